@@ -5,17 +5,24 @@ of an account without setting a password, and sends an email to the user so that
 they can reset the password themselves.
 Source: https://django-authtools.readthedocs.io/en/latest/how-to/invitation-email.html
 
+Also contains LargeTableAdminMixin, for the ModelAdmins of tables with millions
+of rows, like source traits and their encoded values.
 """
 
+import re
 
 from django import forms
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import PasswordResetForm
+from django.core.paginator import Paginator
+from django.db import connections, router
 from django.utils.crypto import get_random_string
+from django.utils.functional import cached_property
 
 from authtools.admin import NamedUserAdmin
 from authtools.forms import UserCreationForm
+import watson.search as watson
 
 
 User = get_user_model()
@@ -87,5 +94,86 @@ class UserAdmin(NamedUserAdmin):
             )
 
 
+def estimate_row_count(model):
+    """Return the database's estimate of the number of rows in the table of model, or None if it has none.
+
+    The estimate comes from the table statistics of MySQL or PostgreSQL, so it is
+    fast but can be off by a few percent. Other databases have no estimate.
+    """
+    connection = connections[router.db_for_read(model)]
+    if connection.vendor == 'mysql':
+        query = 'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s'
+    elif connection.vendor == 'postgresql':
+        query = 'SELECT reltuples FROM pg_class WHERE relname = %s'
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(query, [model._meta.db_table])
+        row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """A Paginator that uses the estimated number of rows of large tables for unfiltered querysets.
+
+    Filtered querysets, and tables with fewer than MIN_ESTIMATED_COUNT estimated
+    rows, are counted exactly.
+    """
+
+    MIN_ESTIMATED_COUNT = 100000
+
+    def estimate_count(self):
+        return estimate_row_count(self.object_list.model)
+
+    @cached_property
+    def count(self):
+        """Return the estimated number of rows in the table, if the queryset is unfiltered and the table is large."""
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = self.estimate_count()
+            if estimate is not None and estimate >= self.MIN_ESTIMATED_COUNT:
+                return estimate
+        return super().count
+
+
+class LargeTableAdminMixin(object):
+    """A ModelAdmin mixin for models with millions of rows, to keep their changelists fast.
+
+    Set list_select_related to the related objects whose __str__ is shown in
+    list_display, so that they are not loaded with one query per row.
+
+    The changelist is counted with EstimatedCountPaginator, and the full result
+    count of filtered changelists is not shown, so that no COUNT(*) of the whole
+    table is run. Search terms that fully match one of exact_search_patterns are
+    looked up exactly in the corresponding field (which should be indexed), using
+    the first group of the match. Other search terms are searched for with
+    search_fields, which should only use the '^' (starts with) and '=' (exact)
+    prefixes on indexed fields, and, if full_text_search is True, in the
+    django-watson search index of the model, which replaces icontains searches of
+    descriptions.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Tuples of (regex, field name).
+    exact_search_patterns = ()
+    full_text_search = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """Route the search term to an exact lookup, or to search_fields and the full text index."""
+        search_term = search_term.strip()
+        for pattern, field_name in self.exact_search_patterns:
+            match = re.fullmatch(pattern, search_term, flags=re.IGNORECASE)
+            if match is not None:
+                return queryset.filter(**{field_name: match.group(1)}), False
+        results, use_distinct = super().get_search_results(request, queryset, search_term)
+        if self.full_text_search and search_term:
+            entries = watson.search(search_term, models=(self.model, ), ranking=False)
+            results = results | queryset.filter(pk__in=entries.values('object_id_int'))
+        return results, use_distinct
+
+
 admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
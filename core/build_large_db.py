@@ -0,0 +1,471 @@
+"""Contains a function to fill a db with a large, realistic, synthetic catalog, for performance work.
+
+Unlike build_test_db, which makes a handful of objects with the factories, build_large_db
+makes objects in memory and saves them with bulk_create, or for the source trait tables
+inserts rows of values with executemany, so it can make millions of source traits in
+minutes. All of the random choices come from one seeded random number generator, so the
+same arguments always make the same catalog in an empty db.
+
+Neither of these calls save() or sends signals, so the fields that the models set in
+save() are set here with the same model methods or formats, and the cached tables that
+the signal receivers maintain (tag study counts and the component html of harmonized
+trait set versions) are rebuilt at the end. The version links of each study's versions,
+datasets, and traits are set after the study is saved, as import_db sets them. The
+full-text search index is not built, because it is slow for catalogs of this size; run
+the buildwatson management command if searches are needed.
+"""
+
+import datetime
+import random
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+import profiles.caches
+import tags.caches
+import tags.models
+import trait_browser.models
+
+
+# Number of objects to save in each INSERT statement.
+BULK_CREATE_BATCH_SIZE = 5000
+USER_EMAIL = 'large_db_user_{}@example.com'
+
+PHENOTYPE_WORDS = (
+    'age', 'alcohol', 'angina', 'ankle', 'apnea', 'arm', 'asthma', 'atrial', 'baseline', 'blood', 'body', 'bmi',
+    'calcium', 'cancer', 'cholesterol', 'chronic', 'cigarette', 'clinic', 'creatinine', 'daily', 'death', 'diabetes',
+    'diastolic', 'diet', 'dose', 'education', 'event', 'exam', 'exercise', 'family', 'fasting', 'fibrillation',
+    'follow-up', 'glucose', 'hdl', 'heart', 'height', 'hemoglobin', 'hip', 'history', 'hospital', 'hypertension',
+    'income', 'insulin', 'kidney', 'ldl', 'lung', 'medication', 'myocardial', 'pressure', 'pulse', 'rate', 'sleep',
+    'smoking', 'stroke', 'systolic', 'triglycerides', 'visit', 'waist', 'weight',
+)
+# Tuple format: (detected type, dbGaP type)
+TRAIT_TYPES = (('integer', 'integer'), ('double', 'decimal'), ('character', 'string'), ('encoded', 'encoded value'))
+UNITS = ('', '', '', 'mmHg', 'kg', 'cm', 'years', 'mg/dL', 'beats/min', 'days', 'ng/mL')
+HARMONIZED_DATA_TYPES = ('encoded', 'character', 'double', 'integer')
+
+# Tuple format: (review state, relative weight)
+REVIEW_STATES = (
+    ('unreviewed', 40),
+    ('confirmed', 35),
+    ('followup', 10),
+    ('followup_agree', 5),
+    ('followup_disagree', 4),
+    ('followup_disagree_confirm', 3),
+    ('followup_disagree_remove', 3),
+)
+
+# Field order of the rows inserted with _LargeDBBuilder.insert_rows.
+DATE_FIELDS = ('i_date_added', 'i_date_changed', 'created', 'modified')
+SOURCE_TRAIT_FIELDS = (
+    'i_trait_id', 'i_trait_name', 'i_description', 'source_dataset', 'i_detected_type', 'i_dbgap_type',
+    'i_dbgap_variable_accession', 'i_dbgap_variable_version', 'i_dbgap_comment', 'i_dbgap_unit', 'i_n_records',
+    'i_n_missing', 'i_is_unique_key', 'i_are_values_truncated', 'full_accession', 'dbgap_link',
+    'encoded_value_set', 'is_current', 'previous_version', 'next_version') + DATE_FIELDS
+SOURCE_TRAIT_ENCODED_VALUE_FIELDS = ('i_id', 'source_trait', 'i_category', 'i_value') + DATE_FIELDS
+
+
+class _LargeDBBuilder(object):
+    """Hold the random number generator and the next free primary keys while building a large db."""
+
+    def __init__(self, seed, batch_size):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.now = timezone.now()
+        self.next_pks = {}
+        # A random sample of current source trait pks, for components of harmonized traits.
+        self.component_candidates = []
+        self.n_current_traits = 0
+        # Tuple format: (source trait pk, is current)
+        self.traits_to_tag = []
+        self.counts = {}
+
+    def next_pk(self, model, field='pk'):
+        """Return an unused value of an integer field of model, counting up from the largest one in the db."""
+        key = (model, field)
+        if key not in self.next_pks:
+            max_value = model.objects.aggregate(max_value=Max(field))['max_value'] or 0
+            self.next_pks[key] = max_value + 1
+        value = self.next_pks[key]
+        self.next_pks[key] += 1
+        return value
+
+    def bulk_create(self, model, objs):
+        # Django 1.11 doesn't limit an explicit batch_size to what the db backend can insert at once.
+        batch_size = min(self.batch_size, connection.ops.bulk_batch_size(model._meta.concrete_fields, objs) or 1)
+        model.objects.bulk_create(objs, batch_size=batch_size)
+        self.counts[model._meta.model_name] = self.counts.get(model._meta.model_name, 0) + len(objs)
+
+    def insert_rows(self, model, field_names, rows):
+        """Insert tuples of db-ready values for field_names with executemany, without making model instances.
+
+        This skips the ORM's preparation of every value, which takes most of the time of bulk_create
+        for tables with millions of rows. Every concrete field of the model must be given.
+        """
+        fields = [model._meta.get_field(name) for name in field_names]
+        missing = set(model._meta.concrete_fields) - set(fields)
+        if missing:
+            raise ValueError('No values given for {}.'.format(', '.join(sorted(field.name for field in missing))))
+        quote_name = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote_name(model._meta.db_table), ', '.join(quote_name(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)))
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), self.batch_size):
+                cursor.executemany(sql, rows[start:start + self.batch_size])
+        self.counts[model._meta.model_name] = self.counts.get(model._meta.model_name, 0) + len(rows)
+
+    def db_dates(self):
+        """Return db-ready values for the i_date_added, i_date_changed, created, and modified fields."""
+        if not hasattr(self, '_db_date_pool'):
+            # Adapting each datetime for the db is slow, so pick from a pool of adapted ones.
+            self._db_date_pool = [connection.ops.adapt_datetimefield_value(self.random_date()) for _ in range(1000)]
+            self._db_now = connection.ops.adapt_datetimefield_value(self.now)
+        date_added = self.rng.choice(self._db_date_pool)
+        return (date_added, date_added, self._db_now, self._db_now)
+
+    def random_date(self, max_days_ago=3650):
+        return self.now - datetime.timedelta(days=self.rng.randrange(1, max_days_ago),
+                                             seconds=self.rng.randrange(86400))
+
+    def source_db_dates(self):
+        """Return keyword arguments for the i_date_added and i_date_changed fields."""
+        date_added = self.random_date()
+        return {'i_date_added': date_added, 'i_date_changed': date_added}
+
+    def words(self, n_range):
+        return ' '.join(self.rng.choice(PHENOTYPE_WORDS) for _ in range(self.rng.randint(*n_range)))
+
+    def make_users(self, n_users):
+        """Make phenotype tagger users, or return existing ones from a previous build."""
+        User = get_user_model()
+        taggers = Group.objects.filter(name='phenotype_taggers').first()
+        users = []
+        for i in range(n_users):
+            user, created = User.objects.get_or_create(
+                email=USER_EMAIL.format(i), defaults={'name': 'Large DB User {}'.format(i)})
+            if created:
+                user.set_unusable_password()
+                user.save()
+                if taggers is not None:
+                    user.groups.add(taggers)
+            users.append(user)
+        return users
+
+    def make_tags(self, n_tags, users):
+        made_tags = []
+        for i in range(n_tags):
+            tag = tags.models.Tag(
+                title='{} {}'.format(self.words((1, 2)), self.next_pk(tags.models.Tag)),
+                description=self.words((5, 20)), instructions=self.words((10, 40)), creator=self.rng.choice(users))
+            # Save one at a time, so save() sets lower_title.
+            tag.save()
+            made_tags.append(tag)
+        self.counts['tag'] = n_tags
+        return made_tags
+
+    def make_study(self, global_study, n_versions_range, n_datasets_range, n_traits_range, encoded_fraction,
+                   n_values_range, tagged_fraction):
+        """Make one study with several versions of its datasets, source traits, and encoded values."""
+        study = trait_browser.models.Study(global_study=global_study, i_accession=self.next_pk(
+            trait_browser.models.Study), i_study_name='{} Study'.format(self.words((1, 3)).title()),
+            **self.source_db_dates())
+        study.phs = study.set_phs()
+        self.bulk_create(trait_browser.models.Study, [study])
+        # The datasets and variables of the first version, which later versions update.
+        dataset_specs = [self.make_dataset_spec(n_traits_range, encoded_fraction, n_values_range)
+                         for _ in range(self.rng.randint(*n_datasets_range))]
+        n_versions = self.rng.randint(*n_versions_range)
+        participant_set = 1
+        study_versions, datasets, traits, encoded_values = [], [], [], []
+        for version in range(1, n_versions + 1):
+            is_current = version == n_versions
+            if version > 1:
+                participant_set += self.rng.randrange(2)
+                self.update_dataset_specs(dataset_specs, n_traits_range, encoded_fraction, n_values_range)
+            study_version = trait_browser.models.SourceStudyVersion(
+                study=study, i_id=self.next_pk(trait_browser.models.SourceStudyVersion), i_version=version,
+                i_participant_set=participant_set, i_dbgap_date=self.random_date(), i_is_prerelease=False,
+                i_is_deprecated=not is_current, **self.source_db_dates())
+            study_version.full_accession = study_version.set_full_accession()
+            study_version.dbgap_link = study_version.set_dbgap_link()
+            study_versions.append(study_version)
+            for dataset_spec in dataset_specs:
+                dataset = trait_browser.models.SourceDataset(
+                    source_study_version=study_version, i_id=self.next_pk(trait_browser.models.SourceDataset),
+                    i_accession=dataset_spec['accession'], i_version=dataset_spec['version'],
+                    i_is_subject_file=dataset_spec['is_subject_file'], i_study_subject_column='SUBJID',
+                    i_dbgap_description=dataset_spec['description'], dataset_name=dataset_spec['name'],
+                    dbgap_filename='{}.{}.data_dict.xml'.format(study_version.full_accession, dataset_spec['name']),
+                    is_current=is_current, **self.source_db_dates())
+                dataset.full_accession = dataset.set_full_accession()
+                dataset.dbgap_link = dataset.set_dbgap_link()
+                datasets.append(dataset)
+                for trait_spec in dataset_spec['traits']:
+                    trait = self.make_source_trait_row(dataset, trait_spec)
+                    traits.append(trait)
+                    encoded_values.extend(
+                        (self.next_pk(trait_browser.models.SourceTraitEncodedValue), trait[0], category, value) +
+                        self.db_dates()
+                        for category, value in trait_spec['encoded_values'])
+                    self.sample_trait(trait[0], is_current, tagged_fraction)
+        self.bulk_create(trait_browser.models.SourceStudyVersion, study_versions)
+        self.bulk_create(trait_browser.models.SourceDataset, datasets)
+        self.insert_rows(trait_browser.models.SourceTrait, SOURCE_TRAIT_FIELDS, traits)
+        self.insert_rows(trait_browser.models.SourceTraitEncodedValue, SOURCE_TRAIT_ENCODED_VALUE_FIELDS,
+                         encoded_values)
+        # Link the versions of the study's objects, as import_db does for the studies it changes.
+        for model in (trait_browser.models.SourceStudyVersion, trait_browser.models.SourceDataset,
+                      trait_browser.models.SourceTrait):
+            model.objects.in_studies([study.pk]).refresh_version_links()
+        return study
+
+    def make_dataset_spec(self, n_traits_range, encoded_fraction, n_values_range):
+        name = '_'.join(self.rng.sample(PHENOTYPE_WORDS, 2))
+        return {
+            'accession': self.next_pk(trait_browser.models.SourceDataset, 'i_accession'),
+            'version': 1,
+            'name': name,
+            'description': self.words((5, 30)),
+            'is_subject_file': self.rng.random() < 0.05,
+            'traits': [self.make_trait_spec(encoded_fraction, n_values_range)
+                       for _ in range(self.rng.randint(*n_traits_range))],
+        }
+
+    def make_trait_spec(self, encoded_fraction, n_values_range):
+        if self.rng.random() < encoded_fraction:
+            detected_type, dbgap_type = TRAIT_TYPES[-1]
+            encoded_values = [(str(i), self.words((1, 4))) for i in range(self.rng.randint(*n_values_range))]
+        else:
+            detected_type, dbgap_type = self.rng.choice(TRAIT_TYPES[:-1])
+            encoded_values = []
+        return {
+            'accession': self.next_pk(trait_browser.models.SourceTrait, 'i_dbgap_variable_accession'),
+            'version': 1,
+            'name': '_'.join(self.rng.sample(PHENOTYPE_WORDS, 2)).upper() + str(self.rng.randrange(100)),
+            'description': self.words((3, 25)),
+            'detected_type': detected_type,
+            'dbgap_type': dbgap_type,
+            'unit': self.rng.choice(UNITS),
+            'encoded_values': encoded_values,
+        }
+
+    def update_dataset_specs(self, dataset_specs, n_traits_range, encoded_fraction, n_values_range):
+        """Change the datasets and variables for a new study version, the way dbGaP releases do."""
+        for dataset_spec in dataset_specs:
+            dataset_spec['version'] += 1
+            for trait_spec in dataset_spec['traits']:
+                if self.rng.random() < 0.1:
+                    trait_spec['version'] += 1
+                    trait_spec['description'] = self.words((3, 25))
+            # A few variables are removed and added.
+            dataset_spec['traits'] = [trait_spec for trait_spec in dataset_spec['traits'] if self.rng.random() > 0.02]
+            dataset_spec['traits'].extend(self.make_trait_spec(encoded_fraction, n_values_range)
+                                          for _ in range(len(dataset_spec['traits']) // 50))
+        if self.rng.random() < 0.2:
+            dataset_specs.append(self.make_dataset_spec(n_traits_range, encoded_fraction, n_values_range))
+
+    def make_source_trait_row(self, dataset, trait_spec):
+        """Return a tuple of db-ready values for SOURCE_TRAIT_FIELDS."""
+        n_records = self.rng.randrange(100, 20000)
+        # The same values that SourceTrait.save() would set.
+        full_accession = trait_browser.models.SourceTrait.VARIABLE_ACCESSION.format(
+            trait_spec['accession'], trait_spec['version'], dataset.source_study_version.i_participant_set)
+        dbgap_link = trait_browser.models.SourceTrait.VARIABLE_URL.format(
+            dataset.source_study_version.full_accession, trait_spec['accession'])
+        return (self.next_pk(trait_browser.models.SourceTrait), trait_spec['name'], trait_spec['description'],
+                dataset.pk, trait_spec['detected_type'], trait_spec['dbgap_type'], trait_spec['accession'],
+                trait_spec['version'], '', trait_spec['unit'], n_records, self.rng.randrange(n_records // 10 + 1),
+                False, False, full_accession, dbgap_link, None, dataset.is_current, None, None) + self.db_dates()
+
+    def sample_trait(self, trait_pk, is_current, tagged_fraction):
+        """Choose whether to tag the trait, and keep a random sample of current traits as harmonization components."""
+        if self.rng.random() < (tagged_fraction if is_current else tagged_fraction / 4):
+            self.traits_to_tag.append((trait_pk, is_current))
+        if is_current:
+            # Reservoir sampling keeps each current trait in the sample with equal probability.
+            self.n_current_traits += 1
+            if len(self.component_candidates) < 10000:
+                self.component_candidates.append(trait_pk)
+            else:
+                i = self.rng.randrange(self.n_current_traits)
+                if i < len(self.component_candidates):
+                    self.component_candidates[i] = trait_pk
+
+    def make_tagged_traits(self, made_tags, users):
+        """Tag the chosen traits with one or more tags each, and review some of the tagged traits."""
+        tagged_traits, reviews, responses, decisions = [], [], [], []
+        states, weights = zip(*REVIEW_STATES)
+        for trait_pk, is_current in self.traits_to_tag:
+            for tag in self.rng.sample(made_tags, min(len(made_tags), self.rng.choice((1, 1, 1, 2, 3)))):
+                tagged_trait = tags.models.TaggedTrait(
+                    pk=self.next_pk(tags.models.TaggedTrait), trait_id=trait_pk, tag=tag,
+                    creator=self.rng.choice(users), is_current=is_current)
+                tagged_traits.append(tagged_trait)
+                # Tagged traits from deprecated study versions are mostly reviewed.
+                state = self.rng.choices(states, weights)[0] if is_current else self.rng.choice(states[1:])
+                if state == 'unreviewed':
+                    continue
+                review = tags.models.DCCReview(
+                    pk=self.next_pk(tags.models.DCCReview), tagged_trait=tagged_trait, creator=self.rng.choice(users),
+                    status=(tags.models.DCCReview.STATUS_CONFIRMED if state == 'confirmed'
+                            else tags.models.DCCReview.STATUS_FOLLOWUP),
+                    comment='' if state == 'confirmed' else self.words((3, 15)))
+                reviews.append(review)
+                if state.startswith('followup_'):
+                    agree = state == 'followup_agree'
+                    responses.append(tags.models.StudyResponse(
+                        dcc_review=review, creator=self.rng.choice(users),
+                        status=tags.models.StudyResponse.STATUS_AGREE if agree
+                        else tags.models.StudyResponse.STATUS_DISAGREE,
+                        comment='' if agree else self.words((3, 15))))
+                    # Tagged traits are archived when the study agrees they should be removed.
+                    tagged_trait.archived = agree
+                if state in ('followup_disagree_confirm', 'followup_disagree_remove'):
+                    remove = state == 'followup_disagree_remove'
+                    decisions.append(tags.models.DCCDecision(
+                        dcc_review=review, creator=self.rng.choice(users),
+                        decision=tags.models.DCCDecision.DECISION_REMOVE if remove
+                        else tags.models.DCCDecision.DECISION_CONFIRM,
+                        comment=self.words((3, 15))))
+                    tagged_trait.archived = remove
+        self.bulk_create(tags.models.TaggedTrait, tagged_traits)
+        self.bulk_create(tags.models.DCCReview, reviews)
+        self.bulk_create(tags.models.StudyResponse, responses)
+        self.bulk_create(tags.models.DCCDecision, decisions)
+
+    def make_harmonized_trait_set(self, n_versions_range, n_traits_range, encoded_fraction, n_values_range):
+        """Make a harmonized trait set with several versions, each with harmonization units and harmonized traits."""
+        models = trait_browser.models
+        trait_set = models.HarmonizedTraitSet(
+            i_id=self.next_pk(models.HarmonizedTraitSet),
+            i_trait_set_name='_'.join(self.rng.sample(PHENOTYPE_WORDS, 2)),
+            i_flavor=self.rng.randint(1, 3), i_is_longitudinal=self.rng.random() < 0.2,
+            i_is_demographic=self.rng.random() < 0.1, **self.source_db_dates())
+        self.bulk_create(models.HarmonizedTraitSet, [trait_set])
+        n_versions = self.rng.randint(*n_versions_range)
+        trait_names = ['_'.join(self.rng.sample(PHENOTYPE_WORDS, 2)) + str(i)
+                       for i in range(self.rng.randint(*n_traits_range))]
+        set_versions, units, harmonized_traits, encoded_values = [], [], [], []
+        unit_components, trait_components, trait_units = [], [], []
+        for version in range(1, n_versions + 1):
+            set_version = models.HarmonizedTraitSetVersion(
+                harmonized_trait_set=trait_set, i_id=self.next_pk(models.HarmonizedTraitSetVersion),
+                i_version=version, i_git_commit_hash='{:040x}'.format(self.rng.getrandbits(160)),
+                i_harmonized_by='large_db_user', i_is_deprecated=version != n_versions, **self.source_db_dates())
+            set_versions.append(set_version)
+            version_units = []
+            for _ in range(self.rng.randint(1, 3)):
+                unit = models.HarmonizationUnit(
+                    harmonized_trait_set_version=set_version, i_id=self.next_pk(models.HarmonizationUnit),
+                    i_tag=self.rng.choice(PHENOTYPE_WORDS), **self.source_db_dates())
+                version_units.append(unit)
+                if self.component_candidates:
+                    for trait_pk in set(self.rng.sample(self.component_candidates,
+                                                        min(len(self.component_candidates), self.rng.randint(1, 5)))):
+                        unit_components.append(models.HarmonizationUnit.component_source_traits.through(
+                            harmonizationunit_id=unit.pk, sourcetrait_id=trait_pk))
+            units.extend(version_units)
+            version_unit_pks = {unit.pk for unit in version_units}
+            # The first harmonized trait is the harmonized variable, and the rest are its unique keys.
+            for trait_index, trait_name in enumerate(trait_names):
+                is_encoded = self.rng.random() < encoded_fraction
+                harmonized_trait = models.HarmonizedTrait(
+                    harmonized_trait_set_version=set_version, i_trait_id=self.next_pk(models.HarmonizedTrait),
+                    i_trait_name=trait_name, i_description=self.words((3, 25)),
+                    i_data_type='encoded' if is_encoded else self.rng.choice(HARMONIZED_DATA_TYPES[1:]),
+                    i_unit=self.rng.choice(UNITS), i_has_batch=False, i_is_unique_key=trait_index > 0,
+                    **self.source_db_dates())
+                harmonized_trait.trait_flavor_name = harmonized_trait.set_trait_flavor_name()
+                harmonized_traits.append(harmonized_trait)
+                if is_encoded:
+                    encoded_values.extend(
+                        models.HarmonizedTraitEncodedValue(
+                            harmonized_trait=harmonized_trait, i_id=self.next_pk(models.HarmonizedTraitEncodedValue),
+                            i_category=str(i), i_value=self.words((1, 4)), **self.source_db_dates())
+                        for i in range(self.rng.randint(*n_values_range)))
+                for unit in version_units:
+                    trait_units.append(models.HarmonizedTrait.harmonization_units.through(
+                        harmonizedtrait_id=harmonized_trait.pk, harmonizationunit_id=unit.pk))
+                # Harmonized traits have the source trait components of all of their units.
+                trait_components.extend(
+                    models.HarmonizedTrait.component_source_traits.through(
+                        harmonizedtrait_id=harmonized_trait.pk, sourcetrait_id=link.sourcetrait_id)
+                    for link in unit_components if link.harmonizationunit_id in version_unit_pks)
+        self.bulk_create(models.HarmonizedTraitSetVersion, set_versions)
+        self.bulk_create(models.HarmonizationUnit, units)
+        self.bulk_create(models.HarmonizedTrait, harmonized_traits)
+        self.bulk_create(models.HarmonizedTraitEncodedValue, encoded_values)
+        self.bulk_create(models.HarmonizationUnit.component_source_traits.through, unit_components)
+        self.bulk_create(models.HarmonizedTrait.harmonization_units.through, trait_units)
+        # A source trait can be a component of more than one unit.
+        unique_trait_components = {(link.harmonizedtrait_id, link.sourcetrait_id): link for link in trait_components}
+        self.bulk_create(models.HarmonizedTrait.component_source_traits.through,
+                         list(unique_trait_components.values()))
+
+
+def build_large_db(seed=0, n_studies=200, n_versions_range=(1, 3), n_datasets_range=(5, 25),
+                   n_traits_range=(20, 400), encoded_fraction=0.25, n_enc_value_range=(2, 8), n_tags=50,
+                   tagged_fraction=0.02, n_users=20, n_harmonized_trait_sets=50, n_harmonized_trait_range=(1, 4),
+                   batch_size=BULK_CREATE_BATCH_SIZE):
+    """Add a large, realistic, synthetic catalog to the db, and return counts of the objects made by model name.
+
+    With the default arguments, this makes about 1.3 million source traits.
+
+    seed -- int; seed for the random number generator
+    n_studies -- int; number of studies to make; about one in four global studies has more than one study
+    n_versions_range -- tuple; (min, max) number of versions of each study; all but the last are deprecated
+    n_datasets_range -- tuple; (min, max) number of datasets in the first version of each study
+    n_traits_range -- tuple; (min, max) number of source traits in the first version of each dataset
+    encoded_fraction -- float; fraction of source and harmonized traits that have encoded values
+    n_enc_value_range -- tuple; (min, max) number of encoded values for each trait with encoded values
+    n_tags -- int; number of tags to make
+    tagged_fraction -- float; fraction of current source traits to tag; deprecated ones are tagged less often
+    n_users -- int; number of phenotype tagger users to make, or reuse from a previous build
+    n_harmonized_trait_sets -- int; number of harmonized trait sets to make
+    n_harmonized_trait_range -- tuple; (min, max) number of harmonized traits in each harmonized trait set
+    batch_size -- int; number of objects to save in each INSERT statement
+
+    NOTA BENE: Unlike build_test_db, the range tuples are inclusive, so (1, 3) picks 1, 2, or 3.
+    """
+    if n_studies < 1:
+        raise ValueError('n_studies must be at least 1.')
+    for name, value_range in (('n_versions_range', n_versions_range), ('n_datasets_range', n_datasets_range),
+                              ('n_traits_range', n_traits_range), ('n_enc_value_range', n_enc_value_range),
+                              ('n_harmonized_trait_range', n_harmonized_trait_range)):
+        if value_range[0] < 1 or value_range[1] < value_range[0]:
+            raise ValueError('{} must be a (min, max) tuple with 1 <= min <= max.'.format(name))
+    builder = _LargeDBBuilder(seed, batch_size)
+    with transaction.atomic():
+        users = builder.make_users(n_users)
+        made_tags = builder.make_tags(n_tags, users)
+        global_study = None
+        for i in range(n_studies):
+            if global_study is None or builder.rng.random() > 0.25:
+                global_study = trait_browser.models.GlobalStudy(
+                    i_id=builder.next_pk(trait_browser.models.GlobalStudy), **builder.source_db_dates())
+                global_study.i_name = 'Global study {}'.format(global_study.pk)
+                global_study.i_topmed_abbreviation = 'GS{}'.format(global_study.pk)
+                builder.bulk_create(trait_browser.models.GlobalStudy, [global_study])
+            builder.make_study(global_study, n_versions_range, n_datasets_range, n_traits_range, encoded_fraction,
+                               n_enc_value_range, tagged_fraction)
+        if made_tags and users:
+            builder.make_tagged_traits(made_tags, users)
+        for i in range(n_harmonized_trait_sets):
+            builder.make_harmonized_trait_set(n_versions_range, n_harmonized_trait_range, encoded_fraction,
+                                              n_enc_value_range)
+        # Rebuild the tables that signal receivers would have kept up to date.
+        apps.get_model('tags', 'TagStudyCount').objects.refresh()
+        trait_browser.models.HarmonizedTraitSetVersion.objects.all().update_component_html()
+        trait_browser.models.SourceTraitLineage.objects.refresh()
+        for trait_model in (trait_browser.models.SourceTrait, trait_browser.models.HarmonizedTrait):
+            trait_browser.models.EncodedValueSet.objects.link_traits(trait_model.objects.all())
+        # Mark the catalog pages as changed, as import_db does.
+        trait_browser.models.ImportGeneration.objects.create()
+        tags.caches.clear_unreviewed_index()
+        profiles.caches.clear_all_dashboards()
+    return builder.counts
@@ -6,6 +6,8 @@ from django.contrib.auth.hashers import make_password
 import factory
 import factory.fuzzy
 
+from . import models
+
 User = get_user_model()
 USER_FACTORY_PASSWORD = 'qwerty'
 
@@ -27,3 +29,17 @@ class SuperUserFactory(UserFactory):
 
     is_superuser = True
     is_staff = True
+
+
+class QueryStatFactory(factory.DjangoModelFactory):
+    """Factory for QueryStat objects with made up query totals."""
+
+    url_name = factory.Sequence(lambda n: 'app:view-{}'.format(n))
+    requests = factory.fuzzy.FuzzyInteger(1, 100)
+    queries = factory.LazyAttribute(lambda obj: obj.requests * 10)
+    db_time = factory.fuzzy.FuzzyFloat(0, 10)
+    duplicates = factory.LazyAttribute(lambda obj: obj.requests)
+    max_queries = 20
+
+    class Meta:
+        model = models.QueryStat
@@ -0,0 +1,152 @@
+"""Benchmark the key pages of the site on a large generated catalog, and check them against their budgets."""
+
+import datetime
+import json
+import logging
+import subprocess
+from sys import stdout
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.build_large_db import build_large_db
+from core import view_benchmarks
+
+
+# Set up a logger to handle messages based on verbosity setting.
+logger = logging.getLogger(__name__)
+console_handler = logging.StreamHandler(stdout)
+detail_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(detail_formatter)
+logger.addHandler(console_handler)
+
+
+class Command(BaseCommand):
+    """Management command to time the key pages of the site and count their queries.
+
+    Unless --existing_data is given, a catalog is generated with build_large_db
+    before the benchmarks run. Either way, everything is rolled back at the end, so
+    the command can be run on a development db without changing it.
+    """
+
+    help = 'Time the key pages of the site and count their queries, and check the results against their budgets.'
+
+    def _get_git_commit(self):
+        """Return the hash of the checked out git commit, or None if it can't be found."""
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.SITE_ROOT, stderr=subprocess.DEVNULL).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _make_report(self, results, budgets, regressions, fixture, options):
+        """Make a json-serializable dict of the benchmark results, with the budget and status of each benchmark."""
+        regressed = set(regression['benchmark'] for regression in regressions)
+        benchmarks = {}
+        for name, result in results.items():
+            benchmarks[name] = dict(result)
+            benchmarks[name]['budget'] = budgets.get(name, {})
+            if 'skipped' in result:
+                benchmarks[name]['status'] = 'skipped'
+            else:
+                benchmarks[name]['status'] = 'regression' if name in regressed else 'ok'
+        return {
+            'date': datetime.datetime.now().isoformat(),
+            'git_commit': self._get_git_commit(),
+            'database': connection.vendor,
+            'fixture': fixture,
+            'repeat': options.get('repeat'),
+            'benchmarks': benchmarks,
+            'regressions': regressions,
+        }
+
+    def _write_table(self, report):
+        """Write a fixed-width text table of the benchmark results."""
+        line_template = '{:<26}{:>9}{:>13}{:>11}{:>13}{:>13}  {}'
+        self.stdout.write(line_template.format(
+            'benchmark', 'queries', 'max_queries', 'seconds', 'max_seconds', 'db_seconds', 'status'))
+        names = [name for name in view_benchmarks.BENCHMARKS if name in report['benchmarks']]
+        for name in names:
+            result = report['benchmarks'][name]
+            if result['status'] == 'skipped':
+                self.stdout.write(line_template.format(name, '', '', '', '', '', 'skipped: ' + result['skipped']))
+                continue
+            self.stdout.write(line_template.format(
+                name, result['queries'], result['budget'].get('max_queries', ''), '{:.3f}'.format(result['seconds']),
+                result['budget'].get('max_seconds', ''), '{:.3f}'.format(result['db_seconds']), result['status']))
+
+    def add_arguments(self, parser):
+        """Add custom command line arguments to this management command."""
+        parser.add_argument('--existing_data', action='store_true',
+                            help='Benchmark the data already in the db instead of generating a catalog.')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed for the random number generator of the generated catalog.')
+        parser.add_argument('--studies', type=int, default=50,
+                            help='Number of studies in the generated catalog.')
+        parser.add_argument('--datasets', type=int, nargs=2, default=(5, 25), metavar=('MIN', 'MAX'),
+                            help='Range of the number of datasets in each study version of the generated catalog.')
+        parser.add_argument('--traits', type=int, nargs=2, default=(20, 200), metavar=('MIN', 'MAX'),
+                            help='Range of the number of source traits in each dataset of the generated catalog.')
+        parser.add_argument('--tagged_fraction', type=float, default=0.05,
+                            help='Fraction of current source traits to tag in the generated catalog.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Number of timed runs of each benchmark.')
+        parser.add_argument('--benchmarks', nargs='+', choices=list(view_benchmarks.BENCHMARKS.keys()),
+                            help='Names of the benchmarks to run; all of them are run by default.')
+        parser.add_argument('--budgets', type=str, default=view_benchmarks.BUDGETS_FILE,
+                            help='Json file of the query and time budgets of each benchmark.')
+        parser.add_argument('--no_time_budgets', action='store_true',
+                            help='Only check the query budgets, e.g. on a machine much slower than usual.')
+        parser.add_argument('--output', type=str, default=None,
+                            help='File to write a json report of the results and regressions to.')
+
+    def handle(self, *args, **options):
+        """Handle the main functions of this management command.
+
+        Arguments:
+            **args and **options are handled as per the superclass handling; these
+            argument dicts will pass on command line options
+        """
+        # Set the logger level based on verbosity setting.
+        verbosity = options.get('verbosity')
+        if verbosity == 0:
+            logger.setLevel(level='ERROR')
+        elif verbosity == 1:
+            logger.setLevel(level='WARNING')
+        elif verbosity == 2:
+            logger.setLevel(level='INFO')
+        elif verbosity == 3:
+            logger.setLevel(level='DEBUG')
+        budgets = view_benchmarks.read_budgets(options.get('budgets'))
+        try:
+            with transaction.atomic():
+                if options.get('existing_data'):
+                    fixture = {'existing_data': True}
+                else:
+                    fixture = {key: options.get(key) for key in ('seed', 'studies', 'datasets', 'traits',
+                                                                 'tagged_fraction')}
+                    logger.info('Generating a catalog of {} studies.'.format(options.get('studies')))
+                    counts = build_large_db(
+                        seed=options.get('seed'), n_studies=options.get('studies'),
+                        n_datasets_range=tuple(options.get('datasets')), n_traits_range=tuple(options.get('traits')),
+                        tagged_fraction=options.get('tagged_fraction'))
+                    fixture['counts'] = counts
+                    logger.info('Generated {} source traits.'.format(counts.get('sourcetrait', 0)))
+                results = view_benchmarks.run_benchmarks(repeat=options.get('repeat'),
+                                                         names=options.get('benchmarks'))
+                # Undo the generated catalog and the benchmark user.
+                transaction.set_rollback(True)
+        except view_benchmarks.ViewBenchmarkError as e:
+            raise CommandError(str(e))
+        regressions = view_benchmarks.find_regressions(results, budgets,
+                                                       check_time=not options.get('no_time_budgets'))
+        report = self._make_report(results, budgets, regressions, fixture, options)
+        if options.get('output'):
+            with open(options.get('output'), 'w') as output_file:
+                json.dump(report, output_file, indent=2, sort_keys=True)
+        self._write_table(report)
+        if regressions:
+            raise CommandError('{} benchmark metric{} over budget: {}'.format(
+                len(regressions), 's are' if len(regressions) > 1 else ' is',
+                ', '.join('{benchmark} {metric}'.format(**regression) for regression in regressions)))
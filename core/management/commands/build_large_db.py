@@ -0,0 +1,52 @@
+"""Fill the db with a large, synthetic catalog for performance work."""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.build_large_db import build_large_db, BULK_CREATE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    """Management command to bulk create a reproducible, production-sized catalog of fake studies and variables."""
+
+    help = 'Add a large, seeded, synthetic catalog of studies, variables, and tagging to the db.'
+
+    def add_arguments(self, parser):
+        """Add custom command line arguments to this management command."""
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed for the random number generator; the same seed makes the same catalog.')
+        parser.add_argument('--studies', type=int, default=200,
+                            help='Number of studies to make.')
+        parser.add_argument('--versions', type=int, nargs=2, default=(1, 3), metavar=('MIN', 'MAX'),
+                            help='Range of the number of versions of each study.')
+        parser.add_argument('--datasets', type=int, nargs=2, default=(5, 25), metavar=('MIN', 'MAX'),
+                            help='Range of the number of datasets in each study version.')
+        parser.add_argument('--traits', type=int, nargs=2, default=(20, 400), metavar=('MIN', 'MAX'),
+                            help='Range of the number of source traits in each dataset.')
+        parser.add_argument('--tags', type=int, default=50,
+                            help='Number of tags to make.')
+        parser.add_argument('--tagged_fraction', type=float, default=0.02,
+                            help='Fraction of current source traits to tag.')
+        parser.add_argument('--harmonized_trait_sets', type=int, default=50,
+                            help='Number of harmonized trait sets to make.')
+        parser.add_argument('--batch_size', type=int, default=BULK_CREATE_BATCH_SIZE,
+                            help='Number of objects to save in each INSERT statement.')
+
+    def handle(self, *args, **options):
+        """Handle the main functions of this management command.
+
+        Arguments:
+            **args and **options are handled as per the superclass handling; these
+            argument dicts will pass on command line options
+        """
+        start = time.time()
+        counts = build_large_db(
+            seed=options.get('seed'), n_studies=options.get('studies'),
+            n_versions_range=tuple(options.get('versions')), n_datasets_range=tuple(options.get('datasets')),
+            n_traits_range=tuple(options.get('traits')),
+            n_tags=options.get('tags'), tagged_fraction=options.get('tagged_fraction'),
+            n_harmonized_trait_sets=options.get('harmonized_trait_sets'), batch_size=options.get('batch_size'))
+        for model_name, count in sorted(counts.items()):
+            self.stdout.write('{:<48}{:>10}'.format(model_name, count))
+        self.stdout.write('Built in {:.1f} seconds.'.format(time.time() - start))
@@ -0,0 +1,173 @@
+"""Explain the hot queries of the site on a large generated catalog, and check their plans against the baseline."""
+
+from collections import OrderedDict
+import datetime
+import json
+import logging
+import subprocess
+from sys import stdout
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.build_large_db import build_large_db
+from core import query_plans
+
+
+# Set up a logger to handle messages based on verbosity setting.
+logger = logging.getLogger(__name__)
+console_handler = logging.StreamHandler(stdout)
+detail_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(detail_formatter)
+logger.addHandler(console_handler)
+
+
+class Command(BaseCommand):
+    """Management command to explain the hot queries of the site and report full table scans and filesorts.
+
+    Unless --existing_data is given, a catalog is generated with build_large_db
+    before the queries are explained. Either way, everything is rolled back at the end, so
+    the command can be run on a development db without changing it.
+    """
+
+    help = 'Explain the hot queries of the site, report full table scans and filesorts, and check them against ' \
+           'the baseline.'
+
+    def _get_git_commit(self):
+        """Return the hash of the checked out git commit, or None if it can't be found."""
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.SITE_ROOT, stderr=subprocess.DEVNULL).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _make_report(self, results, baseline, regressions, improvements, fixture):
+        """Make a json-serializable dict of the query plans, with the allowed issues and status of each query."""
+        regressed = set(regression['query'] for regression in regressions)
+        queries = {}
+        for name, result in results.items():
+            queries[name] = dict(result)
+            queries[name]['allowed_issues'] = baseline.get(name, [])
+            if 'skipped' in result:
+                queries[name]['status'] = 'skipped'
+            else:
+                queries[name]['status'] = 'regression' if name in regressed else 'ok'
+        return {
+            'date': datetime.datetime.now().isoformat(),
+            'git_commit': self._get_git_commit(),
+            'database': connection.vendor,
+            'fixture': fixture,
+            'queries': queries,
+            'regressions': regressions,
+            'improvements': improvements,
+        }
+
+    def _write_table(self, report):
+        """Write a fixed-width text table of the issues found in each query plan."""
+        line_template = '{:<34}{:<12}{}'
+        self.stdout.write(line_template.format('query', 'status', 'issues'))
+        for name, result in report['queries'].items():
+            if result['status'] == 'skipped':
+                self.stdout.write(line_template.format(name, 'skipped', result['skipped']))
+                continue
+            self.stdout.write(line_template.format(name, result['status'], ', '.join(result['issues'])))
+
+    def _update_baseline(self, filename, results):
+        """Replace the current database vendor's allowed issues in the baseline file with the issues in results.
+
+        The allowed issues of queries that are not in results are kept.
+        """
+        try:
+            baseline = query_plans.read_baseline(filename)
+        except FileNotFoundError:
+            baseline = {}
+        allowed = baseline.get(connection.vendor, {})
+        allowed.update(query_plans.make_baseline(results))
+        baseline[connection.vendor] = OrderedDict(
+            (name, allowed[name]) for name in query_plans.QUERIES if name in allowed)
+        baseline = OrderedDict(sorted(baseline.items()))
+        with open(filename, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=2)
+            baseline_file.write('\n')
+
+    def add_arguments(self, parser):
+        """Add custom command line arguments to this management command."""
+        parser.add_argument('--existing_data', action='store_true',
+                            help='Explain the queries on the data already in the db instead of a generated catalog.')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed for the random number generator of the generated catalog.')
+        parser.add_argument('--studies', type=int, default=50,
+                            help='Number of studies in the generated catalog.')
+        parser.add_argument('--datasets', type=int, nargs=2, default=(5, 25), metavar=('MIN', 'MAX'),
+                            help='Range of the number of datasets in each study version of the generated catalog.')
+        parser.add_argument('--traits', type=int, nargs=2, default=(20, 200), metavar=('MIN', 'MAX'),
+                            help='Range of the number of source traits in each dataset of the generated catalog.')
+        parser.add_argument('--queries', nargs='+', choices=list(query_plans.QUERIES.keys()),
+                            help='Names of the queries to explain; all of them are explained by default.')
+        parser.add_argument('--baseline', type=str, default=query_plans.BASELINE_FILE,
+                            help='Json file of the issues allowed in the plan of each query, by database vendor.')
+        parser.add_argument('--update_baseline', action='store_true',
+                            help="""Record the issues found as the allowed issues of the current database vendor in
+                                    the baseline file, instead of checking them.""")
+        parser.add_argument('--output', type=str, default=None,
+                            help='File to write a json report of the query plans and regressions to.')
+
+    def handle(self, *args, **options):
+        """Handle the main functions of this management command.
+
+        Arguments:
+            **args and **options are handled as per the superclass handling; these
+            argument dicts will pass on command line options
+        """
+        # Set the logger level based on verbosity setting.
+        verbosity = options.get('verbosity')
+        if verbosity == 0:
+            logger.setLevel(level='ERROR')
+        elif verbosity == 1:
+            logger.setLevel(level='WARNING')
+        elif verbosity == 2:
+            logger.setLevel(level='INFO')
+        elif verbosity == 3:
+            logger.setLevel(level='DEBUG')
+        baseline = {}
+        if not options.get('update_baseline'):
+            all_baselines = query_plans.read_baseline(options.get('baseline'))
+            if connection.vendor not in all_baselines:
+                raise CommandError('The baseline has no query plan issues for {} databases; use --update_baseline '
+                                   'to record them.'.format(connection.vendor))
+            baseline = all_baselines[connection.vendor]
+        try:
+            with transaction.atomic():
+                if options.get('existing_data'):
+                    fixture = {'existing_data': True}
+                else:
+                    fixture = {key: options.get(key) for key in ('seed', 'studies', 'datasets', 'traits')}
+                    logger.info('Generating a catalog of {} studies.'.format(options.get('studies')))
+                    fixture['counts'] = build_large_db(
+                        seed=options.get('seed'), n_studies=options.get('studies'),
+                        n_datasets_range=tuple(options.get('datasets')), n_traits_range=tuple(options.get('traits')))
+                results = query_plans.check_queries(names=options.get('queries'))
+                # Undo the generated catalog.
+                transaction.set_rollback(True)
+        except query_plans.QueryPlanError as e:
+            raise CommandError(str(e))
+        if options.get('update_baseline'):
+            self._update_baseline(options.get('baseline'), results)
+            self.stdout.write('Recorded the query plan issues of {} queries for {} databases.'.format(
+                len(results), connection.vendor))
+            return
+        regressions = query_plans.find_regressions(results, baseline)
+        improvements = query_plans.find_improvements(results, baseline)
+        report = self._make_report(results, baseline, regressions, improvements, fixture)
+        if options.get('output'):
+            with open(options.get('output'), 'w') as output_file:
+                json.dump(report, output_file, indent=2, sort_keys=True, default=str)
+        self._write_table(report)
+        for improvement in improvements:
+            self.stdout.write('{query} no longer has {issue}; update the baseline to keep it that way.'.format(
+                **improvement))
+        if regressions:
+            raise CommandError('{} query plan issue{} not in the baseline: {}'.format(
+                len(regressions), 's are' if len(regressions) > 1 else ' is',
+                ', '.join('{query} {issue}'.format(**regression) for regression in regressions)))
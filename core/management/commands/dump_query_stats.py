@@ -0,0 +1,63 @@
+"""Print the database query totals recorded for each URL name by QueryStatsMiddleware."""
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from core import models
+from core import query_stats
+
+
+FIELDS = ('url_name', 'requests', 'queries', 'mean_queries', 'max_queries', 'duplicates', 'db_time', 'mean_db_time', )
+SORT_CHOICES = ('queries', 'mean_queries', 'max_queries', 'duplicates', 'db_time', 'mean_db_time', )
+
+
+class Command(BaseCommand):
+    """Management command to dump the recorded query stats as a text table or json."""
+
+    help = 'Print the database query counts and times recorded for each URL name.'
+
+    def _get_rows(self, sort):
+        """Make a list of dicts of stats for each URL name, sorted in descending order by sort."""
+        rows = [{field: getattr(query_stat, field) for field in FIELDS}
+                for query_stat in models.QueryStat.objects.all()]
+        return sorted(rows, key=lambda row: (-row[sort], row['url_name']))
+
+    def _format_table(self, rows):
+        """Make a list of lines of fixed-width text for rows."""
+        width = max([len(row['url_name']) for row in rows] + [len('url_name')])
+        line_template = '{:<' + str(width) + '}  {:>9}  {:>10}  {:>12}  {:>11}  {:>10}  {:>10}  {:>12}'
+        lines = [line_template.format(*FIELDS)]
+        for row in rows:
+            lines.append(line_template.format(
+                row['url_name'], row['requests'], row['queries'], '{:.1f}'.format(row['mean_queries']),
+                row['max_queries'], row['duplicates'], '{:.3f}'.format(row['db_time']),
+                '{:.3f}'.format(row['mean_db_time'])))
+        return lines
+
+    def add_arguments(self, parser):
+        """Add custom command line arguments to this management command."""
+        parser.add_argument('--json', action='store_true',
+                            help='Print the stats as a json list instead of a text table.')
+        parser.add_argument('--sort', choices=SORT_CHOICES, default='queries',
+                            help='Stat to sort URL names by, largest first.')
+        parser.add_argument('--reset', action='store_true',
+                            help='Delete the recorded stats after printing them.')
+
+    def handle(self, *args, **options):
+        """Handle the main functions of this management command.
+
+        Arguments:
+            **args and **options are handled as per the superclass handling; these
+            argument dicts will pass on command line options
+        """
+        # Include any stats recorded by this process that have not been saved yet, e.g. when run from a shell.
+        query_stats.flush()
+        rows = self._get_rows(options.get('sort'))
+        if options.get('json'):
+            self.stdout.write(json.dumps(rows, indent=2))
+        else:
+            for line in self._format_table(rows):
+                self.stdout.write(line)
+        if options.get('reset'):
+            models.QueryStat.objects.all().delete()
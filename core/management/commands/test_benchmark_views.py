@@ -0,0 +1,74 @@
+"""Test the benchmark_views management command."""
+
+from io import StringIO
+import json
+import os
+from tempfile import TemporaryDirectory
+
+from django.core import management
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core import view_benchmarks
+from trait_browser.models import Study
+
+
+BENCHMARK_ARGS = ('--studies=2', '--datasets', '1', '2', '--traits', '5', '10', '--tagged_fraction=0.5',
+                  '--repeat=1')
+
+
+class BenchmarkViewsTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.output_fn = os.path.join(self.tmpdir.name, 'report.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def call_command(self, *args):
+        out = StringIO()
+        management.call_command('benchmark_views', *(BENCHMARK_ARGS + args),
+                                '--output={}'.format(self.output_fn), stdout=out, verbosity=0)
+        return out.getvalue()
+
+    def read_report(self):
+        with open(self.output_fn) as output_file:
+            return json.load(output_file)
+
+    def test_writes_report(self):
+        """The json report has the results, budget, and status of each benchmark."""
+        out = self.call_command('--no_time_budgets')
+        report = self.read_report()
+        self.assertEqual(set(report['benchmarks'].keys()), set(view_benchmarks.BENCHMARKS.keys()))
+        self.assertEqual(report['regressions'], [])
+        self.assertEqual(report['fixture']['studies'], 2)
+        for name, result in report['benchmarks'].items():
+            self.assertEqual(result['status'], 'ok')
+            self.assertIn('max_queries', result['budget'])
+            self.assertIn(name, out)
+
+    def test_rolls_back(self):
+        """The generated catalog is rolled back."""
+        self.call_command('--no_time_budgets', '--benchmarks', 'study_list')
+        self.assertEqual(Study.objects.count(), 0)
+        self.assertEqual(list(self.read_report()['benchmarks'].keys()), ['study_list'])
+
+    def test_regression(self):
+        """Metrics over budget are reported as regressions, and raise an error after the report is written."""
+        budgets_fn = os.path.join(self.tmpdir.name, 'budgets.json')
+        with open(budgets_fn, 'w') as budgets_file:
+            json.dump({'study_list': {'max_queries': 1, 'max_seconds': 60}}, budgets_file)
+        with self.assertRaisesRegex(CommandError, 'study_list queries'):
+            self.call_command('--budgets={}'.format(budgets_fn), '--benchmarks', 'study_list', 'tag_list')
+        report = self.read_report()
+        self.assertEqual(report['benchmarks']['study_list']['status'], 'regression')
+        self.assertEqual(report['benchmarks']['tag_list']['status'], 'ok')
+        self.assertEqual([regression['metric'] for regression in report['regressions']], ['queries'])
+
+    def test_existing_data(self):
+        """With --existing_data, no catalog is generated, and benchmarks without objects to show are skipped."""
+        self.call_command('--existing_data', '--no_time_budgets')
+        report = self.read_report()
+        self.assertEqual(report['fixture'], {'existing_data': True})
+        self.assertEqual(report['benchmarks']['tag_detail']['status'], 'skipped')
@@ -0,0 +1,20 @@
+"""Test the build_large_db management command."""
+
+from io import StringIO
+
+from django.core import management
+from django.test import TestCase
+
+from trait_browser.models import SourceTrait, Study
+
+
+class BuildLargeDBCommandTest(TestCase):
+
+    def test_builds_catalog(self):
+        """The command makes the requested number of studies and prints the counts."""
+        out = StringIO()
+        management.call_command('build_large_db', '--studies=2', '--versions', '1', '1', '--datasets', '1', '2',
+                                '--traits', '2', '3', '--tags=1', '--harmonized_trait_sets=1', stdout=out)
+        self.assertEqual(Study.objects.count(), 2)
+        self.assertIn('sourcetrait', out.getvalue())
+        self.assertIn(str(SourceTrait.objects.count()), out.getvalue())
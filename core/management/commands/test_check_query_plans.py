@@ -0,0 +1,72 @@
+"""Test the check_query_plans management command."""
+
+from io import StringIO
+import json
+import os
+from tempfile import TemporaryDirectory
+
+from django.core import management
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+
+from core import query_plans
+from trait_browser.models import Study
+
+
+CATALOG_ARGS = ('--studies=2', '--datasets', '1', '2', '--traits', '5', '10')
+
+
+class CheckQueryPlansTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.output_fn = os.path.join(self.tmpdir.name, 'report.json')
+        self.baseline_fn = os.path.join(self.tmpdir.name, 'baseline.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def call_command(self, *args):
+        out = StringIO()
+        management.call_command('check_query_plans', *(CATALOG_ARGS + args), '--baseline={}'.format(self.baseline_fn),
+                                '--output={}'.format(self.output_fn), stdout=out, verbosity=0)
+        return out.getvalue()
+
+    def write_baseline(self, baseline):
+        with open(self.baseline_fn, 'w') as baseline_file:
+            json.dump({connection.vendor: baseline}, baseline_file)
+
+    def read_report(self):
+        with open(self.output_fn) as output_file:
+            return json.load(output_file)
+
+    def test_update_baseline(self):
+        """With --update_baseline, the issues found are recorded, and then checking them finds no regressions."""
+        self.call_command('--update_baseline')
+        with open(self.baseline_fn) as baseline_file:
+            baseline = json.load(baseline_file)
+        self.assertEqual(list(baseline[connection.vendor].keys()), list(query_plans.QUERIES.keys()))
+        out = self.call_command()
+        report = self.read_report()
+        self.assertEqual(report['regressions'], [])
+        self.assertEqual(Study.objects.count(), 0)
+        for name, result in report['queries'].items():
+            self.assertEqual(result['status'], 'ok')
+            self.assertIn(name, out)
+
+    def test_regression(self):
+        """Issues not in the baseline are reported as regressions, and raise an error after the report is written."""
+        self.write_baseline({})
+        with self.assertRaisesRegex(CommandError, 'harmonized_trait_search full scan'):
+            self.call_command('--queries', 'harmonized_trait_search', 'tag_non_archived_tagged_traits')
+        report = self.read_report()
+        self.assertEqual(report['queries']['harmonized_trait_search']['status'], 'regression')
+        self.assertEqual(report['queries']['tag_non_archived_tagged_traits']['status'], 'ok')
+
+    def test_missing_vendor(self):
+        """The command raises an error if the baseline has nothing for the current database vendor."""
+        with open(self.baseline_fn, 'w') as baseline_file:
+            json.dump({}, baseline_file)
+        with self.assertRaisesRegex(CommandError, '--update_baseline'):
+            self.call_command()
@@ -0,0 +1,58 @@
+"""Test the dump_query_stats management command."""
+
+from io import StringIO
+import json
+
+from django.core import management
+from django.test import TestCase
+
+from core.factories import QueryStatFactory
+from core.models import QueryStat
+from core import query_stats
+
+
+class DumpQueryStatsTest(TestCase):
+
+    def setUp(self):
+        query_stats.reset()
+        self.few_queries = QueryStatFactory.create(url_name='app:few', requests=10, queries=20, db_time=5.0)
+        self.many_queries = QueryStatFactory.create(url_name='app:many', requests=1, queries=100, db_time=1.0)
+
+    def call_command(self, *args):
+        out = StringIO()
+        management.call_command('dump_query_stats', *args, stdout=out)
+        return out.getvalue()
+
+    def test_table(self):
+        """The text table has a header and one line per URL name, sorted by total queries."""
+        lines = self.call_command().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('url_name'))
+        self.assertTrue(lines[1].startswith('app:many'))
+        self.assertTrue(lines[2].startswith('app:few'))
+
+    def test_json(self):
+        """The json output has the stats for each URL name."""
+        rows = json.loads(self.call_command('--json'))
+        self.assertEqual([row['url_name'] for row in rows], ['app:many', 'app:few'])
+        self.assertEqual(rows[1]['mean_queries'], 2)
+        self.assertEqual(rows[1]['mean_db_time'], 0.5)
+
+    def test_sort(self):
+        """The stats can be sorted by a different column."""
+        rows = json.loads(self.call_command('--json', '--sort', 'db_time'))
+        self.assertEqual([row['url_name'] for row in rows], ['app:few', 'app:many'])
+
+    def test_includes_unsaved_stats(self):
+        """Stats recorded in memory but not yet saved are included."""
+        recorder = query_stats.QueryRecorder()
+        recorder.count = 3
+        query_stats.add('app:unsaved', recorder)
+        rows = json.loads(self.call_command('--json'))
+        self.assertIn('app:unsaved', [row['url_name'] for row in rows])
+
+    def test_reset(self):
+        """The stats are deleted after printing with --reset."""
+        output = self.call_command('--reset')
+        self.assertIn('app:many', output)
+        self.assertEqual(QueryStat.objects.count(), 0)
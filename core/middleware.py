@@ -0,0 +1,25 @@
+"""Middleware to reuse across multiple apps."""
+
+from . import query_stats
+
+
+class QueryStatsMiddleware(object):
+    """Record the database queries run for a sample of requests, by resolved URL name.
+
+    See core.query_stats for the settings that control sampling.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not query_stats.is_sampled():
+            return self.get_response(request)
+        with query_stats.QueryRecorder().capture() as recorder:
+            response = self.get_response(request)
+        # Streaming responses may run more queries after this point, which are not counted.
+        resolver_match = getattr(request, 'resolver_match', None)
+        url_name = resolver_match.view_name if resolver_match is not None else query_stats.UNRESOLVED_URL_NAME
+        query_stats.add(url_name, recorder)
+        query_stats.flush_if_due()
+        return response
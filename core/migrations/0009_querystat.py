@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.27 on 2026-10-18 22:56
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0008_add_dccdecision_groups_permissions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryStat',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('url_name', models.CharField(max_length=255, unique=True)),
+                ('requests', models.PositiveIntegerField(default=0)),
+                ('queries', models.BigIntegerField(default=0)),
+                ('db_time', models.FloatField(default=0, help_text='Total seconds spent running queries.')),
+                ('duplicates', models.BigIntegerField(default=0, help_text='Queries repeated with the same sql and parameters.')),
+                ('max_queries', models.PositiveIntegerField(default=0, help_text='Most queries run for one request.')),
+            ],
+            options={
+                'verbose_name': 'query stat',
+                'ordering': ('-queries',),
+            },
+        ),
+    ]
@@ -15,3 +15,32 @@ class TimeStampedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class QueryStat(TimeStampedModel):
+    """Database query totals for one URL name, recorded by core.middleware.QueryStatsMiddleware."""
+
+    url_name = models.CharField(max_length=255, unique=True)
+    requests = models.PositiveIntegerField(default=0)
+    queries = models.BigIntegerField(default=0)
+    db_time = models.FloatField(default=0, help_text='Total seconds spent running queries.')
+    duplicates = models.BigIntegerField(default=0, help_text='Queries repeated with the same sql and parameters.')
+    max_queries = models.PositiveIntegerField(default=0, help_text='Most queries run for one request.')
+
+    class Meta:
+        verbose_name = 'query stat'
+        ordering = ('-queries', )
+
+    def __str__(self):
+        """Pretty printing for QueryStat objects."""
+        return '{}: {} queries in {} requests'.format(self.url_name, self.queries, self.requests)
+
+    @property
+    def mean_queries(self):
+        """Average number of queries per request."""
+        return self.queries / self.requests if self.requests else 0
+
+    @property
+    def mean_db_time(self):
+        """Average seconds spent running queries per request."""
+        return self.db_time / self.requests if self.requests else 0
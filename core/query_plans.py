@@ -0,0 +1,259 @@
+"""EXPLAIN the hot queries of the site, and check their plans for full table scans and sorts.
+
+QUERIES is a registry of the querysets that the searches, querysets, and main views of the
+site run most often, or on the largest tables. Each one is explained with the database's
+query planner, and the plan is checked for full table scans and for sorts that can't use an
+index (filesorts). The issues found are compared against the issues allowed for each query in
+query_plan_baseline.json, so that a query that stops using an index, e.g. after a model or
+queryset change, is caught before it is deployed. Use the check_query_plans management command
+to explain the queries on a large generated catalog and write a json report of the plans.
+
+Query plans differ between database backends, so the baseline has separate issues for each
+backend (connection.vendor). Only MySQL and SQLite are supported.
+"""
+
+from collections import OrderedDict
+import json
+import os
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from tags.models import Tag, TaggedTrait
+from trait_browser import searches
+from trait_browser.models import SourceDataset, SourceStudyVersion, SourceTrait
+
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_plan_baseline.json')
+# Variable and dataset name to search for; build_large_db makes names from these words.
+SEARCH_NAME = 'pressure'
+# Kinds of issues found in query plans.
+FULL_SCAN = 'full scan'
+FILESORT = 'filesort'
+# SQLite plan details, e.g. "SCAN TABLE tags_tag AS U0" or "SCAN tags_tag USING INDEX ...".
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+SQLITE_SORT = re.compile(r'^USE TEMP B-TREE FOR (?:.* )?(ORDER BY|GROUP BY|DISTINCT)')
+SQLITE_NOT_TABLES = ('SUBQUERY', 'CONSTANT')
+
+
+class QueryPlanError(Exception):
+    """Raised when the query plans can't be checked on the current database."""
+
+    pass
+
+
+def query_source_trait_search(objects):
+    return searches.search_source_traits(name=SEARCH_NAME)
+
+
+def query_source_dataset_search(objects):
+    return searches.search_source_datasets(name=SEARCH_NAME)
+
+
+def query_harmonized_trait_search(objects):
+    return searches.search_harmonized_traits(name=SEARCH_NAME)
+
+
+def query_study_latest_version(objects):
+    """The query of Study.get_latest_version()."""
+    return objects['study'].sourcestudyversion_set.filter(i_is_deprecated=False).order_by(
+        '-i_version', '-i_date_added')[:1]
+
+
+def query_study_version_previous_version(objects):
+    """The query of SourceStudyVersion.get_previous_version()."""
+    return objects['study_version'].get_previous_versions()[:1]
+
+
+def query_source_trait_in_study_version(objects):
+    """The query of SourceTrait.get_latest_version() and get_previous_version()."""
+    source_trait = objects['source_trait']
+    return SourceTrait.objects.filter(
+        source_dataset__source_study_version=source_trait.source_dataset.source_study_version_id,
+        i_dbgap_variable_accession=source_trait.i_dbgap_variable_accession)
+
+
+def query_source_trait_in_dataset(objects):
+    source_trait = objects['source_trait']
+    return SourceTrait.objects.filter(source_dataset=source_trait.source_dataset_id,
+                                      i_dbgap_variable_accession=source_trait.i_dbgap_variable_accession)
+
+
+def query_current_datasets_of_study(objects):
+    """The datasets of a study, as on the study detail and dataset list pages."""
+    return SourceDataset.objects.current().filter(source_study_version__study=objects['study']).order_by(
+        'i_accession')
+
+
+def query_tag_non_archived_tagged_traits(objects):
+    return TaggedTrait.objects.non_archived().filter(tag=objects['tag'])
+
+
+def query_tag_current_non_archived_traits(objects):
+    return objects['tag'].current_non_archived_traits
+
+
+def query_user_non_archived_tagged_traits(objects):
+    """The tagged traits of a user, as on the profile page."""
+    return TaggedTrait.objects.non_archived().filter(creator=objects['user'])
+
+
+def query_tag_study_unreviewed(objects):
+    """The tagged traits left to review for a tag and study, as in the DCC review loop."""
+    return TaggedTrait.objects.current().non_archived().unreviewed().filter(
+        tag=objects['tag'], trait__source_dataset__source_study_version__study=objects['study'])
+
+
+# Tuple format: (query function, keys of the objects it needs)
+QUERIES = OrderedDict((
+    ('source_trait_search', (query_source_trait_search, ())),
+    ('source_dataset_search', (query_source_dataset_search, ())),
+    ('harmonized_trait_search', (query_harmonized_trait_search, ())),
+    ('study_latest_version', (query_study_latest_version, ('study', ))),
+    ('study_version_previous_version', (query_study_version_previous_version, ('study_version', ))),
+    ('source_trait_in_study_version', (query_source_trait_in_study_version, ('source_trait', ))),
+    ('source_trait_in_dataset', (query_source_trait_in_dataset, ('source_trait', ))),
+    ('current_datasets_of_study', (query_current_datasets_of_study, ('study', ))),
+    ('tag_non_archived_tagged_traits', (query_tag_non_archived_tagged_traits, ('tag', ))),
+    ('tag_current_non_archived_traits', (query_tag_current_non_archived_traits, ('tag', ))),
+    ('user_non_archived_tagged_traits', (query_user_non_archived_tagged_traits, ('user', ))),
+    ('tag_study_unreviewed', (query_tag_study_unreviewed, ('tag', 'study'))),
+))
+
+
+def get_query_objects():
+    """Choose the objects to run the queries for, preferring a deprecated trait.
+
+    Returns a dict of the chosen objects; keys are missing if there are no suitable objects in the db.
+    """
+    objects = {}
+    source_trait = SourceTrait.objects.order_by('is_current', 'pk').select_related(
+        'source_dataset__source_study_version__study').first()
+    if source_trait is not None:
+        objects['source_trait'] = source_trait
+        objects['study_version'] = source_trait.source_dataset.source_study_version
+        objects['study'] = objects['study_version'].study
+    elif SourceStudyVersion.objects.exists():
+        objects['study_version'] = SourceStudyVersion.objects.select_related('study').order_by('pk').first()
+        objects['study'] = objects['study_version'].study
+    tagged_trait = TaggedTrait.objects.order_by('pk').select_related('tag', 'creator').first()
+    if tagged_trait is not None:
+        objects['tag'] = tagged_trait.tag
+        objects['user'] = tagged_trait.creator
+    else:
+        tag = Tag.objects.order_by('pk').first()
+        if tag is not None:
+            objects['tag'] = tag
+        user = get_user_model().objects.order_by('pk').first()
+        if user is not None:
+            objects['user'] = user
+    return objects
+
+
+def explain(queryset):
+    """Explain a queryset with the database's query planner.
+
+    Returns:
+        list of dicts of the rows of the plan; for SQLite, each row has the plan 'detail' text
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute('EXPLAIN ' + sql, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        elif connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [{'detail': row[-1]} for row in cursor.fetchall()]
+    raise QueryPlanError('Query plans are not supported on {} databases.'.format(connection.vendor))
+
+
+def find_issues(plan, vendor=None):
+    """Return a sorted list of the full table scans and filesorts in a query plan from explain().
+
+    Issues are strings like 'full scan: tags_taggedtrait'; SQLite doesn't say which table is sorted,
+    so its filesort issues name the clause that needed the sort instead.
+    """
+    vendor = vendor or connection.vendor
+    issues = set()
+    for row in plan:
+        if vendor == 'mysql':
+            if row.get('type') == 'ALL':
+                issues.add('{}: {}'.format(FULL_SCAN, row['table']))
+            if 'Using filesort' in (row.get('Extra') or ''):
+                issues.add('{}: {}'.format(FILESORT, row['table']))
+        else:
+            scan = SQLITE_SCAN.match(row['detail'])
+            if scan is not None and scan.group(1) not in SQLITE_NOT_TABLES:
+                issues.add('{}: {}'.format(FULL_SCAN, scan.group(1)))
+            sort = SQLITE_SORT.match(row['detail'])
+            if sort is not None:
+                issues.add('{}: {}'.format(FILESORT, sort.group(1)))
+    return sorted(issues)
+
+
+def check_queries(names=None):
+    """Explain the registered queries and return an OrderedDict of their plans and issues by query name.
+
+    Queries that need objects that are not in the db are skipped, with a results dict of {'skipped': reason}.
+
+    Arguments:
+        names -- iterable; names of the queries to explain, or None to explain all of them
+    """
+    names = list(QUERIES.keys()) if names is None else names
+    objects = get_query_objects()
+    results = OrderedDict()
+    for name in names:
+        function, object_keys = QUERIES[name]
+        missing = [key for key in object_keys if key not in objects]
+        if missing:
+            results[name] = {'skipped': 'No {} in the db.'.format(', '.join(missing))}
+            continue
+        plan = explain(function(objects))
+        results[name] = {'plan': plan, 'issues': find_issues(plan)}
+    return results
+
+
+def read_baseline(filename=BASELINE_FILE):
+    """Read the dict of allowed issues by query name, for each database vendor, from a json file."""
+    with open(filename) as baseline_file:
+        return json.load(baseline_file)
+
+
+def make_baseline(results):
+    """Return a dict of the issues of each query in results, in the format of the vendor's part of the baseline."""
+    return OrderedDict((name, result['issues']) for name, result in results.items() if 'skipped' not in result)
+
+
+def find_regressions(results, baseline):
+    """Return a list of dicts describing each issue of the results that is not allowed by the baseline.
+
+    Arguments:
+        results -- dict; query results by name, as returned by check_queries
+        baseline -- dict; lists of allowed issues by query name, for one database vendor
+    """
+    regressions = []
+    for name, result in results.items():
+        if 'skipped' in result:
+            continue
+        allowed = baseline.get(name, [])
+        for issue in result['issues']:
+            if issue not in allowed:
+                regressions.append({'query': name, 'issue': issue})
+    return regressions
+
+
+def find_improvements(results, baseline):
+    """Return a list of dicts describing each issue allowed by the baseline that is no longer found.
+
+    These are not errors, but mean that the baseline can be tightened by updating it.
+    """
+    improvements = []
+    for name, result in results.items():
+        if 'skipped' in result:
+            continue
+        for issue in baseline.get(name, []):
+            if issue not in result['issues']:
+                improvements.append({'query': name, 'issue': issue})
+    return improvements
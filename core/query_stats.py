@@ -0,0 +1,193 @@
+"""Low-overhead recording of database queries per view.
+
+QueryStatsMiddleware wraps the database cursors while it handles a sampled
+request, and records the number of queries, the total time spent in the
+database, and the number of duplicated queries (the same sql with the same
+parameters) under the request's resolved URL name. The results are summed up
+in memory in each process and periodically added to the QueryStat table, so
+they can be viewed on the staff-only query stats page or dumped with the
+dump_query_stats management command.
+
+Settings:
+    QUERY_STATS_SAMPLE_RATE -- fraction of requests to record, from 0 (off) to 1 (all requests)
+    QUERY_STATS_FLUSH_INTERVAL -- seconds between saving the in-memory stats to the database
+"""
+
+from contextlib import contextmanager
+import logging
+import random
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, DatabaseError, transaction
+from django.db.backends.utils import CursorWrapper
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+# URL name used for requests that did not resolve to a view, e.g. 404s.
+UNRESOLVED_URL_NAME = '<unresolved>'
+# Statements whose row counts are added to QueryRecorder.rows_written.
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+_aggregates = {}
+_aggregates_lock = threading.Lock()
+_last_flush = time.time()
+
+
+class QueryRecorder(object):
+    """Count the queries, database time, duplicated queries, and rows written run while capturing."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.duplicates = 0
+        self.rows_written = 0
+        self._seen = set()
+
+    def record(self, sql, params, duration, rowcount=-1):
+        self.count += 1
+        self.time += duration
+        if rowcount > 0 and sql.lstrip()[:6].upper() in WRITE_STATEMENTS:
+            self.rows_written += rowcount
+        key = (sql, repr(params))
+        if key in self._seen:
+            self.duplicates += 1
+        else:
+            self._seen.add(key)
+
+    @contextmanager
+    def capture(self):
+        """Record queries run on any database connection in this thread until the block exits."""
+        patched = [_patch_connection(connection, self) for connection in connections.all()]
+        try:
+            yield self
+        finally:
+            for connection, original_attrs in patched:
+                _unpatch_connection(connection, original_attrs)
+
+
+class QueryStatsCursorWrapper(CursorWrapper):
+    """Cursor wrapper that reports the time taken by each query to a QueryRecorder."""
+
+    def __init__(self, cursor, db, recorder):
+        super(QueryStatsCursorWrapper, self).__init__(cursor, db)
+        self.recorder = recorder
+
+    def execute(self, sql, params=None):
+        start = time.time()
+        rowcount = -1
+        try:
+            result = super(QueryStatsCursorWrapper, self).execute(sql, params)
+            rowcount = self.cursor.rowcount
+            return result
+        finally:
+            self.recorder.record(sql, params, time.time() - start, rowcount)
+
+    def executemany(self, sql, param_list):
+        start = time.time()
+        rowcount = -1
+        try:
+            result = super(QueryStatsCursorWrapper, self).executemany(sql, param_list)
+            rowcount = self.cursor.rowcount
+            return result
+        finally:
+            self.recorder.record(sql, param_list, time.time() - start, rowcount)
+
+
+def _patch_connection(connection, recorder):
+    """Wrap the cursors made by connection, returning what is needed to undo the patch."""
+    # Django picks one of these two cursor factories depending on whether queries are being logged.
+    original_attrs = {}
+    for attr in ('make_cursor', 'make_debug_cursor'):
+        original_attrs[attr] = connection.__dict__.get(attr)
+        setattr(connection, attr, _wrap_cursor_factory(getattr(connection, attr), connection, recorder))
+    return connection, original_attrs
+
+
+def _unpatch_connection(connection, original_attrs):
+    for attr, original in original_attrs.items():
+        if original is None:
+            delattr(connection, attr)
+        else:
+            setattr(connection, attr, original)
+
+
+def _wrap_cursor_factory(make_cursor, connection, recorder):
+    def make_query_stats_cursor(cursor):
+        return QueryStatsCursorWrapper(make_cursor(cursor), connection, recorder)
+    return make_query_stats_cursor
+
+
+def is_sampled():
+    """Randomly decide whether to record the current request, based on QUERY_STATS_SAMPLE_RATE."""
+    sample_rate = getattr(settings, 'QUERY_STATS_SAMPLE_RATE', 0)
+    return sample_rate >= 1 or random.random() < sample_rate
+
+
+def add(url_name, recorder):
+    """Add the queries captured by recorder for one request to the in-memory stats for url_name."""
+    with _aggregates_lock:
+        stats = _aggregates.setdefault(
+            url_name, {'requests': 0, 'queries': 0, 'db_time': 0.0, 'duplicates': 0, 'max_queries': 0})
+        stats['requests'] += 1
+        stats['queries'] += recorder.count
+        stats['db_time'] += recorder.time
+        stats['duplicates'] += recorder.duplicates
+        stats['max_queries'] = max(stats['max_queries'], recorder.count)
+
+
+def get_aggregates():
+    """Return a copy of the in-memory stats that have not yet been saved to the database."""
+    with _aggregates_lock:
+        return {url_name: dict(stats) for url_name, stats in _aggregates.items()}
+
+
+def flush():
+    """Add the in-memory stats to the QueryStat table, then reset them."""
+    global _aggregates, _last_flush
+    with _aggregates_lock:
+        aggregates, _aggregates = _aggregates, {}
+        _last_flush = time.time()
+    QueryStat = apps.get_model('core', 'QueryStat')
+    for url_name, stats in aggregates.items():
+        updated = QueryStat.objects.filter(url_name=url_name).update(
+            requests=F('requests') + stats['requests'],
+            queries=F('queries') + stats['queries'],
+            db_time=F('db_time') + stats['db_time'],
+            duplicates=F('duplicates') + stats['duplicates'],
+            max_queries=Greatest('max_queries', stats['max_queries']),
+            modified=timezone.now())
+        if not updated:
+            QueryStat.objects.create(url_name=url_name, **stats)
+
+
+def flush_if_due():
+    """Flush the in-memory stats if QUERY_STATS_FLUSH_INTERVAL seconds have passed since the last flush."""
+    if time.time() - _last_flush < getattr(settings, 'QUERY_STATS_FLUSH_INTERVAL', 60):
+        return
+    try_flush()
+
+
+def try_flush():
+    """Flush the in-memory stats, logging rather than raising any database error."""
+    try:
+        # Use a savepoint so that a failure doesn't break the transaction of the request (ATOMIC_REQUESTS).
+        with transaction.atomic():
+            flush()
+    except DatabaseError:
+        # Losing some stats is better than failing the request.
+        logger.exception('Could not save query stats.')
+
+
+def reset():
+    """Discard the in-memory stats."""
+    global _aggregates, _last_flush
+    with _aggregates_lock:
+        _aggregates = {}
+        _last_flush = time.time()
@@ -0,0 +1,30 @@
+"""Table classes that aren't specific to one app, using django-tables2."""
+
+import django_tables2 as tables
+
+from . import models
+
+
+class QueryStatTable(tables.Table):
+    """Table for displaying the database query totals for each URL name."""
+
+    mean_queries = tables.Column(verbose_name='Mean queries', orderable=False)
+    mean_db_time = tables.Column(verbose_name='Mean db time (s)', orderable=False)
+
+    class Meta:
+        model = models.QueryStat
+        fields = ('url_name', 'requests', 'queries', 'mean_queries', 'max_queries', 'duplicates', 'db_time',
+                  'mean_db_time', 'modified', )
+        attrs = {'class': 'table table-striped table-bordered table-hover'}
+        template = 'django_tables2/bootstrap-responsive.html'
+        order_by = ('-queries', )
+        per_page = 50
+
+    def render_mean_queries(self, value):
+        return '{:.1f}'.format(value)
+
+    def render_db_time(self, value):
+        return '{:.3f}'.format(value)
+
+    def render_mean_db_time(self, value):
+        return '{:.3f}'.format(value)
@@ -1,21 +1,48 @@
 """Custom template tags used across the entire phenotype_inventory project."""
 
+from hashlib import sha1
+
 from django import template
 from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
 
 register = template.Library()
 
+# Maximum number of compiled templates kept by render_as_template.
+COMPILED_TEMPLATE_CACHE_SIZE = 256
+# Seconds to keep sections cached by cache_section. The section keys change whenever
+# their content does, so this only limits how long unused sections take up space.
+SECTION_CACHE_TIMEOUT = 60 * 60
+_compiled_templates = {}
+
+
+def _get_compiled_template(engine, template_as_string):
+    """Get the compiled template for template_as_string, compiling it only if it is not already cached."""
+    key = (engine, sha1(template_as_string.encode('utf-8')).hexdigest())
+    compiled_template = _compiled_templates.get(key)
+    if compiled_template is None:
+        compiled_template = engine.from_string(template_as_string)
+        if len(_compiled_templates) >= COMPILED_TEMPLATE_CACHE_SIZE:
+            _compiled_templates.clear()
+        _compiled_templates[key] = compiled_template
+    return compiled_template
+
 
 @register.simple_tag(takes_context=True)
 def render_as_template(context, template_as_string):
     """Renders a template variable as template code.
 
+    Strings without any template tags, variables, or comments are returned as they are. Compiled
+    templates are cached, keyed by a hash of the template string.
+
     Source:
         https://github.com/daniboy/django-render-as-template
         Taken from render_as_template.templatetags.render_as_template
     """
-    template_as_object = context.template.engine.from_string(template_as_string)
-    return template_as_object.render(context)
+    if not any(marker in template_as_string for marker in ('{%', '{{', '{#')):
+        return mark_safe(template_as_string)
+    return _get_compiled_template(context.template.engine, template_as_string).render(context)
 
 
 @register.filter(name='has_group')
@@ -27,3 +54,39 @@ def has_group(user, group_name):
     """
     group = Group.objects.get(name=group_name)
     return True if group in user.groups.all() else False
+
+
+class CacheSectionNode(template.Node):
+
+    def __init__(self, nodelist, page_key, section_name):
+        self.nodelist = nodelist
+        self.page_key = page_key
+        self.section_name = section_name
+
+    def render(self, context):
+        page_key = self.page_key.resolve(context)
+        if not page_key:
+            return self.nodelist.render(context)
+        cache_key = 'core_tags:cache_section:{}:{}'.format(page_key, self.section_name.resolve(context))
+        content = cache.get(cache_key)
+        if content is None:
+            content = self.nodelist.render(context)
+            cache.set(cache_key, content, SECTION_CACHE_TIMEOUT)
+        return content
+
+
+@register.tag
+def cache_section(parser, token):
+    """Caches a section of a page, for pages whose views give a key that changes whenever the section does.
+
+    Usage: {% cache_section page_cache_key 'section name' %} ... {% endcache_section %}
+    If page_cache_key is empty or missing, the section is rendered without caching.
+    Unlike the cache tag, the key must include everything the section depends on,
+    such as the user's role; see trait_browser.views.ConditionalPageMixin.
+    """
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError("'{}' tag takes a page key and a section name.".format(bits[0]))
+    nodelist = parser.parse(('endcache_section', ))
+    parser.delete_first_token()
+    return CacheSectionNode(nodelist, parser.compile_filter(bits[1]), parser.compile_filter(bits[2]))
@@ -2,6 +2,11 @@
 
 # dcc_analysts, dcc_developers, recipe_submitters, phenotype_taggers
 
+from django.core.cache import cache
+from django.template import Context, Template, TemplateSyntaxError
+from django.test import TestCase
+from django.urls import reverse
+
 from core.utils import (DCCAnalystLoginTestCase, DCCDeveloperLoginTestCase, PhenotypeTaggerLoginTestCase,
                         RecipeSubmitterLoginTestCase)
 
@@ -50,3 +55,66 @@ class HasGroupRecipeSubmitterTest(RecipeSubmitterLoginTestCase):
     def test_incorrect_group_false(self):
         """Returns false when testing for belonging to a false group."""
         self.assertFalse(core_tags.has_group(self.user, 'dcc_developers'))
+
+
+class RenderAsTemplateTest(TestCase):
+
+    def setUp(self):
+        core_tags._compiled_templates.clear()
+        self.template = Template('{% load core_tags %}{% render_as_template html %}')
+
+    def test_renders_template_code(self):
+        """Template code in the string is rendered with the current context."""
+        html = self.template.render(
+            Context({'html': '<a href="{% url \'home\' %}">{{ name }}</a>', 'name': 'home page'}))
+        self.assertEqual(html, '<a href="{}">home page</a>'.format(reverse('home')))
+
+    def test_plain_html_unchanged(self):
+        """A string without template code is returned unescaped and without compiling a template."""
+        html = self.template.render(Context({'html': '<a href="/">link</a>'}))
+        self.assertEqual(html, '<a href="/">link</a>')
+        self.assertEqual(core_tags._compiled_templates, {})
+
+    def test_compiled_template_cached(self):
+        """The same template string is only compiled once."""
+        self.template.render(Context({'html': '{{ name }}', 'name': 'a'}))
+        self.assertEqual(len(core_tags._compiled_templates), 1)
+        compiled_template = list(core_tags._compiled_templates.values())[0]
+        self.assertEqual(self.template.render(Context({'html': '{{ name }}', 'name': 'b'})), 'b')
+        self.assertEqual(list(core_tags._compiled_templates.values()), [compiled_template])
+
+    def test_cache_size_limited(self):
+        """The cache of compiled templates does not grow past COMPILED_TEMPLATE_CACHE_SIZE."""
+        for i in range(core_tags.COMPILED_TEMPLATE_CACHE_SIZE + 1):
+            self.template.render(Context({'html': '{{ name }}' + str(i), 'name': 'a'}))
+        self.assertLessEqual(len(core_tags._compiled_templates), core_tags.COMPILED_TEMPLATE_CACHE_SIZE)
+
+
+class CacheSectionTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.template = Template(
+            "{% load core_tags %}{% cache_section key 'details' %}{{ name }}{% endcache_section %}")
+
+    def test_cached_by_key(self):
+        """The section is rendered once for each key."""
+        self.assertEqual(self.template.render(Context({'key': 'a', 'name': 'first'})), 'first')
+        self.assertEqual(self.template.render(Context({'key': 'a', 'name': 'second'})), 'first')
+        self.assertEqual(self.template.render(Context({'key': 'b', 'name': 'second'})), 'second')
+
+    def test_sections_cached_separately(self):
+        """Sections with different names on the same page are cached separately."""
+        template = Template("{% load core_tags %}{% cache_section key 'other' %}{{ name }}{% endcache_section %}")
+        self.template.render(Context({'key': 'a', 'name': 'first'}))
+        self.assertEqual(template.render(Context({'key': 'a', 'name': 'second'})), 'second')
+
+    def test_no_key(self):
+        """The section is not cached if the key is missing."""
+        self.assertEqual(self.template.render(Context({'name': 'first'})), 'first')
+        self.assertEqual(self.template.render(Context({'name': 'second'})), 'second')
+
+    def test_wrong_number_of_arguments(self):
+        """The tag needs a key and a section name."""
+        with self.assertRaises(TemplateSyntaxError):
+            Template("{% load core_tags %}{% cache_section key %}{% endcache_section %}")
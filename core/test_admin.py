@@ -0,0 +1,146 @@
+"""Test the functions and classes for admin.py."""
+
+from django.contrib.admin.sites import AdminSite
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from trait_browser import admin as trait_browser_admin
+from trait_browser import factories
+from trait_browser import models
+
+from . import admin
+from .utils import SuperuserLoginTestCase
+
+
+class EstimatedCountPaginatorTest(TestCase):
+
+    class FixedEstimatePaginator(admin.EstimatedCountPaginator):
+        """A paginator with a fixed row estimate, since the test db has no table statistics."""
+
+        MIN_ESTIMATED_COUNT = 10
+
+        def estimate_count(self):
+            return 1000
+
+    def setUp(self):
+        factories.SourceTraitFactory.create_batch(3)
+
+    def test_estimate_row_count_without_statistics(self):
+        """The estimate is None for databases without table statistics, or a count for those with them."""
+        estimate = admin.estimate_row_count(models.SourceTrait)
+        self.assertTrue(estimate is None or estimate >= 0)
+
+    def test_exact_count_without_estimate(self):
+        """The queryset is counted exactly when there is no estimate."""
+        paginator = admin.EstimatedCountPaginator(models.SourceTrait.objects.order_by('pk'), 2)
+        self.assertEqual(paginator.count, 3)
+
+    def test_estimated_count_of_unfiltered_queryset(self):
+        """The estimate is used for unfiltered querysets of large tables."""
+        paginator = self.FixedEstimatePaginator(models.SourceTrait.objects.order_by('pk'), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 1000)
+        self.assertEqual(paginator.num_pages, 500)
+
+    def test_exact_count_of_filtered_queryset(self):
+        """Filtered querysets are counted exactly."""
+        trait = models.SourceTrait.objects.first()
+        paginator = self.FixedEstimatePaginator(models.SourceTrait.objects.filter(pk=trait.pk).order_by('pk'), 2)
+        self.assertEqual(paginator.count, 1)
+
+    def test_exact_count_of_small_table(self):
+        """Tables with a small estimate are counted exactly."""
+        paginator = self.FixedEstimatePaginator(models.SourceTrait.objects.order_by('pk'), 2)
+        paginator.MIN_ESTIMATED_COUNT = 10000
+        self.assertEqual(paginator.count, 3)
+
+
+class LargeTableAdminMixinSearchTest(TestCase):
+
+    def setUp(self):
+        self.admin = trait_browser_admin.SourceTraitAdmin(models.SourceTrait, AdminSite())
+        self.request = RequestFactory().get('/')
+        self.trait = factories.SourceTraitFactory.create(
+            i_trait_name='sbp_visit_1', i_description='systolic blood pressure', i_dbgap_variable_accession=4567)
+        self.other_trait = factories.SourceTraitFactory.create(
+            i_trait_name='visit_sbp', i_description='height', i_dbgap_variable_accession=1234)
+
+    def search(self, search_term):
+        results, use_distinct = self.admin.get_search_results(
+            self.request, models.SourceTrait.objects.all(), search_term)
+        return list(results)
+
+    def test_empty_search(self):
+        """All objects are returned for an empty search term."""
+        self.assertEqual(len(self.search('  ')), 2)
+
+    def test_accession_search(self):
+        """A phv accession is looked up exactly, with or without the version and zero padding."""
+        self.assertEqual(self.search('phv00004567'), [self.trait])
+        self.assertEqual(self.search('PHV4567.v1.p1'), [self.trait])
+        self.assertEqual(self.search('phv00000045'), [])
+
+    def test_id_search(self):
+        """A number is looked up as the primary key."""
+        self.assertEqual(self.search(str(self.other_trait.pk)), [self.other_trait])
+
+    def test_name_prefix_search(self):
+        """Names are searched for by prefix."""
+        self.assertEqual(self.search('sbp'), [self.trait])
+
+    def test_full_text_search(self):
+        """Descriptions are searched for in the full text index."""
+        self.assertEqual(self.search('pressure'), [self.trait])
+        self.assertEqual(self.search('height'), [self.other_trait])
+
+
+class LargeTableChangelistTest(SuperuserLoginTestCase):
+
+    def count_changelist_queries(self, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_source_trait_encoded_value_changelist_queries(self):
+        """The number of queries of the changelist does not depend on the number of rows."""
+        url = reverse('admin:trait_browser_sourcetraitencodedvalue_changelist')
+        factories.SourceTraitEncodedValueFactory.create_batch(2)
+        n_queries = self.count_changelist_queries(url)
+        factories.SourceTraitEncodedValueFactory.create_batch(10)
+        self.assertEqual(self.count_changelist_queries(url), n_queries)
+
+    def test_source_trait_changelist_search(self):
+        """The source trait changelist can be searched by accession."""
+        trait = factories.SourceTraitFactory.create(i_dbgap_variable_accession=4567)
+        factories.SourceTraitFactory.create(i_dbgap_variable_accession=1234)
+        response = self.client.get(reverse('admin:trait_browser_sourcetrait_changelist'), {'q': 'phv00004567'})
+        self.assertEqual(list(response.context['cl'].result_list), [trait])
+
+
+class ImportRunAdminTest(SuperuserLoginTestCase):
+
+    def setUp(self):
+        super(ImportRunAdminTest, self).setUp()
+        self.import_run = models.ImportRun.objects.create()
+        models.ImportCheckpoint.objects.create(import_run=self.import_run, phase='import source_trait', result='[]',
+                                               seconds=2.0, source_rows=100, rows_written=100, queries=300)
+        models.ImportCheckpoint.objects.create(import_run=self.import_run, phase='lineage', result='0',
+                                               seconds=1.0, queries=5)
+
+    def test_changelist_totals(self):
+        """The changelist shows the totals of the phases of each import run."""
+        response = self.client.get(reverse('admin:trait_browser_importrun_changelist'))
+        self.assertEqual(response.status_code, 200)
+        import_run = response.context['cl'].result_list[0]
+        self.assertEqual(import_run.phases, 2)
+        self.assertEqual(import_run.seconds, 3.0)
+        self.assertEqual(import_run.queries, 305)
+
+    def test_change_page_phases(self):
+        """The change page lists the phases of the import run."""
+        response = self.client.get(reverse('admin:trait_browser_importrun_change', args=[self.import_run.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'import source_trait')
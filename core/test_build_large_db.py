@@ -0,0 +1,121 @@
+"""Test the function to build a large synthetic catalog."""
+
+from django.test import TestCase
+
+from tags.models import DCCDecision, DCCReview, StudyResponse, TaggedTrait, TagStudyCount
+from trait_browser import models
+
+from .build_large_db import build_large_db
+
+
+SMALL_DB = {'n_studies': 4, 'n_versions_range': (2, 3), 'n_datasets_range': (1, 3), 'n_traits_range': (5, 20),
+            'n_tags': 3, 'tagged_fraction': 0.5, 'n_users': 2, 'n_harmonized_trait_sets': 3, 'batch_size': 7}
+
+
+class BuildLargeDBTest(TestCase):
+
+    def get_trait_data(self):
+        return list(models.SourceTrait.objects.order_by('pk').values_list(
+            'i_trait_name', 'i_description', 'full_accession', 'source_dataset__full_accession'))
+
+    def test_counts(self):
+        """The returned counts match the number of objects made."""
+        counts = build_large_db(**SMALL_DB)
+        self.assertEqual(counts['study'], 4)
+        self.assertEqual(counts['sourcetrait'], models.SourceTrait.objects.count())
+        self.assertEqual(counts['sourcetraitencodedvalue'], models.SourceTraitEncodedValue.objects.count())
+        self.assertEqual(counts['taggedtrait'], TaggedTrait.objects.count())
+        self.assertEqual(counts['harmonizedtraitset'], 3)
+        self.assertEqual(models.Study.objects.count(), 4)
+
+    def test_versions(self):
+        """Each study has one current version, and later versions reuse the dataset and variable accessions."""
+        build_large_db(**SMALL_DB)
+        for study in models.Study.objects.all():
+            versions = study.sourcestudyversion_set.order_by('i_version')
+            self.assertGreaterEqual(versions.count(), 2)
+            self.assertEqual(versions.filter(i_is_deprecated=False).count(), 1)
+            self.assertFalse(versions.last().i_is_deprecated)
+            first_phvs = set(models.SourceTrait.objects.filter(
+                source_dataset__source_study_version=versions.first()).values_list(
+                    'i_dbgap_variable_accession', flat=True))
+            last_phvs = set(models.SourceTrait.objects.filter(
+                source_dataset__source_study_version=versions.last()).values_list(
+                    'i_dbgap_variable_accession', flat=True))
+            self.assertTrue(first_phvs & last_phvs)
+
+    def test_saved_fields(self):
+        """Fields that are set by save() are set for bulk created objects."""
+        build_large_db(**SMALL_DB)
+        trait = models.SourceTrait.objects.first()
+        self.assertEqual(trait.full_accession, trait.set_full_accession())
+        self.assertEqual(trait.dbgap_link, trait.set_dbgap_link())
+        dataset = trait.source_dataset
+        self.assertEqual(dataset.full_accession, dataset.set_full_accession())
+        study_version = dataset.source_study_version
+        self.assertEqual(study_version.full_accession, study_version.set_full_accession())
+        self.assertEqual(study_version.study.phs, study_version.study.set_phs())
+        harmonized_trait = models.HarmonizedTrait.objects.first()
+        self.assertEqual(harmonized_trait.trait_flavor_name, harmonized_trait.set_trait_flavor_name())
+
+    def test_review_states(self):
+        """Tagged traits are made in a mix of review states."""
+        build_large_db(seed=1, **dict(SMALL_DB, n_studies=10))
+        self.assertTrue(TaggedTrait.objects.unreviewed().exists())
+        self.assertTrue(DCCReview.objects.filter(status=DCCReview.STATUS_CONFIRMED).exists())
+        self.assertTrue(StudyResponse.objects.exists())
+        self.assertTrue(DCCDecision.objects.exists())
+        self.assertTrue(TaggedTrait.objects.archived().exists())
+        self.assertEqual(TaggedTrait.objects.archived().count(),
+                         StudyResponse.objects.filter(status=StudyResponse.STATUS_AGREE).count() +
+                         DCCDecision.objects.filter(decision=DCCDecision.DECISION_REMOVE).count())
+
+    def test_tag_study_counts(self):
+        """The tag study counts are rebuilt."""
+        build_large_db(**SMALL_DB)
+        self.assertTrue(TagStudyCount.objects.exists())
+        self.assertEqual(TagStudyCount.objects.get_differences(), {})
+
+    def test_component_html(self):
+        """The component html of harmonized trait set versions with components is filled in."""
+        build_large_db(**SMALL_DB)
+        self.assertTrue(models.HarmonizationUnit.objects.filter(component_source_traits__isnull=False).exists())
+        self.assertFalse(models.HarmonizedTraitSetVersion.objects.filter(component_html_detail='').exists())
+
+    def test_version_links(self):
+        """The previous and next version links of study versions, datasets, and traits are set."""
+        build_large_db(**SMALL_DB)
+        for model in (models.SourceStudyVersion, models.SourceDataset, models.SourceTrait):
+            self.assertTrue(model.objects.filter(previous_version__isnull=False).exists())
+            self.assertEqual(model.objects.all().get_version_link_differences(), {})
+
+    def test_seeded(self):
+        """The same seed makes the same catalog."""
+        build_large_db(seed=5, **SMALL_DB)
+        first_data = self.get_trait_data()
+        models.GlobalStudy.objects.all().delete()
+        build_large_db(seed=5, **SMALL_DB)
+        self.assertEqual(self.get_trait_data(), first_data)
+
+    def test_different_seeds(self):
+        """Different seeds make different catalogs."""
+        build_large_db(seed=5, **SMALL_DB)
+        first_data = self.get_trait_data()
+        models.GlobalStudy.objects.all().delete()
+        build_large_db(seed=6, **SMALL_DB)
+        self.assertNotEqual(self.get_trait_data(), first_data)
+
+    def test_adds_to_existing_data(self):
+        """A second build adds to the first one, without reusing primary keys or accessions."""
+        build_large_db(**SMALL_DB)
+        n_traits = models.SourceTrait.objects.count()
+        build_large_db(**SMALL_DB)
+        self.assertEqual(models.Study.objects.count(), 8)
+        self.assertGreater(models.SourceTrait.objects.count(), n_traits)
+
+    def test_bad_ranges(self):
+        """A range with a minimum larger than its maximum raises a ValueError."""
+        with self.assertRaises(ValueError):
+            build_large_db(n_traits_range=(10, 5))
+        with self.assertRaises(ValueError):
+            build_large_db(n_studies=0)
@@ -7,6 +7,7 @@ from profiles.models import Profile
 import trait_browser.models
 
 from . import factories
+from . import models
 from .build_test_db import build_test_db
 
 
@@ -184,3 +185,22 @@ class BuildTestDbTest(TestCase):
         self.assertTrue(trait_browser.models.HarmonizedTraitSet.objects.count() > 0)
         self.assertTrue(trait_browser.models.HarmonizedTrait.objects.count() > 0)
         self.assertTrue(trait_browser.models.HarmonizedTraitEncodedValue.objects.count() > 0)
+
+
+class QueryStatFactoryTest(TestCase):
+
+    def test_query_stat_factory_build(self):
+        """Test that a QueryStat instance is returned by QueryStatFactory.build()."""
+        query_stat = factories.QueryStatFactory.build()
+        self.assertIsInstance(query_stat, models.QueryStat)
+
+    def test_query_stat_factory_create(self):
+        """Test that a QueryStat instance is returned by QueryStatFactory.create()."""
+        query_stat = factories.QueryStatFactory.create()
+        self.assertIsInstance(query_stat, models.QueryStat)
+
+    def test_query_stat_factory_create_batch(self):
+        """Test that QueryStat instances are returned by QueryStatFactory.create_batch(5)."""
+        query_stats = factories.QueryStatFactory.create_batch(5)
+        for one in query_stats:
+            self.assertIsInstance(one, models.QueryStat)
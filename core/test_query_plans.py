@@ -0,0 +1,96 @@
+"""Test the query plan checks of the hot queries of the site."""
+
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from core.build_large_db import build_large_db
+from core import query_plans
+from core.test_view_benchmarks import SMALL_DB_ARGS
+
+
+class CheckQueriesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        build_large_db(**SMALL_DB_ARGS)
+
+    def test_explains_all_queries(self):
+        """All of the registered queries are explained."""
+        results = query_plans.check_queries()
+        self.assertEqual(list(results.keys()), list(query_plans.QUERIES.keys()))
+        for name, result in results.items():
+            self.assertNotIn('skipped', result, msg=name)
+            self.assertTrue(len(result['plan']) > 0, msg=name)
+
+    @skipUnless(connection.vendor in query_plans.read_baseline(), 'No query plan baseline for this database.')
+    def test_no_regressions(self):
+        """None of the query plans have issues that are not in the checked in baseline."""
+        results = query_plans.check_queries()
+        baseline = query_plans.read_baseline()[connection.vendor]
+        self.assertEqual(query_plans.find_regressions(results, baseline), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite query plans only.')
+    def test_version_lookups_use_indexes(self):
+        """The latest and previous study version lookups are sorted by an index."""
+        results = query_plans.check_queries(names=['study_latest_version', 'study_version_previous_version'])
+        for name, result in results.items():
+            self.assertEqual(result['issues'], [], msg=name)
+
+
+class EmptyDBQueriesTest(TestCase):
+
+    def test_skips_missing_objects(self):
+        """Queries that need objects are skipped when there are none in the db."""
+        results = query_plans.check_queries()
+        self.assertIn('skipped', results['study_latest_version'])
+        self.assertIn('skipped', results['tag_study_unreviewed'])
+        self.assertNotIn('skipped', results['source_trait_search'])
+
+
+class FindIssuesTest(TestCase):
+
+    def test_mysql_plan(self):
+        """Rows of MySQL plans that scan the whole table or use a filesort are issues."""
+        plan = [
+            {'table': 'trait_browser_sourcetrait', 'type': 'ALL', 'Extra': 'Using where; Using filesort'},
+            {'table': 'trait_browser_sourcedataset', 'type': 'eq_ref', 'Extra': None},
+        ]
+        self.assertEqual(query_plans.find_issues(plan, vendor='mysql'), [
+            'filesort: trait_browser_sourcetrait', 'full scan: trait_browser_sourcetrait'])
+
+    def test_sqlite_plan(self):
+        """Steps of SQLite plans that scan a table or sort in a temporary b-tree are issues."""
+        plan = [
+            {'detail': 'SCAN TABLE tags_taggedtrait AS U0'},
+            {'detail': 'SEARCH TABLE tags_tag USING INTEGER PRIMARY KEY (rowid=?)'},
+            {'detail': 'SCAN SUBQUERY 1'},
+            {'detail': 'USE TEMP B-TREE FOR ORDER BY'},
+        ]
+        self.assertEqual(query_plans.find_issues(plan, vendor='sqlite'), [
+            'filesort: ORDER BY', 'full scan: tags_taggedtrait'])
+
+
+class FindRegressionsTest(TestCase):
+
+    def setUp(self):
+        self.results = {'source_trait_search': {'plan': [], 'issues': ['filesort: ORDER BY']},
+                        'tag_study_unreviewed': {'skipped': 'No tag in the db.'}}
+
+    def test_allowed_issues(self):
+        """There are no regressions when all of the issues are in the baseline."""
+        baseline = {'source_trait_search': ['filesort: ORDER BY', 'full scan: tags_tag']}
+        self.assertEqual(query_plans.find_regressions(self.results, baseline), [])
+        self.assertEqual(query_plans.find_improvements(self.results, baseline),
+                         [{'query': 'source_trait_search', 'issue': 'full scan: tags_tag'}])
+
+    def test_new_issue(self):
+        """Each issue that is not in the baseline is a regression."""
+        self.assertEqual(query_plans.find_regressions(self.results, {}),
+                         [{'query': 'source_trait_search', 'issue': 'filesort: ORDER BY'}])
+
+    def test_baseline_file(self):
+        """The checked in baseline has allowed issues for every query, for each database vendor."""
+        for vendor, baseline in query_plans.read_baseline().items():
+            self.assertEqual(set(baseline.keys()), set(query_plans.QUERIES.keys()), msg=vendor)
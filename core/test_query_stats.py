@@ -0,0 +1,171 @@
+"""Test the functions and classes for query_stats.py and middleware.py."""
+
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test import override_settings, TestCase
+from django.urls import reverse
+
+from .models import QueryStat
+from . import query_stats
+from .utils import UserLoginTestCase
+
+
+class QueryRecorderTest(TestCase):
+
+    def test_counts_queries(self):
+        """All queries run while capturing are counted."""
+        with query_stats.QueryRecorder().capture() as recorder:
+            Group.objects.count()
+            list(Group.objects.all())
+        self.assertEqual(recorder.count, 2)
+        self.assertGreaterEqual(recorder.time, 0)
+        self.assertEqual(recorder.duplicates, 0)
+
+    def test_counts_duplicate_queries(self):
+        """Queries with the same sql and parameters are counted as duplicates."""
+        with query_stats.QueryRecorder().capture() as recorder:
+            for i in range(3):
+                Group.objects.filter(name='phenotype_taggers').exists()
+            Group.objects.filter(name='recipe_submitters').exists()
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual(recorder.duplicates, 2)
+
+    def test_stops_counting_after_capture(self):
+        """Queries run after the capture block exits are not counted."""
+        with query_stats.QueryRecorder().capture() as recorder:
+            Group.objects.count()
+        Group.objects.count()
+        self.assertEqual(recorder.count, 1)
+        self.assertNotIn('make_cursor', connection.__dict__)
+        self.assertNotIn('make_debug_cursor', connection.__dict__)
+
+    def test_counts_failed_query(self):
+        """A query that raises an error is still counted."""
+        with query_stats.QueryRecorder().capture() as recorder:
+            with self.assertRaises(Exception):
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT * FROM a_table_that_does_not_exist')
+        self.assertEqual(recorder.count, 1)
+
+    def test_counts_rows_written(self):
+        """The rows inserted, updated, and deleted are counted, but not the rows read."""
+        with query_stats.QueryRecorder().capture() as recorder:
+            QueryStat.objects.bulk_create([QueryStat(url_name='app:one'), QueryStat(url_name='app:two')])
+            QueryStat.objects.update(requests=1)
+            list(QueryStat.objects.all())
+            QueryStat.objects.all().delete()
+        self.assertEqual(recorder.rows_written, 6)
+
+
+class AggregatesTest(TestCase):
+
+    def setUp(self):
+        query_stats.reset()
+
+    def tearDown(self):
+        query_stats.reset()
+
+    def make_recorder(self, count, duplicates=0, time=0.5):
+        recorder = query_stats.QueryRecorder()
+        recorder.count, recorder.duplicates, recorder.time = count, duplicates, time
+        return recorder
+
+    def test_add(self):
+        """Stats for several requests are summed by URL name."""
+        query_stats.add('a', self.make_recorder(3, duplicates=1))
+        query_stats.add('a', self.make_recorder(5))
+        query_stats.add('b', self.make_recorder(1))
+        aggregates = query_stats.get_aggregates()
+        self.assertEqual(aggregates['a'], {'requests': 2, 'queries': 8, 'db_time': 1.0, 'duplicates': 1,
+                                           'max_queries': 5})
+        self.assertEqual(aggregates['b']['requests'], 1)
+
+    def test_flush_creates_query_stats(self):
+        """Flushing saves the in-memory stats to the database and resets them."""
+        query_stats.add('a', self.make_recorder(3, duplicates=1))
+        query_stats.flush()
+        self.assertEqual(query_stats.get_aggregates(), {})
+        query_stat = QueryStat.objects.get(url_name='a')
+        self.assertEqual(query_stat.requests, 1)
+        self.assertEqual(query_stat.queries, 3)
+        self.assertEqual(query_stat.duplicates, 1)
+        self.assertEqual(query_stat.max_queries, 3)
+        self.assertEqual(query_stat.db_time, 0.5)
+
+    def test_flush_adds_to_existing_query_stats(self):
+        """Flushing adds the in-memory stats to the saved stats."""
+        query_stats.add('a', self.make_recorder(3))
+        query_stats.flush()
+        query_stats.add('a', self.make_recorder(2))
+        query_stats.flush()
+        query_stat = QueryStat.objects.get(url_name='a')
+        self.assertEqual(query_stat.requests, 2)
+        self.assertEqual(query_stat.queries, 5)
+        self.assertEqual(query_stat.max_queries, 3)
+        self.assertEqual(query_stat.db_time, 1.0)
+        self.assertEqual(query_stat.mean_queries, 2.5)
+        self.assertEqual(query_stat.mean_db_time, 0.5)
+
+    @override_settings(QUERY_STATS_FLUSH_INTERVAL=3600)
+    def test_flush_if_due_not_due(self):
+        """Stats are kept in memory until the flush interval has passed."""
+        query_stats.add('a', self.make_recorder(3))
+        query_stats.flush_if_due()
+        self.assertEqual(QueryStat.objects.count(), 0)
+        self.assertIn('a', query_stats.get_aggregates())
+
+    @override_settings(QUERY_STATS_FLUSH_INTERVAL=0)
+    def test_flush_if_due(self):
+        """Stats are saved once the flush interval has passed."""
+        query_stats.add('a', self.make_recorder(3))
+        query_stats.flush_if_due()
+        self.assertEqual(QueryStat.objects.count(), 1)
+
+    def test_try_flush_database_error(self):
+        """A database error while flushing is logged, and the stats are discarded."""
+        # A null url_name can't be saved.
+        query_stats.add(None, self.make_recorder(3))
+        with self.assertLogs('core.query_stats', 'ERROR'):
+            query_stats.try_flush()
+        self.assertEqual(query_stats.get_aggregates(), {})
+        self.assertEqual(QueryStat.objects.count(), 0)
+
+
+@override_settings(QUERY_STATS_FLUSH_INTERVAL=3600)
+class QueryStatsMiddlewareTest(UserLoginTestCase):
+
+    def setUp(self):
+        super(QueryStatsMiddlewareTest, self).setUp()
+        query_stats.reset()
+
+    def tearDown(self):
+        query_stats.reset()
+        super(QueryStatsMiddlewareTest, self).tearDown()
+
+    @override_settings(QUERY_STATS_SAMPLE_RATE=1)
+    def test_records_resolved_url_name(self):
+        """Queries are recorded under the namespaced URL name of the view."""
+        self.client.get(reverse('profiles:profile'))
+        self.client.get(reverse('profiles:profile'))
+        stats = query_stats.get_aggregates()['profiles:profile']
+        self.assertEqual(stats['requests'], 2)
+        self.assertGreater(stats['queries'], 0)
+        self.assertGreaterEqual(stats['max_queries'], stats['queries'] / 2)
+
+    @override_settings(QUERY_STATS_SAMPLE_RATE=1)
+    def test_records_unresolved_url(self):
+        """Queries for urls that don't resolve are recorded under a placeholder name."""
+        self.client.get('/a/url/that/does/not/exist/')
+        self.assertIn(query_stats.UNRESOLVED_URL_NAME, query_stats.get_aggregates())
+
+    @override_settings(QUERY_STATS_SAMPLE_RATE=0)
+    def test_sample_rate_zero(self):
+        """Nothing is recorded when the sample rate is zero."""
+        self.client.get(reverse('profiles:profile'))
+        self.assertEqual(query_stats.get_aggregates(), {})
+
+    @override_settings(QUERY_STATS_SAMPLE_RATE=1, QUERY_STATS_FLUSH_INTERVAL=0)
+    def test_flushes_when_due(self):
+        """Stats are saved to the database after the request when the flush interval has passed."""
+        self.client.get(reverse('profiles:profile'))
+        self.assertTrue(QueryStat.objects.filter(url_name='profiles:profile').exists())
@@ -0,0 +1,98 @@
+"""Test the benchmarks of the key pages of the site."""
+
+from django.test import TestCase
+
+from core.build_large_db import build_large_db
+from core import view_benchmarks
+
+
+SMALL_DB_ARGS = {'n_studies': 3, 'n_datasets_range': (1, 2), 'n_traits_range': (5, 10), 'n_tags': 3,
+                 'tagged_fraction': 0.5, 'n_users': 2, 'n_harmonized_trait_sets': 2}
+
+
+class RunBenchmarksTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        build_large_db(**SMALL_DB_ARGS)
+
+    def test_runs_all_benchmarks(self):
+        """All of the benchmarks run, and record queries and times."""
+        results = view_benchmarks.run_benchmarks(repeat=1)
+        self.assertEqual(list(results.keys()), list(view_benchmarks.BENCHMARKS.keys()))
+        for name, result in results.items():
+            self.assertNotIn('skipped', result, msg=name)
+            self.assertTrue(result['queries'] > 0, msg=name)
+            self.assertTrue(result['seconds'] >= result['db_seconds'], msg=name)
+
+    def test_within_query_budgets(self):
+        """None of the pages run more queries than their checked in budgets."""
+        results = view_benchmarks.run_benchmarks(repeat=1)
+        budgets = view_benchmarks.read_budgets()
+        self.assertEqual(view_benchmarks.find_regressions(results, budgets, check_time=False), [])
+
+    def test_query_counts_do_not_grow(self):
+        """The pages run the same number of queries after the catalog grows, so no page runs a query per row."""
+        results = view_benchmarks.run_benchmarks(repeat=1)
+        build_large_db(**SMALL_DB_ARGS)
+        build_large_db(**SMALL_DB_ARGS)
+        larger_results = view_benchmarks.run_benchmarks(repeat=1)
+        for name, result in results.items():
+            self.assertEqual(larger_results[name]['queries'], result['queries'], msg=name)
+
+    def test_named_benchmarks(self):
+        """Only the named benchmarks are run."""
+        results = view_benchmarks.run_benchmarks(repeat=1, names=['tag_list', 'profile'])
+        self.assertEqual(list(results.keys()), ['tag_list', 'profile'])
+
+    def test_review_loop_does_not_review(self):
+        """The review loop benchmark leaves the tagged traits unreviewed."""
+        objects = view_benchmarks.get_benchmark_objects()
+        tag, study = objects['review_tag'], objects['review_study']
+        unreviewed = tag.all_taggedtraits.unreviewed().filter(
+            trait__source_dataset__source_study_version__study=study)
+        n_unreviewed = unreviewed.count()
+        view_benchmarks.run_benchmarks(repeat=2, names=['dcc_review_loop'])
+        self.assertEqual(unreviewed.count(), n_unreviewed)
+
+
+class EmptyDBBenchmarksTest(TestCase):
+
+    def test_skips_missing_objects(self):
+        """Benchmarks of detail pages are skipped when there are no objects to show."""
+        results = view_benchmarks.run_benchmarks(repeat=1)
+        self.assertIn('skipped', results['tag_detail'])
+        self.assertIn('skipped', results['harmonized_trait_detail'])
+        self.assertNotIn('skipped', results['study_list'])
+
+
+class FindRegressionsTest(TestCase):
+
+    def setUp(self):
+        self.results = {'study_list': {'queries': 10, 'seconds': 2.0, 'db_seconds': 0.5},
+                        'tag_detail': {'skipped': 'No tag in the db.'}}
+
+    def test_within_budget(self):
+        """There are no regressions when all of the metrics are within their budgets."""
+        budgets = {'study_list': {'max_queries': 10, 'max_seconds': 2.0}, 'tag_detail': {'max_queries': 0}}
+        self.assertEqual(view_benchmarks.find_regressions(self.results, budgets), [])
+
+    def test_over_budget(self):
+        """Each metric that is over its budget is a regression."""
+        budgets = {'study_list': {'max_queries': 5, 'max_seconds': 1.0}}
+        self.assertEqual(view_benchmarks.find_regressions(self.results, budgets), [
+            {'benchmark': 'study_list', 'metric': 'queries', 'value': 10, 'budget': 5},
+            {'benchmark': 'study_list', 'metric': 'seconds', 'value': 2.0, 'budget': 1.0},
+        ])
+
+    def test_no_time_check(self):
+        """Time budgets are not checked with check_time=False."""
+        budgets = {'study_list': {'max_queries': 10, 'max_seconds': 1.0}}
+        self.assertEqual(view_benchmarks.find_regressions(self.results, budgets, check_time=False), [])
+
+    def test_budgets_file(self):
+        """The checked in budgets file has query and time budgets for every benchmark."""
+        budgets = view_benchmarks.read_budgets()
+        self.assertEqual(set(budgets.keys()), set(view_benchmarks.BENCHMARKS.keys()))
+        for budget in budgets.values():
+            self.assertEqual(set(budget.keys()), set(view_benchmarks.BUDGET_KEYS.values()))
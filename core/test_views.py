@@ -0,0 +1,62 @@
+"""Test the functions and classes for views.py."""
+
+from django.urls import reverse
+
+from . import query_stats
+from .factories import QueryStatFactory
+from .utils import LoginRequiredTestCase, SuperuserLoginTestCase, UserLoginTestCase
+
+
+class QueryStatListTest(SuperuserLoginTestCase):
+
+    def setUp(self):
+        super(QueryStatListTest, self).setUp()
+        query_stats.reset()
+
+    def get_url(self, *args):
+        return reverse('core:query-stats')
+
+    def test_view_success_code(self):
+        """View returns successful response code."""
+        response = self.client.get(self.get_url())
+        self.assertEqual(response.status_code, 200)
+
+    def test_context_data(self):
+        """View has appropriate data in the context."""
+        query_stat = QueryStatFactory.create()
+        response = self.client.get(self.get_url())
+        self.assertIn('query_stat_table', response.context)
+        self.assertEqual(list(response.context['query_stat_table'].data), [query_stat])
+
+    def test_includes_unsaved_stats(self):
+        """Stats recorded in memory but not yet saved are shown."""
+        recorder = query_stats.QueryRecorder()
+        recorder.count = 7
+        query_stats.add('unsaved:view', recorder)
+        response = self.client.get(self.get_url())
+        self.assertContains(response, 'unsaved:view')
+
+    def test_unsaved_stats_database_error(self):
+        """The page is still shown if the unsaved stats can't be saved."""
+        query_stat = QueryStatFactory.create()
+        # A null url_name can't be saved.
+        query_stats.add(None, query_stats.QueryRecorder())
+        with self.assertLogs('core.query_stats', 'ERROR'):
+            response = self.client.get(self.get_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['query_stat_table'].data), [query_stat])
+
+
+class QueryStatListRegularUserTest(UserLoginTestCase):
+
+    def test_forbidden(self):
+        """Regular users cannot see the query stats."""
+        response = self.client.get(reverse('core:query-stats'))
+        self.assertEqual(response.status_code, 403)
+
+
+class CoreLoginRequiredTest(LoginRequiredTestCase):
+
+    def test_core_login_required(self):
+        """All core urls redirect to login page if no user is logged in."""
+        self.assert_redirect_all_urls('core')
@@ -0,0 +1,16 @@
+"""URL configuration for the core app.
+
+These urlpatterns are included in the project's urlpatterns, so these
+urls will show up under /core.
+"""
+
+from django.conf.urls import url
+
+from . import views
+
+
+app_name = 'core'
+
+urlpatterns = [
+    url(r'^query-stats/$', views.QueryStatList.as_view(), name='query-stats'),
+]
@@ -3,6 +3,7 @@
 Following a suggestion from Two Scoops of Django 1.8.
 """
 
+from contextlib import contextmanager
 from functools import reduce
 from io import StringIO
 import itertools
@@ -13,8 +14,10 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from django.core.exceptions import ImproperlyConfigured
 from django.core.management import call_command
+from django.db import connection
 from django.http import HttpResponseRedirect
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from trait_browser.factories import StudyFactory
@@ -92,6 +95,20 @@ class ValidateObjectMixin(object):
         return super(ValidateObjectMixin, self).dispatch(request, *args, **kwargs)
 
 
+class QueryBudgetTestMixin(object):
+    """Mixin for TestCases that checks code does not run more than a fixed number of db queries."""
+
+    @contextmanager
+    def assertMaxNumQueries(self, budget):
+        """Context manager that fails if the code inside it runs more than budget db queries."""
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        executed = len(context.captured_queries)
+        queries = '\n'.join('{}. {}'.format(i, query['sql']) for i, query in enumerate(context.captured_queries, 1))
+        self.assertLessEqual(
+            executed, budget, '{} queries executed, budget is {}\n{}'.format(executed, budget, queries))
+
+
 class UserLoginTestCase(TestCase):
     """TestCase that creates a user and logs in as that user.
 
@@ -0,0 +1,272 @@
+"""Benchmarks of the key pages of the site, with budgets for their query counts and times.
+
+Each benchmark drives one page, or for the DCC review loop a short series of pages,
+with the django test client, and records the wall time, the number of database
+queries, and the time spent in the database with a QueryRecorder. The results are
+compared against the budgets checked in to view_benchmark_budgets.json, so that a
+view that goes from 5 queries to 500 is caught before it is deployed. Use the
+benchmark_views management command to run the benchmarks on a large generated
+catalog and write a json report of the results.
+
+The benchmarks only read from the db (the review loop skips tagged traits instead
+of reviewing them), apart from the benchmark user and its sessions.
+"""
+
+from collections import OrderedDict
+import json
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.query_stats import QueryRecorder
+from tags.forms import DCCReviewByTagAndStudyForm
+from tags.models import Tag, TaggedTrait
+from trait_browser.models import HarmonizedTraitSetVersion, SourceTrait, Study
+
+
+BUDGETS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'view_benchmark_budgets.json')
+BENCHMARK_USER_EMAIL = 'view_benchmark_user@example.com'
+# Variable name to search for; build_large_db makes variable names from these words.
+SEARCH_NAME = 'pressure'
+# Number of variable accessions to resolve with the bulk accession lookup.
+BULK_LOOKUP_ACCESSIONS = 5000
+# Budget keys, by the metric they limit.
+BUDGET_KEYS = OrderedDict((('queries', 'max_queries'), ('seconds', 'max_seconds')))
+
+
+class ViewBenchmarkError(Exception):
+    """Raised when a benchmarked page does not load successfully."""
+
+    pass
+
+
+def _get(client, url, data=None):
+    """Get url with client, following redirects, and check that the final page loaded."""
+    response = client.get(url, data, follow=True)
+    if response.status_code != 200:
+        raise ViewBenchmarkError('{} returned status code {}.'.format(url, response.status_code))
+    return response
+
+
+def _post(client, url, data):
+    """Post data to url with client, following redirects, and check that the final page loaded."""
+    response = client.post(url, data, follow=True)
+    if response.status_code != 200:
+        raise ViewBenchmarkError('{} returned status code {}.'.format(url, response.status_code))
+    return response
+
+
+def benchmark_study_list(client, objects):
+    _get(client, reverse('trait_browser:source:studies:list'))
+
+
+def benchmark_dataset_list(client, objects):
+    _get(client, reverse('trait_browser:source:datasets:list'))
+
+
+def benchmark_trait_search(client, objects):
+    _get(client, reverse('trait_browser:source:traits:search'), {'name': SEARCH_NAME})
+
+
+def benchmark_tag_list(client, objects):
+    _get(client, reverse('tags:list'))
+
+
+def benchmark_tag_detail(client, objects):
+    _get(client, reverse('tags:tag:detail', args=[objects['tag'].pk]))
+
+
+def benchmark_dcc_review_loop(client, objects):
+    """Begin reviewing the unreviewed tagged traits of a tag and study, and skip the first two."""
+    tag, study = objects['review_tag'], objects['review_study']
+    _get(client, reverse('tags:tag:study:begin-dcc-review', args=[tag.pk, study.pk]))
+    review_url = reverse('tags:tagged-traits:dcc-review:review')
+    for i in range(2):
+        _post(client, review_url, {DCCReviewByTagAndStudyForm.SUBMIT_SKIP: 'Skip'})
+
+
+def benchmark_profile(client, objects):
+    """Load the profile page of the most active phenotype tagger, and the fragments that it loads with ajax."""
+    _get(client, reverse('profiles:profile'))
+    _get(client, reverse('profiles:user-tagged-traits'))
+    _get(client, reverse('profiles:study-tagged-trait-counts'))
+
+
+def benchmark_harmonized_trait_detail(client, objects):
+    _get(client, reverse('trait_browser:harmonized:traits:detail', args=[objects['harmonized_trait_set_version'].pk]))
+
+
+def benchmark_bulk_accession_lookup(client, objects):
+    """Resolve many variable accessions, reading the whole streamed response."""
+    response = _post(client, reverse('trait_browser:source:bulk-lookup'),
+                     {'accessions': '\n'.join(objects['variable_accessions']), 'default_prefix': ''})
+    b''.join(response.streaming_content)
+
+
+def benchmark_admin_source_traits(client, objects):
+    _get(client, reverse('admin:trait_browser_sourcetrait_changelist'))
+    _get(client, reverse('admin:trait_browser_sourcetrait_changelist'), {'q': SEARCH_NAME})
+
+
+def benchmark_admin_encoded_values(client, objects):
+    _get(client, reverse('admin:trait_browser_sourcetraitencodedvalue_changelist'))
+
+
+def benchmark_admin_tagged_traits(client, objects):
+    _get(client, reverse('admin:tags_taggedtrait_changelist'))
+
+
+def benchmark_admin_dcc_reviews(client, objects):
+    _get(client, reverse('admin:tags_dccreview_changelist'))
+
+
+# Tuple format: (benchmark function, keys of the objects it needs, key of the user to log in as or None)
+# Benchmarks with no user key are run as the benchmark user.
+BENCHMARKS = OrderedDict((
+    ('study_list', (benchmark_study_list, (), None)),
+    ('dataset_list', (benchmark_dataset_list, (), None)),
+    ('trait_search', (benchmark_trait_search, (), None)),
+    ('tag_list', (benchmark_tag_list, (), None)),
+    ('tag_detail', (benchmark_tag_detail, ('tag', ), None)),
+    ('dcc_review_loop', (benchmark_dcc_review_loop, ('review_tag', 'review_study'), None)),
+    ('profile', (benchmark_profile, ('tagger', ), 'tagger')),
+    ('harmonized_trait_detail', (benchmark_harmonized_trait_detail, ('harmonized_trait_set_version', ), None)),
+    ('bulk_accession_lookup', (benchmark_bulk_accession_lookup, ('variable_accessions', ), None)),
+    ('admin_source_traits', (benchmark_admin_source_traits, (), None)),
+    ('admin_encoded_values', (benchmark_admin_encoded_values, (), None)),
+    ('admin_tagged_traits', (benchmark_admin_tagged_traits, (), None)),
+    ('admin_dcc_reviews', (benchmark_admin_dcc_reviews, (), None)),
+))
+
+
+def get_benchmark_objects():
+    """Choose the objects to show on the detail pages, preferring the largest ones.
+
+    Returns a dict of the chosen objects; keys are missing if there are no suitable objects in the db.
+    """
+    objects = {}
+    tag = Tag.objects.annotate(n_tagged_traits=Count('all_taggedtraits')).order_by('-n_tagged_traits', 'pk').first()
+    if tag is not None:
+        objects['tag'] = tag
+    to_review = TaggedTrait.objects.current().non_archived().unreviewed().values(
+        'tag', 'trait__source_dataset__source_study_version__study').annotate(
+        n_tagged_traits=Count('pk')).order_by('-n_tagged_traits', 'tag',
+                                              'trait__source_dataset__source_study_version__study')
+    to_review = to_review.first()
+    if to_review is not None:
+        objects['review_tag'] = Tag.objects.get(pk=to_review['tag'])
+        objects['review_study'] = Study.objects.get(pk=to_review['trait__source_dataset__source_study_version__study'])
+    tagger = get_user_model().objects.filter(groups__name='phenotype_taggers').annotate(
+        n_tagged_traits=Count('taggedtrait')).order_by('-n_tagged_traits', 'pk').first()
+    if tagger is not None:
+        objects['tagger'] = tagger
+    harmonized_trait_set_version = HarmonizedTraitSetVersion.objects.annotate(
+        n_components=Count('harmonizationunit__component_source_traits')).order_by('-n_components', 'pk').first()
+    if harmonized_trait_set_version is not None:
+        objects['harmonized_trait_set_version'] = harmonized_trait_set_version
+    variable_accessions = SourceTrait.objects.order_by('pk').values_list(
+        'i_dbgap_variable_accession', flat=True)[:BULK_LOOKUP_ACCESSIONS]
+    if variable_accessions:
+        objects['variable_accessions'] = ['phv{:08}'.format(accession) for accession in variable_accessions]
+    return objects
+
+
+def get_benchmark_user():
+    """Return a DCC analyst user who can see and use all of the benchmarked pages."""
+    # A superuser, because the DCC review permissions of the dcc_analysts group are not added on every db backend.
+    user, created = get_user_model().objects.get_or_create(
+        email=BENCHMARK_USER_EMAIL, defaults={'name': 'View benchmark user', 'is_staff': True, 'is_superuser': True})
+    if created:
+        user.set_unusable_password()
+        user.save()
+    user.groups.add(Group.objects.get(name='dcc_analysts'))
+    return user
+
+
+def _get_client(user):
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+def run_benchmarks(repeat=5, names=None):
+    """Run the benchmarks and return an OrderedDict of their results by benchmark name.
+
+    Each benchmark is run once to warm up caches, and then repeat times. The results
+    are the median wall time and db time, and the largest number of queries, of the
+    repeated runs; benchmarks that need objects that are not in the db are skipped,
+    with a results dict of {'skipped': reason}.
+
+    Arguments:
+        repeat -- int; number of timed runs of each benchmark
+        names -- iterable; names of the benchmarks to run, or None to run all of them
+    """
+    names = list(BENCHMARKS.keys()) if names is None else names
+    objects = get_benchmark_objects()
+    client = _get_client(get_benchmark_user())
+    results = OrderedDict()
+    # Benchmark the pages as they are served in production, without the debug toolbar.
+    with override_settings(DEBUG=False, ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver']):
+        for name in names:
+            function, object_keys, user_key = BENCHMARKS[name]
+            missing = [key for key in object_keys if key not in objects]
+            if missing:
+                results[name] = {'skipped': 'No {} in the db.'.format(', '.join(missing))}
+                continue
+            benchmark_client = client if user_key is None else _get_client(objects[user_key])
+            function(benchmark_client, objects)
+            runs = []
+            for i in range(repeat):
+                recorder = QueryRecorder()
+                start = time.time()
+                with recorder.capture():
+                    function(benchmark_client, objects)
+                runs.append({'queries': recorder.count, 'seconds': time.time() - start, 'db_seconds': recorder.time})
+            results[name] = {
+                'queries': max(run['queries'] for run in runs),
+                'seconds': _median([run['seconds'] for run in runs]),
+                'db_seconds': _median([run['db_seconds'] for run in runs]),
+            }
+    return results
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def read_budgets(filename=BUDGETS_FILE):
+    """Read the dict of budgets by benchmark name from a json file."""
+    with open(filename) as budgets_file:
+        return json.load(budgets_file)
+
+
+def find_regressions(results, budgets, check_time=True):
+    """Return a list of dicts describing each metric of the results that is over its budget.
+
+    Arguments:
+        results -- dict; benchmark results by name, as returned by run_benchmarks
+        budgets -- dict; dicts of max_queries and max_seconds by benchmark name
+        check_time -- bool; whether to check max_seconds, which depends on the machine, as well as max_queries
+    """
+    regressions = []
+    for name, result in results.items():
+        if 'skipped' in result:
+            continue
+        for metric, budget_key in BUDGET_KEYS.items():
+            if metric == 'seconds' and not check_time:
+                continue
+            budget = budgets.get(name, {}).get(budget_key)
+            if budget is not None and result[metric] > budget:
+                regressions.append({'benchmark': name, 'metric': metric, 'value': result[metric], 'budget': budget})
+    return regressions
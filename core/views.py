@@ -0,0 +1,26 @@
+"""Views that aren't specific to one app."""
+
+from django.views.generic import ListView
+
+from braces.views import LoginRequiredMixin, StaffuserRequiredMixin
+from django_tables2 import SingleTableMixin
+
+from . import models
+from . import query_stats
+from . import tables
+
+
+class QueryStatList(LoginRequiredMixin, StaffuserRequiredMixin, SingleTableMixin, ListView):
+    """Show the database query totals recorded by QueryStatsMiddleware for each URL name."""
+
+    model = models.QueryStat
+    table_class = tables.QueryStatTable
+    context_table_name = 'query_stat_table'
+    template_name = 'core/querystat_list.html'
+    raise_exception = True
+    redirect_unauthenticated_users = True
+
+    def get(self, request, *args, **kwargs):
+        # Include the stats recorded by this process that have not been saved yet.
+        query_stats.try_flush()
+        return super(QueryStatList, self).get(request, *args, **kwargs)
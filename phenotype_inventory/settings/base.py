@@ -132,6 +132,7 @@ MESSAGE_TAGS = {message_constants.DEBUG: 'alert-debug',
 # MIDDLEWARE SETTINGS
 MIDDLEWARE = (
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.QueryStatsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -177,6 +178,24 @@ INSTALLED_APPS = (
 )
 
 
+# CACHE SETTINGS
+# Each process keeps its own in-memory cache. Code that caches data derived from the db must
+# invalidate it when the underlying data change, and set a timeout so other processes catch up.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': SITE_NAME,
+    }
+}
+
+
+# QUERY STATS SETTINGS
+# Fraction of requests for which core.middleware.QueryStatsMiddleware records query counts and times (0 is off).
+QUERY_STATS_SAMPLE_RATE = 0
+# Seconds between saving each process's recorded query stats to the database.
+QUERY_STATS_FLUSH_INTERVAL = 60
+
+
 # URL SETTINGS
 ROOT_URLCONF = '%s.urls' % SITE_NAME
 LOGIN_URL = 'login'
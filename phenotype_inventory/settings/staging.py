@@ -99,6 +99,18 @@ DATABASES = {
 }
 
 
+# CACHE SETTINGS
+# Apache serves the site from several processes, and the cached tagging indexes, dashboards, and page sections are
+# cleared by signal receivers in the process that made the change, so the processes must share one cache instead of
+# each keeping its own in memory. Create the cache table with ./manage.py createcachetable.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'phenotype_inventory_cache',
+    }
+}
+
+
 # STATIC FILE SETTINGS
 STATIC_ROOT = '/var/django/static_files/phenotype_inventory'
 # URL prefix for static files.
@@ -117,3 +129,8 @@ EMAIL_HOST_USER = get_secret('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = get_secret('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 DEFAULT_TO_EMAIL = EMAIL_HOST_USER
+
+
+# QUERY STATS SETTINGS
+# Record query counts and times for one in ten requests on the deployed sites.
+QUERY_STATS_SAMPLE_RATE = 0.1
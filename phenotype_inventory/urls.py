@@ -33,6 +33,7 @@ urlpatterns = [
     # 3rd-party apps.
     url(r'^auth/', include('authtools.urls')),
     # Custom apps.
+    url(r'^core/', include('core.urls')),
     url(r'^phenotypes/', include('trait_browser.urls')),
     url(r'^profiles/', include('profiles.urls')),
     url(r'^recipes/', include('recipes.urls')),
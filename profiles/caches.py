@@ -0,0 +1,115 @@
+"""Cached, precomputed per-user dashboard data for the Profile page.
+
+The caches are cleared by signal receivers in profiles.models whenever the data they
+are built from are changed.
+"""
+
+from itertools import groupby
+import time
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+
+DASHBOARD_CACHE_KEY = 'profiles:dashboard:{generation}:{user_pk}:{part}'
+# The summary counts are shown on every Profile page load; the tagged trait listing only by its fragment.
+DASHBOARD_PARTS = ('summary', 'user_taggedtraits')
+# Changing the generation invalidates the dashboards of all users at once.
+DASHBOARD_GENERATION_CACHE_KEY = 'profiles:dashboard_generation'
+# Seconds before a dashboard is rebuilt even without changes, for processes that don't see the clearing signal.
+DASHBOARD_TIMEOUT = 300
+
+
+def _build_user_taggedtraits(user_pk):
+    """Get the user's current, non-archived tagged traits, grouped by study and then by tag."""
+    user_taggedtraits = apps.get_model('tags', 'TaggedTrait').objects.current().non_archived().filter(
+        creator__pk=user_pk)
+    user_taggedtraits = user_taggedtraits.values(
+        study_name=F('trait__source_dataset__source_study_version__study__i_study_name'),
+        study_pk=F('trait__source_dataset__source_study_version__study__pk'),
+        tag_name=F('tag__title'),
+        tag_pk=F('tag__pk'),
+        variable_name=F('trait__i_trait_name'),
+        dataset_name=F('trait__source_dataset__dataset_name'),
+        review=F('dcc_review'),
+        taggedtrait_pk=F('pk')).order_by('study_name', 'tag_name', 'variable_name')
+    # Group by study.
+    user_taggedtraits = groupby(user_taggedtraits,
+                                lambda x: {'study_name': x['study_name'], 'study_pk': x['study_pk']})
+    user_taggedtraits = [(key, list(group)) for key, group in user_taggedtraits]
+    # Group by tag.
+    user_taggedtraits_bytag = []
+    for study, study_taggedtraits in user_taggedtraits:
+        taggedtraits_groupedbytag = groupby(study_taggedtraits,
+                                            lambda x: {'tag_name': x['tag_name'], 'tag_pk': x['tag_pk']})
+        taggedtraits_groupedbytag = [(key, list(group)) for key, group in taggedtraits_groupedbytag]
+        user_taggedtraits_bytag.append((study, taggedtraits_groupedbytag))
+    return user_taggedtraits_bytag
+
+
+def _build_dashboard(user_pk):
+    """Get the summary counts of the user's tagging and recipe work shown on the Profile page."""
+    return {
+        'user_taggedtrait_count': apps.get_model('tags', 'TaggedTrait').objects.current().non_archived().filter(
+            creator__pk=user_pk).count(),
+        'unit_recipe_count': apps.get_model('recipes', 'UnitRecipe').objects.filter(creator__pk=user_pk).count(),
+        'harmonization_recipe_count': apps.get_model('recipes', 'HarmonizationRecipe').objects.filter(
+            creator__pk=user_pk).count(),
+    }
+
+
+def _get_generation():
+    """Return the current dashboard generation, starting a new one if there is none cached."""
+    generation = cache.get(DASHBOARD_GENERATION_CACHE_KEY)
+    if generation is None:
+        generation = _new_generation()
+    return generation
+
+
+def _new_generation():
+    """Start and return a new dashboard generation."""
+    generation = repr(time.time())
+    cache.set(DASHBOARD_GENERATION_CACHE_KEY, generation, None)
+    return generation
+
+
+def _get_cache_key(user_pk, part='summary'):
+    return DASHBOARD_CACHE_KEY.format(generation=_get_generation(), user_pk=user_pk, part=part)
+
+
+def _get_cached(user_pk, part, build):
+    key = _get_cache_key(user_pk, part)
+    value = cache.get(key)
+    if value is None:
+        value = build(user_pk)
+        cache.set(key, value, DASHBOARD_TIMEOUT)
+    return value
+
+
+def get_dashboard(user_pk):
+    """Return the cached dashboard summary counts for the user with pk user_pk."""
+    return _get_cached(user_pk, 'summary', _build_dashboard)
+
+
+def get_user_taggedtraits(user_pk):
+    """Return the cached listing of tagged traits, grouped by study and tag, for the user with pk user_pk."""
+    return _get_cached(user_pk, 'user_taggedtraits', _build_user_taggedtraits)
+
+
+def _delete_dashboard(user_pk):
+    cache.delete_many([_get_cache_key(user_pk, part) for part in DASHBOARD_PARTS])
+
+
+def clear_dashboard(user_pk):
+    """Clear the user's cached dashboard, now and again when the current transaction commits."""
+    _delete_dashboard(user_pk)
+    # Another request could rebuild the dashboard before this transaction commits, so clear it again afterwards.
+    transaction.on_commit(lambda: _delete_dashboard(user_pk))
+
+
+def clear_all_dashboards():
+    """Clear the cached dashboards of all users, now and again when the current transaction commits."""
+    _new_generation()
+    transaction.on_commit(_new_generation)
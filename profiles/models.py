@@ -1,10 +1,13 @@
+from django.apps import apps
 from django.conf import settings
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from core.models import TimeStampedModel
 
+from . import caches
+
 
 class Profile(TimeStampedModel):
     """Model to hold data related to the User model."""
@@ -28,3 +31,30 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def save_user_profile(sender, instance, **kwargs):
     instance.profile.save()
+
+
+@receiver(post_save, sender='tags.TaggedTrait')
+@receiver(post_delete, sender='tags.TaggedTrait')
+@receiver(post_save, sender='recipes.UnitRecipe')
+@receiver(post_delete, sender='recipes.UnitRecipe')
+@receiver(post_save, sender='recipes.HarmonizationRecipe')
+@receiver(post_delete, sender='recipes.HarmonizationRecipe')
+def clear_creator_dashboard(sender, instance, **kwargs):
+    caches.clear_dashboard(instance.creator_id)
+
+
+@receiver(post_save, sender='tags.DCCReview')
+@receiver(post_delete, sender='tags.DCCReview')
+def clear_tagged_trait_creator_dashboard(sender, instance, **kwargs):
+    # The tagged trait may already be gone if this review is being deleted along with it.
+    creator_pks = apps.get_model('tags', 'TaggedTrait').objects.filter(
+        pk=instance.tagged_trait_id).values_list('creator', flat=True)
+    for creator_pk in creator_pks:
+        caches.clear_dashboard(creator_pk)
+
+
+@receiver(post_save, sender='tags.Tag')
+@receiver(post_save, sender='trait_browser.Study')
+@receiver(post_save, sender='trait_browser.SourceStudyVersion')
+def clear_all_dashboards(sender, instance, **kwargs):
+    caches.clear_all_dashboards()
@@ -0,0 +1,160 @@
+"""Tests of cached data for the profiles app."""
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.factories import UserFactory
+from recipes.factories import HarmonizationRecipeFactory, UnitRecipeFactory
+from tags.factories import DCCReviewFactory, TagFactory, TaggedTraitFactory
+from trait_browser.factories import SourceStudyVersionFactory, SourceTraitFactory
+
+from . import caches
+
+
+class DashboardTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory.create()
+        self.other_user = UserFactory.create()
+
+    def assertCached(self, user, part='summary'):
+        self.assertIsNotNone(cache.get(caches._get_cache_key(user.pk, part)))
+
+    def assertNotCached(self, user, part='summary'):
+        self.assertIsNone(cache.get(caches._get_cache_key(user.pk, part)))
+
+    def test_empty(self):
+        """The dashboard is empty for a user with no tagged traits or recipes."""
+        dashboard = caches.get_dashboard(self.user.pk)
+        self.assertEqual(caches.get_user_taggedtraits(self.user.pk), [])
+        self.assertEqual(dashboard['user_taggedtrait_count'], 0)
+        self.assertEqual(dashboard['unit_recipe_count'], 0)
+        self.assertEqual(dashboard['harmonization_recipe_count'], 0)
+
+    def test_grouped_by_study_and_tag(self):
+        """The user's tagged traits are grouped by study, then by tag."""
+        study_version = SourceStudyVersionFactory.create()
+        tag = TagFactory.create()
+        tagged_traits = TaggedTraitFactory.create_batch(
+            2, creator=self.user, tag=tag, trait__source_dataset__source_study_version=study_version)
+        TaggedTraitFactory.create(creator=self.user)
+        self.assertEqual(caches.get_dashboard(self.user.pk)['user_taggedtrait_count'], 3)
+        user_taggedtraits = caches.get_user_taggedtraits(self.user.pk)
+        self.assertEqual(len(user_taggedtraits), 2)
+        study_data = [data for data in user_taggedtraits if data[0]['study_pk'] == study_version.study.pk]
+        self.assertEqual(len(study_data), 1)
+        tag_data = study_data[0][1]
+        self.assertEqual(len(tag_data), 1)
+        self.assertEqual(tag_data[0][0], {'tag_name': tag.title, 'tag_pk': tag.pk})
+        self.assertEqual(sorted(el['taggedtrait_pk'] for el in tag_data[0][1]), [x.pk for x in tagged_traits])
+
+    def test_cached(self):
+        """The dashboard is not rebuilt while it is cached."""
+        caches.get_dashboard(self.user.pk)
+        with self.assertNumQueries(0):
+            caches.get_dashboard(self.user.pk)
+
+    def test_summary_does_not_build_listing(self):
+        """Getting the dashboard summary does not build the user's tagged trait listing."""
+        TaggedTraitFactory.create(creator=self.user)
+        caches.get_dashboard(self.user.pk)
+        self.assertCached(self.user)
+        self.assertNotCached(self.user, 'user_taggedtraits')
+
+    def test_user_taggedtraits_cached(self):
+        """The tagged trait listing is not rebuilt while it is cached."""
+        caches.get_user_taggedtraits(self.user.pk)
+        with self.assertNumQueries(0):
+            caches.get_user_taggedtraits(self.user.pk)
+
+    def test_clear_dashboard_clears_listing(self):
+        """clear_dashboard also clears the user's cached tagged trait listing."""
+        caches.get_user_taggedtraits(self.user.pk)
+        caches.clear_dashboard(self.user.pk)
+        self.assertNotCached(self.user, 'user_taggedtraits')
+
+    def test_clear_dashboard(self):
+        """clear_dashboard clears only the given user's dashboard."""
+        caches.get_dashboard(self.user.pk)
+        caches.get_dashboard(self.other_user.pk)
+        caches.clear_dashboard(self.user.pk)
+        self.assertNotCached(self.user)
+        self.assertCached(self.other_user)
+
+    def test_clear_all_dashboards(self):
+        """clear_all_dashboards clears the dashboards of all users."""
+        caches.get_dashboard(self.user.pk)
+        caches.get_dashboard(self.other_user.pk)
+        caches.clear_all_dashboards()
+        self.assertNotCached(self.user)
+        self.assertNotCached(self.other_user)
+
+    def test_cleared_by_tagged_trait(self):
+        """Creating a tagged trait clears only its creator's dashboard."""
+        # Create the tag and trait first, because creating a tag or study version clears all dashboards.
+        tag = TagFactory.create()
+        trait = SourceTraitFactory.create()
+        caches.get_dashboard(self.user.pk)
+        caches.get_dashboard(self.other_user.pk)
+        TaggedTraitFactory.create(creator=self.user, tag=tag, trait=trait)
+        self.assertNotCached(self.user)
+        self.assertCached(self.other_user)
+        self.assertEqual(caches.get_dashboard(self.user.pk)['user_taggedtrait_count'], 1)
+
+    def test_cleared_by_tagged_trait_delete(self):
+        """Deleting a tagged trait clears its creator's dashboard."""
+        tagged_trait = TaggedTraitFactory.create(creator=self.user)
+        caches.get_dashboard(self.user.pk)
+        tagged_trait.delete()
+        self.assertNotCached(self.user)
+
+    def test_cleared_by_dcc_review(self):
+        """Reviewing a tagged trait clears the dashboard of the tagged trait's creator."""
+        tagged_trait = TaggedTraitFactory.create(creator=self.user)
+        caches.get_dashboard(self.user.pk)
+        caches.get_dashboard(self.other_user.pk)
+        DCCReviewFactory.create(tagged_trait=tagged_trait, creator=self.other_user)
+        self.assertNotCached(self.user)
+        self.assertCached(self.other_user)
+
+    def test_cleared_by_dcc_review_delete(self):
+        """Deleting a review clears the dashboard of the tagged trait's creator."""
+        dcc_review = DCCReviewFactory.create(tagged_trait__creator=self.user)
+        caches.get_dashboard(self.user.pk)
+        dcc_review.delete()
+        self.assertNotCached(self.user)
+
+    def test_cleared_by_unit_recipe(self):
+        """Creating a unit recipe clears its creator's dashboard."""
+        caches.get_dashboard(self.user.pk)
+        caches.get_dashboard(self.other_user.pk)
+        UnitRecipeFactory.create(creator=self.user)
+        self.assertNotCached(self.user)
+        self.assertCached(self.other_user)
+        self.assertEqual(caches.get_dashboard(self.user.pk)['unit_recipe_count'], 1)
+
+    def test_cleared_by_harmonization_recipe(self):
+        """Creating a harmonization recipe clears its creator's dashboard."""
+        caches.get_dashboard(self.user.pk)
+        HarmonizationRecipeFactory.create(creator=self.user)
+        self.assertNotCached(self.user)
+        self.assertEqual(caches.get_dashboard(self.user.pk)['harmonization_recipe_count'], 1)
+
+    def test_cleared_by_tag(self):
+        """Changing a tag clears the dashboards of all users."""
+        tag = TagFactory.create()
+        caches.get_dashboard(self.user.pk)
+        tag.title = 'new title'
+        tag.save()
+        self.assertNotCached(self.user)
+
+    def test_cleared_by_deprecated_study_version(self):
+        """Deprecating a study version clears the dashboards of all users."""
+        tagged_trait = TaggedTraitFactory.create(creator=self.other_user)
+        caches.get_dashboard(self.user.pk)
+        study_version = tagged_trait.trait.source_dataset.source_study_version
+        study_version.i_is_deprecated = True
+        study_version.save()
+        self.assertNotCached(self.user)
+        self.assertEqual(caches.get_dashboard(self.other_user.pk)['user_taggedtrait_count'], 0)
@@ -1,5 +1,6 @@
 """Test the functions and classes for views.py."""
 
+from django.core.cache import cache
 from django.urls import reverse
 
 from core.utils import (DCCAnalystLoginTestCase, LoginRequiredTestCase, RecipeSubmitterLoginTestCase,
@@ -9,11 +10,14 @@ from tags.factories import DCCReviewFactory, TaggedTraitFactory
 from tags.models import DCCReview, TaggedTrait
 from trait_browser.factories import StudyFactory
 
+from . import caches
+
 
 class ProfileTest(UserLoginTestCase):
 
     def setUp(self):
         super(ProfileTest, self).setUp()
+        cache.clear()
 
     def get_url(self, *args):
         return reverse('profiles:profile')
@@ -52,11 +56,22 @@ class ProfileTest(UserLoginTestCase):
         self.assertNotContains(response, 'id="unitrecipes"')
         self.assertNotContains(response, 'id="harmonizationrecipes"')
 
+    def test_user_tagged_traits_fragment_forbidden(self):
+        """Regular user cannot load the 'my tagged variables' fragment."""
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_study_tagged_trait_counts_fragment_forbidden(self):
+        """Regular user cannot load the 'tagged variables in my studies' fragment."""
+        response = self.client.get(reverse('profiles:study-tagged-trait-counts'))
+        self.assertEqual(response.status_code, 403)
+
 
 class DCCAnalystLoginTestCaseProfileTest(DCCAnalystLoginTestCase):
 
     def setUp(self):
         super(DCCAnalystLoginTestCaseProfileTest, self).setUp()
+        cache.clear()
 
     def get_url(self, *args):
         return reverse('profiles:profile')
@@ -78,8 +93,9 @@ class DCCAnalystLoginTestCaseProfileTest(DCCAnalystLoginTestCase):
         self.assertEqual(len(context['unit_recipe_table'].rows), 0)
         self.assertIn('harmonization_recipe_table', context)
         self.assertEqual(len(context['harmonization_recipe_table'].rows), 0)
-        self.assertIn('user_taggedtraits', context)
-        self.assertEqual(len(context['user_taggedtraits']), 0)
+        self.assertIn('dashboard', context)
+        self.assertEqual(context['dashboard']['user_taggedtrait_count'], 0)
+        self.assertNotIn('user_taggedtraits', context)
         self.assertNotIn('study_taggedtrait_counts', context)
 
     def test_has_correct_tagged_phenotypes_tabs(self):
@@ -112,7 +128,7 @@ class DCCAnalystLoginTestCaseProfileTest(DCCAnalystLoginTestCase):
 
     def test_my_tagged_variables_correct_empty(self):
         """The list of 'my tagged traits' is correct when the user has no taggedtraits."""
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         context = response.context
         self.assertEqual(context['user_taggedtraits'], [])
 
@@ -122,7 +138,7 @@ class DCCAnalystLoginTestCaseProfileTest(DCCAnalystLoginTestCase):
         tagged_traits = TaggedTraitFactory.create_batch(
             2, creator=self.user,
             trait__source_dataset__source_study_version__study=study)
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         context = response.context
         study_data = context['user_taggedtraits'][0][0]
         study_tag_data = context['user_taggedtraits'][0][1]
@@ -140,7 +156,7 @@ class DCCAnalystLoginTestCaseProfileTest(DCCAnalystLoginTestCase):
             trait__source_dataset__source_study_version__study=study)
         archived_tagged_trait = TaggedTraitFactory.create(
             trait__source_dataset__source_study_version__study=study, creator=self.user, archived=True)
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         context = response.context
         study_data = context['user_taggedtraits'][0][0]
         study_tag_data = context['user_taggedtraits'][0][1]
@@ -157,7 +173,7 @@ class DCCAnalystLoginTestCaseProfileTest(DCCAnalystLoginTestCase):
             2, creator=self.user,
             trait__source_dataset__source_study_version__study=study)
         other_tagged_trait = TaggedTraitFactory.create(trait__source_dataset__source_study_version__study=study)
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         context = response.context
         study_data = context['user_taggedtraits'][0][0]
         study_tag_data = context['user_taggedtraits'][0][1]
@@ -176,7 +192,7 @@ class DCCAnalystLoginTestCaseProfileTest(DCCAnalystLoginTestCase):
             trait__source_dataset__source_study_version__study=study)
         archived_tagged_trait = TaggedTraitFactory.create(
             trait__source_dataset__source_study_version__study=study, creator=self.user, archived=True)
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         context = response.context
         study_data = context['user_taggedtraits'][0][0]
         study_tag_data = context['user_taggedtraits'][0][1]
@@ -191,21 +207,21 @@ class DCCAnalystLoginTestCaseProfileTest(DCCAnalystLoginTestCase):
         """The taggedtrait delete link is present in the html for a taggedtrait that is not reviewed."""
         tagged_trait = TaggedTraitFactory.create(creator=self.user)
         tagged_trait_delete_url = reverse('tags:tagged-traits:pk:delete', args=[tagged_trait.pk])
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         self.assertContains(response, tagged_trait_delete_url)
 
     def test_delete_link_not_present_for_confirmed_taggedtrait(self):
         """The taggedtrait delete link is not present in the html for a taggedtrait that is confirmed."""
         dcc_review = DCCReviewFactory.create(status=DCCReview.STATUS_CONFIRMED, tagged_trait__creator=self.user)
         tagged_trait_delete_url = reverse('tags:tagged-traits:pk:delete', args=[dcc_review.tagged_trait.pk])
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         self.assertNotContains(response, tagged_trait_delete_url)
 
     def test_delete_link_not_present_for_needsfollowup_taggedtrait(self):
         """The taggedtrait delete link is not present in the html for a taggedtrait that needs followup."""
         dcc_review = DCCReviewFactory.create(status=DCCReview.STATUS_FOLLOWUP, tagged_trait__creator=self.user)
         tagged_trait_delete_url = reverse('tags:tagged-traits:pk:delete', args=[dcc_review.tagged_trait.pk])
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         self.assertNotContains(response, tagged_trait_delete_url)
 
     def test_no_deprecated_tagged_traits(self):
@@ -219,7 +235,7 @@ class DCCAnalystLoginTestCaseProfileTest(DCCAnalystLoginTestCase):
             trait__source_dataset__source_study_version__study=study,
             trait__source_dataset__source_study_version__i_is_deprecated=True
         )
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         context = response.context
         study_data = context['user_taggedtraits'][0][0]
         study_tag_data = context['user_taggedtraits'][0][1]
@@ -230,11 +246,72 @@ class DCCAnalystLoginTestCaseProfileTest(DCCAnalystLoginTestCase):
         expected_pks = [x.pk for x in tagged_traits]
         self.assertEqual(sorted(all_tagged_trait_pks), expected_pks)
 
+    def test_has_my_tagged_fragment_url(self):
+        """The page loads only the 'my tagged variables' fragment."""
+        response = self.client.get(self.get_url())
+        self.assertContains(response, reverse('profiles:user-tagged-traits'))
+        self.assertNotContains(response, reverse('profiles:study-tagged-trait-counts'))
+
+    def test_study_tagged_trait_counts_fragment_forbidden(self):
+        """Staff user without taggable studies cannot load the 'tagged variables in my studies' fragment."""
+        response = self.client.get(reverse('profiles:study-tagged-trait-counts'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_dashboard_counts(self):
+        """The dashboard has the correct counts of the user's tagged traits and recipes."""
+        TaggedTraitFactory.create_batch(2, creator=self.user)
+        TaggedTraitFactory.create(creator=self.user, archived=True)
+        TaggedTraitFactory.create()
+        UnitRecipeFactory.create_batch(3, creator=self.user)
+        HarmonizationRecipeFactory.create(creator=self.user)
+        response = self.client.get(self.get_url())
+        dashboard = response.context['dashboard']
+        self.assertEqual(dashboard['user_taggedtrait_count'], 2)
+        self.assertEqual(dashboard['unit_recipe_count'], 3)
+        self.assertEqual(dashboard['harmonization_recipe_count'], 1)
+
+    def test_dashboard_counts_updated_after_new_recipe(self):
+        """The dashboard recipe counts are updated after the user creates a recipe."""
+        self.client.get(self.get_url())
+        UnitRecipeFactory.create(creator=self.user)
+        response = self.client.get(self.get_url())
+        self.assertEqual(response.context['dashboard']['unit_recipe_count'], 1)
+
+    def test_does_not_build_tagged_trait_listing(self):
+        """The page shell does not build the user's tagged trait listing."""
+        TaggedTraitFactory.create(creator=self.user)
+        self.client.get(self.get_url())
+        self.assertIsNone(cache.get(caches._get_cache_key(self.user.pk, 'user_taggedtraits')))
+
+    def test_my_tagged_variables_updated_after_new_tagged_trait(self):
+        """The list of 'my tagged traits' includes a taggedtrait created after the list was cached."""
+        self.client.get(reverse('profiles:user-tagged-traits'))
+        tagged_trait = TaggedTraitFactory.create(creator=self.user)
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
+        self.assertContains(response, reverse('tags:tagged-traits:pk:detail', args=[tagged_trait.pk]))
+
+    def test_delete_link_removed_after_review(self):
+        """The taggedtrait delete link is removed after the taggedtrait is reviewed."""
+        tagged_trait = TaggedTraitFactory.create(creator=self.user)
+        tagged_trait_delete_url = reverse('tags:tagged-traits:pk:delete', args=[tagged_trait.pk])
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
+        self.assertContains(response, tagged_trait_delete_url)
+        DCCReviewFactory.create(tagged_trait=tagged_trait, status=DCCReview.STATUS_CONFIRMED)
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
+        self.assertNotContains(response, tagged_trait_delete_url)
+
+    def test_delete_link_returns_to_profile(self):
+        """The taggedtrait delete link returns to the profile page, not to the fragment."""
+        tagged_trait = TaggedTraitFactory.create(creator=self.user)
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
+        self.assertContains(response, '?next={}'.format(self.get_url()))
+
 
 class RecipeSubmitterLoginTestCaseProfileTest(RecipeSubmitterLoginTestCase):
 
     def setUp(self):
         super(RecipeSubmitterLoginTestCaseProfileTest, self).setUp()
+        cache.clear()
 
     def get_url(self, *args):
         return reverse('profiles:profile')
@@ -284,11 +361,22 @@ class RecipeSubmitterLoginTestCaseProfileTest(RecipeSubmitterLoginTestCase):
         self.assertEqual(len(context['unit_recipe_table'].rows), len(unit_recipes))
         self.assertEqual(len(context['harmonization_recipe_table'].rows), len(harmonization_recipes))
 
+    def test_user_tagged_traits_fragment_forbidden(self):
+        """Recipe submitter cannot load the 'my tagged variables' fragment."""
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_study_tagged_trait_counts_fragment_forbidden(self):
+        """Recipe submitter cannot load the 'tagged variables in my studies' fragment."""
+        response = self.client.get(reverse('profiles:study-tagged-trait-counts'))
+        self.assertEqual(response.status_code, 403)
+
 
 class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
 
     def setUp(self):
         super(PhenotypeTaggerLoginTestCaseProfileTest, self).setUp()
+        cache.clear()
 
     def get_url(self, *args):
         return reverse('profiles:profile')
@@ -308,8 +396,9 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
         self.assertTrue(context['show_study_tagged'])
         self.assertNotIn('unit_recipe_table', context)
         self.assertNotIn('harmonization_recipe_table', context)
-        self.assertIn('user_taggedtraits', context)
-        self.assertIn('study_taggedtrait_counts', context)
+        self.assertIn('dashboard', context)
+        self.assertNotIn('user_taggedtraits', context)
+        self.assertNotIn('study_taggedtrait_counts', context)
 
     def test_has_correct_tagged_phenotypes_tabs(self):
         """Tagger user does see My Tagged Phenotypes."""
@@ -328,7 +417,7 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
 
     def test_my_tagged_variables_correct_empty(self):
         """The list of 'my tagged traits' is correct when the user has no taggedtraits."""
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         context = response.context
         self.assertEqual(context['user_taggedtraits'], [])
 
@@ -338,7 +427,7 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
         tagged_traits = TaggedTraitFactory.create_batch(
             2, creator=self.user,
             trait__source_dataset__source_study_version__study=study)
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         context = response.context
         study_data = context['user_taggedtraits'][0][0]
         study_tag_data = context['user_taggedtraits'][0][1]
@@ -356,7 +445,7 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
             trait__source_dataset__source_study_version__study=study)
         archived_tagged_trait = TaggedTraitFactory.create(
             trait__source_dataset__source_study_version__study=study, creator=self.user, archived=True)
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         context = response.context
         study_data = context['user_taggedtraits'][0][0]
         study_tag_data = context['user_taggedtraits'][0][1]
@@ -373,7 +462,7 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
             2, creator=self.user,
             trait__source_dataset__source_study_version__study=study)
         other_tagged_trait = TaggedTraitFactory.create(trait__source_dataset__source_study_version__study=study)
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         context = response.context
         study_data = context['user_taggedtraits'][0][0]
         study_tag_data = context['user_taggedtraits'][0][1]
@@ -392,7 +481,7 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
             trait__source_dataset__source_study_version__study=study)
         archived_tagged_trait = TaggedTraitFactory.create(
             trait__source_dataset__source_study_version__study=study, creator=self.user, archived=True)
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         context = response.context
         study_data = context['user_taggedtraits'][0][0]
         study_tag_data = context['user_taggedtraits'][0][1]
@@ -405,7 +494,7 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
 
     def test_study_tagged_variables_correct_empty(self):
         """The counts of 'tagged variables from my studies' is correct when the study and user have no taggedtraits."""
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:study-tagged-trait-counts'))
         context = response.context
         self.assertEqual(context['study_taggedtrait_counts'], [])
 
@@ -414,7 +503,7 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
         user_tagged_trait = TaggedTraitFactory.create(creator=self.user,
                                                       trait__source_dataset__source_study_version__study=self.study)
         other_study_taggedtrait = TaggedTraitFactory.create()
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:study-tagged-trait-counts'))
         context = response.context
         study_data = context['study_taggedtrait_counts']
         self.assertEqual(self.user.profile.taggable_studies.count(), len(study_data))
@@ -430,7 +519,7 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
         archived_taggedtrait = TaggedTraitFactory.create(
             creator=self.user, trait__source_dataset__source_study_version__study=self.study, archived=True,
             tag=user_tagged_trait.tag)
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:study-tagged-trait-counts'))
         context = response.context
         study_data = context['study_taggedtrait_counts']
         self.assertEqual(self.user.profile.taggable_studies.count(), len(study_data))
@@ -445,7 +534,7 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
         other_user_taggedtrait = TaggedTraitFactory.create(
             tag=user_tagged_trait.tag,
             trait__source_dataset__source_study_version__study=self.study)
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:study-tagged-trait-counts'))
         context = response.context
         study_data = context['study_taggedtrait_counts']
         self.assertEqual(self.user.profile.taggable_studies.count(), len(study_data))
@@ -460,7 +549,7 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
         archived_taggedtrait = TaggedTraitFactory.create(
             creator=self.user, trait__source_dataset__source_study_version__study=self.study, archived=True,
             tag=user_tagged_trait.tag)
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:study-tagged-trait-counts'))
         context = response.context
         study_data = context['study_taggedtrait_counts']
         self.assertEqual(self.user.profile.taggable_studies.count(), len(study_data))
@@ -473,7 +562,7 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
         tagged_trait = TaggedTraitFactory.create(creator=self.user,
                                                  trait__source_dataset__source_study_version__study=self.study)
         tagged_trait_delete_url = reverse('tags:tagged-traits:pk:delete', args=[tagged_trait.pk])
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         self.assertContains(response, tagged_trait_delete_url)
 
     def test_delete_link_not_present_for_confirmed_taggedtrait(self):
@@ -483,7 +572,7 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
             tagged_trait__creator=self.user,
             tagged_trait__trait__source_dataset__source_study_version__study=self.study)
         tagged_trait_delete_url = reverse('tags:tagged-traits:pk:delete', args=[dcc_review.tagged_trait.pk])
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         self.assertNotContains(response, tagged_trait_delete_url)
 
     def test_delete_link_not_present_for_needsfollowup_taggedtrait(self):
@@ -493,7 +582,7 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
             tagged_trait__creator=self.user,
             tagged_trait__trait__source_dataset__source_study_version__study=self.study)
         tagged_trait_delete_url = reverse('tags:tagged-traits:pk:delete', args=[dcc_review.tagged_trait.pk])
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         self.assertNotContains(response, tagged_trait_delete_url)
 
     def test_study_tagged_variables_correct_count_with_deprecated_trait(self):
@@ -506,7 +595,7 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
             trait__source_dataset__source_study_version__study=self.study,
             trait__source_dataset__source_study_version__i_is_deprecated=True
         )
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:study-tagged-trait-counts'))
         context = response.context
         study_data = context['study_taggedtrait_counts']
         self.assertEqual(self.user.profile.taggable_studies.count(), len(study_data))
@@ -526,7 +615,7 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
             trait__source_dataset__source_study_version__study=study,
             trait__source_dataset__source_study_version__i_is_deprecated=True
         )
-        response = self.client.get(self.get_url())
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
         context = response.context
         study_data = context['user_taggedtraits'][0][0]
         study_tag_data = context['user_taggedtraits'][0][1]
@@ -537,6 +626,33 @@ class PhenotypeTaggerLoginTestCaseProfileTest(PhenotypeTaggerLoginTestCase):
         expected_pks = [x.pk for x in tagged_traits]
         self.assertEqual(sorted(all_tagged_trait_pks), expected_pks)
 
+    def test_has_tagged_fragment_urls(self):
+        """The page loads both tagged variable fragments."""
+        response = self.client.get(self.get_url())
+        self.assertContains(response, reverse('profiles:user-tagged-traits'))
+        self.assertContains(response, reverse('profiles:study-tagged-trait-counts'))
+
+    def test_my_tagged_variables_updated_after_archiving(self):
+        """The list of 'my tagged traits' excludes a taggedtrait archived after the list was cached."""
+        tagged_trait = TaggedTraitFactory.create(creator=self.user,
+                                                 trait__source_dataset__source_study_version__study=self.study)
+        tagged_trait_url = reverse('tags:tagged-traits:pk:detail', args=[tagged_trait.pk])
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
+        self.assertContains(response, tagged_trait_url)
+        tagged_trait.archive()
+        response = self.client.get(reverse('profiles:user-tagged-traits'))
+        self.assertNotContains(response, tagged_trait_url)
+
+    def test_study_tagged_variables_includes_new_trait_tagged_by_other_user(self):
+        """The counts of 'tagged variables from my studies' are updated after another user tags a trait."""
+        user_tagged_trait = TaggedTraitFactory.create(creator=self.user,
+                                                      trait__source_dataset__source_study_version__study=self.study)
+        self.client.get(reverse('profiles:study-tagged-trait-counts'))
+        TaggedTraitFactory.create(tag=user_tagged_trait.tag,
+                                  trait__source_dataset__source_study_version__study=self.study)
+        response = self.client.get(reverse('profiles:study-tagged-trait-counts'))
+        self.assertEqual(response.context['study_taggedtrait_counts'][0][1][0]['tt_count'], 2)
+
 
 class ProfilesLoginRequiredTestCase(LoginRequiredTestCase):
 
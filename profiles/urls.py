@@ -14,4 +14,8 @@ app_name = 'profiles'
 urlpatterns = [
     # General views
     url(r'^$', views.Profile.as_view(), name='profile'),
+    # Fragments of the profile page, loaded after the page itself.
+    url(r'^tagged-variables/$', views.UserTaggedTraitsFragment.as_view(), name='user-tagged-traits'),
+    url(r'^study-tagged-variables/$', views.StudyTaggedTraitCountsFragment.as_view(),
+        name='study-tagged-trait-counts'),
 ]
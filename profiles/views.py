@@ -2,90 +2,96 @@
 
 from itertools import groupby
 
-from django.contrib.auth.models import Group
-from django.db.models import Count, F
+from django.db.models import F
 from django.views.generic import TemplateView
 
-from braces.views import LoginRequiredMixin
+from braces.views import LoginRequiredMixin, UserPassesTestMixin
 
 import recipes.models
 import recipes.tables
-from tags.models import TaggedTrait
+from tags.models import TagStudyCount
 
+from . import caches
 
-class Profile(LoginRequiredMixin, TemplateView):
+
+class ProfileSectionsMixin(object):
+    """Determine which sections of the Profile page the logged in user can see."""
+
+    def get_sections(self, user):
+        """Return a dict of booleans controlling which components show up on the Profile page."""
+        group_names = set(user.groups.filter(
+            name__in=('phenotype_taggers', 'recipe_submitters')).values_list('name', flat=True))
+        is_phenotype_tagger = 'phenotype_taggers' in group_names
+        is_recipe_submitter = 'recipe_submitters' in group_names
+        return {
+            # Show the tab panels only for staff members, phenotype_taggers, or recipe_submitters.
+            'show_tabs': is_phenotype_tagger or is_recipe_submitter or user.is_staff,
+            'show_recipes': is_recipe_submitter or user.is_staff,
+            'show_my_tagged': is_phenotype_tagger or user.is_staff,
+            'show_study_tagged': is_phenotype_tagger,
+        }
+
+
+class Profile(LoginRequiredMixin, ProfileSectionsMixin, TemplateView):
+    """Show the page shell and summary; the tagged variable sections are loaded from the fragment views below."""
 
     template_name = 'profiles/profile.html'
 
     def get_context_data(self, **kwargs):
         context = super(Profile, self).get_context_data(**kwargs)
-        phenotype_tagger = Group.objects.get(name='phenotype_taggers')
-        recipe_submitter = Group.objects.get(name='recipe_submitters')
-        is_staff = self.request.user.is_staff
-        is_phenotype_tagger = phenotype_tagger in self.request.user.groups.all()
-        is_recipe_submitter = recipe_submitter in self.request.user.groups.all()
-        # Set up variables for controlling which components show up on the page.
-        context['show_tabs'] = False
-        context['show_recipes'] = False
-        context['show_my_tagged'] = False
-        context['show_study_tagged'] = False
-        # Show the tab panels only for staff members, phenotype_taggers, or recipe_submitters.
-        if is_phenotype_tagger or is_recipe_submitter or is_staff:
-            context['show_tabs'] = True
+        context.update(self.get_sections(self.request.user))
+        if context['show_tabs']:
+            # Only the summary counts; the tagged trait listing is built when its fragment is requested.
+            context['dashboard'] = caches.get_dashboard(self.request.user.pk)
         # Get recipes for recipe_submitters and staff.
-        if is_recipe_submitter or is_staff:
-            context['show_recipes'] = True
+        if context['show_recipes']:
             user_unit_recipes = recipes.models.UnitRecipe.objects.filter(
                 creator=self.request.user).order_by('-modified')
             context['unit_recipe_table'] = recipes.tables.UnitRecipeTable(user_unit_recipes)
             user_harmonization_recipes = recipes.models.HarmonizationRecipe.objects.filter(
                 creator=self.request.user).order_by('-modified')
             context['harmonization_recipe_table'] = recipes.tables.HarmonizationRecipeTable(user_harmonization_recipes)
-        # Get tagged traits and their study names for phenotype_taggers and staff.
-        if is_phenotype_tagger or is_staff:
-            context['show_my_tagged'] = True
-            user_taggedtraits = TaggedTrait.objects.current().non_archived().filter(creator=self.request.user)
-            user_taggedtraits = user_taggedtraits.values(
-                study_name=F('trait__source_dataset__source_study_version__study__i_study_name'),
-                study_pk=F('trait__source_dataset__source_study_version__study__pk'),
+        return context
+
+
+class UserTaggedTraitsFragment(LoginRequiredMixin, UserPassesTestMixin, ProfileSectionsMixin, TemplateView):
+    """Fragment of the Profile page listing the user's tagged traits, grouped by study and tag."""
+
+    template_name = 'profiles/_user_tagged_traits.html'
+    raise_exception = True
+    redirect_unauthenticated_users = True
+
+    def test_func(self, user):
+        return self.get_sections(user)['show_my_tagged']
+
+    def get_context_data(self, **kwargs):
+        context = super(UserTaggedTraitsFragment, self).get_context_data(**kwargs)
+        context['user_taggedtraits'] = caches.get_user_taggedtraits(self.request.user.pk)
+        return context
+
+
+class StudyTaggedTraitCountsFragment(LoginRequiredMixin, UserPassesTestMixin, ProfileSectionsMixin, TemplateView):
+    """Fragment of the Profile page with counts of tagged traits by tag for each of the user's taggable studies."""
+
+    template_name = 'profiles/_study_tagged_trait_counts.html'
+    raise_exception = True
+    redirect_unauthenticated_users = True
+
+    def test_func(self, user):
+        return self.get_sections(user)['show_study_tagged']
+
+    def get_context_data(self, **kwargs):
+        context = super(StudyTaggedTraitCountsFragment, self).get_context_data(**kwargs)
+        # These counts include other users' tagging, so they come from the TagStudyCount table, not the dashboard.
+        study_taggedtrait_counts = TagStudyCount.objects.filter(
+            study__in=self.request.user.profile.taggable_studies.all()).values(
+                'tt_count',
+                study_name=F('study__i_study_name'),
+                study_pk=F('study__pk'),
                 tag_name=F('tag__title'),
-                tag_pk=F('tag__pk'),
-                variable_name=F('trait__i_trait_name'),
-                dataset_name=F('trait__source_dataset__dataset_name'),
-                review=F('dcc_review'),
-                taggedtrait_pk=F('pk')).order_by('study_name', 'tag_name', 'variable_name')
-            # Group by study.
-            user_taggedtraits = groupby(user_taggedtraits,
-                                        lambda x: {'study_name': x['study_name'], 'study_pk': x['study_pk']})
-            user_taggedtraits = [(key, list(group)) for key, group in user_taggedtraits]
-            # Group by tag.
-            user_taggedtraits_bytag = []
-            for study, study_taggedtraits in user_taggedtraits:
-                taggedtraits_groupedbytag = groupby(study_taggedtraits,
-                                                    lambda x: {'tag_name': x['tag_name'], 'tag_pk': x['tag_pk']})
-                taggedtraits_groupedbytag = [(key, list(group)) for key, group in taggedtraits_groupedbytag]
-                user_taggedtraits_bytag.append((study, taggedtraits_groupedbytag))
-            context['user_taggedtraits'] = user_taggedtraits_bytag
-        # Get tagged traits for all of the studies this user can tag for.
-        if is_phenotype_tagger:
-            context['show_study_tagged'] = True
-            taggable_studies = self.request.user.profile.taggable_studies.all()
-            if len(taggable_studies) > 0:
-                study_taggedtrait_counts = TaggedTrait.objects.current().non_archived().filter(
-                    trait__source_dataset__source_study_version__study__in=taggable_studies)
-                study_taggedtrait_counts = study_taggedtrait_counts.values(
-                    study_name=F('trait__source_dataset__source_study_version__study__i_study_name'),
-                    study_pk=F('trait__source_dataset__source_study_version__study__pk'),
-                    tag_name=F('tag__title'),
-                    tag_pk=F('tag__pk')).annotate(
-                        tt_count=Count('pk')).values(
-                            'study_name', 'study_pk', 'tag_name', 'tt_count', 'tag_pk').order_by(
-                                'study_name', 'tag_name')
-                # Group by study and count.
-                study_taggedtrait_counts = groupby(study_taggedtrait_counts,
-                                                   lambda x: {'study_name': x['study_name'],
-                                                              'study_pk': x['study_pk']})
-                study_taggedtrait_counts = [
-                    (key, list(group)) for key, group in study_taggedtrait_counts]
-                context['study_taggedtrait_counts'] = study_taggedtrait_counts
+                tag_pk=F('tag__pk')).order_by('study_name', 'tag_name')
+        # Group by study and count.
+        study_taggedtrait_counts = groupby(study_taggedtrait_counts,
+                                           lambda x: {'study_name': x['study_name'], 'study_pk': x['study_pk']})
+        context['study_taggedtrait_counts'] = [(key, list(group)) for key, group in study_taggedtrait_counts]
         return context
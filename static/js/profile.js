@@ -0,0 +1,14 @@
+$(document).ready(function() {
+
+  // Load the larger sections of the profile page after the page itself.
+  $('[data-fragment-url]').each(function() {
+    var pane = $(this);
+    pane.load(pane.data('fragment-url'), function(response, status) {
+      if (status == 'error') {
+        pane.html('<p class="text-danger">This section could not be loaded. Try reloading the page.</p>');
+      }
+      pane.find('[data-toggle="tooltip"]').tooltip();
+    });
+  });
+
+})
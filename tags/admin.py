@@ -2,6 +2,9 @@
 
 from django.contrib import admin
 
+from core.admin import LargeTableAdminMixin
+from trait_browser.admin import ID_SEARCH_PATTERN, PHV_SEARCH_PATTERN
+
 from . import forms
 from . import models
 
@@ -10,6 +13,7 @@ class TagAdmin(admin.ModelAdmin):
     """Admin class for Tag objects."""
 
     list_display = ('title', 'lower_title', 'description', 'creator', 'created', 'modified', )
+    list_select_related = ('creator', )
     list_filter = (('creator', admin.RelatedOnlyFieldListFilter), )
     search_fields = ('lower_title', 'description', 'instructions', )
     form = forms.TagAdminForm
@@ -21,14 +25,16 @@ class TagAdmin(admin.ModelAdmin):
         obj.save()
 
 
-class TaggedTraitAdmin(admin.ModelAdmin):
+class TaggedTraitAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """Admin class for TaggedTrait objects."""
 
     list_display = ('tag', 'trait', 'dcc_review_status', 'study_response_status', 'archived', 'creator', 'created',
                     'modified', )
+    list_select_related = ('tag', 'trait__source_dataset', 'dcc_review__study_response', 'creator', )
     list_filter = ('dcc_review__status', 'dcc_review__study_response__status',
                    ('creator', admin.RelatedOnlyFieldListFilter), 'tag', 'archived', )
-    search_fields = ('tag', 'trait', )
+    search_fields = ('^tag__lower_title', '^trait__i_trait_name', )
+    exact_search_patterns = ((ID_SEARCH_PATTERN, 'pk'), (PHV_SEARCH_PATTERN, 'trait__i_dbgap_variable_accession'), )
     readonly_fields = ('trait', 'tag', )
     form = forms.TaggedTraitAdminForm
 
@@ -54,11 +60,14 @@ class TaggedTraitAdmin(admin.ModelAdmin):
         return False
 
 
-class DCCReviewAdmin(admin.ModelAdmin):
+class DCCReviewAdmin(LargeTableAdminMixin, admin.ModelAdmin):
 
     list_display = ('tagged_trait', 'status', 'comment', 'creator', 'created', 'modified', )
+    list_select_related = ('tagged_trait__tag', 'tagged_trait__trait', 'creator', )
     list_filter = ('status', ('creator', admin.RelatedOnlyFieldListFilter), )
-    search_fields = ('tagged_trait__tag__title', 'tagged_trait__trait__i_trait_name', )
+    search_fields = ('^tagged_trait__tag__lower_title', '^tagged_trait__trait__i_trait_name', )
+    exact_search_patterns = ((ID_SEARCH_PATTERN, 'pk'),
+                             (PHV_SEARCH_PATTERN, 'tagged_trait__trait__i_dbgap_variable_accession'), )
     readonly_fields = ('tagged_trait', )
     form = forms.DCCReviewAdminForm
 
@@ -67,18 +76,24 @@ class DCCReviewAdmin(admin.ModelAdmin):
         return False
 
 
-class StudyResponseAdmin(admin.ModelAdmin):
+class StudyResponseAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('dcc_review', 'status', 'comment', 'creator', 'created', 'modified', )
+    list_select_related = ('dcc_review__tagged_trait__tag', 'dcc_review__tagged_trait__trait', 'creator', )
     list_filter = ('status', ('creator', admin.RelatedOnlyFieldListFilter), )
-    search_fields = ('dcc_review__tagged_trait__tag__title', 'dcc_review__tagged_trait__trait__i_trait_name')
+    search_fields = ('^dcc_review__tagged_trait__tag__lower_title', '^dcc_review__tagged_trait__trait__i_trait_name')
+    exact_search_patterns = ((ID_SEARCH_PATTERN, 'pk'),
+                             (PHV_SEARCH_PATTERN, 'dcc_review__tagged_trait__trait__i_dbgap_variable_accession'), )
     readonly_fields = ('dcc_review', )
     form = forms.StudyResponseAdminForm
 
 
-class DCCDecisionAdmin(admin.ModelAdmin):
+class DCCDecisionAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('dcc_review', 'decision', 'comment', 'creator', 'created', 'modified', )
+    list_select_related = ('dcc_review__tagged_trait__tag', 'dcc_review__tagged_trait__trait', 'creator', )
     list_filter = ('decision', ('creator', admin.RelatedOnlyFieldListFilter), )
-    search_fields = ('dcc_review__tagged_trait__tag__title', 'dcc_review__tagged_trait__trait__i_trait_name', )
+    search_fields = ('^dcc_review__tagged_trait__tag__lower_title', '^dcc_review__tagged_trait__trait__i_trait_name', )
+    exact_search_patterns = ((ID_SEARCH_PATTERN, 'pk'),
+                             (PHV_SEARCH_PATTERN, 'dcc_review__tagged_trait__trait__i_dbgap_variable_accession'), )
     readonly_fields = ('dcc_review', 'creator', )
 
     def has_add_permission(self, request, obj=None):
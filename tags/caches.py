@@ -0,0 +1,48 @@
+"""Cached, precomputed data about tagged traits, to be used across the tags app.
+
+The caches are cleared by signal receivers in tags.models whenever the data they
+are built from are changed. The receivers only run in the process that made the change,
+so deployed sites use a cache backend shared by all processes (see the staging settings).
+"""
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+
+
+UNREVIEWED_INDEX_CACHE_KEY = 'tags:unreviewed_index'
+# Seconds before the index is rebuilt even without changes, in case a change is made without sending a signal.
+UNREVIEWED_INDEX_TIMEOUT = 300
+
+
+def _build_unreviewed_index():
+    """Get the set of (tag_pk, study_pk) pairs with current, unreviewed, non-archived tagged traits."""
+    pairs = apps.get_model('tags', 'TaggedTrait').objects.current().unreviewed().non_archived().values_list(
+        'tag__pk', 'trait__source_dataset__source_study_version__study__pk').distinct()
+    return frozenset(pairs)
+
+
+def get_unreviewed_index():
+    """Return the cached set of (tag_pk, study_pk) pairs with current, unreviewed, non-archived tagged traits."""
+    index = cache.get(UNREVIEWED_INDEX_CACHE_KEY)
+    if index is None:
+        index = _build_unreviewed_index()
+        cache.set(UNREVIEWED_INDEX_CACHE_KEY, index, UNREVIEWED_INDEX_TIMEOUT)
+    return index
+
+
+def get_unreviewed_tag_pks():
+    """Return the set of pks for tags that have current, unreviewed, non-archived tagged traits."""
+    return {tag_pk for tag_pk, study_pk in get_unreviewed_index()}
+
+
+def get_unreviewed_study_pks(tag_pk):
+    """Return the set of pks for studies with current, unreviewed, non-archived traits tagged with tag_pk."""
+    return {study_pk for index_tag_pk, study_pk in get_unreviewed_index() if index_tag_pk == int(tag_pk)}
+
+
+def clear_unreviewed_index():
+    """Clear the cached index, now and again when the current transaction commits."""
+    cache.delete(UNREVIEWED_INDEX_CACHE_KEY)
+    # Another request could rebuild the index before this transaction commits, so clear it again afterwards.
+    transaction.on_commit(lambda: cache.delete(UNREVIEWED_INDEX_CACHE_KEY))
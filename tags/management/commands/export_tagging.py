@@ -1,17 +1,25 @@
 """Create a data package of exported tagging data."""
 
 
+from concurrent.futures import ProcessPoolExecutor
 import datetime
+import hashlib
+from itertools import chain
+import json
 import logging
 import os
 from sys import stdout
-from subprocess import check_output, STDOUT
+import tarfile
 
-from django.core.management.base import BaseCommand
-from django.core import management
+from django.core.management.base import BaseCommand, CommandError
+from django.core import serializers
+from django.db import connections
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
-from tags.models import TaggedTrait
-from trait_browser.models import Study
+from tags.models import DeletedTaggedTrait, Tag, TaggedTrait
+from trait_browser.models import SourceTrait, Study
 
 
 # Set up a logger to handle messages based on verbosity setting.
@@ -64,6 +72,29 @@ TAGGED_TRAIT_COLUMN_NAMES = tuple([el[0] for el in TAGGED_TRAIT_COLUMNS])
 
 README_TEMPLATE = 'tags/management/commands/README.md'
 PREFIX = 'TOPMed_DCC'
+# Number of tagged traits to retrieve from the db at a time when writing the tagged variables file.
+EXPORT_CHUNK_SIZE = 10000
+# Subdirectory of the output directory for the per-study tagged variables files made with --shard_by_study.
+SHARD_DIRECTORY = 'tagged_variables_by_study'
+MANIFEST_FILE_DESCRIPTION = 'size, sha256 checksum, and number of data rows for each file in this package'
+# Tuple format: ('file name part', 'description for README')
+DELTA_FILES = (
+    ('added', 'tagged variables added since the previous export'),
+    ('archived', 'tagged variables archived since the previous export'),
+    ('removed', 'tagged variables removed since the previous export, e.g. deleted or from a deprecated study version'),
+)
+
+
+def _make_study_shard(shard_dir, date, study_pk, include_archived, include_deprecated, chunk_size):
+    """Write the tagged variables file for one study and return its manifest entry.
+
+    This is a module-level function so that it can be run in a worker process by --shard_by_study.
+    """
+    cmd = Command()
+    tagging_data = cmd._get_tagged_trait_data(
+        study_pk=study_pk, include_archived=include_archived, include_deprecated=include_deprecated)
+    shard_fn = cmd._make_tagged_trait_file(shard_dir, date, tagging_data, chunk_size=chunk_size, study_pk=study_pk)
+    return cmd._get_manifest_entry(os.path.dirname(shard_dir), shard_fn, study_pk=study_pk)
 
 
 class Command(BaseCommand):
@@ -92,9 +123,9 @@ class Command(BaseCommand):
             date: str; the formatted datetime stamp from _get_date_stamp
         """
         dump_fn = os.path.join(output_dir, '_'.join([date, PREFIX, 'tags.json']))
-        dump_file = open(dump_fn, 'w')
-        management.call_command('dumpdata', '--indent=4', 'tags.tag', stdout=dump_file)
-        dump_file.close()
+        # Serialize straight to the file, one tag at a time, in the same format as dumpdata.
+        with open(dump_fn, 'w') as dump_file:
+            serializers.serialize('json', Tag.objects.order_by('pk').iterator(), indent=4, stream=dump_file)
         logger.debug('Created json-formatted tags dump file {}'.format(dump_fn))
         return dump_fn
 
@@ -112,6 +143,22 @@ class Command(BaseCommand):
         logger.debug('Created data dictionary for tags dump file {}'.format(dump_dd_fn))
         return dump_dd_fn
 
+    def _parse_since(self, since):
+        """Parse a --since date or datetime string into an aware datetime.
+
+        Arguments:
+            since: str; an ISO format date or datetime; datetimes without a time zone use the current time zone
+        """
+        since_datetime = parse_datetime(since)
+        if since_datetime is None:
+            since_date = parse_date(since)
+            if since_date is None:
+                raise CommandError('Could not parse --since value {}.'.format(since))
+            since_datetime = datetime.datetime.combine(since_date, datetime.time())
+        if timezone.is_naive(since_datetime):
+            since_datetime = timezone.make_aware(since_datetime)
+        return since_datetime
+
     def _get_tagged_trait_data(self, study_pk=None, include_archived=False, include_deprecated=False):
         """Return a nested list of tagged traits according to the given filters.
 
@@ -140,21 +187,58 @@ class Command(BaseCommand):
             'trait__source_dataset__source_study_version__study'
         ).values_list(*TAGGED_TRAIT_VALUES_TO_RETRIEVE)
 
-    def _make_tagged_trait_file(self, output_dir, date, tagged_traits):
+    def _iterate_tagged_trait_data(self, tagged_traits, chunk_size=EXPORT_CHUNK_SIZE):
+        """Yield the rows of tagged trait data, retrieving chunk_size rows from the db at a time.
+
+        Arguments:
+            tagged_traits: QuerySet; tagged traits from _get_tagged_trait_data
+            chunk_size: int; maximum number of rows to retrieve in each query
+        """
+        # Page through the tagged traits by pk, so each query is cheap and only one chunk is held in memory.
+        chunk_query = tagged_traits.values_list('pk', *TAGGED_TRAIT_VALUES_TO_RETRIEVE).order_by('pk')
+        last_pk = None
+        while True:
+            chunk = chunk_query if last_pk is None else chunk_query.filter(pk__gt=last_pk)
+            chunk = list(chunk[:chunk_size])
+            for row in chunk:
+                yield row[1:]
+            if len(chunk) < chunk_size:
+                break
+            last_pk = chunk[-1][0]
+
+    def _get_tagged_trait_file_name(self, output_dir, date, study_pk=None):
+        """Return the full path of a tagged variables file.
+
+        Arguments:
+            output_dir: str; path of the directory where output files should be saved
+            date: str; the formatted datetime stamp from _get_date_stamp
+            study_pk: int; primary key of the study, for per-study files
+        """
+        name_parts = [date, PREFIX]
+        if study_pk is not None:
+            name_parts.append('phs{:06d}'.format(study_pk))
+        name_parts.append('tagged_variables.txt')
+        return os.path.join(output_dir, '_'.join(name_parts))
+
+    def _make_tagged_trait_file(self, output_dir, date, tagged_traits, chunk_size=EXPORT_CHUNK_SIZE, study_pk=None):
         """Create a tab-delimited output file containing tagged trait data.
 
+        Rows are written to the file as they are retrieved, so the whole file is never held in memory.
+
         Arguments:
             output_dir: str; path of the directory where output files should be saved
             date: str; the formatted datetime stamp from _get_date_stamp
+            tagged_traits: QuerySet from _get_tagged_trait_data, or another iterable of rows
+            chunk_size: int; number of rows to retrieve from the db at a time
+            study_pk: int; primary key of the study the tagged traits are from, to include in the file name
         """
-        formatted_taggedtrait_output = []
-        formatted_taggedtrait_output.append('\t'.join(TAGGED_TRAIT_COLUMN_NAMES))
-        tagged_traits = ['\t'.join([str(el) for el in row]) for row in tagged_traits]
-        formatted_taggedtrait_output.extend(tagged_traits)
-        tagged_trait_fn = os.path.join(output_dir, '_'.join([date, PREFIX, 'tagged_variables.txt']))
-        tagged_trait_file = open(tagged_trait_fn, 'w')
-        tagged_trait_file.write('\n'.join(formatted_taggedtrait_output))
-        tagged_trait_file.close()
+        if isinstance(tagged_traits, QuerySet):
+            tagged_traits = self._iterate_tagged_trait_data(tagged_traits, chunk_size=chunk_size)
+        tagged_trait_fn = self._get_tagged_trait_file_name(output_dir, date, study_pk=study_pk)
+        with open(tagged_trait_fn, 'w') as tagged_trait_file:
+            tagged_trait_file.write('\t'.join(TAGGED_TRAIT_COLUMN_NAMES))
+            for row in tagged_traits:
+                tagged_trait_file.write('\n' + '\t'.join([str(el) for el in row]))
         logger.debug('Created tab-delimited tagged traits data file {}'.format(tagged_trait_fn))
         return tagged_trait_fn
 
@@ -172,8 +256,210 @@ class Command(BaseCommand):
         logger.debug('Created data dictionary for tagged traits data file {}'.format(mapping_dd_fn))
         return mapping_dd_fn
 
+    def _make_study_shard_files(self, output_dir, date, include_archived=False, include_deprecated=False,
+                                processes=None, chunk_size=EXPORT_CHUNK_SIZE):
+        """Create one tab-delimited tagged traits file per study, writing several files at once.
+
+        Arguments:
+            output_dir: str; path of the directory where output files should be saved
+            date: str; the formatted datetime stamp from _get_date_stamp
+            include_archived: bool; whether or not to include archived tagged traits
+            include_deprecated: bool; whether or not to include tagged traits from deprecated study versions
+            processes: int; number of worker processes to use; 1 writes the files in this process
+            chunk_size: int; number of rows to retrieve from the db at a time
+
+        Returns:
+            list of manifest entries (see _get_manifest_entry) for the per-study files, in study pk order
+        """
+        shard_dir = os.path.join(output_dir, SHARD_DIRECTORY)
+        os.makedirs(shard_dir)
+        study_pks = list(self._get_tagged_trait_data(
+            include_archived=include_archived, include_deprecated=include_deprecated
+        ).order_by().values_list('trait__source_dataset__source_study_version__study__pk', flat=True).distinct())
+        study_pks = sorted(study_pks)
+        shard_args = [(shard_dir, date, study_pk, include_archived, include_deprecated, chunk_size)
+                      for study_pk in study_pks]
+        if processes == 1 or len(study_pks) <= 1:
+            entries = [_make_study_shard(*args) for args in shard_args]
+        else:
+            # Worker processes must open their own db connections instead of sharing this process's.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                entries = list(executor.map(_make_study_shard, *zip(*shard_args)))
+        logger.debug('Created {} per-study tagged traits data files in {}'.format(len(entries), shard_dir))
+        return entries
+
+    def _get_previous_export_time(self, manifest_fn):
+        """Return the time the export with the given manifest file was started.
+
+        Arguments:
+            manifest_fn: str; full path of the manifest file from a previous export
+        """
+        try:
+            with open(manifest_fn) as manifest_file:
+                export_time = json.load(manifest_file)['export_time']
+        except OSError as e:
+            raise CommandError('Could not read --since_manifest file {}: {}'.format(manifest_fn, e))
+        except (ValueError, KeyError, TypeError):
+            # ValueError includes json decoding errors; KeyError and TypeError are from json that isn't a manifest.
+            raise CommandError('--since_manifest file {} is not an export manifest.'.format(manifest_fn))
+        try:
+            previous_export_time = parse_datetime(export_time)
+        except (ValueError, TypeError):
+            # parse_datetime raises these for a well formatted but invalid datetime, or a value that isn't a string.
+            previous_export_time = None
+        if previous_export_time is None:
+            raise CommandError('Could not parse export_time {!r} in --since_manifest file {}.'.format(
+                export_time, manifest_fn))
+        return previous_export_time
+
+    def _get_tagged_trait_delta_data(self, since, study_pk=None):
+        """Return querysets of the tagged traits added, archived, and removed since a previous export.
+
+        The removed queryset only has tagged traits from deprecated study versions; tagged traits that were
+        deleted are found by _iterate_deleted_tagged_trait_data.
+
+        Arguments:
+            since: datetime; when the previous export was started
+            study_pk: int; primary key of a study to filter the tagged traits to
+        """
+        added = self._get_tagged_trait_data(study_pk=study_pk).filter(created__gte=since)
+        # Archiving a tagged trait updates its modified date.
+        archived = self._get_tagged_trait_data(study_pk=study_pk, include_archived=True).filter(
+            archived=True, modified__gte=since, created__lt=since)
+        removed = self._get_tagged_trait_data(study_pk=study_pk, include_deprecated=True).filter(
+            created__lt=since,
+            trait__source_dataset__source_study_version__i_is_deprecated=True,
+            trait__source_dataset__source_study_version__deprecated_at__gte=since)
+        return {'added': added, 'archived': archived, 'removed': removed}
+
+    def _make_delta_files(self, output_dir, date, since, study_pk=None, chunk_size=EXPORT_CHUNK_SIZE):
+        """Create tab-delimited files of the tagged traits added, archived, and removed since a previous export.
+
+        Arguments:
+            output_dir: str; path of the directory where output files should be saved
+            date: str; the formatted datetime stamp from _get_date_stamp
+            since: datetime; when the previous export was started
+            study_pk: int; primary key of a study to filter the tagged traits to
+            chunk_size: int; number of rows to retrieve from the db at a time
+
+        Returns:
+            dict of full paths of the delta files, keyed by 'added', 'archived', and 'removed'
+        """
+        delta_data = self._get_tagged_trait_delta_data(since, study_pk=study_pk)
+        delta_fns = {}
+        for delta, description in DELTA_FILES:
+            delta_fn = self._get_tagged_trait_file_name(output_dir, date).replace(
+                'tagged_variables.txt', '{}_tagged_variables.txt'.format(delta))
+            delta_fns[delta] = delta_fn
+            rows = self._iterate_tagged_trait_data(delta_data[delta], chunk_size=chunk_size)
+            if delta == 'removed':
+                rows = chain(rows, self._iterate_deleted_tagged_trait_data(since, study_pk=study_pk,
+                                                                           chunk_size=chunk_size))
+            with open(delta_fn, 'w') as delta_file:
+                delta_file.write('\t'.join(TAGGED_TRAIT_COLUMN_NAMES))
+                for row in rows:
+                    delta_file.write('\n' + '\t'.join([str(el) for el in row]))
+            logger.debug('Created {} tagged traits data file {}'.format(delta, delta_fn))
+        return delta_fns
+
+    def _iterate_deleted_tagged_trait_data(self, since, study_pk=None, chunk_size=EXPORT_CHUNK_SIZE):
+        """Yield rows of tagged trait data, as in a tagged variables file, for tagged traits deleted since a time.
+
+        Only tagged traits that were created before since, so that they could have been in the previous export,
+        are included. The rows are built from the DeletedTaggedTrait records and the tags and traits they refer
+        to; tagged traits whose trait has also been deleted are skipped.
+
+        Arguments:
+            since: datetime; when the previous export was started
+            study_pk: int; primary key of a study to filter the tagged traits to
+            chunk_size: int; maximum number of deleted tagged traits to retrieve in each query
+        """
+        trait_fields = [field[len('trait__'):] for field in TAGGED_TRAIT_VALUES_TO_RETRIEVE
+                        if field.startswith('trait__')]
+        deleted_query = DeletedTaggedTrait.objects.filter(created__gte=since, tagged_trait_created__lt=since).order_by(
+            'pk').values_list('pk', 'tag_pk', 'trait_pk', 'tagged_trait_created', 'tagged_trait_modified')
+        last_pk = None
+        while True:
+            chunk = deleted_query if last_pk is None else deleted_query.filter(pk__gt=last_pk)
+            chunk = list(chunk[:chunk_size])
+            if not chunk:
+                break
+            traits = SourceTrait.objects.filter(pk__in=set(row[2] for row in chunk))
+            if study_pk is not None:
+                traits = traits.filter(source_dataset__source_study_version__study__pk=study_pk)
+            traits = {row[0]: dict(zip(trait_fields, row[1:])) for row in traits.values_list('pk', *trait_fields)}
+            tag_titles = dict(Tag.objects.filter(pk__in=set(row[1] for row in chunk)).values_list('pk', 'title'))
+            for pk, tag_pk, trait_pk, created, modified in chunk:
+                if trait_pk not in traits:
+                    continue
+                values = {'tag__pk': tag_pk, 'tag__title': tag_titles.get(tag_pk, ''), 'created': created,
+                          'modified': modified}
+                values.update(('trait__' + field, value) for field, value in traits[trait_pk].items())
+                yield tuple(values[field] for field in TAGGED_TRAIT_VALUES_TO_RETRIEVE)
+            if len(chunk) < chunk_size:
+                break
+            last_pk = chunk[-1][0]
+
+    def _get_manifest_entry(self, output_dir, fn, study_pk=None):
+        """Return a dict with the size, sha256 checksum, and number of data rows of a file.
+
+        Arguments:
+            output_dir: str; path of the directory where output files are saved
+            fn: str; full path of the file
+            study_pk: int; primary key of the study, for per-study tagged traits files
+        """
+        checksum = hashlib.sha256()
+        n_newlines = 0
+        with open(fn, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                checksum.update(block)
+                n_newlines += block.count(b'\n')
+        entry = {
+            'file': os.path.relpath(fn, output_dir),
+            'bytes': os.path.getsize(fn),
+            'sha256': checksum.hexdigest(),
+            # Tagged traits files have a header line and no newline after the last row.
+            'rows': n_newlines if fn.endswith('tagged_variables.txt') else None,
+        }
+        if study_pk is not None:
+            entry['study_pk'] = study_pk
+        return entry
+
+    def _get_manifest_file_name(self, output_dir, date):
+        """Return the full path of the manifest file."""
+        return os.path.join(output_dir, '_'.join([date, PREFIX, 'manifest.json']))
+
+    def _make_manifest_file(self, output_dir, date, export_time, fns, entries=(), options=None, delta_fns=None):
+        """Create a json manifest file listing each file in the package with its size, checksum, and row count.
+
+        Arguments:
+            output_dir: str; path of the directory where output files should be saved
+            date: str; the formatted datetime stamp from _get_date_stamp
+            export_time: datetime; when the export was started
+            fns: list of str; full paths of files to add to the manifest
+            entries: list of dicts; manifest entries that have already been made, e.g. for per-study files
+            options: dict; the export options to record in the manifest
+            delta_fns: dict; full paths of delta files from _make_delta_files
+        """
+        manifest_fn = self._get_manifest_file_name(output_dir, date)
+        files = list(entries) + [self._get_manifest_entry(output_dir, fn) for fn in fns]
+        for delta, delta_fn in (delta_fns or {}).items():
+            entry = self._get_manifest_entry(output_dir, delta_fn)
+            entry['delta'] = delta
+            files.append(entry)
+        manifest = {
+            'export_time': export_time.isoformat(),
+            'options': options or {},
+            'files': sorted(files, key=lambda entry: entry['file']),
+        }
+        with open(manifest_fn, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+        logger.debug('Created manifest file {}'.format(manifest_fn))
+        return manifest_fn
+
     def _make_readme_file(self, output_dir, dump_fn, dump_dd_fn, tagged_trait_fn, tagged_trait_dd_fn,
-                          release_notes=None):
+                          release_notes=None, extra_files=()):
         """Create a README file based on the template found in README_TEMPLATE.
 
         Arguments:
@@ -183,6 +469,7 @@ class Command(BaseCommand):
             tagged_trait_fn: str; full path of the tab-delimited tagged traits file
             tagged_trait_dd_fn: str; full path of the DD for the tagged traits file
             release_notes: str; full path of a file containing notes to include in the release notes section
+            extra_files: list of (full path, description) tuples for other files to describe in the README
         """
         if release_notes is not None:
             with open(release_notes, 'r') as rnf:
@@ -199,6 +486,8 @@ class Command(BaseCommand):
                 tags_dump_dd_file=dump_dd_fn.replace(output_dir, ''),
                 tagged_variable_file=tagged_trait_fn.replace(output_dir, ''),
                 tagged_variable_dd_file=tagged_trait_dd_fn.replace(output_dir, ''),
+                extra_files=''.join(['* {} - {} \n'.format(fn.replace(output_dir, ''), description)
+                                     for fn, description in extra_files]),
                 release_notes=release_notes_text
             )
         )
@@ -215,10 +504,10 @@ class Command(BaseCommand):
         """
         tar_gz_fn = output_dir + '.tar.gz'
         output_package_dir = os.path.basename(output_dir)
-        tar_command = ['tar', '-zcvf', tar_gz_fn, '--directory={}'.format(input_path), output_package_dir]
-        logger.debug('Running tar command:\n' + ' '.join(tar_command))
-        tar_output = check_output(tar_command, stderr=STDOUT)
-        logger.debug(tar_output.decode('utf-8'))
+        # Write the archive as a stream, so files are compressed in blocks rather than read into memory.
+        with tarfile.open(tar_gz_fn, 'w|gz') as tar_gz_file:
+            tar_gz_file.add(output_dir, arcname=output_package_dir)
+            logger.debug('\n'.join(tar_gz_file.getnames()))
         logger.debug('Created compressed data package {}'.format(tar_gz_fn))
         return tar_gz_fn
 
@@ -236,6 +525,28 @@ class Command(BaseCommand):
         parser.add_argument('--release_notes', action='store', type=str, default=None, required=False,
                             help='Path to a file containing release notes to include in the README.'
                             )
+        parser.add_argument('--shard_by_study', action='store_true',
+                            help='Export the tagged variables from each study to a separate file.'
+                            )
+        since_group = parser.add_mutually_exclusive_group()
+        since_group.add_argument('--since', action='store', type=str, default=None, required=False,
+                                 help="""
+                                    Also export files of the tagged variables added, archived, and removed since
+                                    this date and time, e.g. 2019-01-31 or 2019-01-31T12:00:00-08:00.
+                                 """
+                                 )
+        since_group.add_argument('--since_manifest', action='store', type=str, default=None, required=False,
+                                 help="""
+                                    Path to the manifest file of a previous export. Also export files of the tagged
+                                    variables added, archived, and removed since that export.
+                                 """
+                                 )
+        parser.add_argument('--processes', action='store', type=int, default=None, required=False,
+                            help="""
+                                Number of processes to use to write the per-study files for --shard_by_study.
+                                Defaults to the number of CPUs.
+                            """
+                            )
 
     def handle(self, *args, **options):
         """Create a package (compressed and uncompressed) of the tagging data."""
@@ -249,6 +560,17 @@ class Command(BaseCommand):
             logger.setLevel(logging.INFO)
         elif verbosity == 3:
             logger.setLevel(logging.DEBUG)
+        study_pk = options.get('study_pk')
+        shard_by_study = options.get('shard_by_study')
+        if shard_by_study and study_pk is not None:
+            raise CommandError('--shard_by_study and --study_pk cannot be used together.')
+        since = options.get('since')
+        since_manifest = options.get('since_manifest')
+        if since is not None:
+            since = self._parse_since(since)
+        elif since_manifest is not None:
+            since = self._get_previous_export_time(since_manifest)
+        export_time = timezone.now()
         # Make output directory
         dir_option = options.get('output_path')
         date = self._get_date_stamp()
@@ -257,16 +579,37 @@ class Command(BaseCommand):
         dump_fn = self._dump_tags_json(output_dir, date)
         # Make a data dictionary for json data dump
         dump_dd_fn = self._make_tags_dump_data_dictionary_file(dump_fn)
-        # Make exported tagged variables file
-        study_pk = options.get('study_pk')
-        tagging_data = self._get_tagged_trait_data(study_pk=study_pk)
-        tagged_trait_fn = self._make_tagged_trait_file(output_dir, date, tagging_data)
+        # Make exported tagged variables file, or one file per study
+        extra_files = []
+        if shard_by_study:
+            shard_entries = self._make_study_shard_files(output_dir, date, processes=options.get('processes'))
+            tagged_trait_fn = os.path.join(output_dir, SHARD_DIRECTORY, '')
+            extra_files.append((tagged_trait_fn, 'directory with one tagged variables file per study, named by phs'))
+        else:
+            shard_entries = []
+            tagging_data = self._get_tagged_trait_data(study_pk=study_pk)
+            tagged_trait_fn = self._make_tagged_trait_file(output_dir, date, tagging_data)
+        # Make files of the changes since a previous export
+        delta_fns = None
+        if since is not None:
+            delta_fns = self._make_delta_files(output_dir, date, since, study_pk=study_pk)
+            extra_files.extend([(delta_fns[delta], description) for delta, description in DELTA_FILES])
         # Make a data dictionary for tagged variables file
-        tagged_trait_dd_fn = self._make_tagged_trait_data_dictionary_file(tagged_trait_fn)
+        tagged_trait_dd_fn = self._make_tagged_trait_data_dictionary_file(
+            self._get_tagged_trait_file_name(output_dir, date))
         # Make a current version of the readme file
+        extra_files.append((self._get_manifest_file_name(output_dir, date), MANIFEST_FILE_DESCRIPTION))
         notes_file = options.get('release_notes')
         readme_fn = self._make_readme_file(output_dir=output_dir, dump_fn=dump_fn, dump_dd_fn=dump_dd_fn,
                                            tagged_trait_fn=tagged_trait_fn, tagged_trait_dd_fn=tagged_trait_dd_fn,
-                                           release_notes=notes_file)
+                                           release_notes=notes_file, extra_files=extra_files)
+        # Make a manifest of all the files in the package
+        package_fns = [dump_fn, dump_dd_fn, tagged_trait_dd_fn, readme_fn]
+        if not shard_by_study:
+            package_fns.append(tagged_trait_fn)
+        self._make_manifest_file(output_dir, date, export_time, package_fns, entries=shard_entries,
+                                 delta_fns=delta_fns,
+                                 options={'study_pk': study_pk, 'shard_by_study': shard_by_study,
+                                          'since': since.isoformat() if since is not None else None})
         # tar and gzip the output directory
         self._compress_directory(dir_option, output_dir)
@@ -0,0 +1,48 @@
+"""Check or recompute the cached tag by study tagged trait counts."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tags import models
+from trait_browser.models import Study
+
+
+class Command(BaseCommand):
+    """Management command to compare TagStudyCount against the TaggedTrait table and fix it."""
+
+    help = 'Check the cached tag/study tagged trait counts against the TaggedTrait table, and recompute them.'
+
+    def _format_differences(self, differences):
+        """Make a list of human-readable lines describing differences between cached and expected counts."""
+        tags = dict(models.Tag.objects.filter(
+            pk__in=[tag_pk for tag_pk, study_pk in differences]).values_list('pk', 'title'))
+        studies = dict(Study.objects.filter(
+            pk__in=[study_pk for tag_pk, study_pk in differences]).values_list('pk', 'i_study_name'))
+        lines = []
+        for (tag_pk, study_pk), (cached, expected) in sorted(differences.items()):
+            lines.append('tag {} ({}), study {} ({}): cached {}, expected {}'.format(
+                tag_pk, tags.get(tag_pk), study_pk, studies.get(study_pk), cached, expected))
+        return lines
+
+    def add_arguments(self, parser):
+        """Add custom command line arguments to this management command."""
+        parser.add_argument('--check', action='store_true',
+                            help="""Only report differences between cached and expected counts, without fixing them.
+                                    Exits with an error if any differences are found.""")
+
+    def handle(self, *args, **options):
+        """Handle the main functions of this management command.
+
+        Arguments:
+            **args and **options are handled as per the superclass handling; these
+            argument dicts will pass on command line options
+        """
+        if options.get('check'):
+            differences = models.TagStudyCount.objects.get_differences()
+        else:
+            differences = models.TagStudyCount.objects.refresh()
+        for line in self._format_differences(differences):
+            self.stdout.write(line)
+        if options.get('check') and len(differences) > 0:
+            raise CommandError('Found {} inconsistent tag study counts.'.format(len(differences)))
+        self.stdout.write('{} tag study counts {}.'.format(
+            len(differences), 'inconsistent' if options.get('check') else 'updated'))
@@ -2,15 +2,21 @@
 
 import datetime
 from faker import Faker
+import hashlib
+from io import StringIO
 import json
 import os
 import tarfile
 from tempfile import TemporaryDirectory, NamedTemporaryFile
 
 from django.core import management
-from django.test import TestCase
+from django.core.management.base import CommandError
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
-from tags.management.commands.export_tagging import Command, TAGGED_TRAIT_VALUES_TO_RETRIEVE
+from tags.management.commands.export_tagging import (Command, PREFIX, SHARD_DIRECTORY, TAGGED_TRAIT_COLUMN_NAMES,
+                                                     TAGGED_TRAIT_VALUES_TO_RETRIEVE)
 from tags import factories
 from tags import models
 from trait_browser.factories import StudyFactory, SourceStudyVersionFactory
@@ -69,6 +75,18 @@ class DumpTagsJsonTest(TestCase):
         self.assertEqual(tags[0]['pk'], tag.pk)
         self.assertEqual(tags[0]['fields']['title'], tag.title)
 
+    def test_same_as_dumpdata(self):
+        """The json dump file has the same contents as the output of dumpdata."""
+        factories.TagFactory.create_batch(3)
+        tmpdir = TemporaryDirectory()
+        date = cmd._get_date_stamp()
+        output_dir = cmd._make_output_directory(tmpdir.name, date)
+        json_file = cmd._dump_tags_json(output_dir, date)
+        dumpdata_output = StringIO()
+        management.call_command('dumpdata', '--indent=4', 'tags.tag', stdout=dumpdata_output)
+        with open(json_file) as f:
+            self.assertEqual(json.loads(f.read()), json.loads(dumpdata_output.getvalue()))
+
 
 class MakeTagsDumpDataDictionaryFileTest(TestCase):
 
@@ -193,6 +211,36 @@ class GetTaggedTraitDataTest(TestCase):
         self.assertEqual(len(result), 0)
 
 
+class IterateTaggedTraitDataTest(TestCase):
+
+    def test_all_rows_in_chunks(self):
+        """All rows are returned when there are more rows than the chunk size."""
+        factories.TaggedTraitFactory.create_batch(5)
+        data = cmd._get_tagged_trait_data()
+        rows = list(cmd._iterate_tagged_trait_data(data, chunk_size=2))
+        self.assertEqual(rows, list(data.order_by('pk')))
+
+    def test_rows_exactly_fill_chunks(self):
+        """All rows are returned when the number of rows is a multiple of the chunk size."""
+        factories.TaggedTraitFactory.create_batch(4)
+        data = cmd._get_tagged_trait_data()
+        with self.assertNumQueries(3):
+            rows = list(cmd._iterate_tagged_trait_data(data, chunk_size=2))
+        self.assertEqual(rows, list(data.order_by('pk')))
+
+    def test_one_query_per_chunk(self):
+        """One query is run for each chunk of rows."""
+        factories.TaggedTraitFactory.create_batch(5)
+        data = cmd._get_tagged_trait_data()
+        with self.assertNumQueries(3):
+            list(cmd._iterate_tagged_trait_data(data, chunk_size=2))
+
+    def test_no_rows(self):
+        """No rows are returned when there are no tagged traits."""
+        data = cmd._get_tagged_trait_data()
+        self.assertEqual(list(cmd._iterate_tagged_trait_data(data, chunk_size=2)), [])
+
+
 class MakeTaggedTraitFileTest(TestCase):
 
     def test_creates_file(self):
@@ -227,6 +275,19 @@ class MakeTaggedTraitFileTest(TestCase):
             content = f.readlines()
         self.assertEqual(len(content), 1)
 
+    def test_file_contents_with_small_chunks(self):
+        """The output file contains one line for each tagged trait when written in several chunks."""
+        tmpdir = TemporaryDirectory()
+        date = cmd._get_date_stamp()
+        output_dir = cmd._make_output_directory(tmpdir.name, date)
+        factories.TaggedTraitFactory.create_batch(5)
+        data = cmd._get_tagged_trait_data()
+        tagged_traits_file = cmd._make_tagged_trait_file(output_dir, date, data, chunk_size=2)
+        with open(tagged_traits_file, 'r') as f:
+            content = f.read().split('\n')
+        self.assertEqual(content[0], '\t'.join(TAGGED_TRAIT_COLUMN_NAMES))
+        self.assertEqual(content[1:], ['\t'.join(str(el) for el in row) for row in data.order_by('pk')])
+
 
 class MakeTaggedTraitDataDictionaryFileTest(TestCase):
 
@@ -320,6 +381,261 @@ class MakeReadmeFileTest(TestCase):
         self.assertIn(tagged_trait_fn, readme_contents)
         self.assertIn(tagged_trait_dd_fn, readme_contents)
 
+    def test_readme_contains_extra_files(self):
+        """The names and descriptions of extra files are found in the readme file."""
+        tmpdir = TemporaryDirectory()
+        date = cmd._get_date_stamp()
+        output_dir = cmd._make_output_directory(tmpdir.name, date)
+        readme_file = cmd._make_readme_file(output_dir=output_dir,
+                                            dump_fn='tags_file.json',
+                                            dump_dd_fn='tags_file_dd.txt',
+                                            tagged_trait_fn='tagged_traits_file.txt',
+                                            tagged_trait_dd_fn='tagged_traits_file_dd.txt',
+                                            extra_files=[(os.path.join(output_dir, 'extra.json'), 'extra file')])
+        with open(readme_file, 'r') as f:
+            readme_contents = f.read()
+        self.assertIn('* /extra.json - extra file', readme_contents)
+
+
+class MakeStudyShardFilesTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.date = cmd._get_date_stamp()
+        self.output_dir = cmd._make_output_directory(self.tmpdir.name, self.date)
+
+    def test_one_file_per_study(self):
+        """One tagged traits file is created for each study with tagged traits."""
+        studies = StudyFactory.create_batch(2)
+        StudyFactory.create()
+        for study in studies:
+            factories.TaggedTraitFactory.create_batch(2, trait__source_dataset__source_study_version__study=study)
+        entries = cmd._make_study_shard_files(self.output_dir, self.date, processes=1)
+        self.assertEqual([entry['study_pk'] for entry in entries], sorted(study.pk for study in studies))
+        for entry, study in zip(entries, sorted(studies, key=lambda study: study.pk)):
+            shard_fn = os.path.join(self.output_dir, entry['file'])
+            self.assertEqual(shard_fn, cmd._get_tagged_trait_file_name(
+                os.path.join(self.output_dir, SHARD_DIRECTORY), self.date, study_pk=study.pk))
+            with open(shard_fn) as f:
+                content = f.read().split('\n')
+            expected_rows = cmd._get_tagged_trait_data(study_pk=study.pk).order_by('pk')
+            self.assertEqual(content[1:], ['\t'.join(str(el) for el in row) for row in expected_rows])
+            self.assertEqual(entry['rows'], 2)
+
+    def test_excludes_archived(self):
+        """Archived tagged traits are not included in the per-study files."""
+        study = StudyFactory.create()
+        factories.TaggedTraitFactory.create(trait__source_dataset__source_study_version__study=study)
+        factories.TaggedTraitFactory.create(trait__source_dataset__source_study_version__study=study, archived=True)
+        entries = cmd._make_study_shard_files(self.output_dir, self.date, processes=1)
+        self.assertEqual(entries[0]['rows'], 1)
+
+    def test_no_tagged_traits(self):
+        """No files are created when there are no tagged traits."""
+        entries = cmd._make_study_shard_files(self.output_dir, self.date, processes=1)
+        self.assertEqual(entries, [])
+        self.assertEqual(os.listdir(os.path.join(self.output_dir, SHARD_DIRECTORY)), [])
+
+
+class MakeStudyShardFilesParallelTest(TransactionTestCase):
+
+    def test_files_written_by_worker_processes(self):
+        """The per-study files written by worker processes contain the expected rows."""
+        tmpdir = TemporaryDirectory()
+        date = cmd._get_date_stamp()
+        output_dir = cmd._make_output_directory(tmpdir.name, date)
+        studies = StudyFactory.create_batch(3)
+        for study in studies:
+            factories.TaggedTraitFactory.create_batch(2, trait__source_dataset__source_study_version__study=study)
+        entries = cmd._make_study_shard_files(output_dir, date, processes=2)
+        self.assertEqual([entry['study_pk'] for entry in entries], sorted(study.pk for study in studies))
+        self.assertEqual([entry['rows'] for entry in entries], [2, 2, 2])
+
+
+class ManifestTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.date = cmd._get_date_stamp()
+        self.output_dir = cmd._make_output_directory(self.tmpdir.name, self.date)
+
+    def test_manifest_entry(self):
+        """The manifest entry has the file's path, size, and checksum."""
+        fn = os.path.join(self.output_dir, 'test.json')
+        with open(fn, 'w') as f:
+            f.write('test contents')
+        entry = cmd._get_manifest_entry(self.output_dir, fn)
+        self.assertEqual(entry, {'file': 'test.json', 'bytes': 13, 'rows': None,
+                                 'sha256': hashlib.sha256(b'test contents').hexdigest()})
+
+    def test_manifest_entry_rows(self):
+        """The manifest entry for a tagged traits file has the number of data rows."""
+        factories.TaggedTraitFactory.create_batch(3)
+        fn = cmd._make_tagged_trait_file(self.output_dir, self.date, cmd._get_tagged_trait_data())
+        self.assertEqual(cmd._get_manifest_entry(self.output_dir, fn)['rows'], 3)
+
+    def test_manifest_entry_no_rows(self):
+        """The manifest entry for a tagged traits file with only a header has zero rows."""
+        fn = cmd._make_tagged_trait_file(self.output_dir, self.date, cmd._get_tagged_trait_data())
+        self.assertEqual(cmd._get_manifest_entry(self.output_dir, fn)['rows'], 0)
+
+    def test_manifest_file(self):
+        """The manifest file lists every given file and entry."""
+        fn = os.path.join(self.output_dir, 'test.json')
+        with open(fn, 'w') as f:
+            f.write('test contents')
+        export_time = timezone.now()
+        extra_entry = {'file': 'other.txt', 'bytes': 0, 'sha256': '', 'rows': 0, 'study_pk': 1}
+        manifest_fn = cmd._make_manifest_file(self.output_dir, self.date, export_time, [fn], entries=[extra_entry],
+                                              options={'study_pk': None})
+        with open(manifest_fn) as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest['export_time'], export_time.isoformat())
+        self.assertEqual(manifest['options'], {'study_pk': None})
+        self.assertEqual([entry['file'] for entry in manifest['files']], ['other.txt', 'test.json'])
+
+
+class DeltaFilesTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.previous_dir = cmd._make_output_directory(self.tmpdir.name, 'previous')
+        self.date = cmd._get_date_stamp()
+        self.output_dir = cmd._make_output_directory(self.tmpdir.name, self.date)
+        self.unchanged = factories.TaggedTraitFactory.create()
+        self.to_archive = factories.TaggedTraitFactory.create()
+        self.to_deprecate = factories.TaggedTraitFactory.create()
+        self.to_delete = factories.TaggedTraitFactory.create()
+        # Make a previous export of the tagged traits so far.
+        previous_fn = cmd._make_tagged_trait_file(self.previous_dir, 'previous', cmd._get_tagged_trait_data())
+        self.since = timezone.now()
+        self.previous_manifest = cmd._make_manifest_file(self.previous_dir, 'previous', self.since, [previous_fn],
+                                                         options={})
+        self.added = factories.TaggedTraitFactory.create()
+        self.to_archive.archive()
+        study_version = self.to_deprecate.trait.source_dataset.source_study_version
+        study_version.i_is_deprecated = True
+        study_version.save()
+        self.to_delete.delete()
+
+    def get_keys(self, fn):
+        """Return the (tag_pk, variable_full_accession) keys of the rows in a tagged traits file."""
+        with open(fn) as f:
+            header = next(f).rstrip('\n').split('\t')
+            rows = [line.rstrip('\n').split('\t') for line in f]
+        return sorted((row[header.index('tag_pk')], row[header.index('variable_full_accession')]) for row in rows)
+
+    def get_key(self, tagged_trait):
+        return (str(tagged_trait.tag.pk), tagged_trait.trait.full_accession)
+
+    def test_delta_data(self):
+        """The added, archived, and removed querysets have only the tagged traits changed since the given time."""
+        delta_data = cmd._get_tagged_trait_delta_data(self.since)
+        self.assertEqual(list(delta_data['added'].values_list('pk', flat=True)), [self.added.pk])
+        self.assertEqual(list(delta_data['archived'].values_list('pk', flat=True)), [self.to_archive.pk])
+        self.assertEqual(list(delta_data['removed'].values_list('pk', flat=True)), [self.to_deprecate.pk])
+
+    def test_delta_data_removed_changed_deprecated_version(self):
+        """Tagged traits from a study version deprecated before the previous export are not removed again."""
+        tagged_trait = factories.TaggedTraitFactory.create(
+            trait__source_dataset__source_study_version__i_is_deprecated=True)
+        study_version = tagged_trait.trait.source_dataset.source_study_version
+        models.TaggedTrait.objects.filter(pk=tagged_trait.pk).update(created=self.since - datetime.timedelta(days=1))
+        study_version.__class__.objects.filter(pk=study_version.pk).update(
+            deprecated_at=self.since - datetime.timedelta(days=1))
+        # Changes to the study version after the export don't make it a new deprecation.
+        study_version.refresh_from_db()
+        study_version.i_participant_set += 1
+        study_version.save()
+        delta_data = cmd._get_tagged_trait_delta_data(self.since)
+        self.assertEqual(list(delta_data['removed'].values_list('pk', flat=True)), [self.to_deprecate.pk])
+
+    def test_delta_data_study_pk(self):
+        """The delta querysets are filtered to the given study."""
+        study_pk = self.to_archive.trait.source_dataset.source_study_version.study.pk
+        delta_data = cmd._get_tagged_trait_delta_data(self.since, study_pk=study_pk)
+        self.assertEqual(delta_data['added'].count(), 0)
+        self.assertEqual(list(delta_data['archived'].values_list('pk', flat=True)), [self.to_archive.pk])
+        self.assertEqual(delta_data['removed'].count(), 0)
+
+    def test_deleted_tagged_trait_data(self):
+        """Rows for deleted tagged traits are the same as they were in the previous export."""
+        with open(os.path.join(self.previous_dir, 'previous_{}_tagged_variables.txt'.format(PREFIX))) as f:
+            previous_lines = f.read().split('\n')
+        rows = list(cmd._iterate_deleted_tagged_trait_data(self.since))
+        self.assertEqual(len(rows), 1)
+        self.assertIn('\t'.join(str(el) for el in rows[0]), previous_lines)
+
+    def test_deleted_tagged_trait_data_created_since(self):
+        """Tagged traits created and deleted since the previous export are not included."""
+        factories.TaggedTraitFactory.create().delete()
+        rows = list(cmd._iterate_deleted_tagged_trait_data(self.since, chunk_size=1))
+        self.assertEqual(len(rows), 1)
+
+    def test_deleted_tagged_trait_data_study_pk(self):
+        """Rows for deleted tagged traits are filtered to the given study."""
+        study_pk = self.to_archive.trait.source_dataset.source_study_version.study.pk
+        self.assertEqual(list(cmd._iterate_deleted_tagged_trait_data(self.since, study_pk=study_pk)), [])
+
+    def test_deleted_tagged_trait_data_queries(self):
+        """The number of queries for deleted tagged traits depends on the chunk size, not the previous export."""
+        tagged_traits = models.TaggedTrait.objects.filter(
+            pk__in=[el.pk for el in factories.TaggedTraitFactory.create_batch(3)])
+        tagged_traits.update(created=self.since - datetime.timedelta(days=1))
+        tagged_traits.delete()
+        # Deleted tagged traits, traits, and tags for each of two full chunks, then an empty chunk.
+        with self.assertNumQueries(7):
+            rows = list(cmd._iterate_deleted_tagged_trait_data(self.since, chunk_size=2))
+        self.assertEqual(len(rows), 4)
+
+    def test_delta_files(self):
+        """The removed file has tagged traits from deprecated study versions and tagged traits that were deleted."""
+        delta_fns = cmd._make_delta_files(self.output_dir, self.date, self.since, chunk_size=1)
+        self.assertEqual(sorted(delta_fns), ['added', 'archived', 'removed'])
+        for delta, fn in delta_fns.items():
+            self.assertTrue(fn.endswith('_{}_tagged_variables.txt'.format(delta)))
+        self.assertEqual(self.get_keys(delta_fns['added']), [self.get_key(self.added)])
+        self.assertEqual(self.get_keys(delta_fns['archived']), [self.get_key(self.to_archive)])
+        self.assertEqual(self.get_keys(delta_fns['removed']),
+                         sorted([self.get_key(self.to_deprecate), self.get_key(self.to_delete)]))
+
+    def test_delta_files_study_pk(self):
+        """With a study, the removed file only has tagged traits from that study."""
+        study_pk = self.to_delete.trait.source_dataset.source_study_version.study.pk
+        delta_fns = cmd._make_delta_files(self.output_dir, self.date, self.since, study_pk=study_pk)
+        self.assertEqual(self.get_keys(delta_fns['removed']), [self.get_key(self.to_delete)])
+
+    def test_previous_export_time(self):
+        """The time of the previous export is read from its manifest."""
+        self.assertEqual(cmd._get_previous_export_time(self.previous_manifest), self.since)
+
+    def test_manifest_delta_entries(self):
+        """Delta files are listed in the manifest as deltas."""
+        delta_fns = cmd._make_delta_files(self.output_dir, self.date, self.since)
+        manifest_fn = cmd._make_manifest_file(self.output_dir, self.date, timezone.now(), [], delta_fns=delta_fns)
+        with open(manifest_fn) as f:
+            manifest = json.load(f)
+        self.assertEqual(sorted(entry['delta'] for entry in manifest['files']), ['added', 'archived', 'removed'])
+        self.assertEqual([entry['rows'] for entry in manifest['files']], [1, 1, 2])
+
+
+class ParseSinceTest(TestCase):
+
+    def test_date(self):
+        """A date is parsed as midnight in the current time zone."""
+        since = cmd._parse_since('2019-01-31')
+        self.assertEqual(since, timezone.make_aware(datetime.datetime(2019, 1, 31)))
+
+    def test_datetime_with_time_zone(self):
+        """A datetime with a time zone keeps its time zone."""
+        since = cmd._parse_since('2019-01-31T12:00:00+00:00')
+        self.assertEqual(since, datetime.datetime(2019, 1, 31, 12, tzinfo=timezone.utc))
+
+    def test_invalid(self):
+        """An unparseable value raises a CommandError."""
+        with self.assertRaises(CommandError):
+            cmd._parse_since('yesterday')
+
 
 class CompressDirectoryTest(TestCase):
 
@@ -331,6 +647,21 @@ class CompressDirectoryTest(TestCase):
         expected_tar_gz_file = cmd._compress_directory(tmpdir.name, output_dir)
         self.assertTrue(os.path.exists(expected_tar_gz_file))
 
+    def test_file_contents(self):
+        """The .tar.gz file contains the output directory and its files."""
+        tmpdir = TemporaryDirectory()
+        date = cmd._get_date_stamp()
+        output_dir = cmd._make_output_directory(tmpdir.name, date)
+        with open(os.path.join(output_dir, 'test.txt'), 'w') as f:
+            f.write('test contents')
+        tar_gz_file = cmd._compress_directory(tmpdir.name, output_dir)
+        output_package_dir = os.path.basename(output_dir)
+        with tarfile.open(tar_gz_file, 'r:gz') as ftgz:
+            self.assertEqual(sorted(ftgz.getnames()),
+                             [output_package_dir, os.path.join(output_package_dir, 'test.txt')])
+            contents = ftgz.extractfile(os.path.join(output_package_dir, 'test.txt')).read()
+        self.assertEqual(contents, b'test contents')
+
 
 class ExportTaggingIntegrationTest(TestCase):
 
@@ -362,3 +693,133 @@ class ExportTaggingIntegrationTest(TestCase):
         for file in output_files:
             self.assertIn(os.path.join(output_dir, file), archive_contents,
                           msg='Expected file {} missing from .tar.gz archive.'.format(file))
+
+    def test_manifest_lists_all_files(self):
+        """The manifest lists all of the other files in the package, with their row counts."""
+        factories.TaggedTraitFactory.create_batch(3)
+        tmpdir = TemporaryDirectory()
+        management.call_command('export_tagging', tmpdir.name)
+        output_dir = [el for el in os.listdir(tmpdir.name) if not el.endswith('.tar.gz')][0]
+        output_dir = os.path.join(tmpdir.name, output_dir)
+        manifest_fn = [el for el in os.listdir(output_dir) if el.endswith('_manifest.json')][0]
+        with open(os.path.join(output_dir, manifest_fn)) as f:
+            manifest = json.load(f)
+        self.assertEqual(sorted(entry['file'] for entry in manifest['files']),
+                         sorted(el for el in os.listdir(output_dir) if el != manifest_fn))
+        tagged_trait_entry = [entry for entry in manifest['files'] if entry['file'].endswith('_tagged_variables.txt')]
+        self.assertEqual(tagged_trait_entry[0]['rows'], 3)
+
+    def test_shard_by_study(self):
+        """With --shard_by_study, the package has one tagged traits file per study, listed in the manifest."""
+        studies = StudyFactory.create_batch(2)
+        for study in studies:
+            factories.TaggedTraitFactory.create_batch(2, trait__source_dataset__source_study_version__study=study)
+        tmpdir = TemporaryDirectory()
+        management.call_command('export_tagging', tmpdir.name, '--shard_by_study', '--processes=1')
+        output = os.listdir(tmpdir.name)
+        output_dir = [el for el in output if not el.endswith('.tar.gz')][0]
+        output_files = os.listdir(os.path.join(tmpdir.name, output_dir))
+        self.assertFalse(any([el.endswith('_tagged_variables.txt') for el in output_files]))
+        self.assertTrue(any([el.endswith('_tagged_variables_data_dictionary.txt') for el in output_files]))
+        self.assertEqual(output_files.count('README.md'), 1)
+        shard_files = os.listdir(os.path.join(tmpdir.name, output_dir, SHARD_DIRECTORY))
+        self.assertEqual(len(shard_files), 2)
+        manifest_fn = [el for el in output_files if el.endswith('_manifest.json')][0]
+        with open(os.path.join(tmpdir.name, output_dir, manifest_fn)) as f:
+            manifest = json.load(f)
+        self.assertTrue(manifest['options']['shard_by_study'])
+        shard_entries = [entry for entry in manifest['files'] if 'study_pk' in entry]
+        self.assertEqual(sorted(os.path.basename(entry['file']) for entry in shard_entries), sorted(shard_files))
+        self.assertEqual([entry['rows'] for entry in shard_entries], [2, 2])
+        tar_gz_file = os.path.join(tmpdir.name, [el for el in output if el.endswith('.tar.gz')][0])
+        with tarfile.open(tar_gz_file, 'r:gz') as ftgz:
+            archive_contents = ftgz.getnames()
+        for file in shard_files:
+            self.assertIn(os.path.join(output_dir, SHARD_DIRECTORY, file), archive_contents)
+
+    def test_shard_by_study_with_study_pk(self):
+        """--shard_by_study can't be used with --study_pk."""
+        study = StudyFactory.create()
+        tmpdir = TemporaryDirectory()
+        with self.assertRaises(CommandError):
+            management.call_command(
+                'export_tagging', tmpdir.name, '--shard_by_study', '--study_pk={}'.format(study.pk))
+        self.assertEqual(os.listdir(tmpdir.name), [])
+
+    def test_since(self):
+        """With --since, the package has delta files, listed in the README and manifest."""
+        factories.TaggedTraitFactory.create()
+        tmpdir = TemporaryDirectory()
+        management.call_command('export_tagging', tmpdir.name, '--since=2000-01-01')
+        output_dir = os.path.join(tmpdir.name, [el for el in os.listdir(tmpdir.name) if not el.endswith('.tar.gz')][0])
+        output_files = os.listdir(output_dir)
+        for delta in ('added', 'archived', 'removed'):
+            self.assertEqual(len([el for el in output_files if el.endswith('_{}_tagged_variables.txt'.format(delta))]),
+                             1)
+        manifest_fn = [el for el in output_files if el.endswith('_manifest.json')][0]
+        with open(os.path.join(output_dir, manifest_fn)) as f:
+            manifest = json.load(f)
+        self.assertEqual(parse_datetime(manifest['options']['since']),
+                         timezone.make_aware(datetime.datetime(2000, 1, 1)))
+        added_entry = [entry for entry in manifest['files'] if entry.get('delta') == 'added'][0]
+        self.assertEqual(added_entry['rows'], 1)
+        with open(os.path.join(output_dir, 'README.md')) as f:
+            readme = f.read()
+        self.assertIn(os.path.basename(added_entry['file']), readme)
+
+    def test_since_manifest(self):
+        """With --since_manifest, the delta files have the changes since the previous export."""
+        old_tagged_trait = factories.TaggedTraitFactory.create()
+        previous_tmpdir = TemporaryDirectory()
+        management.call_command('export_tagging', previous_tmpdir.name)
+        previous_dir = os.path.join(
+            previous_tmpdir.name, [el for el in os.listdir(previous_tmpdir.name) if not el.endswith('.tar.gz')][0])
+        previous_manifest = os.path.join(
+            previous_dir, [el for el in os.listdir(previous_dir) if el.endswith('_manifest.json')][0])
+        old_tagged_trait.delete()
+        new_tagged_trait = factories.TaggedTraitFactory.create()
+        tmpdir = TemporaryDirectory()
+        management.call_command('export_tagging', tmpdir.name, '--since_manifest={}'.format(previous_manifest))
+        output_dir = os.path.join(tmpdir.name, [el for el in os.listdir(tmpdir.name) if not el.endswith('.tar.gz')][0])
+        manifest_fn = [el for el in os.listdir(output_dir) if el.endswith('_manifest.json')][0]
+        with open(os.path.join(output_dir, manifest_fn)) as f:
+            manifest = json.load(f)
+        rows = {entry['delta']: entry['rows'] for entry in manifest['files'] if 'delta' in entry}
+        self.assertEqual(rows, {'added': 1, 'archived': 0, 'removed': 1})
+        added_fn = [entry['file'] for entry in manifest['files'] if entry.get('delta') == 'added'][0]
+        with open(os.path.join(output_dir, added_fn)) as f:
+            self.assertIn(new_tagged_trait.trait.full_accession, f.read())
+
+    def test_since_and_since_manifest(self):
+        """--since and --since_manifest can't be used together."""
+        tmpdir = TemporaryDirectory()
+        with self.assertRaises(CommandError):
+            management.call_command('export_tagging', tmpdir.name, '--since=2019-01-01', '--since_manifest=x.json')
+
+    def test_since_manifest_missing(self):
+        """A --since_manifest file that doesn't exist raises a CommandError naming the file."""
+        tmpdir = TemporaryDirectory()
+        manifest_fn = os.path.join(tmpdir.name, 'missing_manifest.json')
+        with self.assertRaisesRegex(CommandError, manifest_fn):
+            management.call_command('export_tagging', tmpdir.name, '--since_manifest={}'.format(manifest_fn))
+
+    def test_since_manifest_not_a_manifest(self):
+        """A --since_manifest file that isn't a manifest json file raises a CommandError naming the file."""
+        tmpdir = TemporaryDirectory()
+        manifest_fn = os.path.join(tmpdir.name, 'bad_manifest.json')
+        for content in ('not json', '["export_time"]', '{"files": []}'):
+            with open(manifest_fn, 'w') as f:
+                f.write(content)
+            with self.assertRaisesRegex(CommandError, manifest_fn):
+                management.call_command('export_tagging', tmpdir.name, '--since_manifest={}'.format(manifest_fn))
+
+    def test_since_manifest_bad_export_time(self):
+        """A --since_manifest file with an unparseable export_time raises a CommandError."""
+        tmpdir = TemporaryDirectory()
+        manifest_fn = os.path.join(tmpdir.name, 'bad_manifest.json')
+        for export_time in ('yesterday', '2019-13-01T00:00:00', None):
+            with open(manifest_fn, 'w') as f:
+                json.dump({'export_time': export_time}, f)
+            with self.assertRaisesRegex(CommandError, 'export_time'):
+                management.call_command('export_tagging', tmpdir.name, '--since_manifest={}'.format(manifest_fn))
+            self.assertEqual(os.listdir(tmpdir.name), ['bad_manifest.json'])
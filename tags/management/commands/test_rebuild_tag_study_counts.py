@@ -0,0 +1,45 @@
+"""Test the rebuild_tag_study_counts management command."""
+
+from io import StringIO
+
+from django.core import management
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from tags import factories
+from tags import models
+from trait_browser.factories import SourceStudyVersionFactory
+
+
+class RebuildTagStudyCountsTest(TestCase):
+
+    def setUp(self):
+        self.tag = factories.TagFactory.create()
+        self.study_version = SourceStudyVersionFactory.create()
+        factories.TaggedTraitFactory.create_batch(
+            2, tag=self.tag, trait__source_dataset__source_study_version=self.study_version)
+
+    def test_no_differences(self):
+        """The command runs without changes when the cached counts are consistent."""
+        out = StringIO()
+        management.call_command('rebuild_tag_study_counts', stdout=out)
+        self.assertIn('0 tag study counts updated', out.getvalue())
+        management.call_command('rebuild_tag_study_counts', '--check', stdout=out)
+
+    def test_fixes_inconsistent_counts(self):
+        """The command recomputes inconsistent cached counts."""
+        models.TagStudyCount.objects.all().delete()
+        out = StringIO()
+        management.call_command('rebuild_tag_study_counts', stdout=out)
+        self.assertIn('1 tag study counts updated', out.getvalue())
+        self.assertIn(self.tag.title, out.getvalue())
+        self.assertEqual(models.TagStudyCount.objects.get(tag=self.tag, study=self.study_version.study).tt_count, 2)
+
+    def test_check_reports_without_fixing(self):
+        """With --check, the command raises an error for inconsistent counts and does not fix them."""
+        models.TagStudyCount.objects.all().update(tt_count=10)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            management.call_command('rebuild_tag_study_counts', '--check', stdout=out)
+        self.assertIn('cached 10, expected 2', out.getvalue())
+        self.assertEqual(models.TagStudyCount.objects.get(tag=self.tag, study=self.study_version.study).tt_count, 10)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.27 on 2026-10-18 22:01
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count, F
+import django.db.models.deletion
+
+
+def fill_tag_study_counts(apps, schema_editor):
+    """Fill the TagStudyCount table from existing current, non-archived TaggedTraits."""
+    TaggedTrait = apps.get_model('tags', 'TaggedTrait')
+    TagStudyCount = apps.get_model('tags', 'TagStudyCount')
+    counts = TaggedTrait.objects.filter(
+        archived=False, trait__source_dataset__source_study_version__i_is_deprecated=False
+    ).values(
+        study_pk=F('trait__source_dataset__source_study_version__study__pk'),
+        tag_pk=F('tag__pk')
+    ).annotate(tt_count=Count('pk')).values_list('tag_pk', 'study_pk', 'tt_count')
+    TagStudyCount.objects.bulk_create(
+        [TagStudyCount(tag_id=tag_pk, study_id=study_pk, tt_count=tt_count) for tag_pk, study_pk, tt_count in counts])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trait_browser', '0011_remove_old_dbgap_link_fields'),
+        ('tags', '0008_taggedtrait_previous_tagged_trait'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagStudyCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('tt_count', models.PositiveIntegerField(default=0)),
+                ('study', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_counts', to='trait_browser.Study')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='study_counts', to='tags.Tag')),
+            ],
+            options={
+                'verbose_name': 'tag study count',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='tagstudycount',
+            unique_together=set([('tag', 'study')]),
+        ),
+        migrations.RunPython(fill_tag_study_counts, reverse_code=migrations.RunPython.noop),
+    ]
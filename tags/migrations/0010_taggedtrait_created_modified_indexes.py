@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.27 on 2026-10-18 23:20
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0009_tagstudycount'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taggedtrait',
+            index=models.Index(fields=['created'], name='tags_tagged_created_0aadf8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taggedtrait',
+            index=models.Index(fields=['modified'], name='tags_tagged_modifie_019219_idx'),
+        ),
+    ]
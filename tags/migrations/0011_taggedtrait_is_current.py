@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.27 on 2026-10-19 14:20
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def fill_is_current(apps, schema_editor):
+    """Set is_current to False for the tagged traits of traits from deprecated study versions."""
+    TaggedTrait = apps.get_model('tags', 'TaggedTrait')
+    TaggedTrait.objects.filter(
+        trait__source_dataset__source_study_version__i_is_deprecated=True).update(is_current=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trait_browser', '0019_add_is_current'),
+        ('tags', '0010_taggedtrait_created_modified_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taggedtrait',
+            name='is_current',
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+        migrations.RunPython(fill_is_current, reverse_code=migrations.RunPython.noop),
+    ]
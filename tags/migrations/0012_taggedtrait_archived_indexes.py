@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.27 on 2026-10-19 15:05
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0011_taggedtrait_is_current'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taggedtrait',
+            index=models.Index(fields=['tag', 'archived'], name='tags_tagged_tag_id_530915_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taggedtrait',
+            index=models.Index(fields=['creator', 'archived'], name='tags_tagged_creator_cd7ab7_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.27 on 2026-10-19 02:19
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0012_taggedtrait_archived_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedTaggedTrait',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('tagged_trait_pk', models.PositiveIntegerField()),
+                ('tag_pk', models.PositiveIntegerField()),
+                ('trait_pk', models.PositiveIntegerField()),
+                ('tagged_trait_created', models.DateTimeField()),
+                ('tagged_trait_modified', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'deleted tagged phenotype',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='deletedtaggedtrait',
+            index=models.Index(fields=['created'], name='tags_delete_created_b5a168_idx'),
+        ),
+    ]
@@ -3,11 +3,14 @@
 from django.apps import apps
 from django.conf import settings
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.urls import reverse
 
 from core.exceptions import DeleteNotAllowedError
 from core.models import TimeStampedModel
 
+from . import caches
 from . import querysets
 
 
@@ -22,6 +25,9 @@ class Tag(TimeStampedModel):
     creator = models.ForeignKey(settings.AUTH_USER_MODEL, blank=True, on_delete=models.PROTECT)
     all_traits = models.ManyToManyField('trait_browser.SourceTrait', through='TaggedTrait', related_name='all_tags')
 
+    # Managers/custom querysets.
+    objects = querysets.TagQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'phenotype tag'
 
@@ -62,7 +68,7 @@ class Tag(TimeStampedModel):
     def current_archived_traits(self):
         """Return queryset of non-deprecated archived traits tagged with this tag."""
         archived_tagged_traits = apps.get_model('tags', 'TaggedTrait').objects.archived().filter(
-            tag=self, trait__source_dataset__source_study_version__i_is_deprecated=False)
+            tag=self, is_current=True)
         return apps.get_model('trait_browser', 'SourceTrait').objects.filter(
             pk__in=archived_tagged_traits.values_list('trait__pk', flat=True))
 
@@ -70,7 +76,7 @@ class Tag(TimeStampedModel):
     def current_non_archived_traits(self):
         """Return queryset of non-deprecated non-archived traits tagged with this tag."""
         non_archived_tagged_traits = apps.get_model('tags', 'TaggedTrait').objects.non_archived().filter(
-            tag=self, trait__source_dataset__source_study_version__i_is_deprecated=False)
+            tag=self, is_current=True)
         return apps.get_model('trait_browser', 'SourceTrait').objects.filter(
             pk__in=non_archived_tagged_traits.values_list('trait__pk', flat=True))
 
@@ -84,6 +90,8 @@ class TaggedTrait(TimeStampedModel):
                                                  related_name='updated_tagged_trait')
     creator = models.ForeignKey(settings.AUTH_USER_MODEL, blank=True, on_delete=models.PROTECT)
     archived = models.BooleanField(default=False)
+    # Denormalized from trait.is_current, so current() doesn't need joins.
+    is_current = models.BooleanField(default=True, db_index=True)
 
     # Managers/custom querysets.
     objects = querysets.TaggedTraitQuerySet.as_manager()
@@ -91,11 +99,29 @@ class TaggedTrait(TimeStampedModel):
     class Meta:
         verbose_name = 'tagged phenotype'
         unique_together = (('trait', 'tag'), )
+        indexes = [
+            # For finding the tagged traits added or changed since a previous export.
+            models.Index(fields=['created']),
+            models.Index(fields=['modified']),
+            # For the non-archived tagged traits of a tag or user.
+            models.Index(fields=['tag', 'archived']),
+            models.Index(fields=['creator', 'archived']),
+        ]
 
     def __str__(self):
         """Pretty printing."""
         return 'variable {} tagged {}'.format(self.trait.i_trait_name, self.tag.title)
 
+    def save(self, *args, **kwargs):
+        """Custom save method to auto-set is_current for new tagged traits.
+
+        The trait of a tagged trait doesn't change, and SourceStudyVersion.save() updates is_current when the
+        study version is deprecated, so is_current only needs to be set here when the tagged trait is created.
+        """
+        if self._state.adding:
+            self.is_current = self.trait.is_current
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse('tags:tagged-traits:pk:detail', args=[self.pk])
 
@@ -231,3 +257,95 @@ class DCCDecision(TimeStampedModel):
 
     def __str__(self):
         return 'DCC decision to {} {}'.format(self.get_decision_display(), self.dcc_review.tagged_trait)
+
+
+class TagStudyCount(TimeStampedModel):
+    """Cached count of current, non-archived TaggedTraits for one Tag and Study.
+
+    Rows are kept up to date by the signal receivers below, whenever a TaggedTrait
+    is created, archived, unarchived, or deleted, or a SourceStudyVersion is
+    (un)deprecated. Tag/study pairs with no tagged traits have no row. Use the
+    rebuild_tag_study_counts management command to check or recompute the table.
+    """
+
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='study_counts')
+    study = models.ForeignKey('trait_browser.Study', on_delete=models.CASCADE, related_name='tag_counts')
+    tt_count = models.PositiveIntegerField(default=0)
+
+    # Managers/custom querysets.
+    objects = querysets.TagStudyCountQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'tag study count'
+        unique_together = (('tag', 'study'), )
+
+    def __str__(self):
+        """Pretty printing."""
+        return '{} variables in study {} tagged {}'.format(self.tt_count, self.study.i_study_name, self.tag.title)
+
+
+class DeletedTaggedTrait(TimeStampedModel):
+    """Record of a deleted TaggedTrait, so that export_tagging can list it as removed.
+
+    Rows are created by the signal receiver below whenever a TaggedTrait is deleted;
+    created is the time of deletion. The tag and trait are stored as plain pks, so
+    that deleting a tag or trait along with its tagged traits is not blocked.
+    """
+
+    tagged_trait_pk = models.PositiveIntegerField()
+    tag_pk = models.PositiveIntegerField()
+    trait_pk = models.PositiveIntegerField()
+    tagged_trait_created = models.DateTimeField()
+    tagged_trait_modified = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'deleted tagged phenotype'
+        indexes = [
+            # For finding the tagged traits deleted since a previous export.
+            models.Index(fields=['created']),
+        ]
+
+    def __str__(self):
+        """Pretty printing."""
+        return 'deleted tagged phenotype {}'.format(self.tagged_trait_pk)
+
+
+def _get_trait_study_pks(trait_pk):
+    """Return a list containing the study pk for the SourceTrait with pk trait_pk, if it still exists."""
+    return list(apps.get_model('trait_browser', 'SourceTrait').objects.filter(pk=trait_pk).values_list(
+        'source_dataset__source_study_version__study__pk', flat=True))
+
+
+@receiver(post_save, sender=TaggedTrait)
+@receiver(post_delete, sender=TaggedTrait)
+def update_tag_study_count(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    study_pks = _get_trait_study_pks(instance.trait_id)
+    if study_pks:
+        TagStudyCount.objects.refresh(tag_pks=[instance.tag_id], study_pks=study_pks)
+
+
+@receiver(post_delete, sender=TaggedTrait)
+def record_deleted_tagged_trait(sender, instance, **kwargs):
+    DeletedTaggedTrait.objects.create(
+        tagged_trait_pk=instance.pk, tag_pk=instance.tag_id, trait_pk=instance.trait_id,
+        tagged_trait_created=instance.created, tagged_trait_modified=instance.modified)
+
+
+@receiver(post_save, sender='trait_browser.SourceStudyVersion')
+def update_study_tag_counts(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    TagStudyCount.objects.refresh(study_pks=[instance.study_id])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=TaggedTrait)
+@receiver(post_delete, sender=TaggedTrait)
+@receiver(post_save, sender=DCCReview)
+@receiver(post_delete, sender=DCCReview)
+@receiver(post_save, sender='trait_browser.SourceStudyVersion')
+def clear_unreviewed_index(sender, **kwargs):
+    caches.clear_unreviewed_index()
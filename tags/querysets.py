@@ -1,14 +1,26 @@
 """Custom QuerySets for the tags app."""
 
+from django.apps import apps
 from django.db import models
-from django.db.models import Q
+from django.db.models import Count, F, Q
 
 from core.exceptions import DeleteNotAllowedError
+from trait_browser.querysets import IsCurrentQuerySetMixin
 
 
-class TaggedTraitQuerySet(models.query.QuerySet):
+class TagQuerySet(models.query.QuerySet):
+
+    def with_current_non_archived_trait_count(self):
+        """Annotate each tag with current_non_archived_trait_count, its number of current non-archived traits."""
+        return self.annotate(current_non_archived_trait_count=Count(models.Case(
+            models.When(all_taggedtraits__is_current=True, all_taggedtraits__archived=False, then=1))))
+
+
+class TaggedTraitQuerySet(IsCurrentQuerySetMixin, models.query.QuerySet):
     """Class to hold custom query set filtering and delete methods for the TaggedTrait model."""
 
+    DEPRECATED_LOOKUP = 'trait__source_dataset__source_study_version__i_is_deprecated'
+
     def delete(self, *args, **kwargs):  # noqa
         """Archive (reviewed) or delete (unreviewed), unless any included objects are confirmed via DCCReview."""
         unreviewed = self.unreviewed()
@@ -82,9 +94,6 @@ class TaggedTraitQuerySet(models.query.QuerySet):
         """Filter to only archived tagged traits."""
         return self.filter(archived=True)
 
-    def current(self):
-        return self.filter(trait__source_dataset__source_study_version__i_is_deprecated=False)
-
 
 class DCCReviewQuerySet(models.query.QuerySet):
     """Class to hold custom query set filtering and delete methods for the DCCReview model."""
@@ -126,3 +135,65 @@ class StudyResponseQuerySet(models.query.QuerySet):
     def hard_delete(self, *args, **kwargs):
         """Delete the queryset objects regardless of decision status."""
         super().delete(*args, **kwargs)
+
+
+class TagStudyCountQuerySet(models.query.QuerySet):
+    """Class to hold custom methods for maintaining the cached TagStudyCount table."""
+
+    def get_expected_counts(self, tag_pks=None, study_pks=None):
+        """Count current, non-archived TaggedTraits directly from the TaggedTrait table.
+
+        Arguments:
+            tag_pks (list of int): only count tagged traits with these tags
+            study_pks (list of int): only count tagged traits from these studies
+
+        Returns:
+            dict of (tag_pk, study_pk): tt_count pairs, excluding pairs with no tagged traits
+        """
+        tagged_traits = apps.get_model('tags', 'TaggedTrait').objects.non_archived().current()
+        if tag_pks is not None:
+            tagged_traits = tagged_traits.filter(tag__pk__in=tag_pks)
+        if study_pks is not None:
+            tagged_traits = tagged_traits.filter(trait__source_dataset__source_study_version__study__pk__in=study_pks)
+        counts = tagged_traits.values(
+            study_pk=F('trait__source_dataset__source_study_version__study__pk'),
+            tag_pk=F('tag__pk')).annotate(tt_count=Count('pk')).values_list('tag_pk', 'study_pk', 'tt_count')
+        return {(tag_pk, study_pk): tt_count for tag_pk, study_pk, tt_count in counts}
+
+    def get_differences(self, tag_pks=None, study_pks=None):
+        """Compare cached counts against expected counts for the given tags and studies.
+
+        Returns:
+            dict of (tag_pk, study_pk): (cached_count, expected_count) pairs for counts that disagree;
+            a missing row has a cached_count of 0
+        """
+        cached = self.all()
+        if tag_pks is not None:
+            cached = cached.filter(tag__pk__in=tag_pks)
+        if study_pks is not None:
+            cached = cached.filter(study__pk__in=study_pks)
+        cached = {(tag_pk, study_pk): tt_count for tag_pk, study_pk, tt_count in cached.values_list(
+            'tag_id', 'study_id', 'tt_count')}
+        expected = self.get_expected_counts(tag_pks=tag_pks, study_pks=study_pks)
+        differences = {}
+        for key in set(cached) | set(expected):
+            if cached.get(key, 0) != expected.get(key, 0):
+                differences[key] = (cached.get(key, 0), expected.get(key, 0))
+        return differences
+
+    def refresh(self, tag_pks=None, study_pks=None):
+        """Recompute cached counts for the given tags and studies (all of them by default).
+
+        Only rows whose counts have changed are written. Rows for tag/study pairs that
+        no longer have any current, non-archived tagged traits are deleted.
+
+        Returns:
+            dict of (tag_pk, study_pk): (old_count, new_count) pairs that were changed
+        """
+        differences = self.get_differences(tag_pks=tag_pks, study_pks=study_pks)
+        for (tag_pk, study_pk), (old_count, new_count) in differences.items():
+            if new_count == 0:
+                self.filter(tag_id=tag_pk, study_id=study_pk).delete()
+            else:
+                self.update_or_create(tag_id=tag_pk, study_id=study_pk, defaults={'tt_count': new_count})
+        return differences
@@ -59,7 +59,11 @@ class TagTable(tables.Table):
 
     def render_number_tagged_traits(self, record):
         """Render column with the count of non-archived non-deprecated tagged traits for each tag."""
-        return record.current_non_archived_traits.count()
+        # Views annotate the count with Tag.objects.with_current_non_archived_trait_count(), to avoid a query per row.
+        trait_count = getattr(record, 'current_non_archived_trait_count', None)
+        if trait_count is None:
+            trait_count = record.current_non_archived_traits.count()
+        return trait_count
 
 
 class TaggedTraitTable(tables.Table):
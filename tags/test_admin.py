@@ -2,7 +2,9 @@
 
 from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
 from django.contrib.admin.sites import AdminSite
+from django.db import connection
 from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from core.exceptions import DeleteNotAllowedError
@@ -194,3 +196,50 @@ class TaggedTraitAdminDeleteTest(DCCAnalystLoginTestCase):
         self.assertIn('Successfully deleted', str(messages[0]))
         for tt in tagged_traits:
             self.assertNotIn(tt, models.TaggedTrait.objects.all())
+
+
+class ChangelistQueriesTest(SuperuserLoginTestCase):
+
+    def count_queries(self, url):
+        # Load the page once first, so that one-off queries such as content type lookups are not counted.
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_tagged_trait_changelist(self):
+        """The number of queries of the tagged trait changelist does not depend on the number of rows."""
+        url = reverse('admin:tags_taggedtrait_changelist')
+        factories.StudyResponseFactory.create()
+        factories.TaggedTraitFactory.create()
+        n_queries = self.count_queries(url)
+        factories.StudyResponseFactory.create_batch(5)
+        factories.TaggedTraitFactory.create_batch(5)
+        self.assertEqual(self.count_queries(url), n_queries)
+
+    def test_dcc_review_changelist(self):
+        """The number of queries of the dcc review changelist does not depend on the number of rows."""
+        url = reverse('admin:tags_dccreview_changelist')
+        factories.DCCReviewFactory.create()
+        n_queries = self.count_queries(url)
+        factories.DCCReviewFactory.create_batch(5)
+        self.assertEqual(self.count_queries(url), n_queries)
+
+    def test_study_response_changelist(self):
+        """The number of queries of the study response changelist does not depend on the number of rows."""
+        url = reverse('admin:tags_studyresponse_changelist')
+        factories.StudyResponseFactory.create()
+        n_queries = self.count_queries(url)
+        factories.StudyResponseFactory.create_batch(5)
+        self.assertEqual(self.count_queries(url), n_queries)
+
+    def test_tagged_trait_search(self):
+        """Tagged traits can be searched by variable accession and tag title."""
+        tagged_trait = factories.TaggedTraitFactory.create(
+            trait__i_dbgap_variable_accession=4567, tag__title='Blood pressure')
+        factories.TaggedTraitFactory.create(trait__i_dbgap_variable_accession=1234, tag__title='Height')
+        url = reverse('admin:tags_taggedtrait_changelist')
+        for search_term in ('phv00004567.v1.p1', 'blood'):
+            response = self.client.get(url, {'q': search_term})
+            self.assertEqual(list(response.context['cl'].result_list), [tagged_trait])
@@ -0,0 +1,90 @@
+"""Tests of cached data for the tags app."""
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from trait_browser.factories import SourceStudyVersionFactory
+
+from . import caches
+from . import factories
+
+
+class UnreviewedIndexTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.tag = factories.TagFactory.create()
+        self.study_version = SourceStudyVersionFactory.create()
+        self.study = self.study_version.study
+
+    def make_tagged_trait(self, **kwargs):
+        return factories.TaggedTraitFactory.create(
+            tag=self.tag, trait__source_dataset__source_study_version=self.study_version, **kwargs)
+
+    def test_empty(self):
+        """The index is empty when there are no tagged traits."""
+        self.assertEqual(caches.get_unreviewed_index(), frozenset())
+        self.assertEqual(caches.get_unreviewed_tag_pks(), set())
+        self.assertEqual(caches.get_unreviewed_study_pks(self.tag.pk), set())
+
+    def test_unreviewed_tagged_trait(self):
+        """An unreviewed tagged trait is in the index."""
+        self.make_tagged_trait()
+        self.assertEqual(caches.get_unreviewed_index(), frozenset([(self.tag.pk, self.study.pk)]))
+        self.assertEqual(caches.get_unreviewed_tag_pks(), {self.tag.pk})
+        self.assertEqual(caches.get_unreviewed_study_pks(self.tag.pk), {self.study.pk})
+        self.assertEqual(caches.get_unreviewed_study_pks(str(self.tag.pk)), {self.study.pk})
+
+    def test_reviewed_tagged_trait(self):
+        """A reviewed tagged trait is not in the index."""
+        tagged_trait = self.make_tagged_trait()
+        factories.DCCReviewFactory.create(tagged_trait=tagged_trait)
+        self.assertEqual(caches.get_unreviewed_index(), frozenset())
+
+    def test_archived_tagged_trait(self):
+        """An archived unreviewed tagged trait is not in the index."""
+        self.make_tagged_trait(archived=True)
+        self.assertEqual(caches.get_unreviewed_index(), frozenset())
+
+    def test_deprecated_tagged_trait(self):
+        """An unreviewed tagged trait from a deprecated study version is not in the index."""
+        self.make_tagged_trait()
+        self.study_version.i_is_deprecated = True
+        self.study_version.save()
+        self.assertEqual(caches.get_unreviewed_index(), frozenset())
+
+    def test_index_is_cached(self):
+        """The index is not rebuilt from the db when it is already cached."""
+        self.make_tagged_trait()
+        caches.get_unreviewed_index()
+        with self.assertNumQueries(0):
+            caches.get_unreviewed_tag_pks()
+            caches.get_unreviewed_study_pks(self.tag.pk)
+
+    def test_cleared_by_tagging(self):
+        """Creating a tagged trait clears the index."""
+        caches.get_unreviewed_index()
+        self.make_tagged_trait()
+        self.assertEqual(caches.get_unreviewed_tag_pks(), {self.tag.pk})
+
+    def test_cleared_by_deleting_tagged_trait(self):
+        """Deleting a tagged trait clears the index."""
+        tagged_trait = self.make_tagged_trait()
+        caches.get_unreviewed_index()
+        tagged_trait.delete()
+        self.assertEqual(caches.get_unreviewed_tag_pks(), set())
+
+    def test_cleared_by_review_changes(self):
+        """Creating and deleting a review clears the index."""
+        tagged_trait = self.make_tagged_trait()
+        caches.get_unreviewed_index()
+        dcc_review = factories.DCCReviewFactory.create(tagged_trait=tagged_trait)
+        self.assertEqual(caches.get_unreviewed_tag_pks(), set())
+        dcc_review.delete()
+        self.assertEqual(caches.get_unreviewed_tag_pks(), {self.tag.pk})
+
+    def test_clear_unreviewed_index(self):
+        """clear_unreviewed_index removes the cached index."""
+        caches.get_unreviewed_index()
+        caches.clear_unreviewed_index()
+        self.assertIsNone(cache.get(caches.UNREVIEWED_INDEX_CACHE_KEY))
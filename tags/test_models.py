@@ -1716,6 +1716,32 @@ class TaggedTraitDeleteTest(TestCase):
         tagged_trait.delete()
         self.assertNotIn(tagged_trait, models.TaggedTrait.objects.all())
 
+    def test_delete_records_deleted_tagged_trait(self):
+        """Deleting an unreviewed taggedtrait records it as deleted."""
+        tagged_trait = self.model_factory.create(**self.model_args)
+        pk = tagged_trait.pk
+        tagged_trait.delete()
+        deleted = models.DeletedTaggedTrait.objects.get()
+        self.assertEqual(deleted.tagged_trait_pk, pk)
+        self.assertEqual(deleted.tag_pk, self.tag.pk)
+        self.assertEqual(deleted.trait_pk, self.trait.pk)
+        self.assertEqual(deleted.tagged_trait_created, tagged_trait.created)
+        self.assertEqual(deleted.tagged_trait_modified, tagged_trait.modified)
+
+    def test_archive_does_not_record_deleted_tagged_trait(self):
+        """Archiving a reviewed taggedtrait instead of deleting it does not record it as deleted."""
+        tagged_trait = self.model_factory.create(**self.model_args)
+        factories.DCCReviewFactory.create(tagged_trait=tagged_trait, status=models.DCCReview.STATUS_FOLLOWUP)
+        tagged_trait.delete()
+        self.assertEqual(models.DeletedTaggedTrait.objects.count(), 0)
+
+    def test_delete_tag_with_tagged_traits(self):
+        """A tag can still be deleted along with its tagged traits."""
+        self.model_factory.create(**self.model_args)
+        tag_pk = self.tag.pk
+        self.tag.delete()
+        self.assertEqual(models.DeletedTaggedTrait.objects.get().tag_pk, tag_pk)
+
     # Tests of hard_delete().
     def test_hard_delete_need_followup(self):
         """Deletes a need_followup tagged trait."""
@@ -2380,3 +2406,116 @@ class DCCDecisionTest(TestCase):
         instance = self.model_factory.create()
         with self.assertRaises(ProtectedError):
             instance.creator.delete()
+
+
+class TagStudyCountTest(TestCase):
+
+    def setUp(self):
+        self.tag = factories.TagFactory.create()
+        self.study_version = SourceStudyVersionFactory.create()
+        self.study = self.study_version.study
+
+    def make_tagged_trait(self, **kwargs):
+        return factories.TaggedTraitFactory.create(
+            tag=self.tag, trait__source_dataset__source_study_version=self.study_version, **kwargs)
+
+    def get_count(self, tag=None, study=None):
+        """Return the cached count for the tag and study, or None if there is no row."""
+        try:
+            return models.TagStudyCount.objects.get(tag=tag or self.tag, study=study or self.study).tt_count
+        except ObjectDoesNotExist:
+            return None
+
+    def test_printing(self):
+        """The custom __str__ method returns a string."""
+        self.make_tagged_trait()
+        instance = models.TagStudyCount.objects.get(tag=self.tag, study=self.study)
+        self.assertIsInstance(instance.__str__(), str)
+
+    def test_create_increments_count(self):
+        """Creating tagged traits creates and increments the count."""
+        self.make_tagged_trait()
+        self.assertEqual(self.get_count(), 1)
+        self.make_tagged_trait()
+        self.assertEqual(self.get_count(), 2)
+
+    def test_archive_and_unarchive_change_count(self):
+        """Archiving a tagged trait removes it from the count and unarchiving adds it back."""
+        tagged_traits = factories.TaggedTraitFactory.create_batch(
+            2, tag=self.tag, trait__source_dataset__source_study_version=self.study_version)
+        tagged_traits[0].archive()
+        self.assertEqual(self.get_count(), 1)
+        tagged_traits[1].archive()
+        self.assertIsNone(self.get_count())
+        tagged_traits[0].unarchive()
+        self.assertEqual(self.get_count(), 1)
+
+    def test_delete_decrements_count(self):
+        """Deleting tagged traits decrements the count and removes the row when none are left."""
+        tagged_traits = factories.TaggedTraitFactory.create_batch(
+            2, tag=self.tag, trait__source_dataset__source_study_version=self.study_version)
+        tagged_traits[0].delete()
+        self.assertEqual(self.get_count(), 1)
+        tagged_traits[1].delete()
+        self.assertIsNone(self.get_count())
+
+    def test_queryset_delete_decrements_count(self):
+        """Deleting tagged traits through the queryset updates the count."""
+        factories.TaggedTraitFactory.create_batch(
+            3, tag=self.tag, trait__source_dataset__source_study_version=self.study_version)
+        models.TaggedTrait.objects.filter(tag=self.tag).delete()
+        self.assertIsNone(self.get_count())
+
+    def test_deleting_trait_decrements_count(self):
+        """Deleting a source trait cascades to its tagged traits and updates the count."""
+        tagged_traits = factories.TaggedTraitFactory.create_batch(
+            2, tag=self.tag, trait__source_dataset__source_study_version=self.study_version)
+        tagged_traits[0].trait.delete()
+        self.assertEqual(self.get_count(), 1)
+
+    def test_counts_are_separate_by_tag_and_study(self):
+        """Tagged traits only change the count for their own tag and study."""
+        other_tag = factories.TagFactory.create()
+        other_study_version = SourceStudyVersionFactory.create()
+        self.make_tagged_trait()
+        factories.TaggedTraitFactory.create_batch(
+            2, tag=other_tag, trait__source_dataset__source_study_version=self.study_version)
+        factories.TaggedTraitFactory.create_batch(
+            3, tag=self.tag, trait__source_dataset__source_study_version=other_study_version)
+        self.assertEqual(self.get_count(), 1)
+        self.assertEqual(self.get_count(tag=other_tag), 2)
+        self.assertEqual(self.get_count(study=other_study_version.study), 3)
+        self.assertIsNone(self.get_count(tag=other_tag, study=other_study_version.study))
+
+    def test_deprecating_study_version_removes_count(self):
+        """Deprecating a study version removes its tagged traits from the count."""
+        self.make_tagged_trait()
+        self.study_version.i_is_deprecated = True
+        self.study_version.save()
+        self.assertIsNone(self.get_count())
+        self.study_version.i_is_deprecated = False
+        self.study_version.save()
+        self.assertEqual(self.get_count(), 1)
+
+    def test_refresh_fixes_inconsistent_counts(self):
+        """Refresh recomputes counts that are out of sync with the TaggedTrait table."""
+        factories.TaggedTraitFactory.create_batch(
+            2, tag=self.tag, trait__source_dataset__source_study_version=self.study_version)
+        models.TagStudyCount.objects.filter(tag=self.tag).update(tt_count=5)
+        other_tag = factories.TagFactory.create()
+        models.TagStudyCount.objects.create(tag=other_tag, study=self.study, tt_count=1)
+        differences = models.TagStudyCount.objects.refresh()
+        self.assertEqual(differences, {(self.tag.pk, self.study.pk): (5, 2), (other_tag.pk, self.study.pk): (1, 0)})
+        self.assertEqual(self.get_count(), 2)
+        self.assertIsNone(self.get_count(tag=other_tag))
+        self.assertEqual(models.TagStudyCount.objects.get_differences(), {})
+
+    def test_get_differences_with_filters(self):
+        """get_differences only looks at the requested tags and studies."""
+        other_tag = factories.TagFactory.create()
+        self.make_tagged_trait()
+        factories.TaggedTraitFactory.create(
+            tag=other_tag, trait__source_dataset__source_study_version=self.study_version)
+        models.TagStudyCount.objects.all().delete()
+        differences = models.TagStudyCount.objects.get_differences(tag_pks=[other_tag.pk])
+        self.assertEqual(differences, {(other_tag.pk, self.study.pk): (0, 1)})
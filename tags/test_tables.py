@@ -60,6 +60,18 @@ class TagTableTest(TestCase):
         row = table.rows[0]
         self.assertEqual(row.get_cell('number_tagged_traits'), 1)
 
+    def test_tagged_count_annotated(self):
+        """Tagged trait counts annotated by with_current_non_archived_trait_count don't need a query per row."""
+        tag = self.tags[0]
+        factories.TaggedTraitFactory.create_batch(3, tag=tag)
+        factories.TaggedTraitFactory.create(tag=tag, archived=True)
+        factories.TaggedTraitFactory.create(tag=tag, trait__source_dataset__source_study_version__i_is_deprecated=True)
+        table = self.table_class(self.model_class.objects.with_current_non_archived_trait_count())
+        with self.assertNumQueries(1):
+            cells = {row.record.pk: row.get_cell('number_tagged_traits') for row in table.rows}
+        self.assertEqual(cells[tag.pk], 3)
+        self.assertEqual(len([cell for cell in cells.values() if cell == 0]), 9)
+
 
 class TaggedTraitTableTest(TestCase):
     table_class = tables.TaggedTraitTable
@@ -7,7 +7,7 @@ from django.contrib.auth.models import Group
 from django.urls import reverse
 
 from core.factories import UserFactory
-from core.utils import (LoginRequiredTestCase, PhenotypeTaggerLoginTestCase, UserLoginTestCase,
+from core.utils import (LoginRequiredTestCase, PhenotypeTaggerLoginTestCase, QueryBudgetTestMixin, UserLoginTestCase,
                         DCCAnalystLoginTestCase, DCCDeveloperLoginTestCase, get_autocomplete_view_ids)
 from trait_browser.factories import SourceDatasetFactory, SourceStudyVersionFactory, SourceTraitFactory, StudyFactory
 from trait_browser.models import SourceTrait
@@ -212,6 +212,30 @@ class TagAutocompleteTest(UserLoginTestCase):
         pks = get_autocomplete_view_ids(response)
         self.assertEqual(sorted([tag.pk for tag in self.tags]), sorted(pks))
 
+    def test_unreviewed_only_excludes_archived_tagged_traits(self):
+        """Queryset does not return tags whose only unreviewed tagged traits are archived."""
+        factories.TaggedTraitFactory.create(tag=self.tags[0], archived=True)
+        url = self.get_url()
+        response = self.client.get(url, {'q': '', 'forward': ['{"unreviewed_only":true}']})
+        pks = get_autocomplete_view_ids(response)
+        self.assertEqual([], pks)
+
+    def test_unreviewed_only_updates_after_review(self):
+        """Queryset stops returning a tag once its tagged trait is reviewed."""
+        tagged_trait = factories.TaggedTraitFactory.create(tag=self.tags[0])
+        url = self.get_url()
+        response = self.client.get(url, {'q': '', 'forward': ['{"unreviewed_only":true}']})
+        self.assertEqual([self.tags[0].pk], get_autocomplete_view_ids(response))
+        factories.DCCReviewFactory.create(tagged_trait=tagged_trait)
+        response = self.client.get(url, {'q': '', 'forward': ['{"unreviewed_only":true}']})
+        self.assertEqual([], get_autocomplete_view_ids(response))
+
+    def test_query_with_regex_characters(self):
+        """Queryset treats regular expression characters in the query literally."""
+        response = self.client.get(self.get_url(), {'q': '.*'})
+        pks = get_autocomplete_view_ids(response)
+        self.assertEqual([], pks)
+
 
 class TagListTest(UserLoginTestCase):
 
@@ -2016,6 +2040,60 @@ class TaggedTraitDetailOtherUserTest(UserLoginTestCase):
         self.assertEqual(response.status_code, 403)
 
 
+class TaggedTraitDetailQueryBudgetTestsMixin(QueryBudgetTestMixin):
+    """Mixin to check the number of queries run by the TaggedTraitDetail view."""
+
+    query_budget = None
+
+    def get_url(self, *args):
+        return reverse('tags:tagged-traits:pk:detail', args=args)
+
+    def setUp(self):
+        super().setUp()
+        if self.user.profile.taggable_studies.count() > 0:
+            self.user_study = self.study
+        else:
+            self.user_study = StudyFactory.create()
+        self.tagged_trait = factories.TaggedTraitFactory.create(
+            trait__source_dataset__source_study_version__study=self.user_study)
+
+    def test_unreviewed_query_budget(self):
+        """The view runs no more than the query budget for an unreviewed tagged trait."""
+        with self.assertMaxNumQueries(self.query_budget):
+            response = self.client.get(self.get_url(self.tagged_trait.pk))
+        self.assertEqual(response.status_code, 200)
+
+    def test_followup_with_response_and_decision_query_budget(self):
+        """The view runs no more than the query budget for a tagged trait with a review, response, and decision."""
+        dcc_review = factories.DCCReviewFactory.create(
+            tagged_trait=self.tagged_trait, status=models.DCCReview.STATUS_FOLLOWUP)
+        factories.StudyResponseFactory.create(dcc_review=dcc_review, status=models.StudyResponse.STATUS_DISAGREE)
+        factories.DCCDecisionFactory.create(dcc_review=dcc_review, decision=models.DCCDecision.DECISION_CONFIRM)
+        with self.assertMaxNumQueries(self.query_budget):
+            response = self.client.get(self.get_url(self.tagged_trait.pk))
+        self.assertEqual(response.status_code, 200)
+
+    def test_deprecated_query_budget(self):
+        """The view runs no more than the query budget for a tagged trait with a newer version."""
+        self.tagged_trait.trait.source_dataset.source_study_version.i_is_deprecated = True
+        self.tagged_trait.trait.source_dataset.source_study_version.save()
+        # Looking up the newer version of the tagged trait takes two extra queries.
+        with self.assertMaxNumQueries(self.query_budget + 2):
+            response = self.client.get(self.get_url(self.tagged_trait.pk))
+        self.assertEqual(response.status_code, 200)
+
+
+class TaggedTraitDetailQueryBudgetPhenotypeTaggerTest(TaggedTraitDetailQueryBudgetTestsMixin,
+                                                      PhenotypeTaggerLoginTestCase):
+
+    query_budget = 8
+
+
+class TaggedTraitDetailQueryBudgetDCCAnalystTest(TaggedTraitDetailQueryBudgetTestsMixin, DCCAnalystLoginTestCase):
+
+    query_budget = 7
+
+
 class TaggedTraitTagCountsByStudyTest(UserLoginTestCase):
 
     def setUp(self):
@@ -20,6 +20,7 @@ from django_tables2 import SingleTableMixin
 from core.utils import SessionVariableMixin, ValidateObjectMixin
 from trait_browser.models import Study
 
+from . import caches
 from . import forms
 from . import models
 from . import tables
@@ -58,7 +59,7 @@ class SpecificTaggableStudyRequiredMixin(UserPassesTestMixin):
         if self.allow_staff and user.is_staff:
             return True
         else:
-            return self.study in user.profile.taggable_studies.all()
+            return user.profile.taggable_studies.filter(pk=self.study.pk).exists()
 
 
 class TagDetail(LoginRequiredMixin, DetailView):
@@ -69,17 +70,15 @@ class TagDetail(LoginRequiredMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         context = super(TagDetail, self).get_context_data(**kwargs)
-        study_counts = models.TaggedTrait.objects.non_archived().current().filter(
+        study_counts = models.TagStudyCount.objects.filter(
             tag=self.object
         ).values(
-            study_name=F('trait__source_dataset__source_study_version__study__i_study_name'),
-            study_pk=F('trait__source_dataset__source_study_version__study__pk')
-        ).annotate(
-            tt_count=Count('pk')
-        ).values(
-            'study_name', 'study_pk', 'tt_count').order_by('study_name')
+            'tt_count',
+            study_name=F('study__i_study_name'),
+            study_pk=F('study__pk')
+        ).order_by('study_name')
         context['study_counts'] = study_counts
-        context['traits_tagged_count'] = self.object.current_non_archived_traits.count()
+        context['traits_tagged_count'] = sum(study['tt_count'] for study in study_counts)
         return context
 
 
@@ -87,18 +86,17 @@ class TagAutocomplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
     """View for autocompleting tag model choice fields by title in a form. Case-insensitive.
 
     Forwarded arguments:
-        unreviewed_only: bool; if true, filters tags to those with unreviewed tagged traits
+        unreviewed_only: bool; if true, filters tags to those with current, unreviewed, non-archived tagged traits
     """
 
     def get_queryset(self):
         retrieved = models.Tag.objects.all()
-        # Filter to tags with unreviewed tagged traits.
+        # Filter to tags with unreviewed tagged traits, using the cached index instead of querying TaggedTrait.
         unreviewed_only = self.forwarded.get('unreviewed_only', None)
-        tag_pks = models.TaggedTrait.objects.unreviewed().values_list('tag__pk', flat=True).distinct()
         if unreviewed_only:
-            retrieved = retrieved.filter(pk__in=tag_pks)
+            retrieved = retrieved.filter(pk__in=caches.get_unreviewed_tag_pks())
         if self.q:
-            retrieved = retrieved.filter(lower_title__iregex=r'^{}'.format(self.q))
+            retrieved = retrieved.filter(lower_title__startswith=self.q.lower())
         return retrieved
 
 
@@ -109,6 +107,9 @@ class TagList(LoginRequiredMixin, SingleTableMixin, ListView):
     context_table_name = 'tag_table'
     table_pagination = {'per_page': TABLE_PER_PAGE * 2}
 
+    def get_table_data(self):
+        return models.Tag.objects.with_current_non_archived_trait_count()
+
 
 class TaggedTraitDetail(LoginRequiredMixin, PermissionRequiredMixin, SpecificTaggableStudyRequiredMixin, DetailView):
 
@@ -120,10 +121,22 @@ class TaggedTraitDetail(LoginRequiredMixin, PermissionRequiredMixin, SpecificTag
     allow_staff = True
     permission_required = 'tags.add_taggedtrait'
 
+    def get_queryset(self):
+        # Retrieve everything the page shows about the tagged trait and its review in one query.
+        return super(TaggedTraitDetail, self).get_queryset().select_related(
+            'trait__source_dataset__source_study_version__study', 'tag', 'creator',
+            'dcc_review__study_response', 'dcc_review__dcc_decision'
+        )
+
+    def get_object(self, queryset=None):
+        # The object is already retrieved in set_study(), before the view's get() method runs.
+        if queryset is None and getattr(self, 'object', None) is not None:
+            return self.object
+        return super(TaggedTraitDetail, self).get_object(queryset=queryset)
+
     def get_context_data(self, **kwargs):
         context = super(TaggedTraitDetail, self).get_context_data(**kwargs)
-        user_studies = list(self.request.user.profile.taggable_studies.all())
-        user_is_study_tagger = self.object.trait.source_dataset.source_study_version.study in user_studies
+        user_is_study_tagger = self.request.user.profile.taggable_studies.filter(pk=self.study.pk).exists()
         user_is_staff = self.request.user.is_staff
         user_has_study_access = user_is_staff or user_is_study_tagger
         is_non_archived = not self.object.archived
@@ -187,7 +200,8 @@ class TaggedTraitDetail(LoginRequiredMixin, PermissionRequiredMixin, SpecificTag
         return context
 
     def set_study(self):
-        self.study = self.get_object().trait.source_dataset.source_study_version.study
+        self.object = self.get_object()
+        self.study = self.object.trait.source_dataset.source_study_version.study
 
 
 class TaggedTraitTagCountsByStudy(LoginRequiredMixin, TemplateView):
@@ -196,14 +210,12 @@ class TaggedTraitTagCountsByStudy(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super(TaggedTraitTagCountsByStudy, self).get_context_data(**kwargs)
-        annotated_studies = models.TaggedTrait.objects.non_archived().current().values(
-            study_name=F('trait__source_dataset__source_study_version__study__i_study_name'),
-            study_pk=F('trait__source_dataset__source_study_version__study__pk'),
+        annotated_studies = models.TagStudyCount.objects.values(
+            'tt_count',
+            study_name=F('study__i_study_name'),
+            study_pk=F('study__pk'),
             tag_name=F('tag__title'),
-            tag_pk=F('tag__pk')).annotate(
-                tt_count=Count('pk')).values(
-                    'study_name', 'study_pk', 'tag_name', 'tt_count', 'tag_pk').order_by(
-                        'study_name', 'tag_name')
+            tag_pk=F('tag__pk')).order_by('study_name', 'tag_name')
         grouped_annotated_studies = groupby(annotated_studies,
                                             lambda x: {'study_name': x['study_name'], 'study_pk': x['study_pk']})
         grouped_annotated_studies = [(key, list(group)) for key, group in grouped_annotated_studies]
@@ -217,14 +229,12 @@ class TaggedTraitStudyCountsByTag(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super(TaggedTraitStudyCountsByTag, self).get_context_data(**kwargs)
-        annotated_tags = models.TaggedTrait.objects.non_archived().current().values(
-            study_name=F('trait__source_dataset__source_study_version__study__i_study_name'),
-            study_pk=F('trait__source_dataset__source_study_version__study__pk'),
+        annotated_tags = models.TagStudyCount.objects.values(
+            'tt_count',
+            study_name=F('study__i_study_name'),
+            study_pk=F('study__pk'),
             tag_name=F('tag__title'),
-            tag_pk=F('tag__pk')).annotate(
-                tt_count=Count('pk')).values(
-                    'study_name', 'study_pk', 'tag_name', 'tt_count', 'tag_pk').order_by(
-                        'tag_name', 'study_name')
+            tag_pk=F('tag__pk')).order_by('tag_name', 'study_name')
         grouped_annotated_tags = groupby(annotated_tags, lambda x: {'tag_name': x['tag_name'], 'tag_pk': x['tag_pk']})
         grouped_annotated_tags = [(key, list(group)) for key, group in grouped_annotated_tags]
         context['taggedtrait_study_counts_by_tag'] = grouped_annotated_tags
@@ -619,7 +629,8 @@ class DCCReviewByTagAndStudyNext(LoginRequiredMixin, PermissionRequiredMixin, Se
             pk = self.pks[0]
             # Check to see if the tagged trait has been deleted since starting the loop.
             try:
-                tt = models.TaggedTrait.objects.get(pk=pk)
+                tt = models.TaggedTrait.objects.select_related(
+                    'trait__source_dataset__source_study_version', 'dcc_review').get(pk=pk)
             except ObjectDoesNotExist:
                 self._skip_next_tagged_trait()
                 return reverse('tags:tagged-traits:dcc-review:next')
@@ -687,7 +698,10 @@ class DCCReviewByTagAndStudy(LoginRequiredMixin, PermissionRequiredMixin, Sessio
         if 'pk' not in session_info:
             return HttpResponseRedirect(reverse('tags:tagged-traits:dcc-review:next'))
         pk = session_info.get('pk')
-        self.tagged_trait = get_object_or_404(models.TaggedTrait, pk=pk)
+        self.tagged_trait = get_object_or_404(
+            models.TaggedTrait.objects.select_related(
+                'tag', 'trait__source_dataset__source_study_version__study', 'dcc_review'),
+            pk=pk)
 
     def _update_session_variables(self):
         """Update session variables used in this series of views."""
@@ -1140,7 +1154,7 @@ class TaggedTraitsNeedDCCDecisionSummary(LoginRequiredMixin, GroupRequiredMixin,
         # Tagged traits without study responses are not included.
         disagree_responses = models.StudyResponse.objects.filter(
             status=models.StudyResponse.STATUS_DISAGREE,
-            dcc_review__tagged_trait__trait__source_dataset__source_study_version__i_is_deprecated=False
+            dcc_review__tagged_trait__is_current=True
         ).values(
             study_name=F('dcc_review__tagged_trait__trait__source_dataset__source_study_version__study__i_study_name'),
             study_pk=F('dcc_review__tagged_trait__trait__source_dataset__source_study_version__study__i_accession'),
@@ -1286,7 +1300,7 @@ class DCCDecisionByTagAndStudySelectFromURL(LoginRequiredMixin, PermissionRequir
             dcc_review__dcc_decision__isnull=True,
             dcc_review__tagged_trait__tag=tag,
             dcc_review__tagged_trait__trait__source_dataset__source_study_version__study=study,
-            dcc_review__tagged_trait__trait__source_dataset__source_study_version__i_is_deprecated=False
+            dcc_review__tagged_trait__is_current=True
         )
         session_data = {
             'study_pk': study.pk,
@@ -0,0 +1,153 @@
+"""Resolve many dbGaP accessions to studies, datasets, and variables at once.
+
+Accessions may be given in any of the formats the lookup pages accept: with or
+without the phs, pht, or phv prefix, with or without zero padding, and with or
+without a version (e.g. phv00000507.v1.p1, phv507, 00000507, or 507). Accessions
+without a prefix are taken to be of a default type. The accessions are resolved in
+chunks, with one query for each type of accession in a chunk, and the results are
+generated in the same order as the accessions, so that they can be streamed back.
+
+Each result says whether the accession was found in a current (non-deprecated)
+study version, only in deprecated study versions, not found, or could not be
+parsed, and maps the accession to the latest version of the object in the catalog.
+"""
+
+from collections import OrderedDict
+from itertools import islice
+import re
+
+from django.apps import apps
+from django.urls import reverse
+
+
+# Number of accessions to resolve with each set of queries; small enough for the query parameter limit of SQLite.
+ACCESSION_CHUNK_SIZE = 500
+ACCESSION_REGEX = re.compile(r'^(ph[stv])?0*(\d+)(?:\.v(\d+))?(?:\.p\d+)?$', re.IGNORECASE)
+# Characters that separate accessions in pasted text.
+ACCESSION_SEPARATOR_REGEX = re.compile(r'[\s,;]+')
+
+ACCESSION_TYPES = OrderedDict((('phs', 'study'), ('pht', 'dataset'), ('phv', 'variable')))
+STATUS_CURRENT = 'current'
+STATUS_DEPRECATED = 'deprecated'
+STATUS_NOT_FOUND = 'not found'
+STATUS_INVALID = 'invalid'
+RESULT_FIELDS = ('query', 'status', 'type', 'accession', 'version', 'full_accession', 'name', 'study_accession',
+                 'study_name', 'study_version', 'url', 'latest_version', 'latest_full_accession', 'latest_url')
+
+# Tuple format: (model name, accession lookup, version lookup, name lookup, lookup prefix of the study version,
+#                name of the detail url, lookup of the pk for the detail url)
+_ACCESSION_MODELS = {
+    'phs': ('SourceStudyVersion', 'study_id', 'i_version', 'study__i_study_name', '',
+            'trait_browser:source:studies:pk:detail', 'study_id'),
+    'pht': ('SourceDataset', 'i_accession', 'i_version', 'dataset_name', 'source_study_version__',
+            'trait_browser:source:datasets:detail', 'pk'),
+    'phv': ('SourceTrait', 'i_dbgap_variable_accession', 'i_dbgap_variable_version', 'i_trait_name',
+            'source_dataset__source_study_version__', 'trait_browser:source:traits:detail', 'pk'),
+}
+
+
+def split_accessions(text):
+    """Return a list of the accessions in text, separated by whitespace, commas, or semicolons."""
+    return [accession for accession in ACCESSION_SEPARATOR_REGEX.split(text) if accession]
+
+
+def parse_accession(accession, default_prefix=None):
+    """Return a tuple of the prefix, number, and version (or None) of accession, or None if it can't be parsed.
+
+    Arguments:
+        accession -- str; a dbGaP accession, in any of the supported formats
+        default_prefix -- str; prefix to use for accessions without one, or None if a prefix is required
+    """
+    match = ACCESSION_REGEX.match(accession.strip())
+    if match is None:
+        return None
+    prefix, number, version = match.groups()
+    prefix = prefix.lower() if prefix is not None else default_prefix
+    if prefix is None:
+        return None
+    return (prefix, int(number), int(version) if version is not None else None)
+
+
+def _get_catalog_rows(prefix, numbers):
+    """Return a dict of lists of the catalog rows for each accession number of one type."""
+    model_name, accession_lookup, version_lookup, name_lookup, study_version_prefix, url_name, url_pk_lookup = \
+        _ACCESSION_MODELS[prefix]
+    model = apps.get_model('trait_browser', model_name)
+    rows = model.objects.filter(**{accession_lookup + '__in': numbers}).values_list(
+        accession_lookup, version_lookup, 'full_accession', name_lookup, study_version_prefix + 'study_id',
+        study_version_prefix + 'study__i_study_name', study_version_prefix + 'i_version',
+        study_version_prefix + 'i_is_deprecated', study_version_prefix + 'i_date_added', url_pk_lookup)
+    rows_by_number = {}
+    for (number, version, full_accession, name, study_accession, study_name, study_version, is_deprecated,
+         study_version_added, url_pk) in rows:
+        rows_by_number.setdefault(number, []).append({
+            'version': version, 'full_accession': full_accession, 'name': name, 'study_accession': study_accession,
+            'study_name': study_name, 'study_version': study_version, 'is_deprecated': is_deprecated,
+            'study_version_added': study_version_added, 'url': reverse(url_name, args=[url_pk]),
+        })
+    return rows_by_number
+
+
+def _get_sort_key(row):
+    """Order catalog rows as the get_latest_version methods do, with rows from current study versions last."""
+    return (not row['is_deprecated'], row['study_version'], row['study_version_added'])
+
+
+def _make_result(query, parsed, rows):
+    """Return an OrderedDict of the RESULT_FIELDS for one accession, from all of the catalog rows with its number."""
+    result = OrderedDict((field, None) for field in RESULT_FIELDS)
+    result['query'] = query
+    if parsed is None:
+        result['status'] = STATUS_INVALID
+        return result
+    prefix, number, version = parsed
+    result['type'] = ACCESSION_TYPES[prefix]
+    result['accession'] = '{}{:0{}}'.format(prefix, number, 8 if prefix == 'phv' else 6)
+    result['version'] = version
+    current_rows = [row for row in rows if not row['is_deprecated']]
+    if current_rows:
+        latest = max(current_rows, key=_get_sort_key)
+        result['latest_version'] = latest['version']
+        result['latest_full_accession'] = latest['full_accession']
+        result['latest_url'] = latest['url']
+    if version is not None:
+        rows = [row for row in rows if row['version'] == version]
+    if not rows:
+        result['status'] = STATUS_NOT_FOUND
+        return result
+    match = max(rows, key=_get_sort_key)
+    result['status'] = STATUS_DEPRECATED if match['is_deprecated'] else STATUS_CURRENT
+    for field in ('version', 'full_accession', 'name', 'study_accession', 'study_name', 'study_version', 'url'):
+        result[field] = match[field]
+    return result
+
+
+def resolve_accessions(accessions, default_prefix=None, chunk_size=ACCESSION_CHUNK_SIZE):
+    """Generate an OrderedDict of the RESULT_FIELDS for each accession, in the same order as accessions.
+
+    An accession with a version is resolved to the catalog object with that version,
+    from the latest study version it is in. Accessions without a version
+    are resolved to the object in the current study version, or if there isn't one,
+    the latest deprecated study version. The latest_* fields are for the object in
+    the current study version, even if the version of the accession is not found,
+    and are None if the accession is not in the current study version.
+
+    Arguments:
+        accessions -- iterable of str; dbGaP accessions, in any of the supported formats
+        default_prefix -- str; 'phs', 'pht', or 'phv' for accessions without a prefix, or None if they are invalid
+        chunk_size -- int; number of accessions to resolve with each set of queries
+    """
+    accessions = iter(accessions)
+    while True:
+        chunk = list(islice(accessions, chunk_size))
+        if not chunk:
+            return
+        parsed = [parse_accession(accession, default_prefix=default_prefix) for accession in chunk]
+        catalog_rows = {}
+        for prefix in ACCESSION_TYPES:
+            numbers = set(accession[1] for accession in parsed if accession is not None and accession[0] == prefix)
+            if numbers:
+                catalog_rows[prefix] = _get_catalog_rows(prefix, numbers)
+        for query, accession in zip(chunk, parsed):
+            rows = catalog_rows[accession[0]].get(accession[1], []) if accession is not None else []
+            yield _make_result(query, accession, rows)
@@ -2,10 +2,19 @@
 
 from django.contrib import admin
 from django.contrib.sites.models import Site
+from django.db.models import Count, Sum
+
+from core.admin import LargeTableAdminMixin
 
 from . import models
 
 
+# Patterns of search terms for exact lookups by LargeTableAdminMixin.
+ID_SEARCH_PATTERN = r'(\d+)'
+PHT_SEARCH_PATTERN = r'pht(\d+)(?:\.v\d+(?:\.p\d+)?)?'
+PHV_SEARCH_PATTERN = r'phv(\d+)(?:\.v\d+(?:\.p\d+)?)?'
+
+
 class GlobalStudyAdmin(admin.ModelAdmin):
     """Admin class for GlobalStudy objects."""
 
@@ -14,6 +23,9 @@ class GlobalStudyAdmin(admin.ModelAdmin):
                     'modified', )
     search_fields = ('i_id', 'i_name', )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('study_set')
+
     def get_linked_studies(self, global_study):
         """Get the names of the Study objects linked to this GlobalStudy.
 
@@ -32,6 +44,7 @@ class StudyAdmin(admin.ModelAdmin):
 
     # Set fields to display, filter, and search on.
     list_display = ('i_accession', 'i_study_name', 'get_global_study', 'created', 'modified', )
+    list_select_related = ('global_study', )
     list_filter = ('global_study__i_name', )
     search_fields = ('i_accession', 'i_study_name', )
 
@@ -49,6 +62,7 @@ class SourceStudyVersionAdmin(admin.ModelAdmin):
         'i_id', 'study', 'i_version', 'i_is_prerelease', 'i_is_deprecated', 'full_accession', 'created',
         'modified',
     )
+    list_select_related = ('study', )
     list_filter = ('study__i_accession', 'i_is_prerelease', 'i_is_deprecated', )
     search_fields = ('i_id', 'full_accession', )
 
@@ -58,20 +72,25 @@ class SubcohortAdmin(admin.ModelAdmin):
 
     # Set fields to display, filter, and search on.
     list_display = ('i_id', 'i_name', 'global_study', 'created', 'modified', )
+    list_select_related = ('global_study', )
     list_filter = ('global_study__i_name', 'global_study__i_id', )
     search_fields = ('i_id', 'i_name', )
 
 
-class SourceDatasetAdmin(admin.ModelAdmin):
+class SourceDatasetAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """Admin class for SourceDataset objects."""
 
     # Set fields to display, filter, and search on.
     list_display = ('i_id', 'dataset_name', 'i_dbgap_description', 'full_accession',
                     'created', 'modified', )
+    list_select_related = ()
     list_filter = ('source_study_version__study__i_accession',
                    'source_study_version__study__global_study__i_name',
                    'i_is_subject_file', )
-    search_fields = ('i_id', 'i_accession', 'dataset_name', 'full_accession', )
+    search_fields = ('^dataset_name', )
+    exact_search_patterns = ((ID_SEARCH_PATTERN, 'pk'), (PHT_SEARCH_PATTERN, 'i_accession'), )
+    full_text_search = True
+    raw_id_fields = ('source_study_version', )
 
 
 class HarmonizedTraitSetAdmin(admin.ModelAdmin):
@@ -97,8 +116,9 @@ class HarmonizedTraitSetVersionAdmin(admin.ModelAdmin):
 
     # Set fields to display, filter, and search on.
     list_display = ('i_id', 'i_version', 'i_harmonized_by', 'i_is_deprecated', 'created', 'modified', )
+    list_select_related = ('harmonized_trait_set', )
     list_filter = ('i_harmonized_by', 'i_is_deprecated', 'i_version', )
-    search_fields = ('i_id', 'i_trait_set_name', )
+    search_fields = ('i_id', 'harmonized_trait_set__i_trait_set_name', )
 
 
 class HarmonizationUnitAdmin(admin.ModelAdmin):
@@ -110,45 +130,135 @@ class HarmonizationUnitAdmin(admin.ModelAdmin):
     search_fields = ('i_id', 'i_tag', )
 
 
-class SourceTraitAdmin(admin.ModelAdmin):
+class SourceTraitAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """Admin class for SourceTrait objects."""
 
     # Set fields to display, filter, and search on.
     list_display = ('i_trait_id', 'i_trait_name', 'full_accession', 'i_description',
                     'i_is_unique_key', 'created', 'modified')
+    list_select_related = ()
     list_filter = ('source_dataset__source_study_version__study__i_accession',
                    'source_dataset__source_study_version__study__global_study__i_name',
                    'i_is_unique_key', )
-    search_fields = ('i_trait_id', 'i_trait_name', 'i_description', 'full_accession', )
+    search_fields = ('^i_trait_name', )
+    exact_search_patterns = ((ID_SEARCH_PATTERN, 'pk'), (PHV_SEARCH_PATTERN, 'i_dbgap_variable_accession'), )
+    full_text_search = True
+    raw_id_fields = ('source_dataset', 'encoded_value_set', )
 
 
-class HarmonizedTraitAdmin(admin.ModelAdmin):
+class HarmonizedTraitAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """Admin class for HarmonizedTrait objects."""
 
     # Set fields to display, filter, and search on.
     list_display = ('i_trait_id', 'i_trait_name', 'i_description', 'created', 'modified', )
+    list_select_related = ()
     list_filter = ('i_is_unique_key', )
-    search_fields = ('i_trait_id', 'i_trait_name', 'i_description',
-                     'harmonized_trait_set__i_trait_set_name', )
+    search_fields = ('^i_trait_name', '^harmonized_trait_set_version__harmonized_trait_set__i_trait_set_name', )
+    exact_search_patterns = ((ID_SEARCH_PATTERN, 'pk'), )
+    full_text_search = True
+    raw_id_fields = ('harmonized_trait_set_version', 'component_source_traits', 'component_batch_traits',
+                     'component_harmonized_trait_set_versions', 'harmonization_units', 'encoded_value_set', )
 
 
-class SourceTraitEncodedValueAdmin(admin.ModelAdmin):
+class SourceTraitEncodedValueAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """Admin class for SourceTraitEncodedValue objects."""
 
     # Set fields to display, filter, and search on.
     list_display = ('i_id', 'i_category', 'i_value', 'source_trait', 'created', 'modified', )
+    # source_trait.__str__ shows the dataset accession.
+    list_select_related = ('source_trait__source_dataset', )
     # There are too many traits with encoded values to use trait as a filter.
     list_filter = ('source_trait__source_dataset__source_study_version__study__i_accession',
                    'source_trait__source_dataset__source_study_version__study__global_study__i_name', )
-    search_fields = ('i_id', 'i_category', 'i_value', 'source_trait__i_trait_name')
+    search_fields = ('^source_trait__i_trait_name', )
+    exact_search_patterns = ((ID_SEARCH_PATTERN, 'pk'),
+                             (PHV_SEARCH_PATTERN, 'source_trait__i_dbgap_variable_accession'), )
+    raw_id_fields = ('source_trait', )
 
 
-class HarmonizedTraitEncodedValueAdmin(admin.ModelAdmin):
+class HarmonizedTraitEncodedValueAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """Admin class for HarmonizedTraitEncodedValue objects."""
 
     # Set fields to display, filter, and search on.
     list_display = ('i_id', 'i_category', 'i_value', 'harmonized_trait', 'created', 'modified', )
-    search_fields = ('i_id', 'i_category', 'i_value', 'harmonized_trait__i_trait_name', )
+    list_select_related = ('harmonized_trait', )
+    search_fields = ('^harmonized_trait__i_trait_name', )
+    exact_search_patterns = ((ID_SEARCH_PATTERN, 'pk'), )
+    raw_id_fields = ('harmonized_trait', )
+
+
+class EncodedValueSetAdmin(admin.ModelAdmin):
+    """Admin class for EncodedValueSet objects."""
+
+    # Set fields to display, filter, and search on.
+    list_display = ('pk', 'content_hash', 'encoded_values', 'created', 'modified', )
+    search_fields = ('=content_hash', )
+    # Sets are only made by import_db, from the encoded values of traits.
+    readonly_fields = ('content_hash', 'encoded_values', )
+
+
+class ImportCheckpointInline(admin.TabularInline):
+    """Inline for the completed phases of an ImportRun, with their timings."""
+
+    model = models.ImportCheckpoint
+    fields = ('phase', 'seconds', 'source_rows', 'source_rows_per_second', 'rows_written', 'queries', 'created', )
+    readonly_fields = fields
+    ordering = ('pk', )
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request):
+        return False
+
+
+class ImportRunAdmin(admin.ModelAdmin):
+    """Admin class for ImportRun objects."""
+
+    # Set fields to display, filter, and search on.
+    list_display = ('pk', 'created', 'finished', 'get_phases', 'get_seconds', 'get_source_rows', 'get_rows_written',
+                    'get_queries', )
+    readonly_fields = ('created', 'finished', )
+    inlines = (ImportCheckpointInline, )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            phases=Count('checkpoints'), seconds=Sum('checkpoints__seconds'),
+            source_rows=Sum('checkpoints__source_rows'), rows_written=Sum('checkpoints__rows_written'),
+            queries=Sum('checkpoints__queries'))
+
+    def has_add_permission(self, request):
+        # Runs are only made by import_db.
+        return False
+
+    def get_phases(self, import_run):
+        """Get the number of completed phases."""
+        return import_run.phases
+    get_phases.short_description = 'phases'
+    get_phases.admin_order_field = 'phases'
+
+    def get_seconds(self, import_run):
+        """Get the seconds spent in the completed phases."""
+        return '{:.1f}'.format(import_run.seconds or 0)
+    get_seconds.short_description = 'seconds'
+    get_seconds.admin_order_field = 'seconds'
+
+    def get_source_rows(self, import_run):
+        """Get the number of rows read from the source db."""
+        return import_run.source_rows or 0
+    get_source_rows.short_description = 'source rows'
+    get_source_rows.admin_order_field = 'source_rows'
+
+    def get_rows_written(self, import_run):
+        """Get the number of rows written to the Django db."""
+        return import_run.rows_written or 0
+    get_rows_written.short_description = 'rows written'
+    get_rows_written.admin_order_field = 'rows_written'
+
+    def get_queries(self, import_run):
+        """Get the number of queries run on the Django db."""
+        return import_run.queries or 0
+    get_queries.short_description = 'queries'
+    get_queries.admin_order_field = 'queries'
 
 
 # Register models for showing them in the admin interface.
@@ -165,5 +275,7 @@ admin.site.register(models.SourceTrait, SourceTraitAdmin)
 admin.site.register(models.HarmonizedTrait, HarmonizedTraitAdmin)
 admin.site.register(models.SourceTraitEncodedValue, SourceTraitEncodedValueAdmin)
 admin.site.register(models.HarmonizedTraitEncodedValue, HarmonizedTraitEncodedValueAdmin)
+admin.site.register(models.EncodedValueSet, EncodedValueSetAdmin)
+admin.site.register(models.ImportRun, ImportRunAdmin)
 
 admin.site.unregister(Site)
@@ -0,0 +1,83 @@
+"""Validators for conditional GETs and cached html of the catalog pages.
+
+The study, dataset, source trait, and harmonized trait pages only change when
+import_db imports a new release, or when the tagging of the study or trait changes,
+so each page has a version made from the latest ImportGeneration, the tagging state
+of its object, and the role of the user who is viewing it. The version is used both
+for the ETag of the page, so that browsers get a 304 response without the view
+being run when nothing has changed, and for the keys of the sections of the page
+that are cached server side (see the cache_section template tag), which are shared
+by all users with the same role.
+"""
+
+from hashlib import md5
+import json
+
+from django.apps import apps
+from django.db.models import Count, DateTimeField, Exists, IntegerField, Max, OuterRef, Subquery, Sum
+
+
+ROLE_STAFF = 'staff'
+ROLE_STUDY_TAGGER = 'study_tagger'
+ROLE_USER = 'user'
+
+
+def get_page_state_queryset(queryset, user, tagged_traits_path=None, tag_counts_path=None, study_path=None):
+    """Return queryset as values, annotated with everything the version of a catalog page depends on.
+
+    The whole state of the page is got in one query, since it is run for every view
+    of the page. Each row has the modified time of the object, the pk and created
+    time of the latest ImportGeneration (None if there has not been an import since
+    they were added), counts and latest modified times of the object's tagged traits
+    and their tags and reviews if tagged_traits_path is given, the total, number, and
+    latest modified time of the object's TagStudyCounts if tag_counts_path is given,
+    and whether user can tag the object's study if study_path is given. Counts of the
+    tagged traits and their reviews are exact, because each tagged trait has at most
+    one of each kind of review.
+
+    Arguments:
+        queryset -- QuerySet; objects of the model of the page
+        user -- User; the user who is viewing the page
+        tagged_traits_path -- str; lookup path from the model to its TaggedTraits, or None
+        tag_counts_path -- str; lookup path from the model to its TagStudyCounts, or None
+        study_path -- str; lookup path from the model to the pk of its Study, or None
+    """
+    generations = apps.get_model('trait_browser', 'ImportGeneration').objects.order_by('-pk')
+    queryset = queryset.values('modified').annotate(
+        generation_pk=Subquery(generations.values('pk')[:1], output_field=IntegerField()),
+        generation_created=Subquery(generations.values('created')[:1], output_field=DateTimeField()))
+    if tagged_traits_path is not None:
+        def tagged(path):
+            return '{}__{}'.format(tagged_traits_path, path)
+        queryset = queryset.annotate(
+            n_tagged_traits=Count(tagged('pk')), tagged_traits_modified=Max(tagged('modified')),
+            tags_modified=Max(tagged('tag__modified')),
+            n_reviews=Count(tagged('dcc_review')), reviews_modified=Max(tagged('dcc_review__modified')),
+            n_responses=Count(tagged('dcc_review__study_response')),
+            responses_modified=Max(tagged('dcc_review__study_response__modified')),
+            n_decisions=Count(tagged('dcc_review__dcc_decision')),
+            decisions_modified=Max(tagged('dcc_review__dcc_decision__modified')))
+    if tag_counts_path is not None:
+        # Much cheaper than aggregating over all of the tagged traits of a study.
+        queryset = queryset.annotate(
+            n_tagged_traits=Sum('{}__tt_count'.format(tag_counts_path)), n_tags=Count(tag_counts_path),
+            tag_counts_modified=Max('{}__modified'.format(tag_counts_path)))
+    if study_path is not None:
+        taggable = apps.get_model('profiles', 'Profile').objects.filter(
+            user=user.pk, taggable_studies=OuterRef(study_path))
+        queryset = queryset.annotate(is_study_tagger=Exists(taggable))
+    return queryset
+
+
+def get_user_role(user, page_state):
+    """Return the role of user on a page with page_state, which determines which buttons are shown."""
+    if user.is_staff:
+        return ROLE_STAFF
+    if page_state.get('is_study_tagger'):
+        return ROLE_STUDY_TAGGER
+    return ROLE_USER
+
+
+def get_page_version(*parts):
+    """Return a hash of parts, which must be json serializable apart from datetimes."""
+    return md5(json.dumps(parts, default=str, sort_keys=True).encode('utf-8')).hexdigest()
@@ -0,0 +1,371 @@
+"""Typed, columnar snapshots of the phenotype catalog.
+
+A catalog snapshot is a directory with a schema.json file and one subdirectory per
+table (studies, source traits, tagged traits, etc.). Each column of a table is
+stored in one or more flat, uncompressed binary files, so downstream consumers can
+memory map them (e.g. with numpy.memmap, using the dtypes in the schema) instead
+of parsing text. Column types are stored as:
+
+    int -- 64-bit little-endian integers ('<i8')
+    bool -- one byte per value, 0 or 1 ('|u1')
+    datetime -- 64-bit little-endian microseconds since the epoch, in UTC ('<M8[us]')
+    str -- a utf-8 data file, plus 64-bit offsets of the start of each value and the end of the last one
+    category -- 32-bit codes ('<i4') into a dictionary of distinct values, which is stored as a str column
+
+Columns of the int, bool, datetime, and str types that have any null values also have a
+'valid' file, with one byte per value that is 0 for nulls. Null values of category
+columns have the code -1 (NULL_CODE), which is not in the dictionary.
+
+Rows are retrieved from the database in chunks of primary keys, so memory use does
+not grow with the size of the catalog.
+"""
+
+from array import array
+import datetime
+import json
+import mmap
+import os
+import sys
+
+from django.apps import apps
+from django.utils import timezone
+
+
+FORMAT_VERSION = 2
+SCHEMA_FILE = 'schema.json'
+# Number of rows to retrieve from the db at a time.
+CATALOG_CHUNK_SIZE = 10000
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=timezone.utc)
+# Code of null values in category columns.
+NULL_CODE = -1
+
+# Tuple format: ('table name', 'app_label.ModelName', (('column name', 'field__lookup', 'column type'), ...))
+CATALOG_TABLES = (
+    ('studies', 'trait_browser.Study', (
+        ('accession', 'pk', 'int'),
+        ('name', 'i_study_name', 'str'),
+        ('phs', 'phs', 'str'),
+        ('global_study_id', 'global_study_id', 'int'),
+        ('global_study_name', 'global_study__i_name', 'category'),
+    )),
+    ('source_study_versions', 'trait_browser.SourceStudyVersion', (
+        ('id', 'pk', 'int'),
+        ('study_accession', 'study_id', 'int'),
+        ('study_name', 'study__i_study_name', 'category'),
+        ('version', 'i_version', 'int'),
+        ('participant_set', 'i_participant_set', 'int'),
+        ('dbgap_date', 'i_dbgap_date', 'datetime'),
+        ('is_prerelease', 'i_is_prerelease', 'bool'),
+        ('is_deprecated', 'i_is_deprecated', 'bool'),
+        ('full_accession', 'full_accession', 'str'),
+    )),
+    ('source_datasets', 'trait_browser.SourceDataset', (
+        ('id', 'pk', 'int'),
+        ('source_study_version_id', 'source_study_version_id', 'int'),
+        ('study_accession', 'source_study_version__study_id', 'int'),
+        ('study_name', 'source_study_version__study__i_study_name', 'category'),
+        ('study_version', 'source_study_version__i_version', 'int'),
+        ('is_deprecated', 'source_study_version__i_is_deprecated', 'bool'),
+        ('accession', 'i_accession', 'int'),
+        ('version', 'i_version', 'int'),
+        ('is_subject_file', 'i_is_subject_file', 'bool'),
+        ('name', 'dataset_name', 'str'),
+        ('description', 'i_dbgap_description', 'str'),
+        ('full_accession', 'full_accession', 'str'),
+    )),
+    ('source_traits', 'trait_browser.SourceTrait', (
+        ('id', 'pk', 'int'),
+        ('name', 'i_trait_name', 'str'),
+        ('description', 'i_description', 'str'),
+        ('accession', 'i_dbgap_variable_accession', 'int'),
+        ('version', 'i_dbgap_variable_version', 'int'),
+        ('source_dataset_id', 'source_dataset_id', 'int'),
+        ('dataset_accession', 'source_dataset__i_accession', 'int'),
+        ('dataset_name', 'source_dataset__dataset_name', 'category'),
+        ('study_accession', 'source_dataset__source_study_version__study_id', 'int'),
+        ('study_name', 'source_dataset__source_study_version__study__i_study_name', 'category'),
+        ('study_version', 'source_dataset__source_study_version__i_version', 'int'),
+        ('is_deprecated', 'source_dataset__source_study_version__i_is_deprecated', 'bool'),
+        ('detected_type', 'i_detected_type', 'category'),
+        ('dbgap_type', 'i_dbgap_type', 'category'),
+        ('unit', 'i_dbgap_unit', 'category'),
+        ('n_records', 'i_n_records', 'int'),
+        ('n_missing', 'i_n_missing', 'int'),
+        ('full_accession', 'full_accession', 'str'),
+    )),
+    ('source_trait_encoded_values', 'trait_browser.SourceTraitEncodedValue', (
+        ('id', 'pk', 'int'),
+        ('source_trait_id', 'source_trait_id', 'int'),
+        ('category', 'i_category', 'category'),
+        ('value', 'i_value', 'str'),
+    )),
+    ('harmonized_traits', 'trait_browser.HarmonizedTrait', (
+        ('id', 'pk', 'int'),
+        ('name', 'i_trait_name', 'str'),
+        ('description', 'i_description', 'str'),
+        ('trait_flavor_name', 'trait_flavor_name', 'str'),
+        ('harmonized_trait_set_version_id', 'harmonized_trait_set_version_id', 'int'),
+        ('trait_set_name', 'harmonized_trait_set_version__harmonized_trait_set__i_trait_set_name', 'category'),
+        ('flavor', 'harmonized_trait_set_version__harmonized_trait_set__i_flavor', 'int'),
+        ('version', 'harmonized_trait_set_version__i_version', 'int'),
+        ('is_deprecated', 'harmonized_trait_set_version__i_is_deprecated', 'bool'),
+        ('data_type', 'i_data_type', 'category'),
+        ('unit', 'i_unit', 'category'),
+        ('is_unique_key', 'i_is_unique_key', 'bool'),
+    )),
+    ('harmonized_trait_encoded_values', 'trait_browser.HarmonizedTraitEncodedValue', (
+        ('id', 'pk', 'int'),
+        ('harmonized_trait_id', 'harmonized_trait_id', 'int'),
+        ('category', 'i_category', 'category'),
+        ('value', 'i_value', 'str'),
+    )),
+    ('tags', 'tags.Tag', (
+        ('id', 'pk', 'int'),
+        ('title', 'title', 'str'),
+        ('description', 'description', 'str'),
+        ('instructions', 'instructions', 'str'),
+    )),
+    ('tagged_traits', 'tags.TaggedTrait', (
+        ('id', 'pk', 'int'),
+        ('tag_id', 'tag_id', 'int'),
+        ('tag_title', 'tag__title', 'category'),
+        ('source_trait_id', 'trait_id', 'int'),
+        ('study_accession', 'trait__source_dataset__source_study_version__study_id', 'int'),
+        ('study_name', 'trait__source_dataset__source_study_version__study__i_study_name', 'category'),
+        ('is_deprecated', 'trait__source_dataset__source_study_version__i_is_deprecated', 'bool'),
+        ('archived', 'archived', 'bool'),
+        ('dcc_review_status', 'dcc_review__status', 'int'),
+        ('created', 'created', 'datetime'),
+        ('modified', 'modified', 'datetime'),
+    )),
+)
+
+# Tuple format: (array typecode, dtype for the schema); array typecodes are native, and swapped on big-endian machines.
+INT_FORMAT = ('q', '<i8')
+BOOL_FORMAT = ('B', '|u1')
+DATETIME_FORMAT = ('q', '<M8[us]')
+CODE_FORMAT = ('i', '<i4')
+OFFSET_FORMAT = ('q', '<i8')
+
+
+def _to_microseconds(value):
+    return (value - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+class _BinaryFile(object):
+    """Append arrays of fixed-width values to a little-endian binary file."""
+
+    def __init__(self, fn, array_format):
+        self.fn = fn
+        self.typecode, self.dtype = array_format
+        self.file = open(fn, 'wb')
+
+    def write(self, values):
+        values = array(self.typecode, values)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        values.tofile(self.file)
+
+    def close(self):
+        self.file.close()
+
+
+class ColumnWriter(object):
+    """Write the values of one column of a catalog table to binary files, one chunk at a time."""
+
+    def __init__(self, table_dir, name, column_type):
+        self.table_dir = table_dir
+        self.name = name
+        self.column_type = column_type
+        self.files = {}
+        if column_type == 'category':
+            self.files['codes'] = self._open_file('codes', CODE_FORMAT)
+            self.dictionary = {}
+        else:
+            if column_type == 'str':
+                self._open_str_files(name)
+            else:
+                array_format = {'int': INT_FORMAT, 'bool': BOOL_FORMAT, 'datetime': DATETIME_FORMAT}[column_type]
+                self.files['values'] = self._open_file('values', array_format)
+            self.files['valid'] = self._open_file('valid', BOOL_FORMAT)
+            self.n_null = 0
+
+    def _open_file(self, part, array_format, name=None):
+        return _BinaryFile(os.path.join(self.table_dir, '{}.{}'.format(name or self.name, part)), array_format)
+
+    def _open_str_files(self, name):
+        self.files['offsets'] = self._open_file('offsets', OFFSET_FORMAT, name=name)
+        self.files['data'] = open(os.path.join(self.table_dir, '{}.data'.format(name)), 'wb')
+        self.files['offsets'].write([0])
+        self.n_bytes = 0
+
+    def _write_str(self, values):
+        encoded = [value.encode('utf-8') for value in values]
+        offsets = []
+        for value in encoded:
+            self.n_bytes += len(value)
+            offsets.append(self.n_bytes)
+        self.files['offsets'].write(offsets)
+        self.files['data'].write(b''.join(encoded))
+
+    def write(self, values):
+        """Append a chunk of values to the column."""
+        if self.column_type == 'category':
+            codes = [NULL_CODE if value is None else self.dictionary.setdefault(value, len(self.dictionary))
+                     for value in values]
+            self.files['codes'].write(codes)
+            return
+        valid = [value is not None for value in values]
+        self.n_null += valid.count(False)
+        if self.column_type == 'str':
+            self._write_str([value if value is not None else '' for value in values])
+        else:
+            if self.column_type == 'datetime':
+                values = [_to_microseconds(value) if value is not None else 0 for value in values]
+            else:
+                values = [int(value) if value is not None else 0 for value in values]
+            self.files['values'].write(values)
+        self.files['valid'].write(valid)
+
+    def close(self):
+        """Finish writing the column and return its description for the schema."""
+        if self.column_type == 'category':
+            # Dictionary values are in order of their codes.
+            self._open_str_files('{}.dict'.format(self.name))
+            self._write_str(list(self.dictionary))
+        for f in self.files.values():
+            f.close()
+        if self.column_type != 'category' and not self.n_null:
+            os.remove(self.files.pop('valid').fn)
+        files = {}
+        for part, f in self.files.items():
+            if isinstance(f, _BinaryFile):
+                files[part] = {'file': os.path.basename(f.fn), 'dtype': f.dtype}
+            else:
+                files[part] = {'file': os.path.basename(f.name), 'dtype': '|u1'}
+        if self.column_type == 'category':
+            # The dictionary is stored like a str column, next to the codes.
+            files['dictionary_offsets'] = files.pop('offsets')
+            files['dictionary_data'] = files.pop('data')
+        return {'name': self.name, 'type': self.column_type, 'files': files}
+
+
+def iterate_table_rows(model, lookups, chunk_size=CATALOG_CHUNK_SIZE):
+    """Yield lists of rows of values for the given lookups, retrieving chunk_size rows at a time in pk order.
+
+    Arguments:
+        model: Django model class to retrieve rows from
+        lookups: list of str; field lookups to pass to values_list
+        chunk_size: int; number of rows to retrieve from the db at a time
+    """
+    queryset = model.objects.order_by('pk')
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list('pk', *lookups)[:chunk_size].iterator())
+        if not rows:
+            return
+        yield [row[1:] for row in rows]
+        last_pk = rows[-1][0]
+
+
+def write_table(catalog_dir, table_name, model, columns, chunk_size=CATALOG_CHUNK_SIZE):
+    """Write one table of the catalog snapshot, returning its description for the schema.
+
+    Arguments:
+        catalog_dir: str; path of the catalog snapshot directory
+        table_name: str; name of the table's subdirectory
+        model: Django model class to retrieve rows from
+        columns: tuple of ('column name', 'field__lookup', 'column type') tuples
+        chunk_size: int; number of rows to retrieve from the db at a time
+    """
+    table_dir = os.path.join(catalog_dir, table_name)
+    os.makedirs(table_dir)
+    writers = [ColumnWriter(table_dir, name, column_type) for name, lookup, column_type in columns]
+    n_rows = 0
+    for rows in iterate_table_rows(model, [lookup for name, lookup, column_type in columns], chunk_size=chunk_size):
+        n_rows += len(rows)
+        for writer, values in zip(writers, zip(*rows)):
+            writer.write(values)
+    return {'name': table_name, 'rows': n_rows, 'columns': [writer.close() for writer in writers]}
+
+
+def write_catalog(catalog_dir, tables=CATALOG_TABLES, chunk_size=CATALOG_CHUNK_SIZE):
+    """Write a snapshot of the catalog tables and its schema file to catalog_dir, returning the schema.
+
+    Arguments:
+        catalog_dir: str; path of an existing, empty directory to write the snapshot to
+        tables: tuple of table specifications, in the format of CATALOG_TABLES
+        chunk_size: int; number of rows to retrieve from the db at a time
+    """
+    schema = {
+        'format_version': FORMAT_VERSION,
+        'export_time': timezone.now().isoformat(),
+        'tables': [write_table(catalog_dir, table_name, apps.get_model(model_name), columns, chunk_size=chunk_size)
+                   for table_name, model_name, columns in tables],
+    }
+    with open(os.path.join(catalog_dir, SCHEMA_FILE), 'w') as schema_file:
+        json.dump(schema, schema_file, indent=4)
+    return schema
+
+
+def map_file(fn, dtype):
+    """Return a read-only memoryview of a fixed-width column file, without reading it into memory.
+
+    Arguments:
+        fn: str; full path of the column file
+        dtype: str; the file's dtype from the schema
+    """
+    typecode = {'<i8': 'q', '<M8[us]': 'q', '|u1': 'B', '<i4': 'i'}[dtype]
+    if os.path.getsize(fn) == 0:
+        return memoryview(array(typecode))
+    with open(fn, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if sys.byteorder == 'big':
+        values = array(typecode, mapped)
+        values.byteswap()
+        return memoryview(values)
+    return memoryview(mapped).cast(typecode)
+
+
+def _read_str(table_dir, offsets_file, data_file):
+    offsets = map_file(os.path.join(table_dir, offsets_file['file']), offsets_file['dtype'])
+    with open(os.path.join(table_dir, data_file['file']), 'rb') as f:
+        data = f.read()
+    return [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+
+def read_table(catalog_dir, table_name):
+    """Return a dict of lists of the decoded values in each column of a catalog snapshot table.
+
+    This reads whole columns into Python objects, and is meant for small tables or tests; larger
+    tables should be loaded by memory mapping the column files directly.
+
+    Arguments:
+        catalog_dir: str; path of the catalog snapshot directory
+        table_name: str; name of the table
+    """
+    with open(os.path.join(catalog_dir, SCHEMA_FILE)) as schema_file:
+        schema = json.load(schema_file)
+    table = [table for table in schema['tables'] if table['name'] == table_name][0]
+    table_dir = os.path.join(catalog_dir, table_name)
+    data = {}
+    for column in table['columns']:
+        files = column['files']
+        if column['type'] == 'str':
+            values = _read_str(table_dir, files['offsets'], files['data'])
+        elif column['type'] == 'category':
+            dictionary = _read_str(table_dir, files['dictionary_offsets'], files['dictionary_data'])
+            codes = map_file(os.path.join(table_dir, files['codes']['file']), files['codes']['dtype'])
+            values = [dictionary[code] if code != NULL_CODE else None for code in codes]
+        else:
+            values = list(map_file(os.path.join(table_dir, files['values']['file']), files['values']['dtype']))
+            if column['type'] == 'bool':
+                values = [bool(value) for value in values]
+            elif column['type'] == 'datetime':
+                values = [EPOCH + datetime.timedelta(microseconds=value) for value in values]
+        if 'valid' in files:
+            valid = map_file(os.path.join(table_dir, files['valid']['file']), files['valid']['dtype'])
+            values = [value if is_valid else None for value, is_valid in zip(values, valid)]
+        data[column['name']] = values
+    return data
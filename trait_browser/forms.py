@@ -11,6 +11,7 @@ from crispy_forms.layout import Layout, Submit, Div, Field, Row
 from dal import autocomplete
 
 from . import models
+from .accessions import ACCESSION_TYPES, split_accessions
 
 
 ERROR_ONLY_SHORT_WORDS = 'Enter at least one term with more than two letters.'
@@ -453,6 +454,51 @@ class SourceTraitLookupForm(forms.Form):
     helper = lookup_form_helper
 
 
+class BulkAccessionLookupForm(forms.Form):
+    """Form to resolve many dbGaP accessions at once."""
+
+    MAX_ACCESSIONS = 10000
+    ERROR_TOO_MANY_ACCESSIONS = 'Enter no more than {} accessions at a time.'.format(MAX_ACCESSIONS)
+    ERROR_NO_ACCESSIONS = 'Enter at least one accession.'
+
+    accessions = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 15}),
+        label='Accessions',
+        help_text=('Enter study, dataset, or variable accessions, separated by spaces, commas, or new lines '
+                   '(example: phs000007.v29.p10, pht000009, phv00000507.v1, phv507). '
+                   'Up to {} accessions can be entered at once.'.format(MAX_ACCESSIONS))
+    )
+    default_prefix = forms.ChoiceField(
+        choices=[('', 'None (accessions without a prefix are invalid)')] + list(ACCESSION_TYPES.items()),
+        required=False,
+        label='Type of accessions without a prefix',
+        help_text='Select which type of accession numbers without a phs, pht, or phv prefix are.'
+    )
+
+    helper = FormHelper()
+    helper.form_class = 'form-horizontal'
+    helper.label_class = 'col-sm-2'
+    helper.field_class = 'col-sm-8'
+    helper.layout = Layout(
+        'accessions',
+        'default_prefix',
+        FormActions(
+            Submit('submit', 'Download results', css_class='btn-primary')
+        )
+    )
+
+    def clean_accessions(self):
+        data = split_accessions(self.cleaned_data['accessions'])
+        if not data:
+            raise forms.ValidationError(self.ERROR_NO_ACCESSIONS)
+        if len(data) > self.MAX_ACCESSIONS:
+            raise forms.ValidationError(self.ERROR_TOO_MANY_ACCESSIONS)
+        return data
+
+    def clean_default_prefix(self):
+        return self.cleaned_data['default_prefix'] or None
+
+
 class HarmonizedTraitSearchForm(forms.Form):
     """Form to handle django-watson searches for HarmonizedTrait objects.
 
@@ -0,0 +1,351 @@
+"""Time the phases of import_db on a generated SQLite stand-in for the source db."""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import datetime
+import json
+import logging
+import os
+import random
+import subprocess
+from sys import stdout
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import management
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.query_stats import QueryRecorder
+from profiles.caches import clear_all_dashboards
+from tags.caches import clear_unreviewed_index
+from tags.models import DCCReview, Tag, TaggedTrait, TagStudyCount
+from trait_browser.management.commands import import_db
+from trait_browser.models import SourceTrait
+from trait_browser.source_db import SQLiteSourceDB
+from trait_browser.source_db_generator import SourceDBGenerator
+
+
+# Set up a logger to handle messages based on verbosity setting.
+logger = logging.getLogger(__name__)
+console_handler = logging.StreamHandler(stdout)
+detail_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(detail_formatter)
+logger.addHandler(console_handler)
+
+DEFAULT_HISTORY_FILE = 'import_db_benchmarks.json'
+BENCHMARK_USER_EMAIL = 'import_db_benchmark@example.com'
+N_BENCHMARK_TAGS = 5
+# Phases of import_db, in the order they are reported.
+PHASES = ('updates', 'new_rows', 'm2m_links', 'dataset_names', 'version_links', 'tag_carry_forward', 'component_html',
+          'lineage', 'encoded_value_sets')
+
+
+class ImportPhaseTimer(object):
+    """Add up the time and the number of Django db queries spent in each phase of an import."""
+
+    def __init__(self):
+        self.recorder = QueryRecorder()
+        self.phases = OrderedDict((phase, {'seconds': 0.0, 'calls': 0, 'queries': 0}) for phase in PHASES)
+
+    @contextmanager
+    def phase(self, name):
+        start, start_queries = time.time(), self.recorder.count
+        try:
+            yield
+        finally:
+            self.phases[name]['seconds'] += time.time() - start
+            self.phases[name]['calls'] += 1
+            self.phases[name]['queries'] += self.recorder.count - start_queries
+
+
+class TimedImportCommand(import_db.Command):
+    """The import_db command, reading from a SQLite stand-in and timing each of its phases.
+
+    Arguments:
+        source_db_path -- string; path of the SQLiteSourceDB file to import from
+        timer -- ImportPhaseTimer; adds up the time spent in each phase
+    """
+
+    def __init__(self, source_db_path, timer, *args, **kwargs):
+        super(TimedImportCommand, self).__init__(*args, **kwargs)
+        self.source_db_path = source_db_path
+        self.timer = timer
+
+    def _get_source_db(self, *args, **kwargs):
+        return SQLiteSourceDB(self.source_db_path)
+
+    def _update_existing_data(self, **kwargs):
+        with self.timer.phase('updates'):
+            return super(TimedImportCommand, self)._update_existing_data(**kwargs)
+
+    def _import_new_data(self, **kwargs):
+        with self.timer.phase('new_rows'):
+            return super(TimedImportCommand, self)._import_new_data(**kwargs)
+
+    def _update_m2m_field(self, **kwargs):
+        with self.timer.phase('m2m_links'):
+            return super(TimedImportCommand, self)._update_m2m_field(**kwargs)
+
+    def _import_new_m2m_field(self, **kwargs):
+        with self.timer.phase('m2m_links'):
+            return super(TimedImportCommand, self)._import_new_m2m_field(**kwargs)
+
+    def _set_dataset_names(self, *args, **kwargs):
+        with self.timer.phase('dataset_names'):
+            return super(TimedImportCommand, self)._set_dataset_names(*args, **kwargs)
+
+    def _update_version_links(self, *args, **kwargs):
+        with self.timer.phase('version_links'):
+            return super(TimedImportCommand, self)._update_version_links(*args, **kwargs)
+
+    def _apply_tags_to_new_sourcestudyversions(self, *args, **kwargs):
+        with self.timer.phase('tag_carry_forward'):
+            return super(TimedImportCommand, self)._apply_tags_to_new_sourcestudyversions(*args, **kwargs)
+
+    def _update_component_html(self, *args, **kwargs):
+        with self.timer.phase('component_html'):
+            return super(TimedImportCommand, self)._update_component_html(*args, **kwargs)
+
+    def _update_lineage(self, *args, **kwargs):
+        with self.timer.phase('lineage'):
+            return super(TimedImportCommand, self)._update_lineage(*args, **kwargs)
+
+    def _update_encoded_value_sets(self, *args, **kwargs):
+        with self.timer.phase('encoded_value_sets'):
+            return super(TimedImportCommand, self)._update_encoded_value_sets(*args, **kwargs)
+
+
+class Command(BaseCommand):
+    """Management command to benchmark import_db on synthetic source db releases."""
+
+    help = ('Time each phase of import_db, importing two releases of generated data from a SQLite stand-in for the '
+            'source db, and add the timings to a JSON history file.')
+
+    def _get_git_commit(self):
+        """Return the hash of the checked out git commit, or None if it can't be found."""
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.SITE_ROOT, stderr=subprocess.DEVNULL).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _time_import(self, source_db_path, creator, verbosity):
+        """Run import_db on the source db, returning the time and queries spent in total and in each phase.
+
+        Arguments:
+            source_db_path -- string; path of the SQLiteSourceDB file to import from
+            creator -- User; the creator of tagged traits carried forward to new study versions
+            verbosity -- int; verbosity of the import_db command
+        """
+        timer = ImportPhaseTimer()
+        command = TimedImportCommand(source_db_path, timer)
+        start = time.time()
+        with timer.recorder.capture():
+            management.call_command(command, '--no_backup', '--taggedtrait_creator={}'.format(creator.email),
+                                    verbosity=verbosity)
+        phases = timer.phases
+        for phase in phases.values():
+            phase['seconds'] = round(phase['seconds'], 3)
+        return OrderedDict((('seconds', round(time.time() - start, 3)), ('queries', timer.recorder.count),
+                            ('duplicate_queries', timer.recorder.duplicates), ('phases', phases)))
+
+    def _time_row_conversion(self, source_db):
+        """Time converting the source db's source trait rows to model args, with _fix_row and with a RowConversionPlan.
+
+        The dataset foreign key is left out of the args, so only the CPU time spent converting each row is timed.
+
+        Returns:
+            OrderedDict with the number of rows and the microseconds per row spent each way
+        """
+        command = import_db.Command()
+        mapping = import_db.SOURCE_TRAIT_ARGS_MAPPING._replace(foreign_key_mapping={})
+        query = 'SELECT * FROM source_trait'
+        cursor = source_db.cursor(dictionary=True)
+        cursor.execute(query)
+        dict_rows = cursor.fetchall()
+        field_types = {el[0]: el[1] for el in cursor.description}
+        cursor = source_db.cursor()
+        cursor.execute(query)
+        tuple_rows = cursor.fetchall()
+        start = time.process_time()
+        for row in dict_rows:
+            command._make_args_mapping(command._fix_row(row, field_types), *mapping)
+        fix_row_seconds = time.process_time() - start
+        start = time.process_time()
+        plan = import_db.RowConversionPlan(cursor.description, mapping)
+        for row in tuple_rows:
+            plan.make_args(row)
+        plan_seconds = time.process_time() - start
+        n_rows = max(len(tuple_rows), 1)
+        return OrderedDict((('rows', len(tuple_rows)),
+                            ('fix_row_us_per_row', round(fix_row_seconds * 1e6 / n_rows, 2)),
+                            ('plan_us_per_row', round(plan_seconds * 1e6 / n_rows, 2))))
+
+    def _tag_traits(self, creator, tagged_fraction, seed):
+        """Tag a random fraction of the source traits, with confirmed reviews, so the next import carries them forward.
+
+        Returns:
+            int number of tagged traits made
+        """
+        rng = random.Random(seed)
+        tags = []
+        for i in range(N_BENCHMARK_TAGS):
+            tag, created = Tag.objects.get_or_create(
+                lower_title='import_db benchmark {}'.format(i),
+                defaults={'title': 'import_db benchmark {}'.format(i), 'description': 'Benchmark tag.',
+                          'instructions': 'Benchmark tag.', 'creator': creator})
+            tags.append(tag)
+        trait_pks = list(SourceTrait.objects.current().order_by('pk').values_list('pk', flat=True))
+        tagged_trait_pks = rng.sample(trait_pks, int(len(trait_pks) * tagged_fraction))
+        TaggedTrait.objects.bulk_create(
+            [TaggedTrait(trait_id=pk, tag=rng.choice(tags), creator=creator) for pk in tagged_trait_pks])
+        DCCReview.objects.bulk_create(
+            [DCCReview(tagged_trait=tagged_trait, status=DCCReview.STATUS_CONFIRMED, creator=creator)
+             for tagged_trait in TaggedTrait.objects.filter(creator=creator, dcc_review__isnull=True)])
+        # bulk_create skips the signal receivers that keep these up to date.
+        TagStudyCount.objects.refresh()
+        clear_unreviewed_index()
+        clear_all_dashboards()
+        return len(tagged_trait_pks)
+
+    def _read_history(self, history_fn):
+        if not os.path.exists(history_fn):
+            return []
+        with open(history_fn) as history_file:
+            return json.load(history_file)
+
+    def _write_history(self, history_fn, history):
+        with open(history_fn, 'w') as history_file:
+            json.dump(history, history_file, indent=2)
+            history_file.write('\n')
+
+    def _write_report(self, result, previous_result):
+        """Write the timings of each import, compared to those of the previous comparable benchmark."""
+        self.stdout.write('{:<16}{:<18}{:>10}{:>10}{:>10}{:>12}'.format(
+            'import', 'phase', 'calls', 'queries', 'seconds', 'previous'))
+        for import_name, timings in result['imports'].items():
+            rows = [(phase, values) for (phase, values) in timings['phases'].items()]
+            rows.append(('total', dict(timings, calls='')))
+            for phase, values in rows:
+                previous = ''
+                if previous_result is not None:
+                    previous_timings = previous_result['imports'][import_name]
+                    # Phases added since the previous benchmark have no previous time.
+                    previous_values = previous_timings if phase == 'total' else previous_timings['phases'].get(phase)
+                    if previous_values is not None:
+                        previous = '{:.3f}'.format(previous_values['seconds'])
+                self.stdout.write('{:<16}{:<18}{:>10}{:>10}{:>10.3f}{:>12}'.format(
+                    import_name, phase, values['calls'], values['queries'], values['seconds'], previous))
+        row_conversion = result['row_conversion']
+        self.stdout.write(
+            'Converting {} source trait rows to model args: {:.2f} us per row with _fix_row, {:.2f} us per row with '
+            'RowConversionPlan.'.format(row_conversion['rows'], row_conversion['fix_row_us_per_row'],
+                                        row_conversion['plan_us_per_row']))
+        if previous_result is not None:
+            self.stdout.write('Previous times are from the benchmark of commit {} on {}.'.format(
+                previous_result['git_commit'], previous_result['date']))
+
+    def add_arguments(self, parser):
+        """Add custom command line arguments to this management command."""
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed for the random number generator; the same seed makes the same source db.')
+        parser.add_argument('--studies', type=int, default=20,
+                            help='Number of studies in the first release.')
+        parser.add_argument('--datasets', type=int, nargs=2, default=(2, 10), metavar=('MIN', 'MAX'),
+                            help='Range of the number of datasets in each new study.')
+        parser.add_argument('--traits', type=int, nargs=2, default=(10, 100), metavar=('MIN', 'MAX'),
+                            help='Range of the number of source traits in each dataset of a new study.')
+        parser.add_argument('--harmonized_trait_sets', type=int, default=10,
+                            help='Number of harmonized trait sets in the first release.')
+        parser.add_argument('--tagged_fraction', type=float, default=0.05,
+                            help='Fraction of the source traits of the first release to tag before the second import.')
+        parser.add_argument('--history', type=str, default=DEFAULT_HISTORY_FILE,
+                            help='JSON file to add the timings to.')
+        parser.add_argument('--source_db', type=str, default=None,
+                            help="""Path of the SQLite stand-in source db to write. By default, a temporary file is
+                                    used and removed afterwards.""")
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the imported data in the Django db, instead of rolling back the benchmark.')
+
+    def handle(self, *args, **options):
+        """Handle the main functions of this management command.
+
+        Generate the first release of the source db and time importing it, tag some of the
+        imported source traits, then generate the second release and time importing that,
+        which also updates the first release and carries the tags forward. The imports are
+        run in one transaction, which is rolled back unless --keep is used.
+
+        Arguments:
+            **args and **options are handled as per the superclass handling; these
+            argument dicts will pass on command line options
+        """
+        # Set the logger level based on verbosity setting.
+        verbosity = options.get('verbosity')
+        if verbosity == 0:
+            logger.setLevel(logging.ERROR)
+        elif verbosity == 1:
+            logger.setLevel(logging.WARNING)
+        elif verbosity == 2:
+            logger.setLevel(logging.INFO)
+        elif verbosity == 3:
+            logger.setLevel(logging.DEBUG)
+        benchmark_options = OrderedDict(
+            (key, options.get(key)) for key in ('seed', 'studies', 'datasets', 'traits', 'harmonized_trait_sets',
+                                                'tagged_fraction'))
+        benchmark_options['datasets'] = list(benchmark_options['datasets'])
+        benchmark_options['traits'] = list(benchmark_options['traits'])
+        source_db_path = options.get('source_db')
+        if source_db_path is None:
+            source_db_fd, source_db_path = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(source_db_fd)
+        elif os.path.exists(source_db_path):
+            raise CommandError('Source db {} already exists.'.format(source_db_path))
+        release_args = {'n_datasets_range': tuple(options.get('datasets')),
+                        'n_traits_range': tuple(options.get('traits'))}
+        imports = OrderedDict()
+        try:
+            source_db = SQLiteSourceDB(source_db_path)
+            generator = SourceDBGenerator(source_db, seed=options.get('seed'))
+            generator.add_release(n_new_studies=options.get('studies'),
+                                  n_new_harmonized_trait_sets=options.get('harmonized_trait_sets'), **release_args)
+            logger.info('Generated first release: {}'.format(dict(source_db.count_rows())))
+            row_conversion = self._time_row_conversion(source_db)
+            with transaction.atomic():
+                creator, created = get_user_model().objects.get_or_create(
+                    email=BENCHMARK_USER_EMAIL, defaults={'name': 'import_db benchmark'})
+                imports['first_release'] = self._time_import(source_db_path, creator, max(verbosity - 1, 0))
+                n_tagged = self._tag_traits(creator, options.get('tagged_fraction'), options.get('seed'))
+                logger.info('Tagged {} source traits.'.format(n_tagged))
+                # The second release adds a tenth as many new studies and trait sets as the first.
+                generator.add_release(n_new_studies=-(-options.get('studies') // 10),
+                                      n_new_harmonized_trait_sets=-(-options.get('harmonized_trait_sets') // 10),
+                                      **release_args)
+                logger.info('Generated second release: {}'.format(dict(source_db.count_rows())))
+                imports['second_release'] = self._time_import(source_db_path, creator, max(verbosity - 1, 0))
+                if not options.get('keep'):
+                    transaction.set_rollback(True)
+            source_rows = source_db.count_rows()
+            source_db.close()
+        finally:
+            if options.get('source_db') is None:
+                os.remove(source_db_path)
+        result = OrderedDict((
+            ('date', datetime.datetime.now().isoformat(timespec='seconds')),
+            ('git_commit', self._get_git_commit()),
+            ('database', connection.vendor),
+            ('options', benchmark_options),
+            ('source_rows', source_rows),
+            ('imports', imports),
+            ('row_conversion', row_conversion),
+        ))
+        history_fn = options.get('history')
+        history = self._read_history(history_fn)
+        comparable = [el for el in history
+                      if el['options'] == benchmark_options and el['database'] == connection.vendor]
+        self._write_report(result, comparable[-1] if comparable else None)
+        history.append(result)
+        self._write_history(history_fn, history)
+        logger.info('Added the benchmark to {}'.format(history_fn))
@@ -0,0 +1,53 @@
+"""Print the time, rows, and queries spent in each phase of recent import_db runs as json."""
+
+import json
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from trait_browser import models
+
+
+PHASE_FIELDS = ('phase', ) + models.ImportCheckpoint.TELEMETRY_FIELDS
+
+
+class Command(BaseCommand):
+    """Management command to dump the telemetry of import runs, for comparing imports over time."""
+
+    help = 'Print the time, source rows read, rows written, and queries of each phase of recent import_db runs ' \
+           'as json.'
+
+    def _get_run(self, import_run):
+        """Make a dict of the totals and the completed phases of import_run."""
+        phases = [{field: getattr(checkpoint, field) for field in PHASE_FIELDS}
+                  for checkpoint in import_run.checkpoints.all()]
+        run = {'pk': import_run.pk, 'started': import_run.created.isoformat(),
+               'finished': import_run.finished.isoformat() if import_run.finished else None}
+        run.update({field: sum(phase[field] for phase in phases)
+                    for field in models.ImportCheckpoint.TELEMETRY_FIELDS})
+        run['phases'] = phases
+        return run
+
+    def add_arguments(self, parser):
+        """Add custom command line arguments to this management command."""
+        parser.add_argument('--last', type=int, default=None,
+                            help='Only print the given number of most recent import runs.')
+        parser.add_argument('--finished', action='store_true',
+                            help='Only print import runs that finished, leaving out failed and resumable runs.')
+
+    def handle(self, *args, **options):
+        """Handle the main functions of this management command.
+
+        Arguments:
+            **args and **options are handled as per the superclass handling; these
+            argument dicts will pass on command line options
+        """
+        import_runs = models.ImportRun.objects.order_by('-pk').prefetch_related(
+            Prefetch('checkpoints', queryset=models.ImportCheckpoint.objects.order_by('pk')))
+        if options.get('finished'):
+            import_runs = import_runs.filter(finished__isnull=False)
+        if options.get('last') is not None:
+            import_runs = import_runs[:options.get('last')]
+        # Print the runs from oldest to newest.
+        runs = [self._get_run(import_run) for import_run in reversed(list(import_runs))]
+        self.stdout.write(json.dumps(runs, indent=2))
@@ -0,0 +1,81 @@
+"""Create a typed, columnar snapshot of the phenotype catalog."""
+
+import datetime
+import logging
+import os
+from sys import stdout
+import tarfile
+
+from django.core.management.base import BaseCommand
+
+from trait_browser import catalog
+
+
+# Set up a logger to handle messages based on verbosity setting.
+logger = logging.getLogger(__name__)
+console_handler = logging.StreamHandler(stdout)
+detail_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(detail_formatter)
+logger.addHandler(console_handler)
+
+
+class Command(BaseCommand):
+    """Management command to write a columnar snapshot of the studies, variables, and tags in PIE."""
+
+    help = 'Export a typed, columnar snapshot of the phenotype catalog, for loading by analysis pipelines.'
+
+    def _make_output_directory(self, input_path):
+        """Create the directory that will contain the catalog snapshot.
+
+        Arguments:
+            input_path: str; input value of the path where the snapshot directory should be created
+        """
+        date = datetime.datetime.now().strftime('%Y-%m-%d_%H%M')
+        output_dir = os.path.join(os.path.abspath(input_path), '{}_TOPMed_DCC_catalog'.format(date))
+        os.makedirs(output_dir)
+        logger.debug('Created output directory {}'.format(output_dir))
+        return output_dir
+
+    def _compress_directory(self, output_dir):
+        """Create a .tar.gz compressed version of the snapshot directory.
+
+        Arguments:
+            output_dir: str; path of the snapshot directory
+        """
+        tar_gz_fn = output_dir + '.tar.gz'
+        with tarfile.open(tar_gz_fn, 'w|gz') as tar_gz_file:
+            tar_gz_file.add(output_dir, arcname=os.path.basename(output_dir))
+        logger.debug('Created compressed catalog snapshot {}'.format(tar_gz_fn))
+        return tar_gz_fn
+
+    def add_arguments(self, parser):
+        """Add custom command line arguments to this management command."""
+        parser.add_argument('output_path', action='store', type=str,
+                            help="""
+                                The path at which to create the snapshot directory and its .tar.gz file.
+                                The directory will be named with the date and time of export.
+                            """
+                            )
+        parser.add_argument('--chunk_size', action='store', type=int, default=catalog.CATALOG_CHUNK_SIZE,
+                            help='Number of rows to retrieve from the database at a time.')
+        parser.add_argument('--no_compress', action='store_true',
+                            help='Only write the snapshot directory, without a .tar.gz file of it.')
+
+    def handle(self, *args, **options):
+        """Write the catalog snapshot directory and compress it."""
+        # Set the logger level based on verbosity setting.
+        verbosity = options.get('verbosity')
+        if verbosity == 0:
+            logger.setLevel(logging.ERROR)
+        elif verbosity == 1:
+            logger.setLevel(logging.WARNING)
+        elif verbosity == 2:
+            logger.setLevel(logging.INFO)
+        elif verbosity == 3:
+            logger.setLevel(logging.DEBUG)
+        output_dir = self._make_output_directory(options.get('output_path'))
+        schema = catalog.write_catalog(output_dir, chunk_size=options.get('chunk_size'))
+        for table in schema['tables']:
+            logger.info('Exported {} rows to {}'.format(table['rows'], table['name']))
+        if not options.get('no_compress'):
+            self._compress_directory(output_dir)
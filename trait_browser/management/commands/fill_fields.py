@@ -11,9 +11,7 @@ class Command(BaseCommand):
     help = 'For specified model fields, fill in field data using a standard method.'
 
     def _fill_harmonized_trait_set_version__component_html_detail(self):
-        for harmonized_trait_set_version in models.HarmonizedTraitSetVersion.objects.all():
-            harmonized_trait_set_version.component_html_detail = harmonized_trait_set_version.get_component_html()
-            harmonized_trait_set_version.save()
+        return models.HarmonizedTraitSetVersion.objects.all().update_component_html()
 
     # Methods to actually do the management command.
     def add_arguments(self, parser):
@@ -30,4 +28,5 @@ class Command(BaseCommand):
         """
         if 'harmonized_trait_set_version__component_html_detail' in options.get('fields'):
             print('Updating harmonized_trait_set_version__component_html_detail ...')
-            self._fill_harmonized_trait_set_version__component_html_detail()
+            n_saved = self._fill_harmonized_trait_set_version__component_html_detail()
+            print('{} harmonized trait set versions updated.'.format(n_saved))
@@ -13,11 +13,14 @@ Requires the CNF_PATH setting from the specified settings module.
 # Providing initial data for models | Django documentation | Django
 #   https://docs.djangoproject.com/en/1.8/howto/initial-data/
 
+from collections import namedtuple
 from datetime import datetime
+import json
 import logging
 import mysql.connector
 from re import compile, search
 from sys import argv, stdout
+import time
 import pytz
 
 from django.core.management.base import BaseCommand
@@ -25,9 +28,13 @@ from django.core import management
 from django.utils import timezone
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 
+from core.query_stats import QueryRecorder
 from tags.models import DCCDecision, DCCReview, StudyResponse, TaggedTrait
 from trait_browser import models
+from trait_browser.querysets import EncodedValueSetQuerySet
+from trait_browser.source_db import MySQLSourceDB
 
 
 User = get_user_model()
@@ -58,6 +65,163 @@ MYSQL_TYPES = {FieldType.get_info(el): el for el in FieldType.get_binary_types()
                FieldType.get_string_types() +
                FieldType.get_timestamp_types()}
 STRING_TYPES = FieldType.get_string_types() + [MYSQL_TYPES[ty] for ty in ('BLOB', 'MEDIUM_BLOB', 'LONG_BLOB', )]
+TIMESTAMP_TYPES = FieldType.get_timestamp_types()
+NUMBER_TYPES = FieldType.get_number_types()
+
+
+# How the columns of a source db table map to the fields of a Django model, as the arguments of
+# Command._make_args_mapping after row_dict. Each Command._make_*_args method and the RowConversionPlan for its
+# model use the same mapping.
+ArgsMapping = namedtuple('ArgsMapping', ('source_field_names', 'source_field_names_to_map', 'foreign_key_mapping'))
+
+
+GLOBAL_STUDY_ARGS_MAPPING = ArgsMapping(
+    ['id', 'name', 'date_added', 'date_changed', 'topmed_accession', 'topmed_abbreviation'],
+    {},
+    {})
+
+STUDY_ARGS_MAPPING = ArgsMapping(
+    ['accession', 'study_name', 'date_added', 'date_changed'],
+    {},
+    {'global_study_id': models.GlobalStudy})
+
+SOURCE_STUDY_VERSION_ARGS_MAPPING = ArgsMapping(
+    ['id', 'version', 'participant_set', 'dbgap_date', 'is_deprecated', 'is_prerelease', 'date_added',
+     'date_changed'],
+    {},
+    {'accession': models.Study})
+
+SUBCOHORT_ARGS_MAPPING = ArgsMapping(
+    ['id', 'name', 'date_added', 'date_changed'],
+    {},
+    {'global_study_id': models.GlobalStudy})
+
+SOURCE_DATASET_ARGS_MAPPING = ArgsMapping(
+    ['id', 'accession', 'version', 'is_subject_file', 'study_subject_column', 'dbgap_description',
+     'dbgap_date_created', 'date_added', 'date_changed'],
+    {},
+    {'study_version_id': models.SourceStudyVersion})
+
+HARMONIZED_TRAIT_SET_ARGS_MAPPING = ArgsMapping(
+    ['id', 'trait_set_name', 'flavor', 'is_longitudinal', 'is_demographic', 'date_added', 'date_changed'],
+    {},
+    {})
+
+ALLOWED_UPDATE_REASON_ARGS_MAPPING = ArgsMapping(
+    ['id', 'abbreviation', 'description'],
+    {},
+    {})
+
+HARMONIZED_TRAIT_SET_VERSION_ARGS_MAPPING = ArgsMapping(
+    ['id', 'version', 'git_commit_hash', 'harmonized_by', 'is_deprecated', 'date_added', 'date_changed'],
+    {},
+    {'harmonized_trait_set_id': models.HarmonizedTraitSet})
+
+HARMONIZATION_UNIT_ARGS_MAPPING = ArgsMapping(
+    ['id', 'tag', 'date_added', 'date_changed'],
+    {},
+    {'harmonized_trait_set_version_id': models.HarmonizedTraitSetVersion})
+
+SOURCE_TRAIT_ARGS_MAPPING = ArgsMapping(
+    ['trait_name', 'detected_type', 'dbgap_type', 'dbgap_variable_accession', 'dbgap_variable_version',
+     'dbgap_comment', 'dbgap_unit', 'n_records', 'n_missing', 'date_added', 'date_changed'],
+    {'source_trait_id': 'i_trait_id', 'dbgap_description': 'i_description'},
+    {'dataset_id': models.SourceDataset})
+
+HARMONIZED_TRAIT_ARGS_MAPPING = ArgsMapping(
+    ['trait_name', 'description', 'data_type', 'unit', 'has_batch', 'is_unique_key', 'date_added', 'date_changed'],
+    {'harmonized_trait_id': 'i_trait_id'},
+    {'harmonized_trait_set_version_id': models.HarmonizedTraitSetVersion})
+
+SOURCE_TRAIT_ENCODED_VALUE_ARGS_MAPPING = ArgsMapping(
+    ['id', 'category', 'value', 'date_added', 'date_changed'],
+    {},
+    {'source_trait_id': models.SourceTrait})
+
+HARMONIZED_TRAIT_ENCODED_VALUE_ARGS_MAPPING = ArgsMapping(
+    ['id', 'category', 'value', 'date_added', 'date_changed'],
+    {},
+    {'harmonized_trait_id': models.HarmonizedTrait})
+
+
+def _convert_string(value):
+    """Convert a value from a string column, as Command._fix_null and Command._fix_bytearray do."""
+    if value is None:
+        return ''
+    if isinstance(value, bytearray):
+        return value.decode('utf-8')
+    return value
+
+
+def _convert_datetime(value):
+    """Convert a value from a timestamp column, as Command._fix_timezone does."""
+    if isinstance(value, datetime):
+        # Datetimes from the db are already set to UTC, due to our db settings. This is what make_aware does for UTC.
+        return value.replace(tzinfo=pytz.utc)
+    return value
+
+
+def _convert_any(value):
+    """Convert a value from a column of any other type, as Command._fix_bytearray and _fix_timezone do."""
+    if isinstance(value, bytearray):
+        return value.decode('utf-8')
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=pytz.utc)
+    return value
+
+
+def _get_value_converter(field_type):
+    """Return the function to convert values from a column of the given field type, or None to keep them as is."""
+    if field_type in STRING_TYPES:
+        return _convert_string
+    if field_type in TIMESTAMP_TYPES:
+        return _convert_datetime
+    if field_type in NUMBER_TYPES:
+        return None
+    return _convert_any
+
+
+class RowConversionPlan(object):
+    """Convert row tuples from a source db cursor, with the conversion of each column chosen once.
+
+    Command._fix_row checks the type of every value in every row and builds three new dicts, and
+    Command._make_args_mapping builds another. A plan looks up the column types in cursor.description
+    once, and then converts each row tuple straight to the values or model args it needs, giving the
+    same results as _fix_row followed by the _make_*_args method.
+
+    Arguments:
+        description -- the description of the cursor that the rows come from
+        mapping -- ArgsMapping for the model to make args for, or None to only convert values
+    """
+
+    def __init__(self, description, mapping=None):
+        self.columns = {el[0]: i for i, el in enumerate(description)}
+        self.converters = tuple(_get_value_converter(el[1]) for el in description)
+        if mapping is None:
+            self.fields = ()
+            self.foreign_keys = ()
+        else:
+            field_columns = [('i_' + name, name) for name in mapping.source_field_names]
+            field_columns.extend((field, name) for (name, field) in mapping.source_field_names_to_map.items())
+            self.fields = tuple((field, self.columns[name], self.converters[self.columns[name]])
+                                for (field, name) in field_columns)
+            self.foreign_keys = tuple(
+                (model._meta.verbose_name.replace(' ', '_'), self.columns[name], self.converters[self.columns[name]],
+                 model) for (name, model) in mapping.foreign_key_mapping.items())
+
+    def get_value(self, row, column):
+        """Return the converted value of the named column from a row tuple."""
+        i = self.columns[column]
+        convert = self.converters[i]
+        return row[i] if convert is None else convert(row[i])
+
+    def make_args(self, row):
+        """Return a dict of model field name: value pairs from a row tuple, for use in model(**kwargs)."""
+        args = {field: row[i] if convert is None else convert(row[i]) for (field, i, convert) in self.fields}
+        for (field, i, convert, model) in self.foreign_keys:
+            args[field] = model.objects.get(pk=row[i] if convert is None else convert(row[i]))
+        return args
+
 
 # Regex for parsing the dataset name from the data dictionary file name.
 DATA_DICT_RE = compile(
@@ -86,7 +250,7 @@ class Command(BaseCommand):
                 settings
 
         Returns:
-            a mysql.connector open db connection
+            a MySQLSourceDB wrapping a mysql.connector open db connection
         """
         db_group = 'mysql_topmed_pheno_{}'.format(which_db)
         if admin:
@@ -95,30 +259,93 @@ class Command(BaseCommand):
             elif which_db == 'devel':
                 db_group += '_admin'
         cnf_group = ['client', db_group]
-        source_db = mysql.connector.connect(
+        connection = mysql.connector.connect(
             option_files=cnf_path, option_groups=cnf_group, charset='latin1', use_unicode=False, time_zone='+00:00')
-        logger.debug('Connected to source db {}'.format(source_db))
-        return source_db
+        logger.debug('Connected to source db {}'.format(connection))
+        return MySQLSourceDB(connection)
 
     def _lock_source_db(self, source_db):
         """Read-lock all tables in source_db (prevents others writing to the db)."""
-        cursor = source_db.cursor(buffered=True, dictionary=False)
-        cursor.execute('SHOW TABLES;')
-        tables = [el[0].decode('utf-8') for el in cursor.fetchall()]
-        # Locking views actually has the effect of locking the tables they are based upon.
-        tables = [el for el in tables if not el.startswith('view_')]
-        lock_query = 'LOCK TABLES {}'.format(', '.join(['{} READ'.format(el) for el in tables]))
         logger.debug('Locking source_db tables...')
-        logger.debug(lock_query)
-        cursor.execute(lock_query)
-        cursor.close()
+        source_db.lock()
 
     def _unlock_source_db(self, source_db):
         """Undo a read-lock placed on tables in the source db."""
-        cursor = source_db.cursor(buffered=True, dictionary=False)
         logger.debug('Unlocking source_db tables..')
-        cursor.execute('UNLOCK TABLES')
-        cursor.close()
+        source_db.unlock()
+
+    # The ImportRun whose phases are checkpointed; None runs phases without checkpoints, e.g. in tests of helpers.
+    import_run = None
+    completed_phases = {}
+    # Number of rows read from the source db, for the telemetry saved in each checkpoint.
+    source_rows_read = 0
+
+    # Methods to checkpoint the phases of an import run.
+    def _start_import_run(self, resume=False):
+        """Start a new import run, or continue the latest unfinished one if resume is True.
+
+        Arguments:
+            resume (bool): whether to continue the latest unfinished import run, skipping its completed phases
+
+        Returns:
+            the ImportRun
+        """
+        import_run = None
+        if resume:
+            import_run = models.ImportRun.objects.filter(finished__isnull=True).order_by('pk').last()
+            if import_run is None:
+                logger.warning('No unfinished import run to resume; starting a new import run.')
+        if import_run is None:
+            import_run = models.ImportRun.objects.create()
+            logger.info('Started {}'.format(import_run))
+        self.import_run = import_run
+        self.completed_phases = {checkpoint.phase: checkpoint for checkpoint in import_run.checkpoints.all()}
+        if len(self.completed_phases) > 0:
+            logger.info('Resuming {}; skipping {} completed phases'.format(import_run, len(self.completed_phases)))
+        return import_run
+
+    def _run_phase(self, phase, method, *args, **kwargs):
+        """Run one phase of the import in its own transaction, recording an ImportCheckpoint when it completes.
+
+        If the import run has already completed the phase, it is skipped and the result saved
+        in its checkpoint is returned instead, so the result must be JSON serializable.
+
+        Arguments:
+            phase (str): unique name of the phase within an import run
+            method (function): the method to run the phase, called with args and kwargs
+
+        Returns:
+            the result of the method, or of the completed phase
+        """
+        if self.import_run is None:
+            return method(*args, **kwargs)
+        if phase in self.completed_phases:
+            logger.info('Skipping phase {}, which was completed in {}'.format(phase, self.import_run))
+            return self.completed_phases[phase].get_result()
+        start, start_source_rows = time.time(), self.source_rows_read
+        with transaction.atomic():
+            with QueryRecorder().capture() as recorder:
+                result = method(*args, **kwargs)
+            checkpoint = models.ImportCheckpoint.objects.create(
+                import_run=self.import_run, phase=phase, result=json.dumps(result), seconds=time.time() - start,
+                queries=recorder.count, source_rows=self.source_rows_read - start_source_rows,
+                rows_written=recorder.rows_written)
+        self.completed_phases[phase] = checkpoint
+        logger.info('Completed phase {} in {:.3f} seconds: {} source rows read ({:.0f} per second), '
+                    '{} rows written, {} queries'.format(
+                        phase, checkpoint.seconds, checkpoint.source_rows, checkpoint.source_rows_per_second,
+                        checkpoint.rows_written, checkpoint.queries))
+        return result
+
+    def _finish_import_run(self):
+        """Mark the import run as finished, so it can't be resumed."""
+        if self.import_run is not None:
+            self.import_run.finished = timezone.now()
+            self.import_run.save()
+            totals = self.import_run.get_totals()
+            logger.info('Finished {}: {:.3f} seconds in {} phases; {} source rows read, {} rows written, '
+                        '{} queries'.format(self.import_run, totals['seconds'], len(self.completed_phases),
+                                            totals['source_rows'], totals['rows_written'], totals['queries']))
 
     # Helper methods for data munging.
     def _fix_bytearray(self, row_dict):
@@ -197,7 +424,10 @@ class Command(BaseCommand):
         return fixed_row
 
     def _fix_row(self, row_dict, field_types):
-        """Helper function to run all of the fixers."""
+        """Helper function to run all of the fixers.
+
+        The import itself converts row tuples with a RowConversionPlan, which gives the same values.
+        """
         return self._fix_timezone(self._fix_bytearray(self._fix_null(row_dict, field_types)))
 
     # Methods to find out which objects are already in the db.
@@ -272,20 +502,21 @@ class Command(BaseCommand):
         obj.save()
         logger.debug('Created {}'.format(obj))
 
-    def _make_model_object_per_query_row(self, source_db, query, make_args, **kwargs):
+    def _make_model_object_per_query_row(self, source_db, query, args_mapping, **kwargs):
         """Make a model object instance from each row of a query's results.
 
         Arguments:
             source_db (MySQLConnection): a mysql.connector open db connection
             query (str): a query to send to the open db
-            make_args (function): function to convert a db query result row to args for making a model object
+            args_mapping (ArgsMapping): how the columns of the rows map to the fields of the model, e.g.
+                GLOBAL_STUDY_ARGS_MAPPING
         """
-        cursor = source_db.cursor(buffered=True, dictionary=True)
+        cursor = source_db.cursor(buffered=True, dictionary=False)
         cursor.execute(query)
-        field_types = {el[0]: el[1] for el in cursor.description}
+        plan = RowConversionPlan(cursor.description, args_mapping)
         for row in cursor:
-            model_args = make_args(self._fix_row(row, field_types))
-            self._make_model_object_from_args(model_args=model_args, **kwargs)
+            self.source_rows_read += 1
+            self._make_model_object_from_args(model_args=plan.make_args(row), **kwargs)
         cursor.close()
 
     def _make_query_for_new_rows(self, source_table, source_pk, old_pks, **kwargs):
@@ -417,7 +648,7 @@ class Command(BaseCommand):
             old_val = getattr(obj, field_name)
             new_val = model_args[field_name]
             if old_val != new_val:
-                updates += 0
+                updates += 1
                 setattr(obj, field_name, new_val)
                 obj.save()
                 update_message = '{} {} field changed from {} to {}'.format(obj, field_name, old_val, new_val)
@@ -430,7 +661,7 @@ class Command(BaseCommand):
         else:
             return False
 
-    def _update_model_object_per_query_row(self, source_db, query, make_args, **kwargs):
+    def _update_model_object_per_query_row(self, source_db, query, args_mapping, **kwargs):
         """Update an existing model object from each row of a query's results.
 
         Run a query on the source db and use its results to update any changed values
@@ -439,11 +670,12 @@ class Command(BaseCommand):
         Arguments:
             source_db (MySQLConnection): a mysql.connector open db connection
             query (str): query to send to the open db
-            make_args (function): function to convert a db query result row to args for making a model object
+            args_mapping (ArgsMapping): how the columns of the rows map to the fields of the model, e.g.
+                GLOBAL_STUDY_ARGS_MAPPING
             model (class obj): the model class to use to make a model object instance
 
         Returns:
-            int; number of updated rows that were detected in the source db
+            list of str pk values of the model objects that were changed
         """
         # Print the results of the updated rows query (SQL table format).
         # print(query)
@@ -474,15 +706,18 @@ class Command(BaseCommand):
         # print(sep_row)
         # print('\n')
         #
-        cursor = source_db.cursor(buffered=True, dictionary=True)
+        cursor = source_db.cursor(buffered=True, dictionary=False)
         cursor.execute(query)
-        field_types = {el[0]: el[1] for el in cursor.description}
-        updated = 0
+        plan = RowConversionPlan(cursor.description, args_mapping)
+        model_pk_name = kwargs['model']._meta.pk.name
+        updated_pks = []
         for row in cursor:
-            args = make_args(self._fix_row(row, field_types))
-            if self._update_model_object_from_args(model_args=args, **kwargs):
-                updated += 1
+            self.source_rows_read += 1
+            model_args = plan.make_args(row)
+            if self._update_model_object_from_args(model_args=model_args, **kwargs):
+                updated_pks.append(str(model_args[model_pk_name]))
         cursor.close()
+        return updated_pks
 
     def _update_existing_data(self, **kwargs):
         """Update field values that have been modified in the source db since the last update.
@@ -492,21 +727,22 @@ class Command(BaseCommand):
         Django. Use the results of that query to update the data in the Django db.
 
         Returns:
-            int; the number of updated rows detected in the source db
+            list of str pk values that were changed in the Django db
         """
         model = kwargs['model']
         old_pks = self._get_current_pks(model)
         if len(old_pks) < 1:
             logger.debug('Model {} has no imported objects to check for updates.'.format(model._meta.object_name))
-            n_updated = 0
+            updated_pks = []
         else:
             update_rows_query = self._make_query_for_rows_to_update(old_pks=old_pks, changed_greater=True, **kwargs)
             logger.debug(update_rows_query)
             logger.debug('Updating entries for model {} ...'.format(model._meta.object_name))
-            n_updated = self._update_model_object_per_query_row(query=update_rows_query, **kwargs)
-        return n_updated
+            updated_pks = self._update_model_object_per_query_row(query=update_rows_query, **kwargs)
+        return updated_pks
 
     # Methods to make object-instantiating args from a row of the source db data.
+    # import_db itself makes args from row tuples, with a RowConversionPlan compiled from the same ArgsMapping.
     def _make_global_study_args(self, row_dict):
         """Get args for making a models.GlobalStudy object from a source db row.
 
@@ -521,9 +757,7 @@ class Command(BaseCommand):
         Returns:
             a dict of (required_models.GlobalStudy_attribute: attribute_value) pairs
         """
-        return self._make_args_mapping(row_dict,
-                                       ['id', 'name', 'date_added', 'date_changed', 'topmed_accession',
-                                        'topmed_abbreviation'])
+        return self._make_args_mapping(row_dict, *GLOBAL_STUDY_ARGS_MAPPING)
 
     def _make_study_args(self, row_dict):
         """Get args for making a models.Study object from a source db row.
@@ -539,9 +773,7 @@ class Command(BaseCommand):
         Returns:
             a dict of (required_Study_attribute: attribute_value) pairs
         """
-        return self._make_args_mapping(row_dict,
-                                       ['accession', 'study_name', 'date_added', 'date_changed'],
-                                       foreign_key_mapping={'global_study_id': models.GlobalStudy})
+        return self._make_args_mapping(row_dict, *STUDY_ARGS_MAPPING)
 
     def _make_source_study_version_args(self, row_dict):
         """Get args for making a models.SourceStudyVersion object from a source db row.
@@ -557,12 +789,7 @@ class Command(BaseCommand):
         Returns:
             a dict of (required_SourceStudyVersion_attribute: attribute_value) pairs
         """
-        return self._make_args_mapping(
-            row_dict,
-            ['id', 'version', 'participant_set', 'dbgap_date', 'is_deprecated', 'is_prerelease', 'date_added',
-             'date_changed'],
-            foreign_key_mapping={'accession': models.Study}
-        )
+        return self._make_args_mapping(row_dict, *SOURCE_STUDY_VERSION_ARGS_MAPPING)
 
     def _make_subcohort_args(self, row_dict):
         """Get args for making a models.Subcohort object from a source db row.
@@ -578,9 +805,7 @@ class Command(BaseCommand):
         Returns:
             a dict of (required_Subcohort_attribute: attribute_value) pairs
         """
-        return self._make_args_mapping(row_dict,
-                                       ['id', 'name', 'date_added', 'date_changed'],
-                                       foreign_key_mapping={'global_study_id': models.GlobalStudy})
+        return self._make_args_mapping(row_dict, *SUBCOHORT_ARGS_MAPPING)
 
     def _make_source_dataset_args(self, row_dict):
         """Get args for making a models.SourceDataset object from a source db row.
@@ -596,12 +821,7 @@ class Command(BaseCommand):
         Returns:
             a dict of (required_SourceDataset_attribute: attribute_value) pairs
         """
-        return self._make_args_mapping(
-            row_dict,
-            ['id', 'accession', 'version', 'is_subject_file', 'study_subject_column', 'dbgap_description',
-             'dbgap_date_created', 'date_added', 'date_changed', ],
-            foreign_key_mapping={'study_version_id': models.SourceStudyVersion}
-        )
+        return self._make_args_mapping(row_dict, *SOURCE_DATASET_ARGS_MAPPING)
 
     def _make_harmonized_trait_set_args(self, row_dict):
         """Get args for making a models.HarmonizedTraitSet object from a source db row.
@@ -617,11 +837,7 @@ class Command(BaseCommand):
         Returns:
             a dict of (required_HarmonizedTraitSet_attribute: attribute_value) pairs
         """
-        return self._make_args_mapping(
-            row_dict,
-            ['id', 'trait_set_name', 'flavor', 'is_longitudinal', 'is_demographic',
-             'date_added', 'date_changed']
-        )
+        return self._make_args_mapping(row_dict, *HARMONIZED_TRAIT_SET_ARGS_MAPPING)
 
     def _make_allowed_update_reason_args(self, row_dict):
         """Get args for making a models.AllowedUpdateReason object from a source db row.
@@ -637,8 +853,7 @@ class Command(BaseCommand):
         Returns:
             a dict of (required_Subcohort_attribute: attribute_value) pairs
         """
-        return self._make_args_mapping(row_dict,
-                                       ['id', 'abbreviation', 'description'])
+        return self._make_args_mapping(row_dict, *ALLOWED_UPDATE_REASON_ARGS_MAPPING)
 
     def _make_harmonized_trait_set_version_args(self, row_dict):
         """Get args for making a models.HarmonizedTraitSetVersion object from a source db row.
@@ -654,12 +869,7 @@ class Command(BaseCommand):
         Returns:
             a dict of (required_HarmonizedTraitSetVersion_attribute: attribute_value) pairs
         """
-        return self._make_args_mapping(
-            row_dict,
-            ['id', 'version', 'git_commit_hash', 'harmonized_by', 'is_deprecated',
-             'date_added', 'date_changed'],
-            foreign_key_mapping={'harmonized_trait_set_id': models.HarmonizedTraitSet}
-        )
+        return self._make_args_mapping(row_dict, *HARMONIZED_TRAIT_SET_VERSION_ARGS_MAPPING)
 
     def _make_harmonization_unit_args(self, row_dict):
         """Get args for making a models.HarmonizationUnit object from a source db row.
@@ -675,10 +885,7 @@ class Command(BaseCommand):
         Returns:
             a dict of (required_HarmonizationUnit_attribute: attribute_value) pairs
         """
-        return self._make_args_mapping(
-            row_dict,
-            ['id', 'tag', 'date_added', 'date_changed'],
-            foreign_key_mapping={'harmonized_trait_set_version_id': models.HarmonizedTraitSetVersion})
+        return self._make_args_mapping(row_dict, *HARMONIZATION_UNIT_ARGS_MAPPING)
 
     def _make_source_trait_args(self, row_dict):
         """Get args for making a models.SourceTrait object from a source db row.
@@ -693,14 +900,7 @@ class Command(BaseCommand):
         Returns:
             a dict of (required_SourceTrait_attribute: attribute_value) pairs
         """
-        return self._make_args_mapping(
-            row_dict,
-            ['trait_name', 'detected_type', 'dbgap_type', 'dbgap_variable_accession',
-             'dbgap_variable_version', 'dbgap_comment', 'dbgap_unit', 'n_records', 'n_missing',
-             'date_added', 'date_changed'],
-            source_field_names_to_map={'source_trait_id': 'i_trait_id', 'dbgap_description': 'i_description'},
-            foreign_key_mapping={'dataset_id': models.SourceDataset}
-        )
+        return self._make_args_mapping(row_dict, *SOURCE_TRAIT_ARGS_MAPPING)
 
     def _make_harmonized_trait_args(self, row_dict):
         """Get args for making a models.HarmonizedTrait object from a source db row.
@@ -715,12 +915,7 @@ class Command(BaseCommand):
         Returns:
             a dict of (required_HarmonizedTrait_attribute: attribute_value) pairs
         """
-        return self._make_args_mapping(
-            row_dict,
-            ['trait_name', 'description', 'data_type', 'unit', 'has_batch', 'is_unique_key', 'date_added',
-             'date_changed'],
-            source_field_names_to_map={'harmonized_trait_id': 'i_trait_id'},
-            foreign_key_mapping={'harmonized_trait_set_version_id': models.HarmonizedTraitSetVersion})
+        return self._make_args_mapping(row_dict, *HARMONIZED_TRAIT_ARGS_MAPPING)
 
     def _make_source_trait_encoded_value_args(self, row_dict):
         """Get args for making a models.SourceTraitEncodedValue object from a source db row.
@@ -736,11 +931,7 @@ class Command(BaseCommand):
         Arguments:
             source_db -- an open connection to the source database
         """
-        return self._make_args_mapping(
-            row_dict,
-            ['id', 'category', 'value', 'date_added', 'date_changed'],
-            foreign_key_mapping={'source_trait_id': models.SourceTrait}
-        )
+        return self._make_args_mapping(row_dict, *SOURCE_TRAIT_ENCODED_VALUE_ARGS_MAPPING)
 
     def _make_harmonized_trait_encoded_value_args(self, row_dict):
         """Get args for making a models.HarmonizedTraitEncodedValue object from a source db row.
@@ -756,11 +947,7 @@ class Command(BaseCommand):
         Arguments:
             source_db -- an open connection to the source database
         """
-        return self._make_args_mapping(
-            row_dict,
-            ['id', 'category', 'value', 'date_added', 'date_changed'],
-            foreign_key_mapping={'harmonized_trait_id': models.HarmonizedTrait}
-        )
+        return self._make_args_mapping(row_dict, *HARMONIZED_TRAIT_ENCODED_VALUE_ARGS_MAPPING)
 
     # Methods for importing data for ManyToMany fields.
     def _break_m2m_link(self, parent_model, parent_pk, child_model, child_pk, child_related_name, **kwargs):
@@ -836,16 +1023,16 @@ class Command(BaseCommand):
             new_m2m_query = self._make_table_query(filter_field=kwargs['parent_source_pk'],
                                                    filter_values=kwargs['import_parent_pks'],
                                                    filter_not=False, **kwargs)
-        cursor = source_db.cursor(buffered=True, dictionary=True)
+        cursor = source_db.cursor(buffered=True, dictionary=False)
         cursor.execute(new_m2m_query)
-        field_types = {el[0]: el[1] for el in cursor.description}
+        plan = RowConversionPlan(cursor.description)
         logger.debug('Importing M2M links for parent {} and child {}'.format(
             kwargs['parent_model']._meta.object_name, kwargs['child_model']._meta.object_name))
         links = []
         for row in cursor:
-            type_fixed_row = self._fix_row(row, field_types)
-            child, parent = self._make_m2m_link(parent_pk=type_fixed_row[kwargs['parent_source_pk']],
-                                                child_pk=type_fixed_row[kwargs['child_source_pk']],
+            self.source_rows_read += 1
+            child, parent = self._make_m2m_link(parent_pk=plan.get_value(row, kwargs['parent_source_pk']),
+                                                child_pk=plan.get_value(row, kwargs['child_source_pk']),
                                                 **kwargs)
             links.append((parent.pk, child.pk))
         cursor.close()
@@ -866,7 +1053,8 @@ class Command(BaseCommand):
             list of str pk values for (parent_pk, child_pk) pairs that have now been linked
         """
         links = {'added': [], 'removed': []}
-        cursor = source_db.cursor(buffered=True, dictionary=True)
+        cursor = source_db.cursor(buffered=True, dictionary=False)
+        plan = None
         current_parents = kwargs['parent_model'].objects.all()
         logger.debug('Updating M2M links for parent {} and child {}'.format(
             kwargs['parent_model']._meta.object_name, kwargs['child_model']._meta.object_name))
@@ -884,9 +1072,11 @@ class Command(BaseCommand):
                                                             filter_not=False, **kwargs)
             logger.debug(source_links_query)
             cursor.execute(source_links_query)
-            field_types = {el[0]: el[1] for el in cursor.description}
-            source_linked_pks = [str(self._fix_row(row, field_types)[kwargs['child_source_pk']])
-                                 for row in cursor.fetchall()]
+            # The query only differs in the parent pk, so compile the plan once.
+            if plan is None:
+                plan = RowConversionPlan(cursor.description)
+            source_linked_pks = [str(plan.get_value(row, kwargs['child_source_pk'])) for row in cursor.fetchall()]
+            self.source_rows_read += len(source_linked_pks)
             # Figure out which child pk's to add or remove links to.
             to_add = set(source_linked_pks) - set(linked_pks)
             to_remove = set(linked_pks) - set(source_linked_pks)
@@ -907,6 +1097,15 @@ class Command(BaseCommand):
         cursor.close()
         return links
 
+    def _sync_m2m_field(self, **kwargs):
+        """Update m2m links as _update_m2m_field does, returning the pks of the links so they can be checkpointed.
+
+        Returns:
+            dict of lists of [parent_pk, child_pk] pairs for the 'added' and 'removed' links
+        """
+        links = self._update_m2m_field(**kwargs)
+        return {change: [[parent.pk, child.pk] for (parent, child) in links[change]] for change in links}
+
     # One-off method to get the dataset's file name, parse the dataset name from it, and save it to the given dataset.
     def _set_dataset_names(self, source_db, dataset_pks):
         """Use source_db to set the dataset_name field for each of the SourceDatasets from dataset_pks."""
@@ -914,13 +1113,13 @@ class Command(BaseCommand):
         file_query = self._make_table_query(
             source_table='source_dataset_dictionary_files', filter_field='dataset_id',
             filter_values=[str(el) for el in dataset_pks], filter_not=False)
-        cursor = source_db.cursor(buffered=True, dictionary=True)
+        cursor = source_db.cursor(buffered=True, dictionary=False)
         cursor.execute(file_query)
-        field_types = {el[0]: el[1] for el in cursor.description}
+        plan = RowConversionPlan(cursor.description)
         for row in cursor:
-            fixed_row = self._fix_row(row, field_types)
-            dict_file = fixed_row['filename']
-            dataset_id = fixed_row['dataset_id']
+            self.source_rows_read += 1
+            dict_file = plan.get_value(row, 'filename')
+            dataset_id = plan.get_value(row, 'dataset_id')
             # Parse the dataset name.
             try:
                 dataset_name = DATA_DICT_RE.match(dict_file).group('base')
@@ -952,66 +1151,78 @@ class Command(BaseCommand):
             'study__i_study_name', 'i_version', 'i_date_added')]
         logger.debug('\n'.join(print_ssvs))
         for ssv in sourcestudyversions:
-            ssv.apply_previous_tags(creator)
+            self._run_phase('apply tags to source study version {}'.format(ssv.pk), ssv.apply_previous_tags, creator)
 
     # Methods to run all of the updating or importing on all of the models.
-    def _import_source_tables(self, source_db, taggedtrait_creator):
+    def _import_source_tables(self, source_db, taggedtrait_creator, since):
         """Import all source trait-related data from the source db into the Django models.
 
         Connect to the specified source db and run helper methods to import new data
         for models.SourceTrait and its related models. For regular models, use the
         _import_new_data() function with appropriate arguments. For ManyToMany fields,
-        use the _import_new_m2m_field() function with appropriate arguments. Close
-        the source db connection when finished.
+        use the _import_new_m2m_field() function with appropriate arguments. Then link
+        the new versions to their previous versions, before applying tags from the previous
+        versions. Close the source db connection when finished.
 
         Arguments:
             source_db (MySQLConnection): a mysql.connector open db connection
             taggedtrait_creator (str): email of the creator for new tagged traits
+            since (datetime): when this import started; studies with versions, datasets, or traits added or
+                modified after this are relinked
 
         Returns:
-            None
+            list of str pk values of the new source trait encoded values
         """
         logger.info('Importing new source traits...')
 
-        new_global_study_pks = self._import_new_data(
+        new_global_study_pks = self._run_phase(
+            'import global_study', self._import_new_data,
             source_db=source_db, source_table='global_study', source_pk='id', model=models.GlobalStudy,
-            make_args=self._make_global_study_args)
+            args_mapping=GLOBAL_STUDY_ARGS_MAPPING)
         logger.info("Added {} global studies".format(len(new_global_study_pks)))
 
-        new_study_pks = self._import_new_data(
+        new_study_pks = self._run_phase(
+            'import study', self._import_new_data,
             source_db=source_db, source_table='study', source_pk='accession', model=models.Study,
-            make_args=self._make_study_args)
+            args_mapping=STUDY_ARGS_MAPPING)
         logger.info("Added {} studies".format(len(new_study_pks)))
 
-        new_source_study_version_pks = self._import_new_data(
+        new_source_study_version_pks = self._run_phase(
+            'import source_study_version', self._import_new_data,
             source_db=source_db, source_table='source_study_version', source_pk='id', model=models.SourceStudyVersion,
-            make_args=self._make_source_study_version_args)
+            args_mapping=SOURCE_STUDY_VERSION_ARGS_MAPPING)
         logger.info("Added {} source study versions".format(len(new_source_study_version_pks)))
 
-        new_subcohort_pks = self._import_new_data(
+        new_subcohort_pks = self._run_phase(
+            'import subcohort', self._import_new_data,
             source_db=source_db, source_table='subcohort', source_pk='id', model=models.Subcohort,
-            make_args=self._make_subcohort_args)
+            args_mapping=SUBCOHORT_ARGS_MAPPING)
         logger.info("Added {} subcohorts".format(len(new_subcohort_pks)))
 
-        new_source_dataset_pks = self._import_new_data(
+        new_source_dataset_pks = self._run_phase(
+            'import source_dataset', self._import_new_data,
             source_db=source_db, source_table='source_dataset', source_pk='id', model=models.SourceDataset,
-            make_args=self._make_source_dataset_args)
+            args_mapping=SOURCE_DATASET_ARGS_MAPPING)
         logger.info("Added {} source datasets".format(len(new_source_dataset_pks)))
 
-        self._set_dataset_names(source_db, new_source_dataset_pks)
+        self._run_phase('set dataset names', self._set_dataset_names, source_db, new_source_dataset_pks)
         logger.info(
             "Set dataset_name and dbgap_filename fields on {} source datasets".format(len(new_source_dataset_pks)))
 
-        new_source_trait_pks = self._import_new_data(
+        new_source_trait_pks = self._run_phase(
+            'import source_trait', self._import_new_data,
             source_db=source_db, source_table='source_trait', source_pk='source_trait_id', model=models.SourceTrait,
-            make_args=self._make_source_trait_args)
+            args_mapping=SOURCE_TRAIT_ARGS_MAPPING)
         logger.info("Added {} source traits".format(len(new_source_trait_pks)))
 
-        new_source_trait_encoded_value_pks = self._import_new_data(
+        new_source_trait_encoded_value_pks = self._run_phase(
+            'import source_trait_encoded_values', self._import_new_data,
             source_db=source_db, source_table='source_trait_encoded_values', source_pk='id',
-            model=models.SourceTraitEncodedValue, make_args=self._make_source_trait_encoded_value_args)
+            model=models.SourceTraitEncodedValue, args_mapping=SOURCE_TRAIT_ENCODED_VALUE_ARGS_MAPPING)
         logger.info("Added {} source trait encoded values".format(len(new_source_trait_encoded_value_pks)))
 
+        self._run_phase('version links', self._update_version_links, since=since)
+
         # Skip applying updated tags if there are any incomplete reviews.
         unreviewed_count = TaggedTrait.objects.unreviewed().count()
         no_response_or_decision_count = TaggedTrait.objects.filter(
@@ -1040,6 +1251,7 @@ class Command(BaseCommand):
                 creator=creator
             )
             logger.info("Applied tags to updated source traits.")
+        return new_source_trait_encoded_value_pks
 
     def _import_harmonized_tables(self, source_db):
         """Import all harmonized trait-related data from the source db into the Django models.
@@ -1054,41 +1266,48 @@ class Command(BaseCommand):
             source_db (MySQLConnection): a mysql.connector open db connection
 
         Returns:
-            None
+            list of str pk values of the new harmonized trait encoded values
         """
         logger.info('Importing new harmonized traits...')
 
-        new_harmonized_trait_set_pks = self._import_new_data(
+        new_harmonized_trait_set_pks = self._run_phase(
+            'import harmonized_trait_set', self._import_new_data,
             source_db=source_db, source_table='harmonized_trait_set', source_pk='id',
-            model=models.HarmonizedTraitSet, make_args=self._make_harmonized_trait_set_args)
+            model=models.HarmonizedTraitSet, args_mapping=HARMONIZED_TRAIT_SET_ARGS_MAPPING)
         logger.info("Added {} harmonized trait sets".format(len(new_harmonized_trait_set_pks)))
 
-        new_allowed_update_reason_pks = self._import_new_data(
+        new_allowed_update_reason_pks = self._run_phase(
+            'import allowed_update_reason', self._import_new_data,
             source_db=source_db, source_table='allowed_update_reason', source_pk='id',
-            model=models.AllowedUpdateReason, make_args=self._make_allowed_update_reason_args)
+            model=models.AllowedUpdateReason, args_mapping=ALLOWED_UPDATE_REASON_ARGS_MAPPING)
         logger.info("Added {} allowed update reasons".format(len(new_allowed_update_reason_pks)))
 
-        new_harmonized_trait_set_version_pks = self._import_new_data(
+        new_harmonized_trait_set_version_pks = self._run_phase(
+            'import harmonized_trait_set_version', self._import_new_data,
             source_db=source_db, source_table='harmonized_trait_set_version', source_pk='id',
-            model=models.HarmonizedTraitSetVersion, make_args=self._make_harmonized_trait_set_version_args)
+            model=models.HarmonizedTraitSetVersion, args_mapping=HARMONIZED_TRAIT_SET_VERSION_ARGS_MAPPING)
         logger.info("Added {} harmonized trait set versions".format(len(new_harmonized_trait_set_version_pks)))
 
-        new_harmonization_unit_pks = self._import_new_data(
+        new_harmonization_unit_pks = self._run_phase(
+            'import harmonization_unit', self._import_new_data,
             source_db=source_db, source_table='harmonization_unit', source_pk='id',
-            model=models.HarmonizationUnit, make_args=self._make_harmonization_unit_args)
+            model=models.HarmonizationUnit, args_mapping=HARMONIZATION_UNIT_ARGS_MAPPING)
         logger.info("Added {} harmonization units".format(len(new_harmonization_unit_pks)))
 
-        new_harmonized_trait_pks = self._import_new_data(
+        new_harmonized_trait_pks = self._run_phase(
+            'import harmonized_trait', self._import_new_data,
             source_db=source_db, source_table='harmonized_trait', source_pk='harmonized_trait_id',
-            model=models.HarmonizedTrait, make_args=self._make_harmonized_trait_args)
+            model=models.HarmonizedTrait, args_mapping=HARMONIZED_TRAIT_ARGS_MAPPING)
         logger.info("Added {} harmonized traits".format(len(new_harmonized_trait_pks)))
 
-        new_harmonized_trait_encoded_value_pks = self._import_new_data(
+        new_harmonized_trait_encoded_value_pks = self._run_phase(
+            'import harmonized_trait_encoded_values', self._import_new_data,
             source_db=source_db, source_table='harmonized_trait_encoded_values', source_pk='id',
-            model=models.HarmonizedTraitEncodedValue, make_args=self._make_harmonized_trait_encoded_value_args)
+            model=models.HarmonizedTraitEncodedValue, args_mapping=HARMONIZED_TRAIT_ENCODED_VALUE_ARGS_MAPPING)
         logger.info("Added {} harmonized trait encoded values".format(len(new_harmonized_trait_encoded_value_pks)))
 
-        new_component_source_trait_links_to_unit = self._import_new_m2m_field(
+        new_component_source_trait_links_to_unit = self._run_phase(
+            'import component_source_trait links to HarmonizationUnit', self._import_new_m2m_field,
             source_db=source_db, source_table='component_source_trait', parent_model=models.HarmonizationUnit,
             parent_source_pk='harmonization_unit_id', child_model=models.SourceTrait,
             child_source_pk='component_trait_id', child_related_name='component_source_traits',
@@ -1096,7 +1315,8 @@ class Command(BaseCommand):
         logger.info("Added {} component source trait links to harmonization units".format(
             len(new_component_source_trait_links_to_unit)))
 
-        new_component_harmonized_trait_links_to_unit = self._import_new_m2m_field(
+        new_component_harmonized_trait_links_to_unit = self._run_phase(
+            'import component_harmonized_trait_set links to HarmonizationUnit', self._import_new_m2m_field,
             source_db=source_db, source_table='component_harmonized_trait_set', parent_model=models.HarmonizationUnit,
             parent_source_pk='harmonization_unit_id', child_model=models.HarmonizedTraitSetVersion,
             child_source_pk='component_trait_set_version_id',
@@ -1105,7 +1325,8 @@ class Command(BaseCommand):
         logger.info("Added {} component harmonized trait set version links to harmonization units".format(
             len(new_component_harmonized_trait_links_to_unit)))
 
-        new_component_batch_trait_links_to_unit = self._import_new_m2m_field(
+        new_component_batch_trait_links_to_unit = self._run_phase(
+            'import component_batch_trait links to HarmonizationUnit', self._import_new_m2m_field,
             source_db=source_db, source_table='component_batch_trait', parent_model=models.HarmonizationUnit,
             parent_source_pk='harmonization_unit_id', child_model=models.SourceTrait,
             child_source_pk='component_trait_id', child_related_name='component_batch_traits',
@@ -1113,7 +1334,8 @@ class Command(BaseCommand):
         logger.info("Added {} component batch trait links to harmonization units".format(
             len(new_component_batch_trait_links_to_unit)))
 
-        new_component_age_trait_links_to_unit = self._import_new_m2m_field(
+        new_component_age_trait_links_to_unit = self._run_phase(
+            'import component_age_trait links to HarmonizationUnit', self._import_new_m2m_field,
             source_db=source_db, source_table='component_age_trait', parent_model=models.HarmonizationUnit,
             parent_source_pk='harmonization_unit_id', child_model=models.SourceTrait,
             child_source_pk='component_trait_id', child_related_name='component_age_traits',
@@ -1121,7 +1343,8 @@ class Command(BaseCommand):
         logger.info("Added {} component age trait links to harmonization units".format(
             len(new_component_age_trait_links_to_unit)))
 
-        new_component_source_trait_links_to_trait = self._import_new_m2m_field(
+        new_component_source_trait_links_to_trait = self._run_phase(
+            'import component_source_trait links to HarmonizedTrait', self._import_new_m2m_field,
             source_db=source_db, source_table='component_source_trait', parent_model=models.HarmonizedTrait,
             parent_source_pk='harmonized_trait_id', child_model=models.SourceTrait,
             child_source_pk='component_trait_id', child_related_name='component_source_traits',
@@ -1129,7 +1352,8 @@ class Command(BaseCommand):
         logger.info("Added {} component source trait links to harmonized traits".format(
             len(new_component_source_trait_links_to_trait)))
 
-        new_component_harmonized_trait_links_to_trait = self._import_new_m2m_field(
+        new_component_harmonized_trait_links_to_trait = self._run_phase(
+            'import component_harmonized_trait_set links to HarmonizedTrait', self._import_new_m2m_field,
             source_db=source_db, source_table='component_harmonized_trait_set', parent_model=models.HarmonizedTrait,
             parent_source_pk='harmonized_trait_id', child_model=models.HarmonizedTraitSetVersion,
             child_source_pk='component_trait_set_version_id',
@@ -1138,7 +1362,8 @@ class Command(BaseCommand):
         logger.info("Added {} component harmonized trait set version links to harmonized traits".format(
             len(new_component_harmonized_trait_links_to_trait)))
 
-        new_component_batch_trait_links_to_trait = self._import_new_m2m_field(
+        new_component_batch_trait_links_to_trait = self._run_phase(
+            'import component_batch_trait links to HarmonizedTrait', self._import_new_m2m_field,
             source_db=source_db, source_table='component_batch_trait', parent_model=models.HarmonizedTrait,
             parent_source_pk='harmonized_trait_id', child_model=models.SourceTrait,
             child_source_pk='component_trait_id', child_related_name='component_batch_traits',
@@ -1146,7 +1371,8 @@ class Command(BaseCommand):
         logger.info("Added {} component batch trait links to harmonized traits".format(
             len(new_component_batch_trait_links_to_trait)))
 
-        new_harmonization_unit_harmonized_trait_links = self._import_new_m2m_field(
+        new_harmonization_unit_harmonized_trait_links = self._run_phase(
+            'import harmonization unit links to HarmonizedTrait', self._import_new_m2m_field,
             source_db=source_db, query=HUNIT_QUERY, parent_model=models.HarmonizedTrait,
             parent_source_pk='harmonized_trait_id', child_model=models.HarmonizationUnit,
             child_source_pk='harmonization_unit_id', child_related_name='harmonization_units',
@@ -1154,7 +1380,9 @@ class Command(BaseCommand):
         logger.info("Added {} harmonization unit links to harmonized traits".format(
             len(new_harmonization_unit_harmonized_trait_links)))
 
-        new_allowed_update_reason_links = self._import_new_m2m_field(
+        new_allowed_update_reason_links = self._run_phase(
+            'import harmonized_trait_set_version_update_reason links to HarmonizedTraitSetVersion',
+            self._import_new_m2m_field,
             source_db=source_db, source_table='harmonized_trait_set_version_update_reason',
             parent_model=models.HarmonizedTraitSetVersion,
             parent_source_pk='harmonized_trait_set_version_id', child_model=models.AllowedUpdateReason,
@@ -1162,6 +1390,7 @@ class Command(BaseCommand):
             child_related_name='update_reasons', import_parent_pks=new_harmonized_trait_set_version_pks)
         logger.info("Added {} update reason links to harmonized trait set versions".format(
             len(new_allowed_update_reason_links)))
+        return new_harmonized_trait_encoded_value_pks
 
     def _update_source_tables(self, source_db):
         """Update source trait-related Django models from modified data in the source db.
@@ -1178,44 +1407,52 @@ class Command(BaseCommand):
             source_db (MySQLConnection): a mysql.connector open db connection
 
         Returns:
-            None
+            list of str pk values of the source trait encoded values that were changed
         """
         logger.info('Updating source traits...')
 
-        global_study_update_count = self._update_existing_data(
+        updated_global_study_pks = self._run_phase(
+            'update global_study', self._update_existing_data,
             source_db=source_db, source_table='global_study', source_pk='id', model=models.GlobalStudy,
-            make_args=self._make_global_study_args, expected=False)
-        logger.info('{} global studies updated'.format(global_study_update_count))
+            args_mapping=GLOBAL_STUDY_ARGS_MAPPING, expected=False)
+        logger.info('{} global studies updated'.format(len(updated_global_study_pks)))
 
-        study_update_count = self._update_existing_data(
+        updated_study_pks = self._run_phase(
+            'update study', self._update_existing_data,
             source_db=source_db, source_table='study', source_pk='accession', model=models.Study,
-            make_args=self._make_study_args, expected=False)
-        logger.info('{} studies updated'.format(study_update_count))
+            args_mapping=STUDY_ARGS_MAPPING, expected=False)
+        logger.info('{} studies updated'.format(len(updated_study_pks)))
 
-        source_study_version_update_count = self._update_existing_data(
+        updated_source_study_version_pks = self._run_phase(
+            'update source_study_version', self._update_existing_data,
             source_db=source_db, source_table='source_study_version', source_pk='id', model=models.SourceStudyVersion,
-            make_args=self._make_source_study_version_args, expected=True)
-        logger.info('{} source study versions updated'.format(source_study_version_update_count))
+            args_mapping=SOURCE_STUDY_VERSION_ARGS_MAPPING, expected=True)
+        logger.info('{} source study versions updated'.format(len(updated_source_study_version_pks)))
 
-        subcohort_update_count = self._update_existing_data(
+        updated_subcohort_pks = self._run_phase(
+            'update subcohort', self._update_existing_data,
             source_db=source_db, source_table='subcohort', source_pk='id', model=models.Subcohort,
-            make_args=self._make_subcohort_args, expected=True)
-        logger.info('{} subcohorts updated'.format(subcohort_update_count))
+            args_mapping=SUBCOHORT_ARGS_MAPPING, expected=True)
+        logger.info('{} subcohorts updated'.format(len(updated_subcohort_pks)))
 
-        source_dataset_update_count = self._update_existing_data(
+        updated_source_dataset_pks = self._run_phase(
+            'update source_dataset', self._update_existing_data,
             source_db=source_db, source_table='source_dataset', source_pk='id', model=models.SourceDataset,
-            make_args=self._make_source_dataset_args, expected=True)
-        logger.info('{} source datasets updated'.format(source_dataset_update_count))
+            args_mapping=SOURCE_DATASET_ARGS_MAPPING, expected=True)
+        logger.info('{} source datasets updated'.format(len(updated_source_dataset_pks)))
 
-        source_trait_update_count = self._update_existing_data(
+        updated_source_trait_pks = self._run_phase(
+            'update source_trait', self._update_existing_data,
             source_db=source_db, source_table='source_trait', source_pk='source_trait_id', model=models.SourceTrait,
-            make_args=self._make_source_trait_args, expected=True)
-        logger.info('{} source traits updated'.format(source_trait_update_count))
+            args_mapping=SOURCE_TRAIT_ARGS_MAPPING, expected=True)
+        logger.info('{} source traits updated'.format(len(updated_source_trait_pks)))
 
-        source_trait_ev_update_count = self._update_existing_data(
+        updated_source_trait_ev_pks = self._run_phase(
+            'update source_trait_encoded_values', self._update_existing_data,
             source_db=source_db, source_table='source_trait_encoded_values', source_pk='id',
-            model=models.SourceTraitEncodedValue, make_args=self._make_source_trait_encoded_value_args, expected=False)
-        logger.info('{} source trait encoded values updated'.format(source_trait_ev_update_count))
+            model=models.SourceTraitEncodedValue, args_mapping=SOURCE_TRAIT_ENCODED_VALUE_ARGS_MAPPING, expected=False)
+        logger.info('{} source trait encoded values updated'.format(len(updated_source_trait_ev_pks)))
+        return updated_source_trait_ev_pks
 
     def _update_harmonized_tables(self, source_db):
         """Update harmonized trait-related Django models from modified data in the source db.
@@ -1232,11 +1469,13 @@ class Command(BaseCommand):
             source_db (MySQLConnection): a mysql.connector open db connection
 
         Returns:
-            None
+            tuple of (set of pks of the harmonized trait set versions whose units or traits had component links
+            changed, list of str pk values of the harmonized trait encoded values that were changed)
         """
         logger.info('Updating harmonized traits...')
 
-        updated_component_source_trait_links_to_unit = self._update_m2m_field(
+        updated_component_source_trait_links_to_unit = self._run_phase(
+            'update component_source_trait links to HarmonizationUnit', self._sync_m2m_field,
             source_db=source_db, source_table='component_source_trait', parent_model=models.HarmonizationUnit,
             parent_source_pk='harmonization_unit_id', child_model=models.SourceTrait,
             child_source_pk='component_trait_id', child_related_name='component_source_traits', expected=False)
@@ -1245,7 +1484,8 @@ class Command(BaseCommand):
         logger.info("Update: removed {} component source trait links from harmonization unit".format(
             len(updated_component_source_trait_links_to_unit['removed'])))
 
-        updated_component_harmonized_trait_links_to_unit = self._update_m2m_field(
+        updated_component_harmonized_trait_links_to_unit = self._run_phase(
+            'update component_harmonized_trait_set links to HarmonizationUnit', self._sync_m2m_field,
             source_db=source_db, source_table='component_harmonized_trait_set', parent_model=models.HarmonizationUnit,
             parent_source_pk='harmonization_unit_id', child_model=models.HarmonizedTraitSetVersion,
             child_source_pk='component_trait_set_version_id',
@@ -1256,7 +1496,8 @@ class Command(BaseCommand):
         logger.info("Update: removed {} component harmonized trait set versions from harmonization units".format(
             len(updated_component_harmonized_trait_links_to_unit['removed'])))
 
-        updated_component_batch_trait_links_to_unit = self._update_m2m_field(
+        updated_component_batch_trait_links_to_unit = self._run_phase(
+            'update component_batch_trait links to HarmonizationUnit', self._sync_m2m_field,
             source_db=source_db, source_table='component_batch_trait', parent_model=models.HarmonizationUnit,
             parent_source_pk='harmonization_unit_id', child_model=models.SourceTrait,
             child_source_pk='component_trait_id', child_related_name='component_batch_traits', expected=False)
@@ -1265,7 +1506,8 @@ class Command(BaseCommand):
         logger.info("Update: removed {} component batch trait links from harmonization units".format(
             len(updated_component_batch_trait_links_to_unit['removed'])))
 
-        updated_component_age_trait_links_to_unit = self._update_m2m_field(
+        updated_component_age_trait_links_to_unit = self._run_phase(
+            'update component_age_trait links to HarmonizationUnit', self._sync_m2m_field,
             source_db=source_db, source_table='component_age_trait', parent_model=models.HarmonizationUnit,
             parent_source_pk='harmonization_unit_id', child_model=models.SourceTrait,
             child_source_pk='component_trait_id', child_related_name='component_age_traits', expected=False)
@@ -1274,7 +1516,8 @@ class Command(BaseCommand):
         logger.info("Update: removed {} component age trait links from harmonization units".format(
             len(updated_component_age_trait_links_to_unit['removed'])))
 
-        updated_component_source_trait_links_to_trait = self._update_m2m_field(
+        updated_component_source_trait_links_to_trait = self._run_phase(
+            'update component_source_trait links to HarmonizedTrait', self._sync_m2m_field,
             source_db=source_db, source_table='component_source_trait', parent_model=models.HarmonizedTrait,
             parent_source_pk='harmonized_trait_id', child_model=models.SourceTrait,
             child_source_pk='component_trait_id', child_related_name='component_source_traits', expected=False)
@@ -1283,7 +1526,8 @@ class Command(BaseCommand):
         logger.info("Update: removed {} component source trait links from harmonized traits".format(
             len(updated_component_source_trait_links_to_trait['removed'])))
 
-        updated_component_harmonized_trait_links_to_trait = self._update_m2m_field(
+        updated_component_harmonized_trait_links_to_trait = self._run_phase(
+            'update component_harmonized_trait_set links to HarmonizedTrait', self._sync_m2m_field,
             source_db=source_db, source_table='component_harmonized_trait_set', parent_model=models.HarmonizedTrait,
             parent_source_pk='harmonized_trait_id', child_model=models.HarmonizedTraitSetVersion,
             child_source_pk='component_trait_set_version_id',
@@ -1294,7 +1538,8 @@ class Command(BaseCommand):
         logger.info("Update: removed {} component harmonized trait set version links from harmonized traits".format(
             len(updated_component_harmonized_trait_links_to_trait['removed'])))
 
-        updated_component_batch_trait_links_to_trait = self._update_m2m_field(
+        updated_component_batch_trait_links_to_trait = self._run_phase(
+            'update component_batch_trait links to HarmonizedTrait', self._sync_m2m_field,
             source_db=source_db, source_table='component_batch_trait', parent_model=models.HarmonizedTrait,
             parent_source_pk='harmonized_trait_id', child_model=models.SourceTrait,
             child_source_pk='component_trait_id', child_related_name='component_batch_traits', expected=False)
@@ -1303,7 +1548,8 @@ class Command(BaseCommand):
         logger.info("Update: removed {} component batch trait links from harmonized traits".format(
             len(updated_component_batch_trait_links_to_trait['removed'])))
 
-        updated_harmonization_unit_harmonized_trait_links = self._update_m2m_field(
+        updated_harmonization_unit_harmonized_trait_links = self._run_phase(
+            'update harmonization unit links to HarmonizedTrait', self._sync_m2m_field,
             source_db=source_db, query=HUNIT_QUERY, parent_model=models.HarmonizedTrait,
             parent_source_pk='harmonized_trait_id', child_model=models.HarmonizationUnit,
             child_source_pk='harmonization_unit_id', child_related_name='harmonization_units', expected=False)
@@ -1312,7 +1558,9 @@ class Command(BaseCommand):
         logger.info("Update: removed {} harmonization unit links from harmonized traits".format(
             len(updated_harmonization_unit_harmonized_trait_links['removed'])))
 
-        updated_harmonized_trait_set_version_update_reason_links = self._update_m2m_field(
+        updated_harmonized_trait_set_version_update_reason_links = self._run_phase(
+            'update harmonized_trait_set_version_update_reason links to HarmonizedTraitSetVersion',
+            self._sync_m2m_field,
             source_db=source_db, source_table='harmonized_trait_set_version_update_reason',
             parent_model=models.HarmonizedTraitSetVersion, parent_source_pk='harmonized_trait_set_version_id',
             child_model=models.AllowedUpdateReason, child_source_pk='reason_id', child_related_name='update_reasons',
@@ -1323,40 +1571,158 @@ class Command(BaseCommand):
         logger.info("Update: removed {} update reason links from harmonized trait set versions".format(
             len(updated_harmonized_trait_set_version_update_reason_links['removed'])))
 
-        htrait_set_update_count = self._update_existing_data(
+        updated_htrait_set_pks = self._run_phase(
+            'update harmonized_trait_set', self._update_existing_data,
             source_db=source_db, source_table='harmonized_trait_set', source_pk='id', model=models.HarmonizedTraitSet,
-            make_args=self._make_harmonized_trait_set_args, expected=False)
-        logger.info('{} harmonized trait sets updated'.format(htrait_set_update_count))
+            args_mapping=HARMONIZED_TRAIT_SET_ARGS_MAPPING, expected=False)
+        logger.info('{} harmonized trait sets updated'.format(len(updated_htrait_set_pks)))
 
         # Don't even look for updates of allowed_update_reason table, because they shouldn't be there anyway and the
         # update function won't even work because date_changed is not in the table.
         # allowed_update_reason_update_count = self._update_existing_data(
         #     source_db=source_db, source_table='allowed_update_reason', source_pk='id',
         #     model=models.AllowedUpdateReason,
-        #     make_args=self._make_allowed_update_reason_args, expected=False)
+        #     args_mapping=ALLOWED_UPDATE_REASON_ARGS_MAPPING, expected=False)
         # logger.info('{} allowed update reasons updated'.format(allowed_update_reason_update_count))
 
-        htrait_set_version_update_count = self._update_existing_data(
+        updated_htrait_set_version_pks = self._run_phase(
+            'update harmonized_trait_set_version', self._update_existing_data,
             source_db=source_db, source_table='harmonized_trait_set_version', source_pk='id',
             model=models.HarmonizedTraitSetVersion,
-            make_args=self._make_harmonized_trait_set_version_args, expected=False)
-        logger.info('{} harmonized trait set versions updated'.format(htrait_set_version_update_count))
+            args_mapping=HARMONIZED_TRAIT_SET_VERSION_ARGS_MAPPING, expected=False)
+        logger.info('{} harmonized trait set versions updated'.format(len(updated_htrait_set_version_pks)))
 
-        harmonized_trait_update_count = self._update_existing_data(
+        updated_harmonized_trait_pks = self._run_phase(
+            'update harmonized_trait', self._update_existing_data,
             source_db=source_db, source_table='harmonized_trait', source_pk='harmonized_trait_id',
-            model=models.HarmonizedTrait, make_args=self._make_harmonized_trait_args, expected=False)
-        logger.info('{} harmonized traits updated'.format(harmonized_trait_update_count))
+            model=models.HarmonizedTrait, args_mapping=HARMONIZED_TRAIT_ARGS_MAPPING, expected=False)
+        logger.info('{} harmonized traits updated'.format(len(updated_harmonized_trait_pks)))
 
-        htrait_ev_update_count = self._update_existing_data(
+        updated_htrait_ev_pks = self._run_phase(
+            'update harmonized_trait_encoded_values', self._update_existing_data,
             source_db=source_db, source_table='harmonized_trait_encoded_values', source_pk='id',
-            model=models.HarmonizedTraitEncodedValue, make_args=self._make_harmonized_trait_encoded_value_args,
+            model=models.HarmonizedTraitEncodedValue, args_mapping=HARMONIZED_TRAIT_ENCODED_VALUE_ARGS_MAPPING,
             expected=False)
-        logger.info('{} harmonized trait encoded values updated'.format(htrait_ev_update_count))
+        logger.info('{} harmonized trait encoded values updated'.format(len(updated_htrait_ev_pks)))
 
-        harmonization_unit_update_count = self._update_existing_data(
+        updated_harmonization_unit_pks = self._run_phase(
+            'update harmonization_unit', self._update_existing_data,
             source_db=source_db, source_table='harmonization_unit', source_pk='id', model=models.HarmonizationUnit,
-            make_args=self._make_harmonization_unit_args, expected=False)
-        logger.info("{} harmonization units updated".format(harmonization_unit_update_count))
+            args_mapping=HARMONIZATION_UNIT_ARGS_MAPPING, expected=False)
+        logger.info("{} harmonization units updated".format(len(updated_harmonization_unit_pks)))
+
+        # Changing m2m links doesn't change the parent's modified date, so return the affected trait set versions.
+        component_links = (
+            (models.HarmonizationUnit, (
+                updated_component_source_trait_links_to_unit, updated_component_harmonized_trait_links_to_unit,
+                updated_component_batch_trait_links_to_unit, updated_component_age_trait_links_to_unit)),
+            (models.HarmonizedTrait, (
+                updated_component_source_trait_links_to_trait, updated_component_harmonized_trait_links_to_trait,
+                updated_component_batch_trait_links_to_trait, updated_harmonization_unit_harmonized_trait_links)),
+        )
+        changed_set_version_pks = set()
+        for parent_model, link_sets in component_links:
+            parent_pks = set(parent_pk for links in link_sets
+                             for parent_pk, child_pk in links['added'] + links['removed'])
+            changed_set_version_pks.update(parent_model.objects.filter(pk__in=parent_pks).values_list(
+                'harmonized_trait_set_version_id', flat=True))
+        return changed_set_version_pks, updated_htrait_ev_pks
+
+    def _update_component_html(self, since, changed_link_set_version_pks=()):
+        """Rebuild the component html for harmonized trait set versions whose components changed in this import.
+
+        Arguments:
+            since (datetime): when this import started; components added or modified after this are changed
+            changed_link_set_version_pks (iterable): pks of set versions whose component links were changed
+
+        Returns:
+            int number of harmonized trait set versions whose component html was saved
+        """
+        changed_pks = set(models.HarmonizedTraitSetVersion.objects.component_changed_since(since).values_list(
+            'pk', flat=True))
+        changed_pks.update(changed_link_set_version_pks)
+        n_saved = models.HarmonizedTraitSetVersion.objects.filter(pk__in=changed_pks).update_component_html()
+        logger.info('Component html rebuilt for {} of {} changed harmonized trait set versions'.format(
+            n_saved, len(changed_pks)))
+        return n_saved
+
+    def _update_lineage(self):
+        """Recompute the source trait to harmonized trait lineage table after the harmonized tables are imported.
+
+        Returns:
+            int number of lineage rows that were added, removed, or changed
+        """
+        differences = models.SourceTraitLineage.objects.refresh()
+        logger.info('Source trait lineage updated for {} source and harmonized trait pairs'.format(len(differences)))
+        return len(differences)
+
+    def _update_encoded_value_sets(self, source_trait_encoded_value_pks=(), harmonized_trait_encoded_value_pks=()):
+        """Link traits whose encoded values were added or changed in this import to their shared encoded value sets.
+
+        Arguments:
+            source_trait_encoded_value_pks (iterable): pks of the source trait encoded values added or changed
+            harmonized_trait_encoded_value_pks (iterable): pks of the harmonized trait encoded values added or changed
+
+        Returns:
+            int number of source and harmonized traits whose encoded value set was changed
+        """
+        batch_size = EncodedValueSetQuerySet.LINK_BATCH_SIZE
+        n_linked = 0
+        for trait_model, encoded_value_model, encoded_value_pks in (
+                (models.SourceTrait, models.SourceTraitEncodedValue, source_trait_encoded_value_pks),
+                (models.HarmonizedTrait, models.HarmonizedTraitEncodedValue, harmonized_trait_encoded_value_pks)):
+            trait_field = EncodedValueSetQuerySet.TRAIT_ENCODED_VALUES[trait_model.__name__][1]
+            encoded_value_pks = list(encoded_value_pks)
+            changed_trait_pks = set()
+            for start in range(0, len(encoded_value_pks), batch_size):
+                changed_trait_pks.update(encoded_value_model.objects.filter(
+                    pk__in=encoded_value_pks[start:start + batch_size]).values_list(trait_field, flat=True))
+            # Unlinked traits are included so that new traits without encoded values, and traits imported before
+            # the sets existed, are linked too.
+            changed_trait_pks.update(trait_model.objects.filter(encoded_value_set__isnull=True).values_list(
+                'pk', flat=True))
+            changed_trait_pks = sorted(changed_trait_pks)
+            n_traits, n_sets = 0, 0
+            for start in range(0, len(changed_trait_pks), batch_size):
+                n_batch_traits, n_batch_sets = models.EncodedValueSet.objects.link_traits(
+                    trait_model.objects.filter(pk__in=changed_trait_pks[start:start + batch_size]))
+                n_traits += n_batch_traits
+                n_sets += n_batch_sets
+            logger.info('Encoded value sets linked for {} of {} changed {}, with {} new sets'.format(
+                n_traits, len(changed_trait_pks), trait_model._meta.verbose_name_plural, n_sets))
+            n_linked += n_traits
+        return n_linked
+
+    def _update_version_links(self, since):
+        """Relink the previous and next versions of the study versions, datasets, and traits of changed studies.
+
+        Arguments:
+            since (datetime): when this import started; studies with versions, datasets, or traits added or
+                modified after this are changed
+
+        Returns:
+            int number of source study versions, datasets, and traits whose version links were changed
+        """
+        linked_models = (models.SourceStudyVersion, models.SourceDataset, models.SourceTrait)
+        changed_study_pks = set()
+        for model in linked_models:
+            changed_study_pks.update(model.objects.filter(modified__gte=since).get_study_pks())
+        n_linked = 0
+        for model in linked_models:
+            n_changed = model.objects.in_studies(changed_study_pks).refresh_version_links()
+            logger.info('Version links updated for {} {}'.format(n_changed, model._meta.verbose_name_plural))
+            n_linked += n_changed
+        return n_linked
+
+    def _record_import_generation(self):
+        """Add a new import generation, which marks the cached catalog pages as out of date.
+
+        Returns:
+            the new ImportGeneration
+        """
+        generation = models.ImportGeneration.objects.create()
+        logger.info('Recorded import generation {}'.format(generation.pk))
+        return generation
 
     # Methods to actually do the management command.
     def add_arguments(self, parser):
@@ -1378,16 +1744,25 @@ class Command(BaseCommand):
         parser.add_argument('--taggedtrait_creator', action='store', type=str, default=None, required=True,
                             help="""Email address for the user account that will be set as the creator of any
                                     tagged traits that are created from apply_previous_tags().""")
+        parser.add_argument(
+            '--resume', action='store_true',
+            help="""Continue the latest import run that did not finish, skipping the phases it completed (including
+                    the backup). Starts a new import run if there is no unfinished one.""")
 
     def handle(self, *args, **options):
         """Handle the main functions of this management command.
 
         Get a connection to the source db, update the source trait models, update
         the harmonized trait models, import new data from the source trait models,
-        and finally import new data from the harmonized trait models. Then close
-        the connection to the db. Import and update functions can be run separately
+        and import new data from the harmonized trait models. Then rebuild the
+        component html of harmonized trait set versions whose components changed,
+        and close the connection to the db. Import and update functions can be run separately
         using the --update_only and --import_only command line flags.
 
+        Each phase (importing or updating one table or set of m2m links, applying tags to one
+        study version, and so on) is run in its own transaction and checkpointed, so a failed
+        import can be continued with --resume without redoing the phases that completed.
+
         Arguments:
             **args and **options are handled as per the superclass handling; these
             argument dicts will pass on command line options
@@ -1405,9 +1780,10 @@ class Command(BaseCommand):
         # Prevent usage of --import_only or --update_only outside of test environment.
         if (options.get('import_only') or options.get('update_only')) and (not TEST):
             raise ValueError('--import_only and --update_only are only allowed in testing.')
+        import_run = self._start_import_run(resume=options.get('resume'))
         # First, backup the db before anything is changed.
         if not options.get('no_backup'):
-            management.call_command('dbbackup', compress=True, clean=True)
+            self._run_phase('backup', management.call_command, 'dbbackup', compress=True, clean=True)
             logger.info('Django db backup completed.')
         else:
             logger.info('No backup of Django db, due to no_backup option.')
@@ -1417,18 +1793,41 @@ class Command(BaseCommand):
         else:
             # Connect to the production db by default.
             source_db = self._get_source_db(which_db='production')
-        # Lock the source db to prevent others writing new partial data.
-        self._lock_source_db(source_db)
-        logger.info('Locked source db against writes from others.')
-        # First update, then import new data.
-        if not options.get('import_only'):
-            self._update_source_tables(source_db=source_db)
-            self._update_harmonized_tables(source_db=source_db)
-        if not options.get('update_only'):
-            self._import_source_tables(source_db=source_db, taggedtrait_creator=options.get('taggedtrait_creator'))
-            self._import_harmonized_tables(source_db=source_db)
-        # Unlock the db connection.
-        self._unlock_source_db(source_db)
-        logger.info('Unlocked source db.')
-        # Close all db connections.
-        source_db.close()
+        # Unlock and close the source db even if a phase fails, so a resumed import can lock it again.
+        try:
+            # Lock the source db to prevent others writing new partial data.
+            self._lock_source_db(source_db)
+            logger.info('Locked source db against writes from others.')
+            # A resumed run uses the start of the original run, so changes from its completed phases are included.
+            import_start = import_run.created
+            changed_link_set_version_pks = set()
+            source_trait_encoded_value_pks = []
+            harmonized_trait_encoded_value_pks = []
+            # First update, then import new data.
+            if not options.get('import_only'):
+                source_trait_encoded_value_pks += self._update_source_tables(source_db=source_db)
+                changed_link_set_version_pks, updated_htrait_ev_pks = self._update_harmonized_tables(
+                    source_db=source_db)
+                harmonized_trait_encoded_value_pks += updated_htrait_ev_pks
+            if not options.get('update_only'):
+                source_trait_encoded_value_pks += self._import_source_tables(
+                    source_db=source_db, taggedtrait_creator=options.get('taggedtrait_creator'), since=import_start)
+                harmonized_trait_encoded_value_pks += self._import_harmonized_tables(source_db=source_db)
+            # Finally, rebuild the component html only for trait set versions with changed components.
+            self._run_phase('component html', self._update_component_html, since=import_start,
+                            changed_link_set_version_pks=changed_link_set_version_pks)
+            # The lineage table is recomputed in full, because a change to one harmonized trait can affect many others.
+            self._run_phase('lineage', self._update_lineage)
+            # Only the traits whose encoded values were added or changed in this run can need a different set.
+            self._run_phase('encoded value sets', self._update_encoded_value_sets,
+                            source_trait_encoded_value_pks=source_trait_encoded_value_pks,
+                            harmonized_trait_encoded_value_pks=harmonized_trait_encoded_value_pks)
+            with transaction.atomic():
+                self._record_import_generation()
+                self._finish_import_run()
+        finally:
+            # Unlock the db connection.
+            self._unlock_source_db(source_db)
+            logger.info('Unlocked source db.')
+            # Close all db connections.
+            source_db.close()
@@ -0,0 +1,47 @@
+"""Check or relink the deduplicated encoded value sets of source and harmonized traits."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trait_browser import models
+
+
+class Command(BaseCommand):
+    """Management command to compare the EncodedValueSet of each trait against its encoded values and fix it."""
+
+    help = 'Check the encoded value set linked to each source and harmonized trait against its encoded values, ' \
+           'and relink them.'
+
+    def add_arguments(self, parser):
+        """Add custom command line arguments to this management command."""
+        parser.add_argument('--check', action='store_true',
+                            help="""Only report traits whose encoded value set doesn't match their encoded values,
+                                    without fixing them. Exits with an error if any are found.""")
+
+    def handle(self, *args, **options):
+        """Handle the main functions of this management command.
+
+        Arguments:
+            **args and **options are handled as per the superclass handling; these
+            argument dicts will pass on command line options
+        """
+        n_changed = 0
+        for trait_model in (models.SourceTrait, models.HarmonizedTrait):
+            name = trait_model._meta.verbose_name
+            if options.get('check'):
+                differences = models.EncodedValueSet.objects.get_differences(trait_model.objects.all())
+                for trait_pk, (linked, expected) in sorted(differences.items()):
+                    self.stdout.write('{} {}: linked set hash {}, expected set hash {}'.format(
+                        name, trait_pk, linked, expected))
+                n_changed += len(differences)
+            else:
+                n_traits, n_sets = models.EncodedValueSet.objects.link_traits(trait_model.objects.all())
+                self.stdout.write('{} {} linked, with {} new encoded value sets.'.format(
+                    n_traits, trait_model._meta.verbose_name_plural, n_sets))
+                n_changed += n_traits
+        if options.get('check'):
+            if n_changed > 0:
+                raise CommandError('Found {} traits with inconsistent encoded value sets.'.format(n_changed))
+            self.stdout.write('0 traits with inconsistent encoded value sets.')
+        else:
+            n_deleted, _ = models.EncodedValueSet.objects.unused().delete()
+            self.stdout.write('{} unused encoded value sets deleted.'.format(n_deleted))
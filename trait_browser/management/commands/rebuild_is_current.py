@@ -0,0 +1,45 @@
+"""Check or fix the is_current flags copied from the deprecation of each study version."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tags.models import TaggedTrait
+from trait_browser import models
+
+
+class Command(BaseCommand):
+    """Management command to compare is_current against the study version deprecation flags and fix it."""
+
+    help = 'Check the is_current flags of source datasets, source traits, and tagged traits against the ' \
+           'deprecation of their study versions, and fix them.'
+
+    # Models with an is_current flag, in the order they are fixed.
+    MODELS = (models.SourceDataset, models.SourceTrait, TaggedTrait)
+
+    def add_arguments(self, parser):
+        """Add custom command line arguments to this management command."""
+        parser.add_argument('--check', action='store_true',
+                            help="""Only report objects whose is_current doesn't match their study version, without
+                                    fixing them. Exits with an error if any are found.""")
+
+    def handle(self, *args, **options):
+        """Handle the main functions of this management command.
+
+        Arguments:
+            **args and **options are handled as per the superclass handling; these
+            argument dicts will pass on command line options
+        """
+        n_total = 0
+        for model in self.MODELS:
+            if options.get('check'):
+                stale_pks = list(model.objects.with_stale_is_current().order_by('pk').values_list('pk', flat=True))
+                n_stale = len(stale_pks)
+                if options.get('verbosity') > 1:
+                    for pk in stale_pks:
+                        self.stdout.write('{} {}: is_current is stale'.format(model._meta.verbose_name, pk))
+            else:
+                n_stale = model.objects.refresh_is_current()
+            self.stdout.write('{} {} {}.'.format(n_stale, model._meta.verbose_name_plural,
+                                                 'inconsistent' if options.get('check') else 'updated'))
+            n_total += n_stale
+        if options.get('check') and n_total > 0:
+            raise CommandError('Found {} objects with an inconsistent is_current.'.format(n_total))
@@ -0,0 +1,46 @@
+"""Check or recompute the precomputed source trait to harmonized trait lineage."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trait_browser import models
+
+
+class Command(BaseCommand):
+    """Management command to compare SourceTraitLineage against the harmonized trait components and fix it."""
+
+    help = 'Check the source trait to harmonized trait lineage table against the harmonized trait components, ' \
+           'and recompute it.'
+
+    def _format_differences(self, differences):
+        """Make a list of human-readable lines describing differences between cached and expected lineage."""
+        lines = []
+        for (source_pk, harmonized_pk), (cached, expected) in sorted(differences.items()):
+            lines.append('source trait {}, harmonized trait {}: cached depth {}, expected depth {}'.format(
+                source_pk, harmonized_pk, cached, expected))
+        return lines
+
+    def add_arguments(self, parser):
+        """Add custom command line arguments to this management command."""
+        parser.add_argument('--check', action='store_true',
+                            help="""Only report differences between cached and expected lineage, without fixing them.
+                                    Exits with an error if any differences are found.""")
+
+    def handle(self, *args, **options):
+        """Handle the main functions of this management command.
+
+        Arguments:
+            **args and **options are handled as per the superclass handling; these
+            argument dicts will pass on command line options
+        """
+        if options.get('check'):
+            differences = models.SourceTraitLineage.objects.get_differences()
+        else:
+            differences = models.SourceTraitLineage.objects.refresh()
+        # Listing every row of a full rebuild would be too long, so only list them at higher verbosity.
+        if options.get('check') or options.get('verbosity') > 1:
+            for line in self._format_differences(differences):
+                self.stdout.write(line)
+        if options.get('check') and len(differences) > 0:
+            raise CommandError('Found {} inconsistent source trait lineage rows.'.format(len(differences)))
+        self.stdout.write('{} source trait lineage rows {}.'.format(
+            len(differences), 'inconsistent' if options.get('check') else 'updated'))
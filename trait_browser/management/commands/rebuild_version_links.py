@@ -0,0 +1,45 @@
+"""Check or rebuild the precomputed links between the versions of study versions, datasets, and source traits."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trait_browser import models
+
+
+class Command(BaseCommand):
+    """Management command to compare the version links against the versions of each study and fix them."""
+
+    help = 'Check the previous_version and next_version links of source study versions, source datasets, and ' \
+           'source traits against the versions of their studies, and fix them.'
+
+    # Models with version links, in the order they are fixed.
+    MODELS = (models.SourceStudyVersion, models.SourceDataset, models.SourceTrait)
+
+    def add_arguments(self, parser):
+        """Add custom command line arguments to this management command."""
+        parser.add_argument('--check', action='store_true',
+                            help="""Only report objects whose version links are out of date, without fixing them.
+                                    Exits with an error if any are found.""")
+
+    def handle(self, *args, **options):
+        """Handle the main functions of this management command.
+
+        Arguments:
+            **args and **options are handled as per the superclass handling; these
+            argument dicts will pass on command line options
+        """
+        n_total = 0
+        for model in self.MODELS:
+            if options.get('check'):
+                differences = model.objects.all().get_version_link_differences()
+                n_stale = len(differences)
+                if options.get('verbosity') > 1:
+                    for pk, (cached, expected) in sorted(differences.items()):
+                        self.stdout.write('{} {}: (previous, next) is {}, expected {}'.format(
+                            model._meta.verbose_name, pk, cached, expected))
+            else:
+                n_stale = model.objects.all().refresh_version_links()
+            self.stdout.write('{} {} {}.'.format(n_stale, model._meta.verbose_name_plural,
+                                                 'inconsistent' if options.get('check') else 'updated'))
+            n_total += n_stale
+        if options.get('check') and n_total > 0:
+            raise CommandError('Found {} objects with inconsistent version links.'.format(n_total))
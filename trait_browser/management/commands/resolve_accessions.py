@@ -0,0 +1,67 @@
+"""Resolve a file of dbGaP accessions to the studies, datasets, and variables in PIE."""
+
+from collections import Counter
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trait_browser import accessions
+
+
+class Command(BaseCommand):
+    """Management command to map many dbGaP accessions to catalog entries, as the bulk accession lookup page does."""
+
+    help = 'Resolve dbGaP accessions, one or more per line, and write a tab-separated file of the matching studies, ' \
+           'datasets, and variables, with their status and latest version.'
+
+    def _read_accessions(self, input_file):
+        """Generate the accessions in input_file, without reading the whole file into memory."""
+        for line in input_file:
+            yield from accessions.split_accessions(line)
+
+    def add_arguments(self, parser):
+        """Add custom command line arguments to this management command."""
+        parser.add_argument('input_file', type=str,
+                            help='File of accessions, separated by spaces, commas, or new lines; - for stdin.')
+        parser.add_argument('--default_prefix', choices=list(accessions.ACCESSION_TYPES.keys()), default=None,
+                            help='Type of accessions without a phs, pht, or phv prefix. If not given, they are '
+                                 'reported as invalid.')
+        parser.add_argument('--output', type=str, default=None,
+                            help='File to write the results to; they are written to stdout by default.')
+        parser.add_argument('--chunk_size', type=int, default=accessions.ACCESSION_CHUNK_SIZE,
+                            help='Number of accessions to resolve with each set of queries.')
+
+    def handle(self, *args, **options):
+        """Handle the main functions of this management command.
+
+        Arguments:
+            **args and **options are handled as per the superclass handling; these
+            argument dicts will pass on command line options
+        """
+        try:
+            input_file = sys.stdin if options['input_file'] == '-' else open(options['input_file'])
+        except OSError as e:
+            raise CommandError('Could not read {}: {}'.format(options['input_file'], e))
+        output_file = open(options['output'], 'w', newline='') if options.get('output') else self.stdout
+        statuses = Counter()
+        try:
+            writer = csv.writer(output_file, delimiter='\t', lineterminator='\n')
+            writer.writerow(accessions.RESULT_FIELDS)
+            results = accessions.resolve_accessions(self._read_accessions(input_file),
+                                                    default_prefix=options.get('default_prefix'),
+                                                    chunk_size=options.get('chunk_size'))
+            for result in results:
+                statuses[result['status']] += 1
+                writer.writerow(result.values())
+        finally:
+            if input_file is not sys.stdin:
+                input_file.close()
+            if output_file is not self.stdout:
+                output_file.close()
+        # Report the counts on stderr, so that they are not mixed up with results written to stdout.
+        if options.get('verbosity') > 0:
+            self.stderr.write('Resolved {} accessions: {}.'.format(
+                sum(statuses.values()), ', '.join('{} {}'.format(statuses[status], status) for status in (
+                    accessions.STATUS_CURRENT, accessions.STATUS_DEPRECATED, accessions.STATUS_NOT_FOUND,
+                    accessions.STATUS_INVALID))))
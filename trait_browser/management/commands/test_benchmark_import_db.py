@@ -0,0 +1,105 @@
+"""Test the functions and classes for benchmark_import_db.py."""
+
+from io import StringIO
+import json
+import os
+from tempfile import TemporaryDirectory
+
+from django.core import management
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.factories import UserFactory
+from tags.models import TaggedTrait, TagStudyCount
+from trait_browser import models
+from trait_browser.factories import SourceTraitFactory
+from trait_browser.source_db import SQLiteSourceDB
+
+from .benchmark_import_db import Command, PHASES
+
+
+BENCHMARK_ARGS = ('--studies=2', '--datasets', '1', '2', '--traits', '5', '10', '--harmonized_trait_sets=2',
+                  '--tagged_fraction=0.5')
+
+
+class BenchmarkImportDBTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.history_fn = os.path.join(self.tmpdir.name, 'history.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def call_command(self, *args):
+        out = StringIO()
+        management.call_command('benchmark_import_db', *(BENCHMARK_ARGS + args),
+                                '--history={}'.format(self.history_fn), stdout=out, verbosity=0)
+        return out.getvalue()
+
+    def test_records_phase_timings(self):
+        """The timings of each phase of both imports are added to the history file."""
+        self.call_command()
+        with open(self.history_fn) as history_file:
+            history = json.load(history_file)
+        self.assertEqual(len(history), 1)
+        self.assertEqual(list(history[0]['imports'].keys()), ['first_release', 'second_release'])
+        for timings in history[0]['imports'].values():
+            self.assertEqual(list(timings['phases'].keys()), list(PHASES))
+            self.assertTrue(timings['queries'] > 0)
+        self.assertTrue(history[0]['imports']['second_release']['phases']['tag_carry_forward']['queries'] > 0)
+        self.assertEqual(history[0]['options']['studies'], 2)
+
+    def test_records_row_conversion_timings(self):
+        """The time to convert source trait rows with _fix_row and with a RowConversionPlan is recorded."""
+        out = self.call_command()
+        with open(self.history_fn) as history_file:
+            row_conversion = json.load(history_file)[0]['row_conversion']
+        self.assertEqual(list(row_conversion.keys()), ['rows', 'fix_row_us_per_row', 'plan_us_per_row'])
+        self.assertTrue(row_conversion['rows'] > 0)
+        self.assertIn('RowConversionPlan', out)
+
+    def test_rolls_back(self):
+        """The imported data is rolled back."""
+        self.call_command()
+        self.assertEqual(models.SourceTrait.objects.count(), 0)
+        self.assertEqual(TaggedTrait.objects.count(), 0)
+
+    def test_compares_to_previous(self):
+        """A second benchmark with the same options is compared to the first."""
+        self.assertNotIn('Previous times', self.call_command())
+        self.assertIn('Previous times', self.call_command())
+        with open(self.history_fn) as history_file:
+            self.assertEqual(len(json.load(history_file)), 2)
+
+    def test_keep(self):
+        """With --keep, the Django db has the same data as the source db, with tags carried forward."""
+        source_db_fn = os.path.join(self.tmpdir.name, 'source_db.sqlite3')
+        self.call_command('--keep', '--source_db={}'.format(source_db_fn))
+        source_db = SQLiteSourceDB(source_db_fn)
+        source_rows = source_db.count_rows()
+        source_db.close()
+        self.assertEqual(models.SourceTrait.objects.count(), source_rows['source_trait'])
+        self.assertEqual(models.HarmonizedTrait.objects.count(), source_rows['harmonized_trait'])
+        self.assertEqual(models.SourceDataset.objects.filter(dataset_name='').count(), 0)
+        self.assertTrue(TaggedTrait.objects.filter(previous_tagged_trait__isnull=False).exists())
+        self.assertTrue(models.SourceTraitLineage.objects.exists())
+        self.assertEqual(models.SourceTraitLineage.objects.get_differences(), {})
+        self.assertEqual(models.EncodedValueSet.objects.get_differences(models.SourceTrait.objects.all()), {})
+        self.assertEqual(models.EncodedValueSet.objects.get_differences(models.HarmonizedTrait.objects.all()), {})
+        self.assertEqual(models.ImportGeneration.objects.count(), 2)
+
+    def test_tag_traits_updates_tag_study_counts(self):
+        """The tag study counts are up to date after tagging traits with bulk inserts."""
+        SourceTraitFactory.create_batch(4)
+        n_tagged = Command()._tag_traits(UserFactory.create(), 1, 0)
+        self.assertEqual(n_tagged, 4)
+        self.assertEqual(TagStudyCount.objects.get_differences(), {})
+        self.assertEqual(sum(TagStudyCount.objects.values_list('tt_count', flat=True)), 4)
+
+    def test_existing_source_db(self):
+        """An existing source db is not overwritten."""
+        source_db_fn = os.path.join(self.tmpdir.name, 'source_db.sqlite3')
+        open(source_db_fn, 'w').close()
+        with self.assertRaises(CommandError):
+            self.call_command('--source_db={}'.format(source_db_fn))
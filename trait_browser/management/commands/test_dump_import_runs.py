@@ -0,0 +1,48 @@
+"""Test the dump_import_runs management command."""
+
+from io import StringIO
+import json
+
+from django.core import management
+from django.test import TestCase
+from django.utils import timezone
+
+from trait_browser import models
+
+
+class DumpImportRunsTest(TestCase):
+
+    def setUp(self):
+        self.finished_run = models.ImportRun.objects.create(finished=timezone.now())
+        models.ImportCheckpoint.objects.create(import_run=self.finished_run, phase='import source_trait', result='[]',
+                                               seconds=2.5, source_rows=100, rows_written=110, queries=300)
+        models.ImportCheckpoint.objects.create(import_run=self.finished_run, phase='lineage', result='0',
+                                               seconds=0.5, queries=5)
+        self.failed_run = models.ImportRun.objects.create()
+
+    def call_command(self, *args):
+        out = StringIO()
+        management.call_command('dump_import_runs', *args, stdout=out)
+        return json.loads(out.getvalue())
+
+    def test_runs_and_phases(self):
+        """Each import run is dumped with its totals and its phases, from oldest to newest."""
+        runs = self.call_command()
+        self.assertEqual([run['pk'] for run in runs], [self.finished_run.pk, self.failed_run.pk])
+        self.assertEqual(runs[0]['seconds'], 3.0)
+        self.assertEqual(runs[0]['source_rows'], 100)
+        self.assertEqual(runs[0]['queries'], 305)
+        self.assertEqual([phase['phase'] for phase in runs[0]['phases']], ['import source_trait', 'lineage'])
+        self.assertEqual(runs[0]['phases'][0]['rows_written'], 110)
+        self.assertIsNone(runs[1]['finished'])
+        self.assertEqual(runs[1]['phases'], [])
+
+    def test_finished(self):
+        """Only finished runs are dumped with --finished."""
+        runs = self.call_command('--finished')
+        self.assertEqual([run['pk'] for run in runs], [self.finished_run.pk])
+
+    def test_last(self):
+        """Only the most recent runs are dumped with --last."""
+        runs = self.call_command('--last=1')
+        self.assertEqual([run['pk'] for run in runs], [self.failed_run.pk])
@@ -0,0 +1,37 @@
+"""Test the functions and classes for export_catalog.py."""
+
+import os
+import tarfile
+from tempfile import TemporaryDirectory
+
+from django.core import management
+from django.test import TestCase
+
+from trait_browser import catalog
+from trait_browser.factories import SourceTraitFactory
+
+
+class ExportCatalogTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        SourceTraitFactory.create_batch(3)
+
+    def test_creates_snapshot_and_package(self):
+        """The snapshot directory and its .tar.gz file are created."""
+        management.call_command('export_catalog', self.tmpdir.name, '--chunk_size=2', verbosity=0)
+        output = sorted(os.listdir(self.tmpdir.name))
+        self.assertEqual(len(output), 2)
+        output_dir, tar_gz_fn = output
+        self.assertTrue(output_dir.endswith('_TOPMed_DCC_catalog'))
+        self.assertEqual(tar_gz_fn, output_dir + '.tar.gz')
+        self.assertEqual(len(catalog.read_table(os.path.join(self.tmpdir.name, output_dir), 'source_traits')['id']), 3)
+        with tarfile.open(os.path.join(self.tmpdir.name, tar_gz_fn), 'r:gz') as tar_gz_file:
+            self.assertIn(os.path.join(output_dir, catalog.SCHEMA_FILE), tar_gz_file.getnames())
+
+    def test_no_compress(self):
+        """With --no_compress, only the snapshot directory is created."""
+        management.call_command('export_catalog', self.tmpdir.name, '--no_compress', verbosity=0)
+        output = os.listdir(self.tmpdir.name)
+        self.assertEqual(len(output), 1)
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir.name, output[0], catalog.SCHEMA_FILE)))
@@ -16,8 +16,9 @@ from os.path import exists, join
 from os import listdir, stat
 from re import compile
 from shutil import rmtree
+import sqlite3
 from subprocess import call
-from tempfile import mkdtemp
+from tempfile import mkdtemp, TemporaryDirectory
 from time import sleep
 from unittest import skip
 
@@ -32,10 +33,13 @@ import watson.search as watson
 from core.factories import UserFactory
 from tags.factories import TagFactory, TaggedTraitFactory
 from tags.models import DCCDecision, DCCReview, StudyResponse, TaggedTrait
-from trait_browser.management.commands.import_db import Command, HUNIT_QUERY, STRING_TYPES
+from trait_browser.management.commands.import_db import (Command, GLOBAL_STUDY_ARGS_MAPPING, HUNIT_QUERY,
+                                                         STRING_TYPES)
 from trait_browser.management.commands.db_factory import fake_row_dict
 from trait_browser import factories
 from trait_browser import models
+from trait_browser.source_db import SQLiteSourceDB
+from trait_browser.source_db_generator import SourceDBGenerator
 from trait_browser.test_searches import ClearSearchIndexMixin
 
 CMD = Command()
@@ -781,6 +785,244 @@ class GetCurrentListsTest(TestCase):
         self.assertEqual(len(pks), self.n)
 
 
+class UpdateComponentHtmlTest(TestCase):
+    """Tests of rebuilding component html for changed harmonized trait set versions."""
+
+    def setUp(self):
+        self.htsv = factories.HarmonizedTraitSetVersionFactory.create()
+        source_traits = factories.SourceTraitFactory.create_batch(2)
+        self.hunit = factories.HarmonizationUnitFactory.create(
+            harmonized_trait_set_version=self.htsv, component_source_traits=source_traits)
+        factories.HarmonizedTraitFactory.create(
+            harmonized_trait_set_version=self.htsv, harmonization_units=[self.hunit],
+            component_source_traits=source_traits)
+        CMD._update_component_html(since=timezone.now())
+        self.htsv.refresh_from_db()
+
+    def test_builds_new_component_html(self):
+        """Component html is built for set versions that have never had it built."""
+        self.assertEqual(self.htsv.component_html_detail, self.htsv.get_component_html())
+        self.assertIn(self.hunit.i_tag, self.htsv.component_html_detail)
+
+    def test_rebuilds_changed_component(self):
+        """Component html is rebuilt when a component trait changes during the import."""
+        since = timezone.now()
+        source_trait = self.hunit.component_source_traits.first()
+        source_trait.i_trait_name = 'new_trait_name'
+        source_trait.save()
+        self.assertEqual(CMD._update_component_html(since=since), 1)
+        self.htsv.refresh_from_db()
+        self.assertIn('new_trait_name', self.htsv.component_html_detail)
+
+    def test_rebuilds_changed_links(self):
+        """Component html is rebuilt for set versions with changed m2m links, which don't change modified."""
+        new_source_trait = factories.SourceTraitFactory.create(i_trait_name='new_component')
+        since = timezone.now()
+        self.hunit.component_age_traits.add(new_source_trait)
+        self.assertEqual(CMD._update_component_html(since=since), 0)
+        self.assertEqual(CMD._update_component_html(since=since, changed_link_set_version_pks=[self.htsv.pk]), 1)
+        self.htsv.refresh_from_db()
+        self.assertIn('new_component', self.htsv.component_html_detail)
+
+    def test_no_changes(self):
+        """No component html is saved when nothing has changed."""
+        self.assertEqual(CMD._update_component_html(since=timezone.now()), 0)
+
+
+class UpdateEncodedValueSetsTest(TestCase):
+    """Tests of linking the traits with changed encoded values to their encoded value sets."""
+
+    def setUp(self):
+        self.source_encoded_value = factories.SourceTraitEncodedValueFactory.create()
+        self.harmonized_encoded_value = factories.HarmonizedTraitEncodedValueFactory.create()
+
+    def test_links_unlinked_traits(self):
+        """Traits that have never been linked to an encoded value set are linked without their pks."""
+        self.assertEqual(CMD._update_encoded_value_sets(), 2)
+        self.assertEqual(models.EncodedValueSet.objects.get_differences(models.SourceTrait.objects.all()), {})
+        self.assertEqual(models.EncodedValueSet.objects.get_differences(models.HarmonizedTrait.objects.all()), {})
+
+    def test_relinks_traits_of_changed_encoded_values(self):
+        """Only the traits of the given encoded values are relinked."""
+        CMD._update_encoded_value_sets()
+        models.SourceTraitEncodedValue.objects.update(i_value='new value')
+        models.HarmonizedTraitEncodedValue.objects.update(i_value='new value')
+        self.assertEqual(CMD._update_encoded_value_sets(), 0)
+        self.assertEqual(CMD._update_encoded_value_sets(
+            source_trait_encoded_value_pks=[str(self.source_encoded_value.pk)]), 1)
+        self.assertEqual(models.EncodedValueSet.objects.get_differences(models.SourceTrait.objects.all()), {})
+        self.assertEqual(CMD._update_encoded_value_sets(
+            harmonized_trait_encoded_value_pks=[str(self.harmonized_encoded_value.pk)]), 1)
+        self.assertEqual(models.EncodedValueSet.objects.get_differences(models.HarmonizedTrait.objects.all()), {})
+
+
+class SQLiteImportCommand(Command):
+    """The import_db command, reading from a SQLite stand-in for the source db and failing in the given phase.
+
+    Arguments:
+        source_db_path (str): path of the SQLiteSourceDB file to import from
+        fail_phase (str): name of the phase to raise an error at the end of, before it is checkpointed
+    """
+
+    def __init__(self, source_db_path, fail_phase=None, *args, **kwargs):
+        super(SQLiteImportCommand, self).__init__(*args, **kwargs)
+        self.source_db_path = source_db_path
+        self.fail_phase = fail_phase
+        self.phases_run = []
+        self.source_db = None
+
+    def _get_source_db(self, *args, **kwargs):
+        self.source_db = SQLiteSourceDB(self.source_db_path)
+        return self.source_db
+
+    def _run_phase(self, phase, method, *args, **kwargs):
+        def run_method(*args, **kwargs):
+            self.phases_run.append(phase)
+            result = method(*args, **kwargs)
+            if phase == self.fail_phase:
+                raise ValueError('Failed in phase {}'.format(phase))
+            return result
+        return super(SQLiteImportCommand, self)._run_phase(phase, run_method, *args, **kwargs)
+
+
+class ResumeImportTest(TestCase):
+    """Tests of checkpointing the phases of import_db and resuming failed imports."""
+
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.source_db_path = join(self.tmpdir.name, 'source_db.sqlite3')
+        source_db = SQLiteSourceDB(self.source_db_path)
+        SourceDBGenerator(source_db).add_release(n_new_studies=2, n_datasets_range=(1, 2), n_traits_range=(2, 4),
+                                                 n_new_harmonized_trait_sets=2)
+        source_db.close()
+        self.user = UserFactory.create()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def call_command(self, *args, fail_phase=None):
+        command = SQLiteImportCommand(self.source_db_path, fail_phase=fail_phase)
+        management.call_command(command, '--no_backup', '--taggedtrait_creator={}'.format(self.user.email), *args,
+                                verbosity=0)
+        return command
+
+    def test_records_checkpoints(self):
+        """Each completed phase is checkpointed, and the import run is finished."""
+        command = self.call_command()
+        import_run = models.ImportRun.objects.get()
+        self.assertIsNotNone(import_run.finished)
+        self.assertEqual(list(import_run.checkpoints.order_by('pk').values_list('phase', flat=True)),
+                         command.phases_run)
+        self.assertIn('import source_trait', command.phases_run)
+        self.assertIn('import component_source_trait links to HarmonizedTrait', command.phases_run)
+        checkpoint = import_run.checkpoints.get(phase='import source_study_version')
+        self.assertEqual(sorted(checkpoint.get_result()),
+                         sorted(str(pk) for pk in models.SourceStudyVersion.objects.values_list('pk', flat=True)))
+
+    def test_records_phase_telemetry(self):
+        """The time, source rows read, rows written, and queries of each phase are saved in its checkpoint."""
+        self.call_command()
+        checkpoint = models.ImportCheckpoint.objects.get(phase='import source_trait')
+        n_source_traits = models.SourceTrait.objects.count()
+        self.assertEqual(checkpoint.source_rows, n_source_traits)
+        self.assertGreaterEqual(checkpoint.rows_written, n_source_traits)
+        self.assertGreater(checkpoint.queries, n_source_traits)
+        self.assertGreater(checkpoint.seconds, 0)
+        totals = models.ImportRun.objects.get().get_totals()
+        self.assertGreater(totals['source_rows'], n_source_traits)
+        self.assertGreater(totals['queries'], checkpoint.queries)
+
+    def test_failed_phase_is_rolled_back(self):
+        """A phase that fails is rolled back without being checkpointed, and earlier phases are kept."""
+        with self.assertRaises(ValueError):
+            self.call_command(fail_phase='import source_trait')
+        import_run = models.ImportRun.objects.get()
+        self.assertIsNone(import_run.finished)
+        self.assertFalse(import_run.checkpoints.filter(phase='import source_trait').exists())
+        self.assertTrue(import_run.checkpoints.filter(phase='import source_dataset').exists())
+        self.assertEqual(models.SourceTrait.objects.count(), 0)
+        self.assertTrue(models.SourceDataset.objects.count() > 0)
+
+    def test_failed_import_unlocks_source_db(self):
+        """A failed import unlocks and closes the source db, so it can be locked again right away."""
+        command = SQLiteImportCommand(self.source_db_path, fail_phase='import source_trait')
+        with self.assertRaises(ValueError):
+            management.call_command(command, '--no_backup', '--taggedtrait_creator={}'.format(self.user.email),
+                                    verbosity=0)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            command.source_db.connection.execute('SELECT 1')
+        connection = sqlite3.connect(self.source_db_path, timeout=0)
+        connection.execute('BEGIN IMMEDIATE')
+        connection.rollback()
+        connection.close()
+
+    def test_resume_skips_completed_phases(self):
+        """Resuming a failed import only runs the phases that weren't completed."""
+        with self.assertRaises(ValueError):
+            self.call_command(fail_phase='import source_trait')
+        command = self.call_command('--resume')
+        self.assertEqual(models.ImportRun.objects.count(), 1)
+        self.assertIsNotNone(models.ImportRun.objects.get().finished)
+        self.assertEqual(command.phases_run[0], 'import source_trait')
+        self.assertNotIn('import source_dataset', command.phases_run)
+        self.assertTrue(models.SourceTrait.objects.count() > 0)
+        # The component links of the new harmonized traits use the pks checkpointed by the harmonized trait phase.
+        self.assertTrue(models.HarmonizedTrait.objects.filter(component_source_traits__isnull=False).exists())
+        self.assertEqual(models.SourceTraitLineage.objects.get_differences(), {})
+
+    def test_resume_links_encoded_value_sets(self):
+        """Resuming links the traits of the encoded values imported before the failure to encoded value sets."""
+        source_db = SQLiteSourceDB(self.source_db_path)
+        SourceDBGenerator(source_db).add_release(n_new_studies=1, n_datasets_range=(1, 1), n_traits_range=(2, 2),
+                                                 encoded_fraction=1, n_new_harmonized_trait_sets=0)
+        source_db.close()
+        with self.assertRaises(ValueError):
+            self.call_command(fail_phase='lineage')
+        # Link the traits with encoded values to a wrong set, so that only the checkpointed encoded value pks can
+        # relink them.
+        for trait_model, encoded_value_model, trait_field in (
+                (models.SourceTrait, models.SourceTraitEncodedValue, 'source_trait'),
+                (models.HarmonizedTrait, models.HarmonizedTraitEncodedValue, 'harmonized_trait')):
+            trait_model.objects.filter(pk__in=encoded_value_model.objects.values(trait_field)).update(
+                encoded_value_set=models.EncodedValueSet.objects.create(
+                    content_hash=trait_model.__name__, encoded_values='[]'))
+        self.call_command('--resume')
+        self.assertEqual(models.EncodedValueSet.objects.get_differences(models.SourceTrait.objects.all()), {})
+        self.assertEqual(models.EncodedValueSet.objects.get_differences(models.HarmonizedTrait.objects.all()), {})
+
+    def test_resume_without_unfinished_run(self):
+        """Resuming when the latest import run finished starts a new import run."""
+        self.call_command()
+        command = self.call_command('--resume')
+        self.assertEqual(models.ImportRun.objects.filter(finished__isnull=False).count(), 2)
+        self.assertIn('update source_trait', command.phases_run)
+
+    def test_links_new_versions(self):
+        """New study versions, datasets, and traits are linked to their previous versions before tags are applied."""
+        self.call_command()
+        source_db = SQLiteSourceDB(self.source_db_path)
+        SourceDBGenerator(source_db).add_release(n_new_studies=1, n_datasets_range=(1, 2), n_traits_range=(2, 4),
+                                                 n_new_harmonized_trait_sets=0)
+        source_db.close()
+        command = self.call_command()
+        # The tags from the previous versions are applied right after the version links phase.
+        self.assertEqual(command.phases_run[command.phases_run.index('import source_trait_encoded_values') + 1],
+                         'version links')
+        for model in (models.SourceStudyVersion, models.SourceDataset, models.SourceTrait):
+            self.assertEqual(model.objects.all().get_version_link_differences(), {})
+            self.assertTrue(model.objects.filter(previous_version__isnull=False).exists())
+        self.assertGreater(models.ImportCheckpoint.objects.get(
+            import_run=models.ImportRun.objects.latest('pk'), phase='version links').get_result(), 0)
+
+    def test_new_run_without_resume(self):
+        """Without --resume, a new import run is started even if the latest one failed."""
+        with self.assertRaises(ValueError):
+            self.call_command(fail_phase='lineage')
+        command = self.call_command()
+        self.assertEqual(models.ImportRun.objects.count(), 2)
+        self.assertIn('update source_trait', command.phases_run)
+
+
 # Tests that require test data.
 class SourceDbTestDataTest(OpenCloseDBMixin, TestCase):
 
@@ -1490,7 +1732,7 @@ class HelperTest(BaseTestDataTestCase):
         # Test with global_study because it is not dependent on any other models.
         query = 'SELECT * FROM global_study'
         CMD._make_model_object_per_query_row(
-            source_db=self.source_db, query=query, make_args=CMD._make_global_study_args,
+            source_db=self.source_db, query=query, args_mapping=GLOBAL_STUDY_ARGS_MAPPING,
             **{'model': models.GlobalStudy})
         self.cursor.execute(query)
         ids = [row['id'] for row in self.cursor.fetchall()]
@@ -1521,7 +1763,7 @@ class HelperTest(BaseTestDataTestCase):
                                                     source_table='global_study',
                                                     source_pk='id',
                                                     model=models.GlobalStudy,
-                                                    make_args=CMD._make_global_study_args)
+                                                    args_mapping=GLOBAL_STUDY_ARGS_MAPPING)
         self.cursor.execute('SELECT * FROM global_study')
         pks_in_db = [row['id'] for row in self.cursor.fetchall()]
         imported_pks = [gs.pk for gs in models.GlobalStudy.objects.all()]
@@ -1601,7 +1843,7 @@ class HelperTest(BaseTestDataTestCase):
         # This update is not technically expected, but get rid of the warning.
         global_study_update_count = CMD._update_existing_data(
             source_db=self.source_db, source_table='global_study', source_pk='id', model=models.GlobalStudy,
-            make_args=CMD._make_global_study_args, expected=True)
+            args_mapping=GLOBAL_STUDY_ARGS_MAPPING, expected=True)
         # Check that modified date > created date, and name is set to new value.
         model_instance.refresh_from_db()
         self.assertEqual(new_value, getattr(model_instance, 'i_' + field_to_update))
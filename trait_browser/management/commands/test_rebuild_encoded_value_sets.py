@@ -0,0 +1,45 @@
+"""Test the rebuild_encoded_value_sets management command."""
+
+from io import StringIO
+
+from django.core import management
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from trait_browser import factories
+from trait_browser import models
+
+
+class RebuildEncodedValueSetsTest(TestCase):
+
+    def setUp(self):
+        self.encoded_value = factories.SourceTraitEncodedValueFactory.create()
+        self.harmonized_trait = factories.HarmonizedTraitFactory.create()
+
+    def test_links_traits(self):
+        """The command links unlinked traits, and then the check finds no differences."""
+        out = StringIO()
+        management.call_command('rebuild_encoded_value_sets', stdout=out)
+        self.assertIn('1 source traits linked, with 1 new encoded value sets', out.getvalue())
+        self.assertIn('1 harmonized traits linked, with 1 new encoded value sets', out.getvalue())
+        self.assertIsNotNone(models.SourceTrait.objects.get().encoded_value_set)
+        out = StringIO()
+        management.call_command('rebuild_encoded_value_sets', '--check', stdout=out)
+        self.assertIn('0 traits with inconsistent encoded value sets', out.getvalue())
+
+    def test_check_reports_without_fixing(self):
+        """With --check, the command raises an error for unlinked traits and does not link them."""
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            management.call_command('rebuild_encoded_value_sets', '--check', stdout=out)
+        self.assertIn('linked set hash None', out.getvalue())
+        self.assertEqual(models.EncodedValueSet.objects.count(), 0)
+
+    def test_deletes_unused_sets(self):
+        """Sets that are no longer linked to any trait are deleted."""
+        management.call_command('rebuild_encoded_value_sets', stdout=StringIO())
+        self.encoded_value.delete()
+        out = StringIO()
+        management.call_command('rebuild_encoded_value_sets', stdout=out)
+        self.assertIn('1 unused encoded value sets deleted', out.getvalue())
+        self.assertEqual(models.EncodedValueSet.objects.count(), 1)
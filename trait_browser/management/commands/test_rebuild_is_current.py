@@ -0,0 +1,40 @@
+"""Test the rebuild_is_current management command."""
+
+from io import StringIO
+
+from django.core import management
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from tags.factories import TaggedTraitFactory
+from tags.models import TaggedTrait
+from trait_browser import models
+
+
+class RebuildIsCurrentTest(TestCase):
+
+    def setUp(self):
+        self.tagged_trait = TaggedTraitFactory.create()
+        self.study_version = self.tagged_trait.trait.source_dataset.source_study_version
+        # Deprecate the study version without updating is_current, as an out of date database would be.
+        models.SourceStudyVersion.objects.filter(pk=self.study_version.pk).update(i_is_deprecated=True)
+
+    def test_fixes_stale_is_current(self):
+        """The command fixes stale is_current flags, and then runs without changes."""
+        out = StringIO()
+        management.call_command('rebuild_is_current', stdout=out)
+        self.assertIn('1 source traits updated', out.getvalue())
+        self.assertFalse(models.SourceDataset.objects.current().exists())
+        self.assertFalse(models.SourceTrait.objects.current().exists())
+        self.assertFalse(TaggedTrait.objects.current().exists())
+        out = StringIO()
+        management.call_command('rebuild_is_current', '--check', stdout=out)
+        self.assertIn('0 source traits inconsistent', out.getvalue())
+
+    def test_check_reports_without_fixing(self):
+        """With --check, the command raises an error for stale is_current flags and does not fix them."""
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            management.call_command('rebuild_is_current', '--check', '--verbosity=2', stdout=out)
+        self.assertIn('source trait {}: is_current is stale'.format(self.tagged_trait.trait.pk), out.getvalue())
+        self.assertTrue(TaggedTrait.objects.current().exists())
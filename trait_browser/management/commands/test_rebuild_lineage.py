@@ -0,0 +1,35 @@
+"""Test the rebuild_lineage management command."""
+
+from io import StringIO
+
+from django.core import management
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from trait_browser import factories
+from trait_browser import models
+
+
+class RebuildLineageTest(TestCase):
+
+    def setUp(self):
+        self.source_trait = factories.SourceTraitFactory.create()
+        self.harmonized_trait = factories.HarmonizedTraitFactory.create(component_source_traits=[self.source_trait])
+
+    def test_builds_lineage(self):
+        """The command adds missing lineage rows, and then runs without changes."""
+        out = StringIO()
+        management.call_command('rebuild_lineage', stdout=out)
+        self.assertIn('1 source trait lineage rows updated', out.getvalue())
+        self.assertEqual(models.SourceTraitLineage.objects.get().harmonized_trait, self.harmonized_trait)
+        out = StringIO()
+        management.call_command('rebuild_lineage', '--check', stdout=out)
+        self.assertIn('0 source trait lineage rows inconsistent', out.getvalue())
+
+    def test_check_reports_without_fixing(self):
+        """With --check, the command raises an error for inconsistent lineage and does not fix it."""
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            management.call_command('rebuild_lineage', '--check', stdout=out)
+        self.assertIn('cached depth None, expected depth 1', out.getvalue())
+        self.assertEqual(models.SourceTraitLineage.objects.count(), 0)
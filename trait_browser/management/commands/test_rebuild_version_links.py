@@ -0,0 +1,55 @@
+"""Test the rebuild_version_links management command."""
+
+from datetime import timedelta
+from io import StringIO
+
+from django.core import management
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from trait_browser import factories
+from trait_browser import models
+
+
+class RebuildVersionLinksTest(TestCase):
+
+    def setUp(self):
+        now = timezone.now()
+        study = factories.StudyFactory.create()
+        self.source_trait_1 = factories.SourceTraitFactory.create(
+            source_dataset__source_study_version__study=study,
+            source_dataset__source_study_version__i_version=1,
+            source_dataset__source_study_version__i_date_added=now - timedelta(hours=1))
+        self.source_trait_2 = factories.SourceTraitFactory.create(
+            source_dataset__source_study_version__study=study,
+            source_dataset__source_study_version__i_version=2,
+            source_dataset__source_study_version__i_date_added=now,
+            source_dataset__i_accession=self.source_trait_1.source_dataset.i_accession,
+            i_dbgap_variable_accession=self.source_trait_1.i_dbgap_variable_accession)
+
+    def test_sets_missing_links(self):
+        """The command sets missing version links, and then runs without changes."""
+        out = StringIO()
+        management.call_command('rebuild_version_links', stdout=out)
+        self.assertIn('2 source study versions updated', out.getvalue())
+        self.assertIn('2 source datasets updated', out.getvalue())
+        self.assertIn('2 source traits updated', out.getvalue())
+        self.source_trait_1.refresh_from_db()
+        self.source_trait_2.refresh_from_db()
+        self.assertIsNone(self.source_trait_1.previous_version)
+        self.assertEqual(self.source_trait_1.next_version, self.source_trait_2)
+        self.assertEqual(self.source_trait_2.previous_version, self.source_trait_1)
+        self.assertIsNone(self.source_trait_2.next_version)
+        out = StringIO()
+        management.call_command('rebuild_version_links', '--check', stdout=out)
+        self.assertIn('0 source traits inconsistent', out.getvalue())
+
+    def test_check_reports_without_fixing(self):
+        """With --check, the command raises an error for missing version links and does not set them."""
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            management.call_command('rebuild_version_links', '--check', '--verbosity=2', stdout=out)
+        self.assertIn('source trait {}: (previous, next) is (None, None), expected (None, {})'.format(
+            self.source_trait_1.pk, self.source_trait_2.pk), out.getvalue())
+        self.assertFalse(models.SourceTrait.objects.filter(next_version__isnull=False).exists())
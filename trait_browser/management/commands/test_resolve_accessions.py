@@ -0,0 +1,62 @@
+"""Test the resolve_accessions management command."""
+
+from io import StringIO
+import os
+from tempfile import TemporaryDirectory
+
+from django.core import management
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from trait_browser import accessions
+from trait_browser import factories
+
+
+class ResolveAccessionsTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.input_fn = os.path.join(self.tmpdir.name, 'accessions.txt')
+        with open(self.input_fn, 'w') as input_file:
+            input_file.write('phv00000507.v1\nphv999, 507\n\nfoo\n')
+        self.trait = factories.SourceTraitFactory.create(i_dbgap_variable_accession=507, i_dbgap_variable_version=1)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def read_rows(self, text):
+        rows = [line.split('\t') for line in text.splitlines()]
+        return [dict(zip(rows[0], row)) for row in rows[1:]]
+
+    def test_writes_results_to_stdout(self):
+        """The results are written to stdout, and the counts to stderr."""
+        out = StringIO()
+        err = StringIO()
+        management.call_command('resolve_accessions', self.input_fn, stdout=out, stderr=err)
+        self.assertEqual(out.getvalue().splitlines()[0].split('\t'), list(accessions.RESULT_FIELDS))
+        results = self.read_rows(out.getvalue())
+        self.assertEqual([result['query'] for result in results], ['phv00000507.v1', 'phv999', '507', 'foo'])
+        self.assertEqual(results[0]['full_accession'], self.trait.full_accession)
+        self.assertIn('Resolved 4 accessions: 1 current, 0 deprecated, 1 not found, 2 invalid.', err.getvalue())
+
+    def test_default_prefix(self):
+        """Accessions without a prefix have the default type."""
+        out = StringIO()
+        management.call_command('resolve_accessions', self.input_fn, '--default_prefix=phv', stdout=out, verbosity=0)
+        self.assertEqual(self.read_rows(out.getvalue())[2]['status'], accessions.STATUS_CURRENT)
+
+    def test_output_file(self):
+        """The results are written to the output file."""
+        output_fn = os.path.join(self.tmpdir.name, 'results.tsv')
+        out = StringIO()
+        management.call_command('resolve_accessions', self.input_fn, '--output={}'.format(output_fn),
+                                '--chunk_size=1', stdout=out, verbosity=0)
+        self.assertEqual(out.getvalue(), '')
+        with open(output_fn) as output_file:
+            self.assertEqual(len(self.read_rows(output_file.read())), 4)
+
+    def test_missing_input_file(self):
+        """A missing input file raises an error."""
+        with self.assertRaises(CommandError):
+            management.call_command('resolve_accessions', os.path.join(self.tmpdir.name, 'missing.txt'),
+                                    stdout=StringIO())
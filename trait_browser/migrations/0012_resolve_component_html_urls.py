@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import re
+
+from django.db import migrations
+from django.urls import reverse
+
+
+# The {% url %} tags that get_name_link_html used to put in component html, which had to be rendered as a template.
+URL_TAG_RE = re.compile(r"\{% url '(?P<url_name>[\w:]+)' pk=(?P<pk>\d+) %\} ?")
+
+
+def resolve_component_html_urls(apps, schema_editor):
+    """Replace {% url %} tags in saved component html with the urls they resolve to."""
+    HarmonizedTraitSetVersion = apps.get_model('trait_browser', 'HarmonizedTraitSetVersion')
+    for pk, component_html in HarmonizedTraitSetVersion.objects.filter(
+            component_html_detail__contains='{% url').values_list('pk', 'component_html_detail'):
+        resolved_html = URL_TAG_RE.sub(
+            lambda match: reverse(match.group('url_name'), kwargs={'pk': match.group('pk')}), component_html)
+        # Use update() so that the modified date is not changed.
+        HarmonizedTraitSetVersion.objects.filter(pk=pk).update(component_html_detail=resolved_html)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trait_browser', '0011_remove_old_dbgap_link_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(resolve_component_html_urls, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.27 on 2026-10-19 00:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trait_browser', '0012_resolve_component_html_urls'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceTraitLineage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('harmonized_trait', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='source_lineage', to='trait_browser.HarmonizedTrait')),
+                ('source_trait', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='harmonized_lineage', to='trait_browser.SourceTrait')),
+            ],
+            options={
+                'verbose_name': 'source trait lineage',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='sourcetraitlineage',
+            unique_together=set([('source_trait', 'harmonized_trait')]),
+        ),
+    ]
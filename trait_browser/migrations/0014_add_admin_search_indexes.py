@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.27 on 2026-10-19 00:07
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trait_browser', '0013_add_source_trait_lineage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='harmonizedtrait',
+            name='i_trait_name',
+            field=models.CharField(db_index=True, max_length=100, verbose_name='phenotype name'),
+        ),
+        migrations.AlterField(
+            model_name='sourcedataset',
+            name='dataset_name',
+            field=models.CharField(db_index=True, default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='sourcedataset',
+            name='i_accession',
+            field=models.PositiveIntegerField(db_index=True, verbose_name='dataset accession'),
+        ),
+        migrations.AlterField(
+            model_name='sourcetrait',
+            name='i_dbgap_variable_accession',
+            field=models.PositiveIntegerField(db_index=True, verbose_name='dbGaP variable accession'),
+        ),
+        migrations.AlterField(
+            model_name='sourcetrait',
+            name='i_trait_name',
+            field=models.CharField(db_index=True, max_length=100, verbose_name='phenotype name'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.27 on 2026-10-19 01:03
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trait_browser', '0015_add_import_generation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EncodedValueSet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('encoded_values', models.TextField()),
+            ],
+            options={
+                'verbose_name': 'encoded value set',
+            },
+        ),
+        migrations.AddField(
+            model_name='harmonizedtrait',
+            name='encoded_value_set',
+            field=models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, to='trait_browser.EncodedValueSet'),
+        ),
+        migrations.AddField(
+            model_name='sourcetrait',
+            name='encoded_value_set',
+            field=models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, to='trait_browser.EncodedValueSet'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.27 on 2026-10-19 11:02
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trait_browser', '0017_add_import_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='queries',
+            field=models.PositiveIntegerField(default=0, help_text='Queries run on the Django db.'),
+        ),
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='rows_written',
+            field=models.PositiveIntegerField(default=0, help_text='Rows inserted, updated, or deleted in the Django db.'),
+        ),
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='seconds',
+            field=models.FloatField(default=0, help_text='Wall time spent in the phase.'),
+        ),
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='source_rows',
+            field=models.PositiveIntegerField(default=0, help_text='Rows read from the source db.'),
+        ),
+    ]
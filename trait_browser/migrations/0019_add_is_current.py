@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.27 on 2026-10-19 14:20
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def fill_is_current(apps, schema_editor):
+    """Set is_current to False for the datasets and source traits of deprecated study versions."""
+    SourceDataset = apps.get_model('trait_browser', 'SourceDataset')
+    SourceTrait = apps.get_model('trait_browser', 'SourceTrait')
+    SourceDataset.objects.filter(source_study_version__i_is_deprecated=True).update(is_current=False)
+    SourceTrait.objects.filter(source_dataset__source_study_version__i_is_deprecated=True).update(is_current=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trait_browser', '0018_add_import_telemetry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sourcedataset',
+            name='is_current',
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+        migrations.AddField(
+            model_name='sourcetrait',
+            name='is_current',
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+        migrations.RunPython(fill_is_current, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.27 on 2026-10-19 15:05
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trait_browser', '0019_add_is_current'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sourcestudyversion',
+            index=models.Index(fields=['study', 'i_version', 'i_date_added'], name='trait_brows_study_i_f702e9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sourcetrait',
+            index=models.Index(fields=['source_dataset', 'i_dbgap_variable_accession'], name='trait_brows_source__7322cd_idx'),
+        ),
+    ]
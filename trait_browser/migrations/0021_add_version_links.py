@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.27 on 2026-10-19 16:02
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trait_browser', '0020_add_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sourcedataset',
+            name='next_version',
+            field=models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='trait_browser.SourceDataset'),
+        ),
+        migrations.AddField(
+            model_name='sourcedataset',
+            name='previous_version',
+            field=models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='trait_browser.SourceDataset'),
+        ),
+        migrations.AddField(
+            model_name='sourcestudyversion',
+            name='next_version',
+            field=models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='trait_browser.SourceStudyVersion'),
+        ),
+        migrations.AddField(
+            model_name='sourcestudyversion',
+            name='previous_version',
+            field=models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='trait_browser.SourceStudyVersion'),
+        ),
+        migrations.AddField(
+            model_name='sourcetrait',
+            name='next_version',
+            field=models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='trait_browser.SourceTrait'),
+        ),
+        migrations.AddField(
+            model_name='sourcetrait',
+            name='previous_version',
+            field=models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='trait_browser.SourceTrait'),
+        ),
+    ]
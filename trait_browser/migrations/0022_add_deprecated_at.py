@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.27 on 2026-10-19 02:21
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_deprecated_at(apps, schema_editor):
+    """Use the modified date of deprecated study versions as an estimate of when they were deprecated."""
+    SourceStudyVersion = apps.get_model('trait_browser', 'SourceStudyVersion')
+    SourceStudyVersion.objects.filter(i_is_deprecated=True).update(deprecated_at=F('modified'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trait_browser', '0021_add_version_links'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sourcestudyversion',
+            name='deprecated_at',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+        migrations.RunPython(fill_deprecated_at, reverse_code=migrations.RunPython.noop),
+    ]
@@ -59,11 +59,15 @@
 # +--------------------------------------------+
 
 
+from collections import namedtuple
+import json
+
 from django.apps import apps
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
 from django.db.models import Count, F, Q
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.text import Truncator
 from core.models import TimeStampedModel
 
@@ -130,6 +134,9 @@ class Study(SourceDBTimeStampedModel):
     i_study_name = models.CharField('study name', max_length=200)
     phs = models.CharField(max_length=9)
 
+    # Managers/custom querysets.
+    objects = querysets.StudyQuerySet.as_manager()
+
     class Meta:
         # Fix pluralization of this model, because grammar.
         verbose_name_plural = 'Studies'
@@ -165,14 +172,13 @@ class Study(SourceDBTimeStampedModel):
 
     def get_name_link_html(self):
         """Get html for study's name linking to study detail page."""
-        url_text = "{{% url 'trait_browser:source:studies:pk:detail' pk={} %}} ".format(self.pk)
-        return URL_HTML.format(url=url_text, name=self.i_study_name)
+        return URL_HTML.format(url=self.get_absolute_url(), name=self.i_study_name)
 
     def get_all_tags_count(self):
         """Return a count of the number of tags for which traits are currently tagged in this study."""
         return apps.get_model('tags', 'Tag').objects.filter(
             all_traits__source_dataset__source_study_version__study=self,
-            all_traits__source_dataset__source_study_version__i_is_deprecated=False
+            all_traits__is_current=True
         ).distinct().count()
 
     def get_archived_tags_count(self):
@@ -261,17 +267,64 @@ class SourceStudyVersion(SourceDBTimeStampedModel):
     i_is_deprecated = models.BooleanField('is deprecated?')
     full_accession = models.CharField(max_length=20)
     dbgap_link = models.URLField(max_length=200)
+    # Links to the previous and next versions of the study, set by import_db.
+    previous_version = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, default=None, related_name='+')
+    next_version = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, default=None, related_name='+')
+    # When the version was marked deprecated in this db, set by save(); for exports of the changes since a date.
+    deprecated_at = models.DateTimeField(null=True, blank=True, default=None)
+
+    # Managers/custom querysets.
+    objects = querysets.SourceStudyVersionQuerySet.as_manager()
+
+    class Meta:
+        # For finding the latest and previous versions of a study without sorting.
+        indexes = [
+            models.Index(fields=['study', 'i_version', 'i_date_added']),
+        ]
 
     def __str__(self):
         """Pretty printing."""
         return 'study {} version {}, id={}'.format(self.study, self.i_version, self.i_id)
 
     def save(self, *args, **kwargs):
-        """Custom save method to auto-set full_accession and dbgap_link."""
+        """Custom save method to auto-set full_accession, dbgap_link, and deprecated_at.
+
+        When i_is_deprecated changes, deprecated_at is set or cleared, and is_current is also updated in bulk
+        for the datasets, source traits, and tagged traits of this version.
+        """
         self.full_accession = self.set_full_accession()
         self.dbgap_link = self.set_dbgap_link()
+        if self._state.adding:
+            was_deprecated = None
+        else:
+            was_deprecated = SourceStudyVersion.objects.filter(pk=self.pk).values_list(
+                'i_is_deprecated', flat=True).first()
+            # Before saving, so that post_save receivers (e.g. for TagStudyCount) see the new is_current.
+            if was_deprecated is not None and was_deprecated != self.i_is_deprecated:
+                self.update_is_current()
+        if was_deprecated != self.i_is_deprecated:
+            self.deprecated_at = timezone.now() if self.i_is_deprecated else None
         super(SourceStudyVersion, self).save(*args, **kwargs)
 
+    def update_is_current(self):
+        """Set is_current of the datasets, source traits, and tagged traits of this version from i_is_deprecated.
+
+        Returns:
+            int number of objects whose is_current was changed
+        """
+        is_current = not self.i_is_deprecated
+        TaggedTrait = apps.get_model('tags', 'TaggedTrait')
+        dependants = (
+            SourceDataset.objects.filter(source_study_version=self),
+            SourceTrait.objects.filter(source_dataset__source_study_version=self),
+            TaggedTrait.objects.filter(trait__source_dataset__source_study_version=self),
+        )
+        # Use update() so that modified is not changed; import_db looks for source db changes
+        # made after the latest modified date.
+        return sum(queryset.exclude(is_current=is_current).update(is_current=is_current) for queryset in dependants)
+
     def set_full_accession(self):
         """Automatically set full_accession from the study's phs value."""
         return self.STUDY_VERSION_ACCESSION.format(self.study.phs, self.i_version, self.i_participant_set)
@@ -291,9 +344,29 @@ class SourceStudyVersion(SourceDBTimeStampedModel):
         )
 
     def get_previous_version(self):
-        """Return the previous version of this study."""
+        """Return the previous version of this study.
+
+        Uses the previous_version link if it has been set, and otherwise searches the study's versions.
+        """
+        if self.previous_version_id is not None:
+            return self.previous_version
         return self.get_previous_versions().first()
 
+    def get_next_version(self):
+        """Return the next version of this study, or None if this is the most recent version.
+
+        Uses the next_version link if it has been set, and otherwise searches the study's versions.
+        """
+        if self.next_version_id is not None:
+            return self.next_version
+        return self.study.sourcestudyversion_set.filter(
+            i_version__gte=self.i_version,
+            i_date_added__gt=self.i_date_added
+        ).order_by(
+            'i_version',
+            'i_date_added'
+        ).first()
+
     def get_new_sourcetraits(self):
         """Return a queryset of SourceTraits that are new in this version compared to past versions."""
         previous_study_version = self.get_previous_version()
@@ -394,7 +467,7 @@ class SourceDataset(SourceDBTimeStampedModel):
     source_study_version = models.ForeignKey(SourceStudyVersion, on_delete=models.CASCADE)
     # Adds .source_study_version (object) and .source_study_version_id (pk).
     i_id = models.PositiveIntegerField('dataset id', primary_key=True, db_column='i_id')
-    i_accession = models.PositiveIntegerField('dataset accession')
+    i_accession = models.PositiveIntegerField('dataset accession', db_index=True)
     i_version = models.PositiveIntegerField('dataset version')
     i_is_subject_file = models.BooleanField('is subject file?')
     i_study_subject_column = models.CharField('study subject column name', max_length=45, blank=True)
@@ -403,8 +476,15 @@ class SourceDataset(SourceDBTimeStampedModel):
     i_dbgap_date_created = models.DateTimeField('dbGaP date created', null=True, blank=True)
     full_accession = models.CharField(max_length=20)
     dbgap_filename = models.CharField(max_length=255, default='')
-    dataset_name = models.CharField(max_length=255, default='')
+    dataset_name = models.CharField(max_length=255, default='', db_index=True)
     dbgap_link = models.URLField(max_length=200)
+    # Denormalized from source_study_version.i_is_deprecated, so current() doesn't need a join.
+    is_current = models.BooleanField(default=True, db_index=True)
+    # Links to the versions of this dataset in the previous and next study versions, set by import_db.
+    previous_version = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, default=None, related_name='+')
+    next_version = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, default=None, related_name='+')
 
     # Managers/custom querysets.
     objects = querysets.SourceDatasetQuerySet.as_manager()
@@ -415,9 +495,10 @@ class SourceDataset(SourceDBTimeStampedModel):
             self.dataset_name, self.source_study_version.study, self.i_id, self.full_accession)
 
     def save(self, *args, **kwargs):
-        """Custom save method to auto-set full_accession and dbgap_link."""
+        """Custom save method to auto-set full_accession, dbgap_link, and is_current."""
         self.full_accession = self.set_full_accession()
         self.dbgap_link = self.set_dbgap_link()
+        self.is_current = not self.source_study_version.i_is_deprecated
         super(SourceDataset, self).save(*args, **kwargs)
 
     def get_absolute_url(self):
@@ -458,6 +539,30 @@ class SourceDataset(SourceDBTimeStampedModel):
             return None
         return current_dataset
 
+    def get_previous_version(self):
+        """Return the version of this dataset from the previous study version.
+
+        Uses the previous_version link if it has been set, and otherwise searches the previous study version.
+        """
+        if self.previous_version_id is not None:
+            return self.previous_version
+        return self._get_version_in(self.source_study_version.get_previous_version())
+
+    def get_next_version(self):
+        """Return the version of this dataset from the next study version.
+
+        Uses the next_version link if it has been set, and otherwise searches the next study version.
+        """
+        if self.next_version_id is not None:
+            return self.next_version
+        return self._get_version_in(self.source_study_version.get_next_version())
+
+    def _get_version_in(self, study_version):
+        """Return the dataset with the same accession in study_version, or None if there isn't one."""
+        if study_version is not None:
+            return SourceDataset.objects.filter(
+                source_study_version=study_version, i_accession=self.i_accession).first()
+
 
 class HarmonizedTraitSet(SourceDBTimeStampedModel):
     """Model for harmonized trait set from topmed_pheno. Analagous to the SourceDataset for source traits."""
@@ -499,6 +604,9 @@ class HarmonizedTraitSetVersion(SourceDBTimeStampedModel):
     update_reasons = models.ManyToManyField(AllowedUpdateReason)
     component_html_detail = models.TextField(default='')
 
+    # Managers/custom querysets.
+    objects = querysets.HarmonizedTraitSetVersionQuerySet.as_manager()
+
     def __str__(self):
         """Pretty printing."""
         return 'Harm. trait set {} version {}, id={}'.format(
@@ -546,8 +654,15 @@ class HarmonizationUnit(SourceDBTimeStampedModel):
         return self.component_source_traits.all() | self.component_batch_traits.all() | self.component_age_traits.all()
 
     def get_source_studies(self):
-        """Get a list containing all of the studies linked to component traits for this unit."""
-        return list(set([trait.source_dataset.source_study_version.study for trait in self.get_all_source_traits()]))
+        """Get a list containing all of the studies linked to component traits for this unit, sorted by name."""
+        # Use .all() on each relation, rather than get_all_source_traits(), so that prefetched traits are used.
+        studies = {}
+        for component_traits in (self.component_source_traits, self.component_batch_traits,
+                                 self.component_age_traits):
+            for trait in component_traits.all():
+                study = trait.source_dataset.source_study_version.study
+                studies[study.pk] = study
+        return sorted(studies.values(), key=lambda study: (study.i_study_name, study.pk))
 
     def get_component_html(self):
         """Get html for a panel of component traits for the harmonization unit.
@@ -581,14 +696,26 @@ class Trait(SourceDBTimeStampedModel):
     """
 
     i_trait_id = models.PositiveIntegerField('phenotype id', primary_key=True, db_column='i_trait_id')
-    i_trait_name = models.CharField('phenotype name', max_length=100)
+    i_trait_name = models.CharField('phenotype name', max_length=100, db_index=True)
     i_description = models.TextField('description')
     # Had to put i_is_unique_key in Harmonized and Source subclasses separately
     # because one can be NULL and the other can't.
+    # Not from topmed_pheno; set by import_db from the trait's encoded values.
+    encoded_value_set = models.ForeignKey(
+        'EncodedValueSet', null=True, blank=True, default=None, on_delete=models.SET_NULL)
 
     class Meta:
         abstract = True
 
+    def get_encoded_values(self):
+        """Get the encoded values of this trait, from its shared EncodedValueSet if it has been linked.
+
+        Traits that have not been linked to an EncodedValueSet yet fall back to their own encoded value rows.
+        """
+        if self.encoded_value_set_id is not None:
+            return self.encoded_value_set.get_encoded_values()
+        return getattr(self, '{}encodedvalue_set'.format(self._meta.model_name)).all()
+
 
 class SourceTrait(Trait):
     """Model for source_trait from topmed_pheno.
@@ -603,7 +730,7 @@ class SourceTrait(Trait):
     # Adds .source_dataset (object) and .source_dataset_id (pk).
     i_detected_type = models.CharField('detected type', max_length=100, blank=True)
     i_dbgap_type = models.CharField('dbGaP type', max_length=100, blank=True)
-    i_dbgap_variable_accession = models.PositiveIntegerField('dbGaP variable accession')
+    i_dbgap_variable_accession = models.PositiveIntegerField('dbGaP variable accession', db_index=True)
     i_dbgap_variable_version = models.PositiveIntegerField('dbGaP variable version')
     # i_description contains data from dbgap_description field.
     i_dbgap_comment = models.TextField('dbGaP comment', blank=True)
@@ -615,10 +742,23 @@ class SourceTrait(Trait):
     # TODO: remove the default.
     full_accession = models.CharField(max_length=23)
     dbgap_link = models.URLField(max_length=200)
+    # Denormalized from source_dataset.source_study_version.i_is_deprecated, so current() doesn't need joins.
+    is_current = models.BooleanField(default=True, db_index=True)
+    # Links to the versions of this trait in the previous and next study versions, set by import_db.
+    previous_version = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, default=None, related_name='+')
+    next_version = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, default=None, related_name='+')
 
     # Managers/custom querysets.
     objects = querysets.SourceTraitQuerySet.as_manager()
 
+    class Meta:
+        # For finding the version of a trait in another version of its dataset.
+        indexes = [
+            models.Index(fields=['source_dataset', 'i_dbgap_variable_accession']),
+        ]
+
     def __str__(self):
         """Pretty printing of SourceTrait objects."""
         return '{trait_name} ({phv}): dataset {pht}'.format(trait_name=self.i_trait_name,
@@ -626,9 +766,10 @@ class SourceTrait(Trait):
                                                             pht=self.source_dataset.full_accession)
 
     def save(self, *args, **kwargs):
-        """Custom save method to auto-set full_accession and dbgap_link."""
+        """Custom save method to auto-set full_accession, dbgap_link, and is_current."""
         self.full_accession = self.set_full_accession()
         self.dbgap_link = self.set_dbgap_link()
+        self.is_current = not self.source_dataset.source_study_version.i_is_deprecated
         super(SourceTrait, self).save(*args, **kwargs)
 
     def set_full_accession(self):
@@ -669,6 +810,10 @@ class SourceTrait(Trait):
         return POPOVER_URL_HTML.format(url=self.get_absolute_url(), popover=description,
                                        name=self.i_trait_name)
 
+    def get_harmonized_traits(self):
+        """Get a queryset of the harmonized traits that use this trait, directly or through other harmonized traits."""
+        return HarmonizedTrait.objects.filter(source_lineage__source_trait=self)
+
     def get_latest_version(self):
         """Return the most recent version of a trait."""
         current_study_version = self.source_dataset.source_study_version.study.get_latest_version()
@@ -685,17 +830,44 @@ class SourceTrait(Trait):
         return current_trait
 
     def get_previous_version(self):
-        """Returns the version of this SourceTrait from the previous study version."""
+        """Returns the version of this SourceTrait from the previous study version.
+
+        Uses the previous_version link if it has been set, and otherwise searches the previous study version.
+        """
+        if self.previous_version_id is not None:
+            return self.previous_version
         previous_study_version = self.source_dataset.source_study_version.get_previous_version()
-        if previous_study_version is not None:
+        return self._get_version_in(previous_study_version)
+
+    def get_next_version(self):
+        """Returns the version of this SourceTrait from the next study version.
+
+        Uses the next_version link if it has been set, and otherwise searches the next study version.
+        """
+        if self.next_version_id is not None:
+            return self.next_version
+        next_study_version = self.source_dataset.source_study_version.get_next_version()
+        return self._get_version_in(next_study_version)
+
+    def _get_version_in(self, study_version):
+        """Return the trait with the same accession in study_version, or None if there isn't one."""
+        if study_version is not None:
             try:
-                previous_trait = SourceTrait.objects.get(
-                    source_dataset__source_study_version=previous_study_version,
+                return SourceTrait.objects.get(
+                    source_dataset__source_study_version=study_version,
                     i_dbgap_variable_accession=self.i_dbgap_variable_accession
                 )
             except SourceTrait.DoesNotExist:
                 return None
-            return previous_trait
+
+    def get_version_history(self):
+        """Return a queryset of all versions of this trait (including this one), from oldest to newest."""
+        return SourceTrait.objects.filter(
+            i_dbgap_variable_accession=self.i_dbgap_variable_accession
+        ).order_by(
+            'source_dataset__source_study_version__i_version',
+            'source_dataset__source_study_version__i_date_added'
+        )
 
     def apply_previous_tags(self, creator):
         """Apply tags from the previous version of this SourceTrait to this version."""
@@ -799,23 +971,32 @@ class HarmonizedTrait(Trait):
         """
         return self.harmonized_trait_set_version.get_absolute_url()
 
+    def get_source_traits(self):
+        """Get a queryset of the source traits this trait uses, directly or through other harmonized traits."""
+        return SourceTrait.objects.filter(harmonized_lineage__harmonized_trait=self)
+
     def get_name_link_html(self, max_popover_words=80):
         """Get html for the trait name linked to the harmonized trait's detail page, with description as popover."""
-        url_text = "{{% url 'trait_browser:harmonized:traits:detail' pk={} %}} ".format(
-            self.harmonized_trait_set_version.pk)
+        # Use the set version's pk directly, to avoid a query for the set version.
+        url = reverse('trait_browser:harmonized:traits:detail', kwargs={'pk': self.harmonized_trait_set_version_id})
         if not self.i_description:
             description = '&mdash;'
         else:
             description = Truncator(self.i_description).words(max_popover_words)
-        return POPOVER_URL_HTML.format(url=url_text, popover=description, name=self.trait_flavor_name)
+        return POPOVER_URL_HTML.format(url=url, popover=description, name=self.trait_flavor_name)
 
     def get_component_html(self, harmonization_unit):
         """Get html for inline lists of source and harmonized component phenotypes for the harmonized trait."""
-        source = [tr.get_name_link_html() for tr in (
-            self.component_source_traits.all() & harmonization_unit.component_source_traits.all())]
-        harmonized_trait_set_versions = [trait_set_version for trait_set_version in (
-            self.component_harmonized_trait_set_versions.all() &
-            harmonization_unit.component_harmonized_trait_set_versions.all())]
+        # Intersect the components in python, so that components prefetched by
+        # HarmonizedTraitSetVersion.objects.with_components() are used instead of new queries.
+        source_pks = set(tr.pk for tr in self.component_source_traits.all())
+        source = [tr.get_name_link_html() for tr in harmonization_unit.component_source_traits.all()
+                  if tr.pk in source_pks]
+        harmonized_trait_set_version_pks = set(
+            trait_set_version.pk for trait_set_version in self.component_harmonized_trait_set_versions.all())
+        harmonized_trait_set_versions = [
+            trait_set_version for trait_set_version in harmonization_unit.component_harmonized_trait_set_versions.all()
+            if trait_set_version.pk in harmonized_trait_set_version_pks]
         harmonized = [tr.get_name_link_html() for trait_set in harmonized_trait_set_versions
                       for tr in trait_set.harmonizedtrait_set.all()
                       if not tr.i_is_unique_key]
@@ -833,8 +1014,73 @@ class HarmonizedTrait(Trait):
         return component_html
 
 
+class SourceTraitLineage(models.Model):
+    """Precomputed link from a SourceTrait to a HarmonizedTrait that depends on it.
+
+    A closure table of the component relationships of harmonized traits, so that the
+    harmonized traits that use a source trait (and the source traits a harmonized trait
+    uses) can be found with one indexed lookup instead of walking the components.
+    Source traits are linked to a harmonized trait if they are its component source or
+    batch traits, component age traits of its harmonization units, or are linked to
+    any harmonized trait in its component harmonized trait set versions. The table is
+    rebuilt by import_db after each import; use the rebuild_lineage management command
+    to check or recompute it.
+    """
+
+    source_trait = models.ForeignKey(SourceTrait, on_delete=models.CASCADE, related_name='harmonized_lineage')
+    harmonized_trait = models.ForeignKey(HarmonizedTrait, on_delete=models.CASCADE, related_name='source_lineage')
+    # 1 for direct components, plus one for each component harmonized trait set version in between.
+    depth = models.PositiveSmallIntegerField()
+
+    # Managers/custom querysets.
+    objects = querysets.SourceTraitLineageQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'source trait lineage'
+        unique_together = (('source_trait', 'harmonized_trait'), )
+
+    def __str__(self):
+        """Pretty printing."""
+        return 'source trait {} used by harmonized trait {} at depth {}'.format(
+            self.source_trait_id, self.harmonized_trait_id, self.depth)
+
+
 # Encoded Value models.
 # ------------------------------------------------------------------------------
+# One encoded value from an EncodedValueSet, with the same attribute names as the TraitEncodedValue models.
+EncodedValue = namedtuple('EncodedValue', ('i_category', 'i_value'))
+
+
+class EncodedValueSet(TimeStampedModel):
+    """A deduplicated list of encoded value categories and values, shared by every trait with the same code list.
+
+    Most traits reuse a handful of code lists (e.g. "0: No, 1: Yes"), so the encoded
+    values of a trait are also stored once per distinct list, identified by a hash of
+    its content, and each trait links to its set. import_db links new and changed
+    traits, only creating sets it has not seen before; use the
+    rebuild_encoded_value_sets management command to check or relink all traits.
+    """
+
+    # sha256 hex digest of encoded_values.
+    content_hash = models.CharField(max_length=64, unique=True)
+    # JSON list of [category, value] pairs, in the order of the source db rows.
+    encoded_values = models.TextField()
+
+    # Managers/custom querysets.
+    objects = querysets.EncodedValueSetQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'encoded value set'
+
+    def __str__(self):
+        """Pretty printing."""
+        return 'encoded value set {}, hash={}'.format(self.pk, self.content_hash[:12])
+
+    def get_encoded_values(self):
+        """Get a list of EncodedValue tuples for this set."""
+        return [EncodedValue(category, value) for category, value in json.loads(self.encoded_values)]
+
+
 class TraitEncodedValue(SourceDBTimeStampedModel):
     """Abstract superclass model for SourceEncodedValue and HarmonizedEncodedValue.
 
@@ -876,3 +1122,83 @@ class HarmonizedTraitEncodedValue(TraitEncodedValue):
     def __str__(self):
         """Pretty printing of HarmonizedTraitEncodedValue objects."""
         return 'encoded value {} for {}\nvalue = {}'.format(self.i_category, self.harmonized_trait, self.i_value)
+
+
+# Import models.
+# ------------------------------------------------------------------------------
+class ImportGeneration(TimeStampedModel):
+    """A counter of completed imports from topmed_pheno, with one row added by each run of import_db.
+
+    The catalog pages only change when the catalog is imported or when tagging
+    changes, so the pk of the latest row and its created time are used to build the
+    ETag and Last-Modified headers of the catalog pages, and the keys of their
+    cached html.
+    """
+
+    class Meta:
+        verbose_name = 'import generation'
+        get_latest_by = 'pk'
+
+    def __str__(self):
+        """Pretty printing."""
+        return 'import generation {} at {}'.format(self.pk, self.created)
+
+
+class ImportRun(TimeStampedModel):
+    """A run of import_db, which is finished once every phase of the import has completed.
+
+    Each phase of the import runs in its own transaction and records an
+    ImportCheckpoint when it commits, so a run that fails partway can be
+    continued with import_db --resume, which skips the completed phases. The
+    checkpoints also record the time, rows, and queries spent in each phase; use
+    the dump_import_runs management command to get them as json.
+    """
+
+    finished = models.DateTimeField(null=True, blank=True, default=None)
+
+    class Meta:
+        verbose_name = 'import run'
+        get_latest_by = 'pk'
+
+    def __str__(self):
+        """Pretty printing."""
+        return 'import run {} started at {}'.format(self.pk, self.created)
+
+    def get_totals(self):
+        """Get a dict of the seconds, queries, source rows, and rows written, summed over the completed phases."""
+        totals = self.checkpoints.aggregate(
+            **{field: models.Sum(field) for field in ImportCheckpoint.TELEMETRY_FIELDS})
+        return {field: value or 0 for (field, value) in totals.items()}
+
+
+class ImportCheckpoint(TimeStampedModel):
+    """A completed phase of an import run, such as importing one table or applying tags to one study version."""
+
+    TELEMETRY_FIELDS = ('seconds', 'queries', 'source_rows', 'rows_written', )
+
+    import_run = models.ForeignKey(ImportRun, on_delete=models.CASCADE, related_name='checkpoints')
+    phase = models.CharField(max_length=255)
+    # JSON result of the phase, e.g. the pks of the new objects, for the later phases that need it.
+    result = models.TextField(blank=True)
+    seconds = models.FloatField(default=0, help_text='Wall time spent in the phase.')
+    queries = models.PositiveIntegerField(default=0, help_text='Queries run on the Django db.')
+    source_rows = models.PositiveIntegerField(default=0, help_text='Rows read from the source db.')
+    rows_written = models.PositiveIntegerField(
+        default=0, help_text='Rows inserted, updated, or deleted in the Django db.')
+
+    class Meta:
+        verbose_name = 'import checkpoint'
+        unique_together = (('import_run', 'phase'), )
+
+    def __str__(self):
+        """Pretty printing."""
+        return '{} for {}'.format(self.phase, self.import_run)
+
+    def get_result(self):
+        """Get the result of the phase, as returned by the phase's method."""
+        return json.loads(self.result)
+
+    @property
+    def source_rows_per_second(self):
+        """Rate of reading rows from the source db during the phase."""
+        return self.source_rows / self.seconds if self.seconds else 0
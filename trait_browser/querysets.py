@@ -1,20 +1,177 @@
 """Custom QuerySets for the trait_browser app."""
 
-from django.db import models
+from collections import defaultdict
+import hashlib
+import json
 
+from django.apps import apps
+from django.db import connection, models
 
-class SourceDatasetQuerySet(models.query.QuerySet):
 
-    def current(self):
-        """Filter to non-deprecated source datasets."""
-        return self.filter(source_study_version__i_is_deprecated=False)
+class IsCurrentQuerySetMixin(object):
+    """Methods for querysets of models with an is_current field copied from the deprecation of their study version.
 
+    Subclasses set DEPRECATED_LOOKUP to the lookup from the model to its SourceStudyVersion's i_is_deprecated.
+    """
 
-class SourceTraitQuerySet(models.query.QuerySet):
+    DEPRECATED_LOOKUP = None
 
     def current(self):
-        """Filter to non-deprecated source traits."""
-        return self.filter(source_dataset__source_study_version__i_is_deprecated=False)
+        """Filter to objects from non-deprecated study versions."""
+        return self.filter(is_current=True)
+
+    def with_stale_is_current(self):
+        """Filter to objects whose is_current doesn't match the deprecation of their study version."""
+        return self.filter(is_current=models.F(self.DEPRECATED_LOOKUP))
+
+    def refresh_is_current(self):
+        """Set is_current from the deprecation of each object's study version, with one update per value.
+
+        Returns:
+            int number of objects whose is_current was changed
+        """
+        n_updated = 0
+        for is_current in (True, False):
+            # Use update() so that modified is not changed; import_db looks for source db changes
+            # made after the latest modified date.
+            n_updated += self.filter(**{'is_current': is_current, self.DEPRECATED_LOOKUP: is_current}).update(
+                is_current=not is_current)
+        return n_updated
+
+
+class VersionLinksQuerySetMixin(object):
+    """Methods for maintaining the precomputed previous_version and next_version links between versions of a model.
+
+    The versions of an object are the objects with the same accession in the different versions of
+    its study. Subclasses set STUDY_LOOKUP, STUDY_VERSION_LOOKUP, and ACCESSION_LOOKUP to the lookups
+    from the model to its Study, its SourceStudyVersion, and the accession shared by its versions.
+    """
+
+    STUDY_LOOKUP = None
+    STUDY_VERSION_LOOKUP = None
+    ACCESSION_LOOKUP = None
+    # Each object relinked in one query adds five query parameters, and SQLite limits the number of parameters.
+    VERSION_LINK_BATCH_SIZE = 100
+
+    def get_study_pks(self):
+        """Return a sorted list of the pks of the studies of the objects in the queryset."""
+        return sorted(set(self.order_by().values_list(self.STUDY_LOOKUP, flat=True)))
+
+    def in_studies(self, study_pks):
+        """Filter to objects from the studies with pks in study_pks."""
+        return self.filter(**{self.STUDY_LOOKUP + '__in': study_pks})
+
+    def get_expected_version_links(self):
+        """Find the previous and next versions of each object in the queryset.
+
+        The previous study version is found as in SourceStudyVersion.get_previous_versions(), and the
+        previous version of an object is the object with the same accession in the previous study
+        version. The next version of an object is the earliest one whose previous version it is.
+
+        Returns:
+            dict of pk: (previous_pk, next_pk) pairs, where a missing version is None
+        """
+        SourceStudyVersion = apps.get_model('trait_browser', 'SourceStudyVersion')
+        study_pks = self.get_study_pks()
+        study_versions = defaultdict(list)
+        for pk, study_pk, version, date_added in SourceStudyVersion.objects.filter(study__in=study_pks).values_list(
+                'pk', 'study_id', 'i_version', 'i_date_added'):
+            study_versions[study_pk].append((version, date_added, pk))
+        previous_study_versions, study_version_order = {}, {}
+        for versions in study_versions.values():
+            versions.sort()
+            for index, (version, date_added, pk) in enumerate(versions):
+                study_version_order[pk] = (version, date_added, pk)
+                earlier = [other for other in versions[:index] if other[1] < date_added]
+                previous_study_versions[pk] = earlier[-1][2] if earlier else None
+        # Include all versions of the objects from the same studies, even if they are not in the queryset.
+        family = self.model.objects.in_studies(study_pks).values_list(
+            'pk', self.STUDY_VERSION_LOOKUP, self.ACCESSION_LOOKUP)
+        by_version = {(study_version_pk, accession): pk for pk, study_version_pk, accession in family}
+        previous, next_versions = {}, {}
+        for (study_version_pk, accession), pk in sorted(
+                by_version.items(), key=lambda item: study_version_order[item[0][0]], reverse=True):
+            previous[pk] = by_version.get((previous_study_versions[study_version_pk], accession))
+            # Versions are visited from newest to oldest, so the earliest next version is set last.
+            if previous[pk] is not None:
+                next_versions[previous[pk]] = pk
+        return {pk: (previous.get(pk), next_versions.get(pk)) for pk in self.values_list('pk', flat=True)}
+
+    def get_version_link_differences(self):
+        """Compare the cached version links against the expected version links, one study at a time.
+
+        Returns:
+            dict of pk: (cached_links, expected_links) for the objects whose links disagree, where
+            links are (previous_pk, next_pk) pairs
+        """
+        differences = {}
+        for study_pk in self.get_study_pks():
+            study_objects = self.filter(**{self.STUDY_LOOKUP: study_pk})
+            cached = {pk: (previous_pk, next_pk) for pk, previous_pk, next_pk in study_objects.values_list(
+                'pk', 'previous_version_id', 'next_version_id')}
+            for pk, links in study_objects.get_expected_version_links().items():
+                if cached[pk] != links:
+                    differences[pk] = (cached[pk], links)
+        return differences
+
+    def refresh_version_links(self):
+        """Recompute the previous_version and next_version links of the objects in the queryset.
+
+        Only objects whose links have changed are updated, in batches of VERSION_LINK_BATCH_SIZE with
+        one UPDATE query each.
+
+        Returns:
+            int number of objects whose links were changed
+        """
+        differences = self.get_version_link_differences()
+        pks = sorted(differences)
+        for start in range(0, len(pks), self.VERSION_LINK_BATCH_SIZE):
+            batch_pks = pks[start:start + self.VERSION_LINK_BATCH_SIZE]
+            links = {}
+            for index, field_name in enumerate(('previous_version', 'next_version')):
+                links[field_name] = models.Case(
+                    *[models.When(pk=pk, then=models.Value(differences[pk][1][index])) for pk in batch_pks],
+                    output_field=models.IntegerField())
+            # Use update() so that modified is not changed; import_db looks for source db changes
+            # made after the latest modified date.
+            self.model.objects.filter(pk__in=batch_pks).update(**links)
+        return len(differences)
+
+
+class StudyQuerySet(models.query.QuerySet):
+
+    def with_trait_count(self):
+        """Annotate each study with trait_count, its number of non-deprecated source traits."""
+        return self.annotate(trait_count=models.Count(models.Case(
+            models.When(sourcestudyversion__sourcedataset__sourcetrait__is_current=True, then=1))))
+
+
+class SourceStudyVersionQuerySet(VersionLinksQuerySetMixin, models.query.QuerySet):
+
+    STUDY_LOOKUP = 'study'
+    STUDY_VERSION_LOOKUP = 'pk'
+    # Each study has one object in each of its versions: the study version itself.
+    ACCESSION_LOOKUP = 'study'
+
+
+class SourceDatasetQuerySet(IsCurrentQuerySetMixin, VersionLinksQuerySetMixin, models.query.QuerySet):
+
+    DEPRECATED_LOOKUP = 'source_study_version__i_is_deprecated'
+    STUDY_LOOKUP = 'source_study_version__study'
+    STUDY_VERSION_LOOKUP = 'source_study_version'
+    ACCESSION_LOOKUP = 'i_accession'
+
+    def with_trait_count(self):
+        """Annotate each dataset with trait_count, its number of source traits."""
+        return self.annotate(trait_count=models.Count('sourcetrait'))
+
+
+class SourceTraitQuerySet(IsCurrentQuerySetMixin, VersionLinksQuerySetMixin, models.query.QuerySet):
+
+    DEPRECATED_LOOKUP = 'source_dataset__source_study_version__i_is_deprecated'
+    STUDY_LOOKUP = 'source_dataset__source_study_version__study'
+    STUDY_VERSION_LOOKUP = 'source_dataset__source_study_version'
+    ACCESSION_LOOKUP = 'i_dbgap_variable_accession'
 
 
 class HarmonizedTraitQuerySet(models.query.QuerySet):
@@ -26,3 +183,278 @@ class HarmonizedTraitQuerySet(models.query.QuerySet):
     def non_unique_keys(self):
         """Filter to harmonized traits that are not unique key traits."""
         return self.filter(i_is_unique_key=False)
+
+
+class HarmonizedTraitSetVersionQuerySet(models.query.QuerySet):
+
+    # Lookups for everything HarmonizedTraitSetVersion.get_component_html() uses, relative to the set version.
+    COMPONENT_PREFETCHES = (
+        'harmonizationunit_set__component_source_traits__source_dataset__source_study_version__study',
+        'harmonizationunit_set__component_batch_traits__source_dataset__source_study_version__study',
+        'harmonizationunit_set__component_age_traits__source_dataset__source_study_version__study',
+        'harmonizationunit_set__component_harmonized_trait_set_versions__harmonizedtrait_set',
+        'harmonizationunit_set__harmonizedtrait_set__component_source_traits',
+        'harmonizationunit_set__harmonizedtrait_set__component_harmonized_trait_set_versions',
+    )
+    # Number of set versions to load the components of at a time when rebuilding component html.
+    COMPONENT_HTML_BATCH_SIZE = 100
+
+    def with_components(self):
+        """Prefetch all of the components needed to build component html, in a fixed number of queries."""
+        return self.prefetch_related(*self.COMPONENT_PREFETCHES)
+
+    def component_changed_since(self, timestamp):
+        """Filter to set versions whose component html may have changed since timestamp.
+
+        Includes set versions that were added or changed since timestamp, that have harmonization units or
+        harmonized traits that were added or changed, or that have component source traits, studies, or
+        component harmonized traits that were changed. Also includes set versions with harmonization units
+        whose component html has never been built.
+        """
+        changed_lookups = (
+            'modified',
+            'harmonizationunit__modified',
+            'harmonizedtrait__modified',
+            'harmonizationunit__component_harmonized_trait_set_versions__harmonizedtrait__modified',
+        )
+        for relation in ('component_source_traits', 'component_batch_traits', 'component_age_traits'):
+            changed_lookups += (
+                'harmonizationunit__{}__modified'.format(relation),
+                'harmonizationunit__{}__source_dataset__source_study_version__study__modified'.format(relation),
+            )
+        # Separate queries avoid one huge OR across all of these joins.
+        pks = set(self.filter(component_html_detail='', harmonizationunit__isnull=False).values_list('pk', flat=True))
+        for lookup in changed_lookups:
+            pks.update(self.filter(**{lookup + '__gte': timestamp}).values_list('pk', flat=True))
+        return self.filter(pk__in=pks)
+
+    def update_component_html(self, batch_size=None):
+        """Rebuild and save component_html_detail for the set versions in this queryset.
+
+        The components are loaded for batches of set versions at once, and only set versions whose html
+        has changed are saved. Returns the number of set versions that were saved.
+        """
+        batch_size = batch_size or self.COMPONENT_HTML_BATCH_SIZE
+        pks = list(self.order_by('pk').values_list('pk', flat=True))
+        n_saved = 0
+        for start in range(0, len(pks), batch_size):
+            batch = self.model.objects.filter(pk__in=pks[start:start + batch_size]).with_components()
+            for trait_set_version in batch:
+                component_html = trait_set_version.get_component_html()
+                if component_html != trait_set_version.component_html_detail:
+                    # Use update() so that modified is not changed; import_db looks for source db changes
+                    # made after the latest modified date.
+                    self.model.objects.filter(pk=trait_set_version.pk).update(component_html_detail=component_html)
+                    n_saved += 1
+        return n_saved
+
+
+class SourceTraitLineageQuerySet(models.query.QuerySet):
+    """Class to hold custom methods for maintaining the SourceTraitLineage closure table."""
+
+    # Number of rows to delete or create in each query.
+    REFRESH_BATCH_SIZE = 500
+
+    def get_expected_lineage(self):
+        """Walk the components of all harmonized traits to find the source traits that each one depends on.
+
+        Returns:
+            dict of (source_trait_pk, harmonized_trait_pk): depth pairs, where depth is 1 for direct
+            components and one more for each component harmonized trait set version in between
+        """
+        HarmonizedTrait = apps.get_model('trait_browser', 'HarmonizedTrait')
+        HarmonizationUnit = apps.get_model('trait_browser', 'HarmonizationUnit')
+        direct = defaultdict(set)
+        for through in (HarmonizedTrait.component_source_traits.through,
+                        HarmonizedTrait.component_batch_traits.through):
+            for harmonized_pk, source_pk in through.objects.values_list('harmonizedtrait_id', 'sourcetrait_id'):
+                direct[harmonized_pk].add(source_pk)
+        # Age traits are only linked to harmonization units, so they are components of every trait in the unit.
+        unit_age_traits = defaultdict(set)
+        for unit_pk, source_pk in HarmonizationUnit.component_age_traits.through.objects.values_list(
+                'harmonizationunit_id', 'sourcetrait_id'):
+            unit_age_traits[unit_pk].add(source_pk)
+        for harmonized_pk, unit_pk in HarmonizedTrait.harmonization_units.through.objects.values_list(
+                'harmonizedtrait_id', 'harmonizationunit_id'):
+            direct[harmonized_pk].update(unit_age_traits[unit_pk])
+        # A harmonized trait depends on every harmonized trait in its component set versions.
+        set_version_traits = defaultdict(list)
+        for harmonized_pk, set_version_pk in HarmonizedTrait.objects.values_list(
+                'pk', 'harmonized_trait_set_version_id'):
+            set_version_traits[set_version_pk].append(harmonized_pk)
+        upstream = defaultdict(set)
+        component_set_versions = HarmonizedTrait.component_harmonized_trait_set_versions.through.objects.values_list(
+            'harmonizedtrait_id', 'harmonizedtraitsetversion_id')
+        for harmonized_pk, set_version_pk in component_set_versions:
+            upstream[harmonized_pk].update(set_version_traits[set_version_pk])
+        lineage = {}
+        for harmonized_pk in set(direct) | set(upstream):
+            # Breadth first, so each source trait gets its smallest depth; visited guards against cycles.
+            visited, frontier, depth = {harmonized_pk}, [harmonized_pk], 1
+            while frontier:
+                for pk in frontier:
+                    for source_pk in direct[pk]:
+                        lineage.setdefault((source_pk, harmonized_pk), depth)
+                frontier = set(upstream_pk for pk in frontier for upstream_pk in upstream[pk]) - visited
+                visited.update(frontier)
+                depth += 1
+        return lineage
+
+    def get_differences(self):
+        """Compare the cached lineage against the expected lineage.
+
+        Returns:
+            dict of (source_trait_pk, harmonized_trait_pk): (cached_depth, expected_depth) pairs that disagree;
+            a missing row has a depth of None
+        """
+        cached = {(source_pk, harmonized_pk): depth for source_pk, harmonized_pk, depth in self.values_list(
+            'source_trait_id', 'harmonized_trait_id', 'depth')}
+        expected = self.get_expected_lineage()
+        differences = {}
+        for key in set(cached) | set(expected):
+            if cached.get(key) != expected.get(key):
+                differences[key] = (cached.get(key), expected.get(key))
+        return differences
+
+    def refresh(self):
+        """Recompute the lineage of all source and harmonized traits.
+
+        Only rows that have changed are written: stale rows are deleted, missing rows are created
+        in bulk, and rows with a changed depth are updated.
+
+        Returns:
+            dict of (source_trait_pk, harmonized_trait_pk): (old_depth, new_depth) pairs that were changed
+        """
+        differences = self.get_differences()
+        stale = [key for key, (old_depth, new_depth) in differences.items() if new_depth is None]
+        if stale:
+            cached_pks = {(source_pk, harmonized_pk): pk for pk, source_pk, harmonized_pk in self.values_list(
+                'pk', 'source_trait_id', 'harmonized_trait_id')}
+            stale_pks = [cached_pks[key] for key in stale]
+            for start in range(0, len(stale_pks), self.REFRESH_BATCH_SIZE):
+                self.filter(pk__in=stale_pks[start:start + self.REFRESH_BATCH_SIZE]).delete()
+        new_rows = []
+        for (source_pk, harmonized_pk), (old_depth, new_depth) in differences.items():
+            if new_depth is None:
+                continue
+            elif old_depth is None:
+                new_rows.append(self.model(source_trait_id=source_pk, harmonized_trait_id=harmonized_pk,
+                                           depth=new_depth))
+            else:
+                self.filter(source_trait_id=source_pk, harmonized_trait_id=harmonized_pk).update(depth=new_depth)
+        # SQLite limits the number of variables in one query.
+        batch_size = connection.ops.bulk_batch_size(
+            ['source_trait_id', 'harmonized_trait_id', 'depth'], new_rows) or self.REFRESH_BATCH_SIZE
+        self.bulk_create(new_rows, batch_size=min(batch_size, self.REFRESH_BATCH_SIZE))
+        return differences
+
+
+class EncodedValueSetQuerySet(models.query.QuerySet):
+    """Class to hold custom methods for maintaining the deduplicated EncodedValueSet table."""
+
+    # Number of traits to link, or sets to create, at a time.
+    LINK_BATCH_SIZE = 500
+    # The model holding the encoded value rows of each trait model, and its fk to the trait.
+    TRAIT_ENCODED_VALUES = {
+        'SourceTrait': ('SourceTraitEncodedValue', 'source_trait_id'),
+        'HarmonizedTrait': ('HarmonizedTraitEncodedValue', 'harmonized_trait_id'),
+    }
+
+    @staticmethod
+    def serialize(encoded_values):
+        """Return the serialized encoded_values field for a list of (category, value) pairs."""
+        return json.dumps([list(pair) for pair in encoded_values], separators=(',', ':'))
+
+    @staticmethod
+    def hash_serialized(serialized):
+        """Return the content_hash for a serialized encoded_values field."""
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+    def get_trait_encoded_values(self, traits):
+        """Get the list of encoded values of each trait from their encoded value rows.
+
+        Arguments:
+            traits -- queryset of SourceTraits or HarmonizedTraits
+
+        Returns:
+            dict of trait_pk: serialized encoded values, for every trait in traits
+        """
+        ev_model_name, trait_field = self.TRAIT_ENCODED_VALUES[traits.model.__name__]
+        ev_model = apps.get_model('trait_browser', ev_model_name)
+        trait_pks = list(traits.order_by('pk').values_list('pk', flat=True))
+        serialized = {}
+        for start in range(0, len(trait_pks), self.LINK_BATCH_SIZE):
+            batch_pks = trait_pks[start:start + self.LINK_BATCH_SIZE]
+            encoded_values = defaultdict(list)
+            rows = ev_model.objects.filter(**{trait_field + '__in': batch_pks}).order_by(
+                trait_field, 'pk').values_list(trait_field, 'i_category', 'i_value')
+            for trait_pk, category, value in rows:
+                encoded_values[trait_pk].append((category, value))
+            for trait_pk in batch_pks:
+                serialized[trait_pk] = self.serialize(encoded_values[trait_pk])
+        return serialized
+
+    def get_differences(self, traits):
+        """Compare the encoded value set linked to each trait against the trait's encoded value rows.
+
+        Arguments:
+            traits -- queryset of SourceTraits or HarmonizedTraits
+
+        Returns:
+            dict of trait_pk: (linked_hash, expected_hash) pairs that disagree; an unlinked trait has a hash of None
+        """
+        expected = self.get_trait_encoded_values(traits)
+        linked = dict(traits.values_list('pk', 'encoded_value_set__content_hash'))
+        differences = {}
+        for trait_pk, serialized in expected.items():
+            expected_hash = self.hash_serialized(serialized)
+            if linked.get(trait_pk) != expected_hash:
+                differences[trait_pk] = (linked.get(trait_pk), expected_hash)
+        return differences
+
+    def link_traits(self, traits):
+        """Link each trait to the encoded value set matching its encoded value rows.
+
+        Sets that don't exist yet are created in bulk, and only traits whose linked set has
+        changed are updated, with one query per set.
+
+        Arguments:
+            traits -- queryset of SourceTraits or HarmonizedTraits
+
+        Returns:
+            tuple of (number of traits whose set was changed, number of sets created)
+        """
+        expected = self.get_trait_encoded_values(traits)
+        by_hash = {}
+        for trait_pk, serialized in expected.items():
+            by_hash.setdefault(self.hash_serialized(serialized), (serialized, []))[1].append(trait_pk)
+        hashes = list(by_hash)
+        set_pks = {}
+        for start in range(0, len(hashes), self.LINK_BATCH_SIZE):
+            set_pks.update(self.model.objects.filter(
+                content_hash__in=hashes[start:start + self.LINK_BATCH_SIZE]).values_list('content_hash', 'pk'))
+        new_sets = [self.model(content_hash=content_hash, encoded_values=by_hash[content_hash][0])
+                    for content_hash in hashes if content_hash not in set_pks]
+        # SQLite limits the number of variables in one query.
+        batch_size = connection.ops.bulk_batch_size(['content_hash', 'encoded_values'], new_sets)
+        self.model.objects.bulk_create(new_sets, batch_size=min(batch_size or self.LINK_BATCH_SIZE,
+                                                                self.LINK_BATCH_SIZE))
+        # bulk_create doesn't set pks on MySQL, so look the new sets up again.
+        new_hashes = [new_set.content_hash for new_set in new_sets]
+        for start in range(0, len(new_hashes), self.LINK_BATCH_SIZE):
+            set_pks.update(self.model.objects.filter(
+                content_hash__in=new_hashes[start:start + self.LINK_BATCH_SIZE]).values_list('content_hash', 'pk'))
+        linked = dict(traits.values_list('pk', 'encoded_value_set_id'))
+        n_linked = 0
+        for content_hash, (serialized, trait_pks) in by_hash.items():
+            to_link = [pk for pk in trait_pks if linked.get(pk) != set_pks[content_hash]]
+            for start in range(0, len(to_link), self.LINK_BATCH_SIZE):
+                # Use update() so that modified is not changed.
+                traits.model.objects.filter(pk__in=to_link[start:start + self.LINK_BATCH_SIZE]).update(
+                    encoded_value_set_id=set_pks[content_hash])
+            n_linked += len(to_link)
+        return n_linked, len(new_sets)
+
+    def unused(self):
+        """Filter to encoded value sets that are not linked to any source or harmonized trait."""
+        return self.filter(sourcetrait__isnull=True, harmonizedtrait__isnull=True)
@@ -0,0 +1,322 @@
+"""Connections to the source phenotype db (topmed_pheno), for the import_db management command.
+
+import_db reads topmed_pheno through a source db object, which has the cursor() and close()
+methods of a mysql.connector connection, plus lock() and unlock() methods to keep others from
+writing to the source tables during an import. Cursors return rows the way mysql.connector does
+with use_unicode=False: character data as bytearrays, dates and times as naive UTC datetimes,
+and MySQL field type codes in cursor.description, so the row fixers in import_db work on rows
+from any source db.
+
+MySQLSourceDB wraps a connection to the real topmed_pheno MySQL db. SQLiteSourceDB is a
+stand-in with the tables and columns that import_db reads, stored in a SQLite file (or in
+memory), so that import_db can be run, tested, and benchmarked without access to topmed_pheno.
+Fill a stand-in with the SourceDBGenerator in trait_browser.source_db_generator.
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+import logging
+import sqlite3
+
+from mysql.connector import FieldType
+
+
+logger = logging.getLogger(__name__)
+
+# Format of DATETIME values in the SQLite stand-in, which MySQL also accepts.
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# MySQL field type of each column in the source db tables read by import_db.
+COLUMN_TYPES = {
+    'abbreviation': FieldType.VAR_STRING,
+    'accession': FieldType.LONG,
+    'category': FieldType.VAR_STRING,
+    'component_trait_id': FieldType.LONG,
+    'component_trait_set_version_id': FieldType.LONG,
+    'data_type': FieldType.VAR_STRING,
+    'dataset_id': FieldType.LONG,
+    'date_added': FieldType.DATETIME,
+    'date_changed': FieldType.DATETIME,
+    'dbgap_comment': FieldType.BLOB,
+    'dbgap_date': FieldType.DATETIME,
+    'dbgap_date_created': FieldType.DATETIME,
+    'dbgap_description': FieldType.BLOB,
+    'dbgap_type': FieldType.VAR_STRING,
+    'dbgap_unit': FieldType.VAR_STRING,
+    'dbgap_variable_accession': FieldType.LONG,
+    'dbgap_variable_version': FieldType.LONG,
+    'description': FieldType.BLOB,
+    'detected_type': FieldType.VAR_STRING,
+    'filename': FieldType.VAR_STRING,
+    'flavor': FieldType.LONG,
+    'git_commit_hash': FieldType.VAR_STRING,
+    'global_study_id': FieldType.LONG,
+    'harmonization_unit_id': FieldType.LONG,
+    'harmonized_by': FieldType.VAR_STRING,
+    'harmonized_trait_id': FieldType.LONG,
+    'harmonized_trait_set_id': FieldType.LONG,
+    'harmonized_trait_set_version_id': FieldType.LONG,
+    'has_batch': FieldType.TINY,
+    'id': FieldType.LONG,
+    'is_demographic': FieldType.TINY,
+    'is_deprecated': FieldType.TINY,
+    'is_longitudinal': FieldType.TINY,
+    'is_prerelease': FieldType.TINY,
+    'is_subject_file': FieldType.TINY,
+    'is_unique_key': FieldType.TINY,
+    'n_missing': FieldType.LONG,
+    'n_records': FieldType.LONG,
+    'name': FieldType.VAR_STRING,
+    'participant_set': FieldType.LONG,
+    'reason_id': FieldType.LONG,
+    'source_trait_id': FieldType.LONG,
+    'study_name': FieldType.VAR_STRING,
+    'study_subject_column': FieldType.VAR_STRING,
+    'study_version_id': FieldType.LONG,
+    'tag': FieldType.VAR_STRING,
+    'topmed_abbreviation': FieldType.VAR_STRING,
+    'topmed_accession': FieldType.LONG,
+    'trait_name': FieldType.VAR_STRING,
+    'trait_set_name': FieldType.VAR_STRING,
+    'unit': FieldType.VAR_STRING,
+    'value': FieldType.VAR_STRING,
+    'version': FieldType.LONG,
+}
+
+# Columns of each table in the SQLite stand-in, in creation order. The first column is the primary key.
+SOURCE_DB_TABLES = OrderedDict((
+    ('global_study', ('id', 'name', 'topmed_accession', 'topmed_abbreviation', 'date_added', 'date_changed')),
+    ('study', ('accession', 'global_study_id', 'study_name', 'date_added', 'date_changed')),
+    ('source_study_version', ('id', 'accession', 'version', 'participant_set', 'dbgap_date', 'is_deprecated',
+                              'is_prerelease', 'date_added', 'date_changed')),
+    ('subcohort', ('id', 'global_study_id', 'name', 'date_added', 'date_changed')),
+    ('source_dataset', ('id', 'study_version_id', 'accession', 'version', 'is_subject_file', 'study_subject_column',
+                        'dbgap_description', 'dbgap_date_created', 'date_added', 'date_changed')),
+    ('source_dataset_dictionary_files', ('id', 'dataset_id', 'filename', 'date_added', 'date_changed')),
+    ('source_trait', ('source_trait_id', 'dataset_id', 'trait_name', 'detected_type', 'dbgap_type',
+                      'dbgap_variable_accession', 'dbgap_variable_version', 'dbgap_description', 'dbgap_comment',
+                      'dbgap_unit', 'n_records', 'n_missing', 'date_added', 'date_changed')),
+    ('source_trait_encoded_values', ('id', 'source_trait_id', 'category', 'value', 'date_added', 'date_changed')),
+    ('harmonized_trait_set', ('id', 'trait_set_name', 'flavor', 'is_longitudinal', 'is_demographic', 'date_added',
+                              'date_changed')),
+    ('allowed_update_reason', ('id', 'abbreviation', 'description')),
+    ('harmonized_trait_set_version', ('id', 'harmonized_trait_set_id', 'version', 'git_commit_hash', 'harmonized_by',
+                                      'is_deprecated', 'date_added', 'date_changed')),
+    ('harmonized_trait_set_version_update_reason', ('id', 'harmonized_trait_set_version_id', 'reason_id',
+                                                    'date_added')),
+    ('harmonization_unit', ('id', 'harmonized_trait_set_version_id', 'tag', 'date_added', 'date_changed')),
+    ('harmonized_trait', ('harmonized_trait_id', 'harmonized_trait_set_version_id', 'trait_name', 'description',
+                          'data_type', 'unit', 'has_batch', 'is_unique_key', 'date_added', 'date_changed')),
+    ('harmonized_trait_encoded_values', ('id', 'harmonized_trait_id', 'category', 'value', 'date_added',
+                                         'date_changed')),
+    ('component_source_trait', ('id', 'harmonized_trait_id', 'harmonization_unit_id', 'component_trait_id',
+                                'date_added')),
+    ('component_batch_trait', ('id', 'harmonized_trait_id', 'harmonization_unit_id', 'component_trait_id',
+                               'date_added')),
+    ('component_age_trait', ('id', 'harmonization_unit_id', 'component_trait_id', 'date_added')),
+    ('component_harmonized_trait_set', ('id', 'harmonized_trait_id', 'harmonization_unit_id',
+                                        'component_trait_set_version_id', 'date_added')),
+))
+
+# Columns that import_db filters on, which are indexed in topmed_pheno as well.
+SOURCE_DB_INDEXES = (
+    ('source_study_version', 'accession'),
+    ('source_dataset', 'study_version_id'),
+    ('source_dataset_dictionary_files', 'dataset_id'),
+    ('source_trait', 'dataset_id'),
+    ('source_trait_encoded_values', 'source_trait_id'),
+    ('harmonization_unit', 'harmonized_trait_set_version_id'),
+    ('harmonized_trait', 'harmonized_trait_set_version_id'),
+    ('harmonized_trait_encoded_values', 'harmonized_trait_id'),
+    ('harmonized_trait_set_version_update_reason', 'harmonized_trait_set_version_id'),
+    ('component_source_trait', 'harmonized_trait_id'),
+    ('component_source_trait', 'harmonization_unit_id'),
+    ('component_batch_trait', 'harmonized_trait_id'),
+    ('component_batch_trait', 'harmonization_unit_id'),
+    ('component_age_trait', 'harmonization_unit_id'),
+    ('component_harmonized_trait_set', 'harmonized_trait_id'),
+    ('component_harmonized_trait_set', 'harmonization_unit_id'),
+)
+
+
+class MySQLSourceDB(object):
+    """A source db backed by a mysql.connector connection to topmed_pheno.
+
+    Attributes other than lock() and unlock(), such as cursor(), close(), and database,
+    are those of the wrapped connection.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def lock(self):
+        """Read-lock all tables in the db (prevents others writing to the db)."""
+        cursor = self.connection.cursor(buffered=True, dictionary=False)
+        cursor.execute('SHOW TABLES;')
+        tables = [el[0].decode('utf-8') for el in cursor.fetchall()]
+        # Locking views actually has the effect of locking the tables they are based upon.
+        tables = [el for el in tables if not el.startswith('view_')]
+        lock_query = 'LOCK TABLES {}'.format(', '.join(['{} READ'.format(el) for el in tables]))
+        logger.debug(lock_query)
+        cursor.execute(lock_query)
+        cursor.close()
+
+    def unlock(self):
+        """Undo a read-lock placed on tables in the db."""
+        cursor = self.connection.cursor(buffered=True, dictionary=False)
+        cursor.execute('UNLOCK TABLES')
+        cursor.close()
+
+
+class SQLiteSourceDB(object):
+    """A stand-in for topmed_pheno, with the same tables stored in SQLite.
+
+    Arguments:
+        path -- string; path of the SQLite file to open, or ':memory:' for an in-memory db
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        # Without implicit transactions, lock() and unlock() can start and end them.
+        self.connection = sqlite3.connect(path, isolation_level=None)
+
+    def cursor(self, buffered=False, dictionary=False):
+        """Return a cursor returning rows like those from mysql.connector.
+
+        Arguments:
+            buffered -- bool; ignored, since SQLite results are all read from the same process
+            dictionary -- bool; whether rows should be returned as dicts of column name: value
+        """
+        return SQLiteSourceCursor(self.connection.cursor(), dictionary=dictionary)
+
+    def lock(self):
+        """Start a transaction that keeps others from writing to the db until it is unlocked."""
+        self.connection.execute('BEGIN IMMEDIATE')
+
+    def unlock(self):
+        """End the transaction started by lock()."""
+        if self.connection.in_transaction:
+            self.connection.execute('COMMIT')
+
+    def commit(self):
+        if self.connection.in_transaction:
+            self.connection.execute('COMMIT')
+
+    def close(self):
+        self.connection.close()
+
+    def create_tables(self):
+        """Create the source db tables, if they don't already exist."""
+        for table, columns in SOURCE_DB_TABLES.items():
+            column_definitions = ['{} {}{}'.format(
+                column, _get_sqlite_type(COLUMN_TYPES[column]), ' PRIMARY KEY' if i == 0 else '')
+                for (i, column) in enumerate(columns)]
+            self.connection.execute('CREATE TABLE IF NOT EXISTS {} ({})'.format(table, ', '.join(column_definitions)))
+        for table, column in SOURCE_DB_INDEXES:
+            self.connection.execute('CREATE INDEX IF NOT EXISTS {table}_{column} ON {table} ({column})'.format(
+                table=table, column=column))
+
+    def insert_rows(self, table, rows):
+        """Insert rows of values into a table.
+
+        Arguments:
+            table -- string; name of the table
+            rows -- iterable of tuples of values for all of the table's columns, in the order of
+                SOURCE_DB_TABLES; datetimes should be naive and in UTC
+        """
+        columns = SOURCE_DB_TABLES[table]
+        query = 'INSERT INTO {} ({}) VALUES ({})'.format(table, ', '.join(columns), ', '.join('?' * len(columns)))
+        self.connection.executemany(query, (tuple(_to_sqlite(value) for value in row) for row in rows))
+
+    def count_rows(self):
+        """Return a dict of table name: number of rows, for each source db table."""
+        return OrderedDict(
+            (table, self.connection.execute('SELECT COUNT(*) FROM {}'.format(table)).fetchone()[0])
+            for table in SOURCE_DB_TABLES)
+
+
+class SQLiteSourceCursor(object):
+    """Wrap a sqlite3 cursor so its rows and description match those of a mysql.connector cursor."""
+
+    def __init__(self, cursor, dictionary=False):
+        self.cursor = cursor
+        self.dictionary = dictionary
+        self.description = None
+        self._columns = ()
+        self._converters = ()
+
+    def execute(self, query, params=()):
+        self.cursor.execute(query, params)
+        if self.cursor.description is None:
+            self.description = None
+            self._columns = self._converters = ()
+        else:
+            self._columns = tuple(el[0] for el in self.cursor.description)
+            types = [COLUMN_TYPES.get(column) for column in self._columns]
+            self.description = [(column, field_type, None, None, None, None, 1)
+                                for (column, field_type) in zip(self._columns, types)]
+            self._converters = tuple(_get_converter(field_type) for field_type in types)
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    def _convert(self, row):
+        values = tuple(value if value is None else convert(value) for (value, convert) in zip(row, self._converters))
+        if self.dictionary:
+            return dict(zip(self._columns, values))
+        return values
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        return None if row is None else self._convert(row)
+
+    def fetchall(self):
+        return [self._convert(row) for row in self.cursor.fetchall()]
+
+    def __iter__(self):
+        for row in self.cursor:
+            yield self._convert(row)
+
+    def close(self):
+        self.cursor.close()
+
+
+def _get_sqlite_type(field_type):
+    """Return the SQLite column type used to store values of a MySQL field type."""
+    if field_type in FieldType.get_number_types():
+        return 'INTEGER'
+    return 'TEXT'
+
+
+def _to_sqlite(value):
+    if isinstance(value, datetime):
+        return value.strftime(DATETIME_FORMAT)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _to_bytearray(value):
+    return bytearray(value, 'utf-8')
+
+
+def _to_datetime(value):
+    return datetime.strptime(value, DATETIME_FORMAT)
+
+
+def _keep(value):
+    return value
+
+
+def _get_converter(field_type):
+    """Return a function to convert a value from SQLite to what mysql.connector returns for field_type."""
+    if field_type in FieldType.get_timestamp_types():
+        return _to_datetime
+    elif field_type in FieldType.get_string_types() + FieldType.get_binary_types():
+        return _to_bytearray
+    # Columns that aren't in COLUMN_TYPES, such as aggregates, are returned as they are.
+    return _keep
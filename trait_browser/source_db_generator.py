@@ -0,0 +1,315 @@
+"""Fill a SQLite stand-in for topmed_pheno with synthetic releases of studies and harmonized traits.
+
+Each call to SourceDBGenerator.add_release adds what one data release to topmed_pheno would:
+a new version of every current study, with new versions of its datasets and variables (a
+few of which are added, dropped, or have corrected comments) that deprecates the previous
+version, a new version of every current harmonized trait set, and some brand new studies and
+harmonized trait sets. Running import_db after each release therefore exercises each of its
+phases: importing new rows, updating changed rows, linking and unlinking components, setting
+dataset names, and carrying tags forward to the new study versions.
+
+All of the random choices come from one seeded random number generator, so the same arguments
+always make the same source db.
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import random
+
+from core.build_large_db import HARMONIZED_DATA_TYPES, PHENOTYPE_WORDS, TRAIT_TYPES, UNITS
+from trait_browser.source_db import SOURCE_DB_TABLES
+
+
+# Date of the first release, and the time between releases.
+FIRST_RELEASE_DATE = datetime(2015, 1, 1)
+RELEASE_INTERVAL = timedelta(days=91)
+DATA_DICT_FILE = ('/projects/topmed/downloaded_data/dbGaP/released/phs{phs:06d}/v{study_version}/organized/'
+                  'Phenotypes/phs{phs:06d}.v{study_version}.pht{pht:06d}.v{dataset_version}.{name}.data_dict.xml')
+# Tuple format: (abbreviation, description)
+ALLOWED_UPDATE_REASONS = (
+    ('bug_fix', 'Fixed a bug in the harmonization function.'),
+    ('new_data', 'Harmonized newly released data.'),
+    ('new_component', 'Added a component variable.'),
+)
+
+
+class SourceDBGenerator(object):
+    """Add synthetic releases of data to a source db.
+
+    Arguments:
+        source_db -- SQLiteSourceDB; the stand-in source db to fill, which will have its tables created
+        seed -- int; seed for the random number generator
+    """
+
+    def __init__(self, source_db, seed=0):
+        self.source_db = source_db
+        self.rng = random.Random(seed)
+        self.source_db.create_tables()
+        self._max_ids = {}
+        self._rows = OrderedDict()
+
+    def words(self, n_range, separator=' '):
+        return separator.join(self.rng.choice(PHENOTYPE_WORDS) for _ in range(self.rng.randint(*n_range)))
+
+    def query(self, query, params=()):
+        return self.source_db.connection.execute(query, params).fetchall()
+
+    def next_id(self, table, column=None):
+        """Return the next unused value of a column, which by default is the primary key of the table."""
+        column = column or SOURCE_DB_TABLES[table][0]
+        key = (table, column)
+        if key not in self._max_ids:
+            self._max_ids[key] = self.query('SELECT MAX({}) FROM {}'.format(column, table))[0][0] or 0
+        self._max_ids[key] += 1
+        return self._max_ids[key]
+
+    def add_row(self, table, *values):
+        self._rows.setdefault(table, []).append(values)
+
+    def flush(self):
+        """Insert the rows made since the last flush."""
+        for table, rows in self._rows.items():
+            self.source_db.insert_rows(table, rows)
+        self._rows = OrderedDict()
+
+    def get_next_release_date(self):
+        latest = self.query('SELECT MAX(date_added) FROM source_study_version')[0][0]
+        if latest is None:
+            return FIRST_RELEASE_DATE
+        return datetime.strptime(latest, '%Y-%m-%d %H:%M:%S') + RELEASE_INTERVAL
+
+    def add_release(self, n_new_studies=10, n_datasets_range=(2, 10), n_traits_range=(10, 100),
+                    encoded_fraction=0.25, n_values_range=(2, 8), changed_fraction=0.05,
+                    n_new_harmonized_trait_sets=5, n_harmonized_trait_range=(1, 4)):
+        """Add a release of new study versions and harmonized trait set versions to the source db.
+
+        The ranges are inclusive.
+
+        Arguments:
+            n_new_studies -- int; number of studies to add, in addition to new versions of the current studies
+            n_datasets_range -- (int, int); range of the number of datasets in each new study
+            n_traits_range -- (int, int); range of the number of source traits in each dataset of a new study
+            encoded_fraction -- float; fraction of new source traits that have encoded values
+            n_values_range -- (int, int); range of the number of encoded values of an encoded trait
+            changed_fraction -- float; fraction of the source traits of the current study versions that
+                have their comments corrected, that are dropped from the new study versions, and that are
+                added to the new study versions
+            n_new_harmonized_trait_sets -- int; number of harmonized trait sets to add, in addition to new
+                versions of the current harmonized trait sets
+            n_harmonized_trait_range -- (int, int); range of the number of harmonized traits in each new
+                harmonized trait set
+
+        Returns:
+            datetime date of the release, which is the date_added of all of the new rows
+        """
+        release_date = self.get_next_release_date()
+        self.source_db.connection.execute('BEGIN')
+        if not self.query('SELECT COUNT(*) FROM allowed_update_reason')[0][0]:
+            for abbreviation, description in ALLOWED_UPDATE_REASONS:
+                self.add_row('allowed_update_reason', self.next_id('allowed_update_reason'), abbreviation,
+                             description)
+        current_study_versions = self.query('SELECT id, accession, version, participant_set FROM '
+                                            'source_study_version WHERE is_deprecated = 0 ORDER BY id')
+        for study_version in current_study_versions:
+            self.add_study_version(release_date, study_version, encoded_fraction, n_values_range, changed_fraction)
+        for _ in range(n_new_studies):
+            self.add_study(release_date, n_datasets_range, n_traits_range, encoded_fraction, n_values_range)
+        # The harmonized traits use the source traits of this release as components.
+        self.flush()
+        component_trait_ids = [row[0] for row in self.query(
+            'SELECT source_trait_id FROM source_trait INNER JOIN source_dataset ON dataset_id = source_dataset.id '
+            'INNER JOIN source_study_version ON study_version_id = source_study_version.id '
+            'WHERE is_deprecated = 0 ORDER BY source_trait_id')]
+        reason_ids = [row[0] for row in self.query('SELECT id FROM allowed_update_reason ORDER BY id')]
+        current_set_versions = self.query('SELECT id, harmonized_trait_set_id, version FROM '
+                                          'harmonized_trait_set_version WHERE is_deprecated = 0 ORDER BY id')
+        for set_version in current_set_versions:
+            self.add_harmonized_trait_set_version(
+                release_date, set_version, component_trait_ids, reason_ids, n_values_range)
+        for _ in range(n_new_harmonized_trait_sets):
+            self.add_harmonized_trait_set(release_date, component_trait_ids, n_harmonized_trait_range,
+                                          n_values_range)
+        self.flush()
+        self.source_db.connection.execute('COMMIT')
+        return release_date
+
+    def add_study(self, release_date, n_datasets_range, n_traits_range, encoded_fraction, n_values_range):
+        """Add a global study, study, subcohorts, and the first version of the study."""
+        global_study_id = self.next_id('global_study')
+        study_name = '{} Study'.format(self.words((1, 3)).title())
+        abbreviation = ''.join(word[0] for word in study_name.split()).upper()
+        self.add_row('global_study', global_study_id, '{} {}'.format(study_name, global_study_id),
+                     global_study_id if self.rng.random() < 0.5 else None, abbreviation, release_date, release_date)
+        for _ in range(self.rng.randint(0, 2)):
+            self.add_row('subcohort', self.next_id('subcohort'), global_study_id, self.words((1, 2)).title(),
+                         release_date, release_date)
+        accession = self.next_id('study')
+        self.add_row('study', accession, global_study_id, study_name, release_date, release_date)
+        study_version_id = self.next_id('source_study_version')
+        self.add_row('source_study_version', study_version_id, accession, 1, 1,
+                     release_date - timedelta(days=self.rng.randint(1, 60)), False, False, release_date, release_date)
+        for i in range(self.rng.randint(*n_datasets_range)):
+            dataset_id = self.add_dataset(
+                release_date, study_version_id, accession, 1, self.next_id('source_dataset', 'accession'), 1,
+                self.words((1, 3), separator='_'), is_subject_file=(i == 0))
+            for _ in range(self.rng.randint(*n_traits_range)):
+                self.add_new_trait(release_date, dataset_id, encoded_fraction, n_values_range)
+
+    def add_dataset(self, release_date, study_version_id, phs, study_version, pht, dataset_version, name,
+                    is_subject_file):
+        """Add a source dataset and its data dictionary file, returning its id."""
+        dataset_id = self.next_id('source_dataset')
+        self.add_row('source_dataset', dataset_id, study_version_id, pht, dataset_version, is_subject_file,
+                     'SUBJID' if is_subject_file else '', self.words((3, 12)).capitalize(),
+                     release_date - timedelta(days=self.rng.randint(1, 60)), release_date, release_date)
+        filename = DATA_DICT_FILE.format(phs=phs, study_version=study_version, pht=pht,
+                                         dataset_version=dataset_version, name=name)
+        self.add_row('source_dataset_dictionary_files', self.next_id('source_dataset_dictionary_files'), dataset_id,
+                     filename, release_date, release_date)
+        return dataset_id
+
+    def add_new_trait(self, release_date, dataset_id, encoded_fraction, n_values_range):
+        """Add a source trait with a new variable accession, and its encoded values."""
+        if self.rng.random() < encoded_fraction:
+            trait_type = TRAIT_TYPES[-1]
+            encoded_values = [(str(i), self.words((1, 3))) for i in range(self.rng.randint(*n_values_range))]
+        else:
+            trait_type = self.rng.choice(TRAIT_TYPES[:-1])
+            encoded_values = []
+        n_records = self.rng.randint(100, 10000)
+        row = (self.next_id('source_trait'), dataset_id, self.words((1, 3), separator='_').upper(), trait_type[0],
+               trait_type[1], self.next_id('source_trait', 'dbgap_variable_accession'), 1,
+               self.words((3, 15)).capitalize(), self.words((0, 10)), self.rng.choice(UNITS), n_records,
+               self.rng.randint(0, n_records // 10), release_date, release_date)
+        self.add_trait(release_date, row, encoded_values)
+
+    def add_trait(self, release_date, row, encoded_values):
+        self.add_row('source_trait', *row)
+        for category, value in encoded_values:
+            self.add_row('source_trait_encoded_values', self.next_id('source_trait_encoded_values'), row[0],
+                         category, value, release_date, release_date)
+
+    def add_study_version(self, release_date, previous_study_version, encoded_fraction, n_values_range,
+                          changed_fraction):
+        """Add the next version of a study, and deprecate its previous version."""
+        previous_id, accession, previous_version, participant_set = previous_study_version
+        self.source_db.connection.execute(
+            'UPDATE source_study_version SET is_deprecated = 1, date_changed = ? WHERE id = ?',
+            (release_date.strftime('%Y-%m-%d %H:%M:%S'), previous_id))
+        study_version_id = self.next_id('source_study_version')
+        version = previous_version + 1
+        self.add_row('source_study_version', study_version_id, accession, version, participant_set + 1,
+                     release_date - timedelta(days=self.rng.randint(1, 60)), False, False, release_date, release_date)
+        previous_datasets = self.query(
+            'SELECT source_dataset.id, accession, version, is_subject_file, filename FROM source_dataset '
+            'INNER JOIN source_dataset_dictionary_files ON dataset_id = source_dataset.id '
+            'WHERE study_version_id = ? ORDER BY source_dataset.id', (previous_id, ))
+        for previous_dataset_id, pht, dataset_version, is_subject_file, filename in previous_datasets:
+            name = filename.split('.')[-3]
+            dataset_id = self.add_dataset(release_date, study_version_id, accession, version, pht,
+                                          dataset_version + 1, name, bool(is_subject_file))
+            self.add_dataset_traits(release_date, previous_dataset_id, dataset_id, encoded_fraction, n_values_range,
+                                    changed_fraction)
+
+    def add_dataset_traits(self, release_date, previous_dataset_id, dataset_id, encoded_fraction, n_values_range,
+                           changed_fraction):
+        """Add the next versions of the source traits of a dataset, and a few new ones."""
+        columns = SOURCE_DB_TABLES['source_trait']
+        previous_traits = self.query(
+            'SELECT {} FROM source_trait WHERE dataset_id = ? ORDER BY source_trait_id'.format(', '.join(columns)),
+            (previous_dataset_id, ))
+        previous_values = {}
+        for source_trait_id, category, value in self.query(
+                'SELECT source_trait_id, category, value FROM source_trait_encoded_values WHERE source_trait_id IN '
+                '(SELECT source_trait_id FROM source_trait WHERE dataset_id = ?) ORDER BY id',
+                (previous_dataset_id, )):
+            previous_values.setdefault(source_trait_id, []).append((category, value))
+        for previous_trait in previous_traits:
+            if self.rng.random() < changed_fraction:
+                # Correct the comment of the trait in the previous version.
+                self.source_db.connection.execute(
+                    'UPDATE source_trait SET dbgap_comment = ?, date_changed = ? WHERE source_trait_id = ?',
+                    ('Corrected: ' + self.words((1, 10)), release_date.strftime('%Y-%m-%d %H:%M:%S'),
+                     previous_trait[0]))
+            if self.rng.random() < changed_fraction:
+                # Drop the trait from the new version.
+                continue
+            row = dict(zip(columns, previous_trait))
+            row.update(source_trait_id=self.next_id('source_trait'), dataset_id=dataset_id,
+                       dbgap_variable_version=row['dbgap_variable_version'] + 1, date_added=release_date,
+                       date_changed=release_date)
+            self.add_trait(release_date, tuple(row[column] for column in columns),
+                           previous_values.get(previous_trait[0], []))
+        n_new_traits = sum(self.rng.random() < changed_fraction for _ in previous_traits)
+        for _ in range(n_new_traits):
+            self.add_new_trait(release_date, dataset_id, encoded_fraction, n_values_range)
+
+    def add_harmonized_trait_set(self, release_date, component_trait_ids, n_harmonized_trait_range, n_values_range):
+        """Add a harmonized trait set and its first version."""
+        trait_set_id = self.next_id('harmonized_trait_set')
+        trait_set_name = '{}_{}'.format(self.words((1, 2), separator='_'), trait_set_id)
+        self.add_row('harmonized_trait_set', trait_set_id, trait_set_name, 1, self.rng.random() < 0.2,
+                     self.rng.random() < 0.1, release_date, release_date)
+        trait_names = [trait_set_name] + ['{}_{}'.format(trait_set_name, i)
+                                          for i in range(1, self.rng.randint(*n_harmonized_trait_range))]
+        self.add_set_version_contents(release_date, trait_set_id, 1, trait_names, component_trait_ids, (),
+                                      n_values_range)
+
+    def add_harmonized_trait_set_version(self, release_date, previous_set_version, component_trait_ids, reason_ids,
+                                         n_values_range):
+        """Add the next version of a harmonized trait set, and deprecate its previous version."""
+        previous_id, trait_set_id, previous_version = previous_set_version
+        self.source_db.connection.execute(
+            'UPDATE harmonized_trait_set_version SET is_deprecated = 1, date_changed = ? WHERE id = ?',
+            (release_date.strftime('%Y-%m-%d %H:%M:%S'), previous_id))
+        trait_names = [row[0] for row in self.query(
+            'SELECT trait_name FROM harmonized_trait WHERE harmonized_trait_set_version_id = ? '
+            'ORDER BY harmonized_trait_id', (previous_id, ))]
+        self.add_set_version_contents(release_date, trait_set_id, previous_version + 1, trait_names,
+                                      component_trait_ids, self.rng.sample(reason_ids, 1), n_values_range)
+
+    def add_set_version_contents(self, release_date, trait_set_id, version, trait_names, component_trait_ids,
+                                 reason_ids, n_values_range):
+        """Add a harmonized trait set version with its units, traits, and component links."""
+        set_version_id = self.next_id('harmonized_trait_set_version')
+        self.add_row('harmonized_trait_set_version', set_version_id, trait_set_id, version,
+                     '{:040x}'.format(self.rng.getrandbits(160)), self.words((1, 1)), False, release_date,
+                     release_date)
+        for reason_id in reason_ids:
+            self.add_row('harmonized_trait_set_version_update_reason',
+                         self.next_id('harmonized_trait_set_version_update_reason'), set_version_id, reason_id,
+                         release_date)
+        unit_ids = []
+        for _ in range(self.rng.randint(1, 3)):
+            unit_id = self.next_id('harmonization_unit')
+            self.add_row('harmonization_unit', unit_id, set_version_id, self.words((1, 1)).upper(), release_date,
+                         release_date)
+            unit_ids.append(unit_id)
+            if component_trait_ids and self.rng.random() < 0.5:
+                self.add_row('component_age_trait', self.next_id('component_age_trait'), unit_id,
+                             self.rng.choice(component_trait_ids), release_date)
+        other_set_versions = [row[0] for row in self.query(
+            'SELECT id FROM harmonized_trait_set_version WHERE harmonized_trait_set_id != ? AND is_deprecated = 0',
+            (trait_set_id, ))]
+        # The first harmonized trait is the harmonized variable, and the rest are its unique keys.
+        for trait_index, trait_name in enumerate(trait_names):
+            harmonized_trait_id = self.next_id('harmonized_trait')
+            data_type = self.rng.choice(HARMONIZED_DATA_TYPES)
+            self.add_row('harmonized_trait', harmonized_trait_id, set_version_id, trait_name,
+                         self.words((3, 15)).capitalize(), data_type, self.rng.choice(UNITS), False, trait_index > 0,
+                         release_date, release_date)
+            if data_type == 'encoded':
+                for i in range(self.rng.randint(*n_values_range)):
+                    self.add_row('harmonized_trait_encoded_values', self.next_id('harmonized_trait_encoded_values'),
+                                 harmonized_trait_id, str(i), self.words((1, 3)), release_date, release_date)
+            for unit_id in unit_ids:
+                n_components = min(self.rng.randint(1, 4), len(component_trait_ids))
+                for component_trait_id in self.rng.sample(component_trait_ids, n_components):
+                    self.add_row('component_source_trait', self.next_id('component_source_trait'),
+                                 harmonized_trait_id, unit_id, component_trait_id, release_date)
+                if component_trait_ids and self.rng.random() < 0.1:
+                    self.add_row('component_batch_trait', self.next_id('component_batch_trait'), harmonized_trait_id,
+                                 unit_id, self.rng.choice(component_trait_ids), release_date)
+                if other_set_versions and self.rng.random() < 0.2:
+                    self.add_row('component_harmonized_trait_set', self.next_id('component_harmonized_trait_set'),
+                                 harmonized_trait_id, unit_id, self.rng.choice(other_set_versions), release_date)
@@ -29,8 +29,12 @@ class StudyTable(tables.Table):
 
     def render_trait_count(self, record):
         """Get the count of non-deprecated source traits for this study."""
-        return '{:,}'.format(models.SourceTrait.objects.current().filter(
-            source_dataset__source_study_version__study=record).count())
+        # Views annotate the count with Study.objects.with_trait_count(), to avoid a query per row.
+        trait_count = getattr(record, 'trait_count', None)
+        if trait_count is None:
+            trait_count = models.SourceTrait.objects.current().filter(
+                source_dataset__source_study_version__study=record).count()
+        return '{:,}'.format(trait_count)
 
 
 class SourceDatasetTable(tables.Table):
@@ -49,7 +53,11 @@ class SourceDatasetTable(tables.Table):
         template = 'django_tables2/bootstrap-responsive.html'
 
     def render_trait_count(self, record):
-        return '{:,}'.format(record.sourcetrait_set.count())
+        # Views annotate the count with SourceDataset.objects.with_trait_count(), to avoid a query per row.
+        trait_count = getattr(record, 'trait_count', None)
+        if trait_count is None:
+            trait_count = record.sourcetrait_set.count()
+        return '{:,}'.format(trait_count)
 
 
 class SourceDatasetTableFull(SourceDatasetTable):
@@ -138,6 +146,28 @@ class SourceTraitDatasetTable(SourceTraitTable):
         order_by = ('dbGaP_dataset', 'dbGaP_variable', )
 
 
+class SourceTraitVersionTable(SourceTraitTable):
+    """Table for displaying the versions of one SourceTrait, from oldest to newest."""
+
+    dbGaP_study = tables.TemplateColumn(
+        orderable=False, verbose_name='dbGaP study version',
+        template_code='<a target="_blank" href={{ record.source_dataset.source_study_version.dbgap_link }}>{{ record.source_dataset.source_study_version.full_accession }}</a>')  # noqa: E501
+    dataset = tables.LinkColumn(
+        'trait_browser:source:datasets:detail',
+        args=[tables.utils.A('source_dataset.pk')],
+        text=lambda record: record.source_dataset.dataset_name,
+        verbose_name='Dataset', orderable=False)
+    status = tables.Column(
+        accessor='is_current', verbose_name='Status', orderable=False)
+
+    class Meta(SourceTraitTable.Meta):
+        fields = ('dbGaP_study', 'i_trait_name', 'dataset', 'dbGaP_variable', 'status', )
+        orderable = False
+
+    def render_status(self, value):
+        return 'current' if value else 'deprecated'
+
+
 class HarmonizedTraitTable(tables.Table):
     """Class for tables2 handling of HarmonizedTrait objects for nice table display.
 
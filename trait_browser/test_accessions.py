@@ -0,0 +1,124 @@
+"""Test the functions for accessions.py."""
+
+from django.test import TestCase
+from django.urls import reverse
+
+from . import accessions
+from . import factories
+
+
+class ParseAccessionTest(TestCase):
+
+    def test_formats(self):
+        """Accessions with or without a prefix, zero padding, and version are parsed."""
+        self.assertEqual(accessions.parse_accession('phv00000507.v1.p1'), ('phv', 507, 1))
+        self.assertEqual(accessions.parse_accession('PHV507'), ('phv', 507, None))
+        self.assertEqual(accessions.parse_accession('pht000009.v2'), ('pht', 9, 2))
+        self.assertEqual(accessions.parse_accession(' phs000007.v29.p10 '), ('phs', 7, 29))
+        self.assertEqual(accessions.parse_accession('00000507', default_prefix='phv'), ('phv', 507, None))
+        self.assertEqual(accessions.parse_accession('507', default_prefix='phv'), ('phv', 507, None))
+
+    def test_invalid(self):
+        """Strings that are not accessions, and accessions without a prefix or default prefix, are not parsed."""
+        self.assertIsNone(accessions.parse_accession('507'))
+        self.assertIsNone(accessions.parse_accession('phx507'))
+        self.assertIsNone(accessions.parse_accession('MF33'))
+        self.assertIsNone(accessions.parse_accession('phv507.x1'))
+
+    def test_split_accessions(self):
+        """Accessions are separated by whitespace, commas, and semicolons."""
+        self.assertEqual(accessions.split_accessions(' phv1,phv2;\nphv3\tphv4 , '), ['phv1', 'phv2', 'phv3', 'phv4'])
+
+
+class ResolveAccessionsTest(TestCase):
+
+    def setUp(self):
+        self.old_study_version = factories.SourceStudyVersionFactory.create(i_version=1, i_is_deprecated=True)
+        self.study = self.old_study_version.study
+        self.new_study_version = factories.SourceStudyVersionFactory.create(
+            study=self.study, i_version=2, i_is_deprecated=False)
+        self.old_trait = factories.SourceTraitFactory.create(
+            source_dataset__source_study_version=self.old_study_version, i_dbgap_variable_accession=507,
+            i_dbgap_variable_version=1)
+        self.new_trait = factories.SourceTraitFactory.create(
+            source_dataset__source_study_version=self.new_study_version, i_dbgap_variable_accession=507,
+            i_dbgap_variable_version=2)
+        self.deprecated_trait = factories.SourceTraitFactory.create(
+            source_dataset__source_study_version=self.old_study_version, i_dbgap_variable_accession=600,
+            i_dbgap_variable_version=1)
+
+    def resolve(self, *args, **kwargs):
+        return list(accessions.resolve_accessions(*args, **kwargs))
+
+    def test_current(self):
+        """An accession without a version resolves to the variable in the current study version."""
+        result = self.resolve(['phv507'])[0]
+        self.assertEqual(list(result.keys()), list(accessions.RESULT_FIELDS))
+        self.assertEqual(result['status'], accessions.STATUS_CURRENT)
+        self.assertEqual(result['accession'], 'phv00000507')
+        self.assertEqual(result['full_accession'], self.new_trait.full_accession)
+        self.assertEqual(result['name'], self.new_trait.i_trait_name)
+        self.assertEqual(result['study_accession'], self.study.pk)
+        self.assertEqual(result['study_version'], 2)
+        self.assertEqual(result['url'], reverse('trait_browser:source:traits:detail', args=[self.new_trait.pk]))
+        self.assertEqual(result['latest_full_accession'], self.new_trait.full_accession)
+
+    def test_old_version(self):
+        """An accession with an old version resolves to that version, and maps to the latest version."""
+        result = self.resolve(['phv00000507.v1'])[0]
+        self.assertEqual(result['status'], accessions.STATUS_DEPRECATED)
+        self.assertEqual(result['full_accession'], self.old_trait.full_accession)
+        self.assertEqual(result['latest_version'], 2)
+        self.assertEqual(result['latest_url'], reverse('trait_browser:source:traits:detail', args=[self.new_trait.pk]))
+
+    def test_deprecated(self):
+        """An accession only in deprecated study versions is deprecated, with no latest version."""
+        result = self.resolve(['phv600'])[0]
+        self.assertEqual(result['status'], accessions.STATUS_DEPRECATED)
+        self.assertEqual(result['full_accession'], self.deprecated_trait.full_accession)
+        self.assertIsNone(result['latest_full_accession'])
+
+    def test_not_found(self):
+        """Accessions and versions that are not in the catalog are not found."""
+        results = self.resolve(['phv999', 'phv507.v9'])
+        self.assertEqual([result['status'] for result in results], [accessions.STATUS_NOT_FOUND] * 2)
+        self.assertIsNone(results[0]['latest_full_accession'])
+        self.assertEqual(results[1]['latest_full_accession'], self.new_trait.full_accession)
+
+    def test_invalid(self):
+        """Strings that can't be parsed are invalid."""
+        result = self.resolve(['507'])[0]
+        self.assertEqual(result['status'], accessions.STATUS_INVALID)
+        self.assertIsNone(result['type'])
+
+    def test_default_prefix(self):
+        """Accessions without a prefix have the default type."""
+        self.assertEqual(self.resolve(['00000507'], default_prefix='phv')[0]['status'], accessions.STATUS_CURRENT)
+
+    def test_studies_and_datasets(self):
+        """Study and dataset accessions are resolved to their current versions."""
+        dataset = self.new_trait.source_dataset
+        results = self.resolve(['phs{}'.format(self.study.pk),
+                                'pht{}.v{}'.format(dataset.i_accession, dataset.i_version)])
+        self.assertEqual(results[0]['type'], 'study')
+        self.assertEqual(results[0]['full_accession'], self.new_study_version.full_accession)
+        self.assertEqual(results[0]['url'], reverse('trait_browser:source:studies:pk:detail', args=[self.study.pk]))
+        self.assertEqual(results[1]['type'], 'dataset')
+        self.assertEqual(results[1]['status'], accessions.STATUS_CURRENT)
+        self.assertEqual(results[1]['full_accession'], dataset.full_accession)
+
+    def test_order_and_chunks(self):
+        """Results are in the order of the accessions, with one query for each type in each chunk."""
+        queries = ['phv600', 'phs{}'.format(self.study.pk), 'phv507', 'foo', 'phv600']
+        # Variables and a study in the first chunk, and a variable in the second.
+        with self.assertNumQueries(3):
+            results = self.resolve(queries, chunk_size=3)
+        self.assertEqual([result['query'] for result in results], queries)
+
+    def test_generator(self):
+        """Accessions are read lazily, one chunk at a time."""
+        def generate_accessions():
+            yield 'phv507'
+            raise AssertionError('Read past the first chunk.')
+        results = accessions.resolve_accessions(generate_accessions(), chunk_size=1)
+        self.assertEqual(next(results)['status'], accessions.STATUS_CURRENT)
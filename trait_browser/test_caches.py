@@ -0,0 +1,101 @@
+"""Tests of the page versions of the trait_browser app."""
+
+from django.test import TestCase
+
+from core.factories import UserFactory
+from tags.factories import DCCDecisionFactory, StudyResponseFactory, TaggedTraitFactory
+
+from . import caches
+from . import factories
+from . import models
+
+
+class PageStateTest(TestCase):
+
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.trait = factories.SourceTraitFactory.create()
+        self.study = self.trait.source_dataset.source_study_version.study
+
+    def get_trait_state(self, user=None):
+        queryset = caches.get_page_state_queryset(
+            models.SourceTrait.objects.all(), user or self.user, tagged_traits_path='all_taggedtraits',
+            study_path='source_dataset__source_study_version__study')
+        return queryset.get(pk=self.trait.pk)
+
+    def test_one_query(self):
+        """The page state is got in one query."""
+        with self.assertNumQueries(1):
+            self.get_trait_state()
+
+    def test_no_import_generation(self):
+        """The generation is None before the first import."""
+        state = self.get_trait_state()
+        self.assertIsNone(state['generation_pk'])
+        self.assertIsNone(state['generation_created'])
+
+    def test_latest_import_generation(self):
+        """The state has the latest import generation."""
+        models.ImportGeneration.objects.create()
+        generation = models.ImportGeneration.objects.create()
+        state = self.get_trait_state()
+        self.assertEqual(state['generation_pk'], generation.pk)
+        self.assertEqual(state['generation_created'], generation.created)
+
+    def test_tagging_counts(self):
+        """The tagged traits and their reviews are counted exactly."""
+        TaggedTraitFactory.create(trait=self.trait)
+        StudyResponseFactory.create(dcc_review__tagged_trait__trait=self.trait)
+        DCCDecisionFactory.create(dcc_review__tagged_trait__trait=self.trait)
+        state = self.get_trait_state()
+        self.assertEqual(state['n_tagged_traits'], 3)
+        self.assertEqual(state['n_reviews'], 2)
+        self.assertEqual(state['n_responses'], 1)
+        self.assertEqual(state['n_decisions'], 1)
+
+    def test_study_of_other_models(self):
+        """Tagged traits of the study are counted on the study page."""
+        TaggedTraitFactory.create_batch(2, trait__source_dataset__source_study_version__study=self.study)
+        queryset = caches.get_page_state_queryset(
+            models.Study.objects.all(), self.user,
+            tagged_traits_path='sourcestudyversion__sourcedataset__sourcetrait__all_taggedtraits', study_path='pk')
+        self.assertEqual(queryset.get(pk=self.study.pk)['n_tagged_traits'], 2)
+
+    def test_tag_counts(self):
+        """The tag study counts of the study are summed on the study page."""
+        TaggedTraitFactory.create_batch(2, trait__source_dataset__source_study_version__study=self.study)
+        TaggedTraitFactory.create(trait__source_dataset__source_study_version__study=self.study, archived=True)
+        queryset = caches.get_page_state_queryset(
+            models.Study.objects.all(), self.user, tag_counts_path='tag_counts', study_path='pk')
+        with self.assertNumQueries(1):
+            state = queryset.get(pk=self.study.pk)
+        self.assertEqual(state['n_tagged_traits'], 2)
+        self.assertEqual(state['n_tags'], 2)
+        self.assertIsNotNone(state['tag_counts_modified'])
+
+    def test_no_tag_counts(self):
+        """A study with no tagged traits has no tag study counts."""
+        queryset = caches.get_page_state_queryset(models.Study.objects.all(), self.user, tag_counts_path='tag_counts')
+        state = queryset.get(pk=self.study.pk)
+        self.assertIsNone(state['n_tagged_traits'])
+        self.assertEqual(state['n_tags'], 0)
+
+    def test_roles(self):
+        """Users are staff, taggers of the study, or plain users."""
+        self.assertEqual(caches.get_user_role(self.user, self.get_trait_state()), caches.ROLE_USER)
+        self.user.profile.taggable_studies.add(self.study)
+        self.assertEqual(caches.get_user_role(self.user, self.get_trait_state()), caches.ROLE_STUDY_TAGGER)
+        staff_user = UserFactory.create(is_staff=True)
+        self.assertEqual(caches.get_user_role(staff_user, self.get_trait_state(staff_user)), caches.ROLE_STAFF)
+
+
+class PageVersionTest(TestCase):
+
+    def test_same_parts(self):
+        """The version is the same for equal parts, whatever the order of dict keys."""
+        self.assertEqual(caches.get_page_version('a', {'x': 1, 'y': 2}),
+                         caches.get_page_version('a', {'y': 2, 'x': 1}))
+
+    def test_different_parts(self):
+        """The version is different for different parts."""
+        self.assertNotEqual(caches.get_page_version('a', {'x': 1}), caches.get_page_version('a', {'x': 2}))
@@ -0,0 +1,198 @@
+"""Test the functions and classes for columnar catalog snapshots."""
+
+import datetime
+import json
+import os
+from tempfile import TemporaryDirectory
+
+from django.test import TestCase
+from django.utils import timezone
+
+from tags.factories import DCCReviewFactory, TaggedTraitFactory
+from tags.models import DCCReview
+
+from . import catalog
+from . import factories
+from . import models
+
+
+class ColumnWriterTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.table_dir = os.path.join(self.tmpdir.name, 'test')
+        os.makedirs(self.table_dir)
+
+    def write_column(self, column_type, chunks):
+        writer = catalog.ColumnWriter(self.table_dir, 'col', column_type)
+        for chunk in chunks:
+            writer.write(chunk)
+        column = writer.close()
+        schema = {'tables': [{'name': 'test', 'rows': sum(len(chunk) for chunk in chunks), 'columns': [column]}]}
+        with open(os.path.join(self.tmpdir.name, catalog.SCHEMA_FILE), 'w') as f:
+            json.dump(schema, f)
+        return column
+
+    def read_column(self):
+        return catalog.read_table(self.tmpdir.name, 'test')['col']
+
+    def test_int(self):
+        """Int columns are written as 8-byte integers, without a valid file if there are no nulls."""
+        column = self.write_column('int', [[1, 2], [3000000000]])
+        self.assertEqual(sorted(column['files']), ['values'])
+        self.assertEqual(column['files']['values']['dtype'], '<i8')
+        self.assertEqual(os.path.getsize(os.path.join(self.table_dir, 'col.values')), 24)
+        self.assertEqual(self.read_column(), [1, 2, 3000000000])
+
+    def test_int_with_nulls(self):
+        """Int columns with nulls also have a valid file."""
+        column = self.write_column('int', [[1, None], [3]])
+        self.assertEqual(sorted(column['files']), ['valid', 'values'])
+        self.assertEqual(self.read_column(), [1, None, 3])
+
+    def test_bool(self):
+        """Bool columns are written as one byte per value."""
+        column = self.write_column('bool', [[True, False, True]])
+        self.assertEqual(column['files']['values']['dtype'], '|u1')
+        self.assertEqual(self.read_column(), [True, False, True])
+
+    def test_datetime(self):
+        """Datetime columns are written as microseconds since the epoch."""
+        value = timezone.make_aware(datetime.datetime(2019, 1, 31, 12, 30, 15, 123456))
+        self.write_column('datetime', [[value]])
+        self.assertEqual(self.read_column(), [value])
+
+    def test_str(self):
+        """Str columns are written as offsets and utf-8 data."""
+        column = self.write_column('str', [['a', ''], ['ünïcode', 'bc']])
+        self.assertEqual(sorted(column['files']), ['data', 'offsets'])
+        with open(os.path.join(self.table_dir, 'col.data'), 'rb') as f:
+            self.assertEqual(f.read(), 'aünïcodebc'.encode('utf-8'))
+        self.assertEqual(self.read_column(), ['a', '', 'ünïcode', 'bc'])
+
+    def test_str_with_nulls(self):
+        """Str columns with nulls also have a valid file, so nulls are distinct from empty strings."""
+        column = self.write_column('str', [['a', None], ['']])
+        self.assertEqual(sorted(column['files']), ['data', 'offsets', 'valid'])
+        self.assertEqual(self.read_column(), ['a', None, ''])
+
+    def test_category(self):
+        """Category columns are written as codes into a dictionary of distinct values."""
+        column = self.write_column('category', [['x', 'y', 'x'], ['y', 'z']])
+        self.assertEqual(sorted(column['files']), ['codes', 'dictionary_data', 'dictionary_offsets'])
+        self.assertEqual(os.path.getsize(os.path.join(self.table_dir, 'col.codes')), 20)
+        with open(os.path.join(self.table_dir, 'col.dict.data'), 'rb') as f:
+            self.assertEqual(f.read(), b'xyz')
+        self.assertEqual(self.read_column(), ['x', 'y', 'x', 'y', 'z'])
+
+    def test_category_with_nulls(self):
+        """Nulls in category columns have the null code, which is not in the dictionary."""
+        column = self.write_column('category', [['x', None], ['', None]])
+        self.assertEqual(sorted(column['files']), ['codes', 'dictionary_data', 'dictionary_offsets'])
+        codes = catalog.map_file(os.path.join(self.table_dir, 'col.codes'), '<i4')
+        self.assertEqual(list(codes), [0, catalog.NULL_CODE, 1, catalog.NULL_CODE])
+        self.assertEqual(self.read_column(), ['x', None, '', None])
+
+    def test_empty(self):
+        """Columns with no values can be written and read."""
+        self.write_column('int', [])
+        self.assertEqual(self.read_column(), [])
+
+
+class IterateTableRowsTest(TestCase):
+
+    def test_chunks(self):
+        """Rows are returned in pk order, in chunks of the given size."""
+        studies = factories.StudyFactory.create_batch(5)
+        chunks = list(catalog.iterate_table_rows(models.Study, ['i_study_name'], chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual([row for chunk in chunks for row in chunk],
+                         [(study.i_study_name, ) for study in sorted(studies, key=lambda study: study.pk)])
+
+    def test_no_rows(self):
+        """There are no chunks for an empty table."""
+        self.assertEqual(list(catalog.iterate_table_rows(models.Study, ['i_study_name'])), [])
+
+
+class WriteCatalogTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.catalog_dir = self.tmpdir.name
+        self.source_traits = factories.SourceTraitFactory.create_batch(
+            3, source_dataset=factories.SourceDatasetFactory.create())
+        self.source_traits.append(factories.SourceTraitFactory.create(i_n_records=None))
+        factories.SourceTraitEncodedValueFactory.create_batch(2, source_trait=self.source_traits[0])
+        factories.HarmonizedTraitEncodedValueFactory.create()
+        self.tagged_trait = TaggedTraitFactory.create(trait=self.source_traits[0])
+        self.reviewed_tagged_trait = TaggedTraitFactory.create(trait=self.source_traits[1])
+        DCCReviewFactory.create(tagged_trait=self.reviewed_tagged_trait, status=DCCReview.STATUS_CONFIRMED)
+
+    def test_schema(self):
+        """The schema lists every table and column, with the number of rows in each table."""
+        schema = catalog.write_catalog(self.catalog_dir, chunk_size=2)
+        with open(os.path.join(self.catalog_dir, catalog.SCHEMA_FILE)) as f:
+            self.assertEqual(json.load(f), schema)
+        self.assertEqual(schema['format_version'], catalog.FORMAT_VERSION)
+        self.assertEqual([table['name'] for table in schema['tables']],
+                         [table_name for table_name, model_name, columns in catalog.CATALOG_TABLES])
+        rows = {table['name']: table['rows'] for table in schema['tables']}
+        self.assertEqual(rows['source_traits'], 4)
+        self.assertEqual(rows['source_trait_encoded_values'], 2)
+        self.assertEqual(rows['harmonized_trait_encoded_values'], 1)
+        self.assertEqual(rows['tagged_traits'], 2)
+
+    def test_source_traits(self):
+        """The source trait values and related study and dataset values are exported."""
+        catalog.write_catalog(self.catalog_dir, chunk_size=2)
+        data = catalog.read_table(self.catalog_dir, 'source_traits')
+        source_traits = models.SourceTrait.objects.order_by('pk')
+        self.assertEqual(data['id'], [trait.pk for trait in source_traits])
+        self.assertEqual(data['accession'], [trait.i_dbgap_variable_accession for trait in source_traits])
+        self.assertEqual(data['full_accession'], [trait.full_accession for trait in source_traits])
+        self.assertEqual(data['study_name'],
+                         [trait.source_dataset.source_study_version.study.i_study_name for trait in source_traits])
+        self.assertEqual(data['n_records'], [trait.i_n_records for trait in source_traits])
+        self.assertIn(None, data['n_records'])
+
+    def test_study_columns_are_dictionary_encoded(self):
+        """Study names are stored once per study in the source traits table."""
+        schema = catalog.write_catalog(self.catalog_dir)
+        source_traits = [table for table in schema['tables'] if table['name'] == 'source_traits'][0]
+        study_name = [column for column in source_traits['columns'] if column['name'] == 'study_name'][0]
+        self.assertEqual(study_name['type'], 'category')
+        study_names = catalog.read_table(self.catalog_dir, 'source_traits')['study_name']
+        self.assertEqual(len(set(study_names)), 2)
+        fn = os.path.join(self.catalog_dir, 'source_traits', study_name['files']['dictionary_offsets']['file'])
+        self.assertEqual(os.path.getsize(fn), 3 * 8)
+
+    def test_tagged_traits(self):
+        """Tagged traits are exported with their review status, or null if they are not reviewed."""
+        catalog.write_catalog(self.catalog_dir)
+        data = catalog.read_table(self.catalog_dir, 'tagged_traits')
+        self.assertEqual(data['id'], [self.tagged_trait.pk, self.reviewed_tagged_trait.pk])
+        self.assertEqual(data['dcc_review_status'], [None, DCCReview.STATUS_CONFIRMED])
+        self.assertEqual(data['created'], [self.tagged_trait.created, self.reviewed_tagged_trait.created])
+        self.assertEqual(data['archived'], [False, False])
+
+    def test_empty_catalog(self):
+        """A snapshot of an empty catalog has no rows."""
+        models.Study.objects.all().delete()
+        models.HarmonizedTraitSet.objects.all().delete()
+        schema = catalog.write_catalog(self.catalog_dir)
+        self.assertEqual(sum(table['rows'] for table in schema['tables'] if table['name'] != 'tags'), 0)
+        self.assertEqual(catalog.read_table(self.catalog_dir, 'source_traits')['id'], [])
+
+
+class MapFileTest(TestCase):
+
+    def test_map_file(self):
+        """A column file is mapped to a memoryview of its values."""
+        tmpdir = TemporaryDirectory()
+        writer = catalog.ColumnWriter(tmpdir.name, 'col', 'int')
+        writer.write([5, 6, 7])
+        column = writer.close()
+        values = catalog.map_file(os.path.join(tmpdir.name, column['files']['values']['file']), '<i8')
+        self.assertIsInstance(values, memoryview)
+        self.assertEqual(values[1], 6)
+        self.assertEqual(len(values), 3)
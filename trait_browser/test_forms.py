@@ -638,6 +638,42 @@ class SourceTraitLookupFormTest(TestCase):
         self.assertFalse(form.is_valid())
 
 
+class BulkAccessionLookupFormTest(TestCase):
+
+    def setUp(self):
+        self.search_form = forms.BulkAccessionLookupForm
+
+    def test_form_with_no_input_data(self):
+        """Form is not bound when it's not given input data."""
+        form = self.search_form()
+        self.assertFalse(form.is_bound)
+
+    def test_form_splits_accessions(self):
+        """The accessions are split on whitespace, commas, and semicolons."""
+        form = self.search_form({'accessions': 'phv507 phv508,\nphs7; 509', 'default_prefix': 'phv'})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['accessions'], ['phv507', 'phv508', 'phs7', '509'])
+        self.assertEqual(form.cleaned_data['default_prefix'], 'phv')
+
+    def test_form_without_default_prefix(self):
+        """The default prefix is None if it is not chosen."""
+        form = self.search_form({'accessions': 'phv507', 'default_prefix': ''})
+        self.assertTrue(form.is_valid())
+        self.assertIsNone(form.cleaned_data['default_prefix'])
+
+    def test_form_invalid_without_accessions(self):
+        """Form is invalid if only separators are given."""
+        form = self.search_form({'accessions': ' ,; '})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['accessions'], [self.search_form.ERROR_NO_ACCESSIONS])
+
+    def test_form_invalid_with_too_many_accessions(self):
+        """Form is invalid if more than the maximum number of accessions is given."""
+        form = self.search_form({'accessions': ' '.join(['phv1'] * (self.search_form.MAX_ACCESSIONS + 1))})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['accessions'], [self.search_form.ERROR_TOO_MANY_ACCESSIONS])
+
+
 class HarmonizedTraitSearchFormTest(TestCase):
 
     def test_form_with_no_input_data(self):
@@ -0,0 +1,39 @@
+"""Test data migrations in the trait_browser app."""
+
+from importlib import import_module
+
+from django.apps import apps
+from django.test import TestCase
+
+from . import factories
+from . import models
+
+
+class ResolveComponentHtmlUrlsTest(TestCase):
+
+    def setUp(self):
+        self.migration = import_module('trait_browser.migrations.0012_resolve_component_html_urls')
+
+    def test_resolves_url_tags(self):
+        """{% url %} tags in saved component html are replaced with their urls."""
+        study = factories.StudyFactory.create()
+        htsv = factories.HarmonizedTraitSetVersionFactory.create()
+        old_html = (
+            """<a href="{{% url 'trait_browser:source:studies:pk:detail' pk={} %}} ">study</a>"""
+            """<a href="{{% url 'trait_browser:harmonized:traits:detail' pk={} %}} ">trait</a>"""
+        ).format(study.pk, htsv.pk)
+        models.HarmonizedTraitSetVersion.objects.filter(pk=htsv.pk).update(component_html_detail=old_html)
+        modified = models.HarmonizedTraitSetVersion.objects.get(pk=htsv.pk).modified
+        self.migration.resolve_component_html_urls(apps, None)
+        htsv.refresh_from_db()
+        self.assertEqual(
+            htsv.component_html_detail,
+            '<a href="{}">study</a><a href="{}">trait</a>'.format(study.get_absolute_url(), htsv.get_absolute_url()))
+        self.assertEqual(htsv.modified, modified)
+
+    def test_resolved_html_unchanged(self):
+        """Component html without {% url %} tags is not changed."""
+        htsv = factories.HarmonizedTraitSetVersionFactory.create(component_html_detail='<p>no urls</p>')
+        self.migration.resolve_component_html_urls(apps, None)
+        htsv.refresh_from_db()
+        self.assertEqual(htsv.component_html_detail, '<p>no urls</p>')
@@ -4,7 +4,9 @@ from datetime import datetime, timedelta
 
 from django.db.models.query import QuerySet
 from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from faker import Factory
@@ -80,6 +82,12 @@ class StudyTest(TestCase):
         study = factories.StudyFactory.create()
         self.assertIsInstance(study.get_name_link_html(), str)
 
+    def test_get_name_link_html_resolved_url(self):
+        """get_name_link_html() links to the study's detail page with an already resolved url."""
+        study = factories.StudyFactory.create()
+        self.assertIn('href="{}"'.format(study.get_absolute_url()), study.get_name_link_html())
+        self.assertNotIn('{%', study.get_name_link_html())
+
     def test_get_latest_version(self):
         """get_latest_version returns the latest version of this study."""
         study = factories.StudyFactory.create()
@@ -181,6 +189,49 @@ class SourceStudyVersionTest(TestCase):
         self.assertRegex(source_study_version.full_accession, r'phs\d{6}\.v\d{1,3}\.p\d{1,3}')
         self.assertEqual(source_study_version.dbgap_link[:68], models.SourceStudyVersion.STUDY_VERSION_URL[:68])
 
+    def test_deprecation_updates_is_current(self):
+        """Deprecating a study version updates is_current of its datasets, traits, and tagged traits."""
+        tagged_trait = TaggedTraitFactory.create()
+        other_trait = factories.SourceTraitFactory.create()
+        source_study_version = tagged_trait.trait.source_dataset.source_study_version
+        source_study_version.i_is_deprecated = True
+        source_study_version.save()
+        self.assertFalse(models.SourceDataset.objects.get(pk=tagged_trait.trait.source_dataset.pk).is_current)
+        self.assertFalse(models.SourceTrait.objects.get(pk=tagged_trait.trait.pk).is_current)
+        self.assertFalse(type(tagged_trait).objects.get(pk=tagged_trait.pk).is_current)
+        self.assertTrue(models.SourceTrait.objects.get(pk=other_trait.pk).is_current)
+        source_study_version.i_is_deprecated = False
+        source_study_version.save()
+        self.assertTrue(models.SourceTrait.objects.get(pk=tagged_trait.trait.pk).is_current)
+        self.assertTrue(type(tagged_trait).objects.get(pk=tagged_trait.pk).is_current)
+
+    def test_deprecation_sets_deprecated_at(self):
+        """Deprecating a study version sets deprecated_at, and undeprecating it clears deprecated_at."""
+        source_study_version = factories.SourceStudyVersionFactory.create()
+        self.assertIsNone(source_study_version.deprecated_at)
+        before = timezone.now()
+        source_study_version.i_is_deprecated = True
+        source_study_version.save()
+        self.assertGreaterEqual(source_study_version.deprecated_at, before)
+        deprecated_at = source_study_version.deprecated_at
+        source_study_version.save()
+        self.assertEqual(source_study_version.deprecated_at, deprecated_at)
+        source_study_version.i_is_deprecated = False
+        source_study_version.save()
+        self.assertIsNone(source_study_version.deprecated_at)
+
+    def test_created_deprecated_sets_deprecated_at(self):
+        """A study version that is deprecated when it is created has deprecated_at set."""
+        source_study_version = factories.SourceStudyVersionFactory.create(i_is_deprecated=True)
+        self.assertIsNotNone(source_study_version.deprecated_at)
+
+    def test_new_objects_in_deprecated_version_are_not_current(self):
+        """Datasets, traits, and tagged traits added to a deprecated study version are not current."""
+        tagged_trait = TaggedTraitFactory.create(trait__source_dataset__source_study_version__i_is_deprecated=True)
+        self.assertFalse(tagged_trait.trait.source_dataset.is_current)
+        self.assertFalse(tagged_trait.trait.is_current)
+        self.assertFalse(tagged_trait.is_current)
+
     def test_get_previous_versions_no_other_versions(self):
         """Returns an empty queryset when no other versions exist."""
         source_study_version = factories.SourceStudyVersionFactory.create()
@@ -350,6 +401,81 @@ class SourceStudyVersionTest(TestCase):
             study=study, i_version=3, i_date_added=now)
         self.assertEqual(source_study_version_3.get_previous_version(), source_study_version_2)
 
+    def test_get_previous_version_uses_link(self):
+        """Returns the previous_version link without searching the study's versions, once it is set."""
+        study = factories.StudyFactory.create()
+        now = timezone.now()
+        source_study_version_1 = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=1, i_date_added=now - timedelta(hours=1))
+        source_study_version_2 = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=2, i_date_added=now)
+        models.SourceStudyVersion.objects.all().refresh_version_links()
+        source_study_version_2.refresh_from_db()
+        with self.assertNumQueries(1):
+            self.assertEqual(source_study_version_2.get_previous_version(), source_study_version_1)
+
+    def test_get_next_version_no_next_version(self):
+        """Returns None when there is no later version."""
+        study = factories.StudyFactory.create()
+        now = timezone.now()
+        source_study_version_1 = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=1, i_date_added=now - timedelta(hours=1))
+        source_study_version_2 = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=2, i_date_added=now)
+        self.assertIsNone(source_study_version_2.get_next_version())
+
+    def test_get_next_version_two_next(self):
+        """Returns the earliest of two later versions."""
+        study = factories.StudyFactory.create()
+        now = timezone.now()
+        source_study_version_1 = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=1, i_date_added=now - timedelta(hours=2))
+        source_study_version_2 = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=2, i_date_added=now - timedelta(hours=1))
+        source_study_version_3 = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=3, i_date_added=now)
+        self.assertEqual(source_study_version_1.get_next_version(), source_study_version_2)
+
+    def test_get_next_version_uses_link(self):
+        """Returns the next_version link once it is set."""
+        study = factories.StudyFactory.create()
+        now = timezone.now()
+        source_study_version_1 = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=1, i_date_added=now - timedelta(hours=1))
+        source_study_version_2 = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=2, i_date_added=now)
+        models.SourceStudyVersion.objects.all().refresh_version_links()
+        source_study_version_1.refresh_from_db()
+        with self.assertNumQueries(1):
+            self.assertEqual(source_study_version_1.get_next_version(), source_study_version_2)
+
+    def test_refresh_version_links_matches_get_previous_version(self):
+        """The links match the previous version found by searching, even when versions are added out of order."""
+        study = factories.StudyFactory.create()
+        now = timezone.now()
+        source_study_version_1 = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=1, i_date_added=now - timedelta(hours=1))
+        source_study_version_2 = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=2, i_date_added=now - timedelta(hours=2))
+        source_study_version_3 = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=3, i_date_added=now)
+        expected = {version.pk: version.get_previous_version() for version in study.sourcestudyversion_set.all()}
+        self.assertEqual(models.SourceStudyVersion.objects.all().refresh_version_links(), 2)
+        for version in study.sourcestudyversion_set.all():
+            self.assertEqual(version.previous_version, expected[version.pk])
+        source_study_version_2.refresh_from_db()
+        self.assertEqual(source_study_version_2.next_version, source_study_version_3)
+        source_study_version_1.refresh_from_db()
+        self.assertIsNone(source_study_version_1.next_version)
+
+    def test_refresh_version_links_ignores_other_studies(self):
+        """Versions of other studies are not linked."""
+        now = timezone.now()
+        other_source_study_version = factories.SourceStudyVersionFactory.create(
+            i_version=1, i_date_added=now - timedelta(hours=1))
+        source_study_version = factories.SourceStudyVersionFactory.create(i_version=2, i_date_added=now)
+        self.assertEqual(models.SourceStudyVersion.objects.all().refresh_version_links(), 0)
+
 
 class SourceStudyVersionGetNewSourceDatasetsTest(TestCase):
 
@@ -787,6 +913,36 @@ class SourceDatasetTest(TestCase):
         )
         self.assertEqual(deprecated_dataset.get_latest_version(), current_dataset_1)
 
+    def test_get_previous_and_next_version(self):
+        """Returns the datasets with the same accession in the previous and next study versions."""
+        study = factories.StudyFactory.create()
+        now = timezone.now()
+        source_dataset_1 = factories.SourceDatasetFactory.create(
+            source_study_version__study=study, source_study_version__i_version=1,
+            source_study_version__i_date_added=now - timedelta(hours=1))
+        source_dataset_2 = factories.SourceDatasetFactory.create(
+            source_study_version__study=study, source_study_version__i_version=2,
+            source_study_version__i_date_added=now, i_accession=source_dataset_1.i_accession)
+        self.assertIsNone(source_dataset_1.get_previous_version())
+        self.assertEqual(source_dataset_1.get_next_version(), source_dataset_2)
+        self.assertEqual(source_dataset_2.get_previous_version(), source_dataset_1)
+        self.assertIsNone(source_dataset_2.get_next_version())
+
+    def test_get_previous_version_uses_link(self):
+        """Returns the previous_version link once it is set."""
+        study = factories.StudyFactory.create()
+        now = timezone.now()
+        source_dataset_1 = factories.SourceDatasetFactory.create(
+            source_study_version__study=study, source_study_version__i_version=1,
+            source_study_version__i_date_added=now - timedelta(hours=1))
+        source_dataset_2 = factories.SourceDatasetFactory.create(
+            source_study_version__study=study, source_study_version__i_version=2,
+            source_study_version__i_date_added=now, i_accession=source_dataset_1.i_accession)
+        self.assertEqual(models.SourceDataset.objects.all().refresh_version_links(), 2)
+        source_dataset_2.refresh_from_db()
+        with self.assertNumQueries(1):
+            self.assertEqual(source_dataset_2.get_previous_version(), source_dataset_1)
+
 
 class HarmonizedTraitSetTest(TestCase):
 
@@ -846,6 +1002,110 @@ class HarmonizedTraitSetVersionTest(TestCase):
         self.assertIsInstance(htsv.get_component_html(), str)
 
 
+class HarmonizedTraitSetVersionQuerySetTest(TestCase):
+
+    def make_trait_set_version(self):
+        """Make a trait set version with a unit, a harmonized trait, and source and harmonized components."""
+        htsv = factories.HarmonizedTraitSetVersionFactory.create()
+        source_traits = factories.SourceTraitFactory.create_batch(2)
+        component_htrait = factories.HarmonizedTraitFactory.create()
+        hunit = factories.HarmonizationUnitFactory.create(
+            harmonized_trait_set_version=htsv, component_source_traits=source_traits,
+            component_age_traits=source_traits[:1],
+            component_harmonized_trait_set_versions=[component_htrait.harmonized_trait_set_version])
+        factories.HarmonizedTraitFactory.create(
+            harmonized_trait_set_version=htsv, harmonization_units=[hunit], component_source_traits=source_traits,
+            component_harmonized_trait_set_versions=[component_htrait.harmonized_trait_set_version])
+        return htsv
+
+    def count_component_html_queries(self, htsvs):
+        with CaptureQueriesContext(connection) as context:
+            for htsv in models.HarmonizedTraitSetVersion.objects.filter(
+                    pk__in=[x.pk for x in htsvs]).with_components():
+                htsv.get_component_html()
+        return len(context)
+
+    def test_with_components_same_html(self):
+        """get_component_html returns the same html with prefetched components."""
+        htsv = self.make_trait_set_version()
+        prefetched = models.HarmonizedTraitSetVersion.objects.with_components().get(pk=htsv.pk)
+        self.assertEqual(prefetched.get_component_html(), htsv.get_component_html())
+
+    def test_with_components_fixed_number_of_queries(self):
+        """The number of queries to build component html does not depend on the number of set versions."""
+        htsvs = [self.make_trait_set_version() for i in range(3)]
+        self.assertEqual(self.count_component_html_queries(htsvs[:1]), self.count_component_html_queries(htsvs))
+
+    def test_update_component_html(self):
+        """update_component_html saves the component html for each set version in the queryset."""
+        htsvs = [self.make_trait_set_version() for i in range(3)]
+        other_htsv = self.make_trait_set_version()
+        n_saved = models.HarmonizedTraitSetVersion.objects.exclude(
+            pk=other_htsv.pk).update_component_html(batch_size=2)
+        self.assertEqual(n_saved, 3)
+        for htsv in htsvs:
+            htsv.refresh_from_db()
+            self.assertEqual(htsv.component_html_detail, htsv.get_component_html())
+            self.assertIn(htsv.harmonizationunit_set.get().i_tag, htsv.component_html_detail)
+        other_htsv.refresh_from_db()
+        self.assertEqual(other_htsv.component_html_detail, '')
+
+    def test_update_component_html_unchanged(self):
+        """update_component_html does not save set versions whose component html has not changed."""
+        htsv = self.make_trait_set_version()
+        models.HarmonizedTraitSetVersion.objects.all().update_component_html()
+        htsv.refresh_from_db()
+        modified = htsv.modified
+        self.assertEqual(models.HarmonizedTraitSetVersion.objects.all().update_component_html(), 0)
+        htsv.refresh_from_db()
+        self.assertEqual(htsv.modified, modified)
+
+    def test_component_changed_since_unbuilt(self):
+        """Set versions without component html are included."""
+        htsv = self.make_trait_set_version()
+        self.assertIn(htsv, models.HarmonizedTraitSetVersion.objects.component_changed_since(timezone.now()))
+
+    def test_component_changed_since_unchanged(self):
+        """Set versions whose components have not changed are not included."""
+        self.make_trait_set_version()
+        models.HarmonizedTraitSetVersion.objects.all().update_component_html()
+        since = timezone.now()
+        self.assertEqual(models.HarmonizedTraitSetVersion.objects.component_changed_since(since).count(), 0)
+
+    def test_component_changed_since_source_trait(self):
+        """Set versions with a changed component source trait are included."""
+        htsv = self.make_trait_set_version()
+        models.HarmonizedTraitSetVersion.objects.all().update_component_html()
+        since = timezone.now()
+        source_trait = htsv.harmonizationunit_set.get().component_source_traits.first()
+        source_trait.i_description = 'new description'
+        source_trait.save()
+        self.assertEqual(list(models.HarmonizedTraitSetVersion.objects.component_changed_since(since)), [htsv])
+
+    def test_component_changed_since_study(self):
+        """Set versions with component source traits from a changed study are included."""
+        htsv = self.make_trait_set_version()
+        models.HarmonizedTraitSetVersion.objects.all().update_component_html()
+        since = timezone.now()
+        study = htsv.harmonizationunit_set.get().component_age_traits.get().source_dataset.source_study_version.study
+        study.i_study_name = 'new name'
+        study.save()
+        self.assertEqual(list(models.HarmonizedTraitSetVersion.objects.component_changed_since(since)), [htsv])
+
+    def test_component_changed_since_component_harmonized_trait(self):
+        """Set versions with a changed component harmonized trait are included, along with its own set version."""
+        htsv = self.make_trait_set_version()
+        models.HarmonizedTraitSetVersion.objects.all().update_component_html()
+        since = timezone.now()
+        component_htsv = htsv.harmonizationunit_set.get().component_harmonized_trait_set_versions.get()
+        component_htrait = component_htsv.harmonizedtrait_set.get()
+        component_htrait.i_description = 'new description'
+        component_htrait.save()
+        self.assertEqual(
+            set(models.HarmonizedTraitSetVersion.objects.component_changed_since(since)),
+            set([htsv, component_htrait.harmonized_trait_set_version]))
+
+
 class HarmonizationUnitTest(TestCase):
 
     def test_model_saving(self):
@@ -915,6 +1175,16 @@ class HarmonizationUnitTest(TestCase):
             component_source_traits=[traits1[2], traits2[2]])
         self.assertEqual(set(list(studies)), set(list(hu.get_source_studies())))
 
+    def test_get_source_studies_sorted(self):
+        """Returned list of linked studies is sorted by study name."""
+        global_study = factories.GlobalStudyFactory.create()
+        study_b = factories.StudyFactory.create(global_study=global_study, i_study_name='b')
+        study_a = factories.StudyFactory.create(global_study=global_study, i_study_name='a')
+        hu = factories.HarmonizationUnitFactory.create(component_source_traits=[
+            factories.SourceTraitFactory.create(source_dataset__source_study_version__study=study)
+            for study in (study_b, study_a)])
+        self.assertEqual(hu.get_source_studies(), [study_a, study_b])
+
     def test_get_component_html(self):
         """get_component_html returns a string."""
         htsv = factories.HarmonizedTraitSetVersionFactory.create()
@@ -1293,6 +1563,109 @@ class SourceTraitTest(TestCase):
             source_dataset__source_study_version=study_version, i_dbgap_variable_accession=100)
         self.assertIsNone(source_trait.get_previous_version())
 
+    def test_get_next_version_next_version_has_trait(self):
+        """Returns the source trait with the same accession in the next study version."""
+        study = factories.StudyFactory.create()
+        now = timezone.now()
+        study_version = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=1, i_date_added=now - timedelta(hours=1))
+        next_study_version = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=2, i_date_added=now)
+        source_trait = factories.SourceTraitFactory.create(
+            source_dataset__source_study_version=study_version, i_dbgap_variable_accession=100)
+        next_source_trait = factories.SourceTraitFactory.create(
+            source_dataset__source_study_version=next_study_version, i_dbgap_variable_accession=100)
+        self.assertEqual(source_trait.get_next_version(), next_source_trait)
+        self.assertIsNone(next_source_trait.get_next_version())
+
+    def test_get_next_version_next_version_no_trait(self):
+        """Returns None if the source trait doesn't exist in the next study version."""
+        study = factories.StudyFactory.create()
+        now = timezone.now()
+        study_version = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=1, i_date_added=now - timedelta(hours=1))
+        factories.SourceStudyVersionFactory.create(study=study, i_version=2, i_date_added=now)
+        source_trait = factories.SourceTraitFactory.create(
+            source_dataset__source_study_version=study_version, i_dbgap_variable_accession=100)
+        self.assertIsNone(source_trait.get_next_version())
+
+    def test_version_links_skip_study_versions_without_trait(self):
+        """The links only join traits in consecutive study versions, as get_previous_version does."""
+        study = factories.StudyFactory.create()
+        now = timezone.now()
+        study_versions = [factories.SourceStudyVersionFactory.create(
+            study=study, i_version=version, i_date_added=now - timedelta(hours=3 - version))
+            for version in (1, 2, 3)]
+        source_trait_1 = factories.SourceTraitFactory.create(
+            source_dataset__source_study_version=study_versions[0], i_dbgap_variable_accession=100)
+        source_trait_3 = factories.SourceTraitFactory.create(
+            source_dataset__source_study_version=study_versions[2], i_dbgap_variable_accession=100)
+        models.SourceTrait.objects.all().refresh_version_links()
+        source_trait_1.refresh_from_db()
+        source_trait_3.refresh_from_db()
+        self.assertIsNone(source_trait_1.next_version)
+        self.assertIsNone(source_trait_3.previous_version)
+        self.assertIsNone(source_trait_3.get_previous_version())
+
+    def test_get_previous_and_next_version_use_links(self):
+        """Returns the version links once they are set, with one query each."""
+        study = factories.StudyFactory.create()
+        now = timezone.now()
+        previous_study_version = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=1, i_date_added=now - timedelta(hours=1))
+        study_version = factories.SourceStudyVersionFactory.create(
+            study=study, i_version=2, i_date_added=now)
+        previous_source_trait = factories.SourceTraitFactory.create(
+            source_dataset__source_study_version=previous_study_version, i_dbgap_variable_accession=100)
+        source_trait = factories.SourceTraitFactory.create(
+            source_dataset__source_study_version=study_version, i_dbgap_variable_accession=100)
+        self.assertEqual(models.SourceTrait.objects.all().refresh_version_links(), 2)
+        source_trait.refresh_from_db()
+        previous_source_trait.refresh_from_db()
+        with self.assertNumQueries(1):
+            self.assertEqual(source_trait.get_previous_version(), previous_source_trait)
+        with self.assertNumQueries(1):
+            self.assertEqual(previous_source_trait.get_next_version(), source_trait)
+        self.assertEqual(models.SourceTrait.objects.all().refresh_version_links(), 0)
+
+    def test_refresh_version_links_one_update_per_batch(self):
+        """The changed links are saved with one update query per batch, not one per trait."""
+        study = factories.StudyFactory.create()
+        now = timezone.now()
+        study_versions = [factories.SourceStudyVersionFactory.create(
+            study=study, i_version=version, i_date_added=now - timedelta(hours=3 - version))
+            for version in (1, 2, 3)]
+        for study_version in study_versions:
+            source_dataset = factories.SourceDatasetFactory.create(source_study_version=study_version)
+            for accession in range(100, 110):
+                factories.SourceTraitFactory.create(
+                    source_dataset=source_dataset, i_dbgap_variable_accession=accession)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(models.SourceTrait.objects.all().refresh_version_links(), 30)
+        updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(models.SourceTrait.objects.all().get_version_link_differences(), {})
+        source_trait = models.SourceTrait.objects.get(
+            source_dataset__source_study_version=study_versions[1], i_dbgap_variable_accession=105)
+        self.assertEqual(source_trait.previous_version.source_dataset.source_study_version, study_versions[0])
+        self.assertEqual(source_trait.next_version.source_dataset.source_study_version, study_versions[2])
+        self.assertEqual(source_trait.next_version.previous_version, source_trait)
+
+    def test_get_version_history(self):
+        """Returns all versions of the trait from oldest to newest, and no other traits."""
+        study = factories.StudyFactory.create()
+        now = timezone.now()
+        study_versions = [factories.SourceStudyVersionFactory.create(
+            study=study, i_version=version, i_date_added=now - timedelta(hours=3 - version))
+            for version in (3, 1, 2)]
+        source_traits = [factories.SourceTraitFactory.create(
+            source_dataset__source_study_version=study_version, i_dbgap_variable_accession=100)
+            for study_version in study_versions]
+        factories.SourceTraitFactory.create(
+            source_dataset__source_study_version=study_versions[0], i_dbgap_variable_accession=101)
+        self.assertEqual(list(source_traits[0].get_version_history()),
+                         [source_traits[1], source_traits[2], source_traits[0]])
+
 
 class HarmonizedTraitTest(TestCase):
 
@@ -1363,11 +1736,27 @@ class HarmonizedTraitTest(TestCase):
             5, harmonized_trait_set_version=trait.harmonized_trait_set_version)
         self.assertIsInstance(trait.get_component_html(hunits[0]), str)
 
+    def test_get_component_html_only_unit_components(self):
+        """get_component_html includes only the components shared with the harmonization unit."""
+        source_traits = factories.SourceTraitFactory.create_batch(2)
+        trait = factories.HarmonizedTraitFactory.create(component_source_traits=source_traits)
+        hunit = factories.HarmonizationUnitFactory.create(
+            harmonized_trait_set_version=trait.harmonized_trait_set_version, component_source_traits=source_traits[:1])
+        component_html = trait.get_component_html(hunit)
+        self.assertIn(source_traits[0].get_absolute_url(), component_html)
+        self.assertNotIn(source_traits[1].get_absolute_url(), component_html)
+
     def test_get_name_link_html(self):
         """get_name_link_html returns a string."""
         trait = factories.HarmonizedTraitFactory.create()
         self.assertIsInstance(trait.get_name_link_html(), str)
 
+    def test_get_name_link_html_resolved_url(self):
+        """get_name_link_html links to the trait set version's detail page with an already resolved url."""
+        trait = factories.HarmonizedTraitFactory.create()
+        self.assertIn('href="{}"'.format(trait.get_absolute_url()), trait.get_name_link_html())
+        self.assertNotIn('{%', trait.get_name_link_html())
+
     def test_get_name_link_html_blank_description(self):
         """get_name_link_html includes an mdash when description is blank."""
         trait = factories.HarmonizedTraitFactory.create(i_description='')
@@ -1410,6 +1799,163 @@ class HarmonizedTraitTest(TestCase):
         self.assertNotIn(uk_trait, models.HarmonizedTrait.objects.non_unique_keys())
 
 
+class SourceTraitLineageTest(TestCase):
+
+    def setUp(self):
+        self.source_traits = factories.SourceTraitFactory.create_batch(4)
+        self.unit = factories.HarmonizationUnitFactory.create(component_age_traits=[self.source_traits[2]])
+        self.harmonized_trait = factories.HarmonizedTraitFactory.create(
+            component_source_traits=[self.source_traits[0]], component_batch_traits=[self.source_traits[1]],
+            harmonization_units=[self.unit])
+        # A harmonized trait that uses the set version of the first harmonized trait.
+        self.downstream_trait = factories.HarmonizedTraitFactory.create(
+            component_source_traits=[self.source_traits[3]],
+            component_harmonized_trait_set_versions=[self.harmonized_trait.harmonized_trait_set_version])
+
+    def test_expected_lineage(self):
+        """Source, batch, and unit age components are at depth 1, and components of component sets at depth 2."""
+        lineage = models.SourceTraitLineage.objects.get_expected_lineage()
+        self.assertEqual(lineage, {
+            (self.source_traits[0].pk, self.harmonized_trait.pk): 1,
+            (self.source_traits[1].pk, self.harmonized_trait.pk): 1,
+            (self.source_traits[2].pk, self.harmonized_trait.pk): 1,
+            (self.source_traits[3].pk, self.downstream_trait.pk): 1,
+            (self.source_traits[0].pk, self.downstream_trait.pk): 2,
+            (self.source_traits[1].pk, self.downstream_trait.pk): 2,
+            (self.source_traits[2].pk, self.downstream_trait.pk): 2,
+        })
+
+    def test_expected_lineage_with_cycle(self):
+        """Harmonized traits that depend on each other's set versions don't cause an infinite loop."""
+        self.harmonized_trait.component_harmonized_trait_set_versions.add(
+            self.downstream_trait.harmonized_trait_set_version)
+        lineage = models.SourceTraitLineage.objects.get_expected_lineage()
+        self.assertEqual(lineage[(self.source_traits[3].pk, self.harmonized_trait.pk)], 2)
+        self.assertEqual(lineage[(self.source_traits[0].pk, self.downstream_trait.pk)], 2)
+
+    def test_shortest_depth(self):
+        """A source trait that is both a direct and a transitive component is at depth 1."""
+        self.downstream_trait.component_source_traits.add(self.source_traits[0])
+        lineage = models.SourceTraitLineage.objects.get_expected_lineage()
+        self.assertEqual(lineage[(self.source_traits[0].pk, self.downstream_trait.pk)], 1)
+
+    def test_refresh(self):
+        """Refresh creates missing rows, deletes stale rows, and fixes depths, and then there are no differences."""
+        models.SourceTraitLineage.objects.refresh()
+        self.assertEqual(models.SourceTraitLineage.objects.count(), 7)
+        self.harmonized_trait.component_batch_traits.clear()
+        models.SourceTraitLineage.objects.filter(harmonized_trait=self.downstream_trait, depth=1).update(depth=5)
+        differences = models.SourceTraitLineage.objects.refresh()
+        self.assertEqual(differences, {
+            (self.source_traits[1].pk, self.harmonized_trait.pk): (1, None),
+            (self.source_traits[1].pk, self.downstream_trait.pk): (2, None),
+            (self.source_traits[3].pk, self.downstream_trait.pk): (5, 1),
+        })
+        self.assertEqual(models.SourceTraitLineage.objects.get_differences(), {})
+        self.assertEqual(models.SourceTraitLineage.objects.count(), 5)
+
+    def test_get_harmonized_traits(self):
+        """A source trait's harmonized traits include those that use it through other harmonized traits."""
+        models.SourceTraitLineage.objects.refresh()
+        self.assertEqual(set(self.source_traits[0].get_harmonized_traits()),
+                         {self.harmonized_trait, self.downstream_trait})
+        self.assertEqual(list(self.source_traits[3].get_harmonized_traits()), [self.downstream_trait])
+
+    def test_get_source_traits(self):
+        """A harmonized trait's source traits include those of its component harmonized trait set versions."""
+        models.SourceTraitLineage.objects.refresh()
+        self.assertEqual(set(self.downstream_trait.get_source_traits()), set(self.source_traits))
+        self.assertEqual(set(self.harmonized_trait.get_source_traits()), set(self.source_traits[:3]))
+
+    def test_printing(self):
+        """The custom __str__ method returns a string."""
+        models.SourceTraitLineage.objects.refresh()
+        self.assertIsInstance(models.SourceTraitLineage.objects.first().__str__(), str)
+
+
+class EncodedValueSetTest(TestCase):
+
+    def setUp(self):
+        self.source_traits = factories.SourceTraitFactory.create_batch(3)
+        # The first two traits share a code list.
+        for source_trait in self.source_traits[:2]:
+            factories.SourceTraitEncodedValueFactory.create(source_trait=source_trait, i_category='0', i_value='No')
+            factories.SourceTraitEncodedValueFactory.create(source_trait=source_trait, i_category='1', i_value='Yes')
+        factories.SourceTraitEncodedValueFactory.create(
+            source_trait=self.source_traits[2], i_category='1', i_value='Male')
+
+    def test_link_traits_deduplicates(self):
+        """Traits with the same encoded values are linked to the same set."""
+        n_traits, n_sets = models.EncodedValueSet.objects.link_traits(models.SourceTrait.objects.all())
+        self.assertEqual((n_traits, n_sets), (3, 2))
+        for source_trait in self.source_traits:
+            source_trait.refresh_from_db()
+        self.assertEqual(self.source_traits[0].encoded_value_set, self.source_traits[1].encoded_value_set)
+        self.assertNotEqual(self.source_traits[0].encoded_value_set, self.source_traits[2].encoded_value_set)
+
+    def test_link_traits_reuses_existing_sets(self):
+        """Linking again only creates sets for new code lists, and only relinks changed traits."""
+        models.EncodedValueSet.objects.link_traits(models.SourceTrait.objects.all())
+        factories.SourceTraitEncodedValueFactory.create(
+            source_trait=self.source_traits[2], i_category='2', i_value='Female')
+        new_trait = factories.SourceTraitFactory.create()
+        factories.SourceTraitEncodedValueFactory.create(source_trait=new_trait, i_category='0', i_value='No')
+        factories.SourceTraitEncodedValueFactory.create(source_trait=new_trait, i_category='1', i_value='Yes')
+        n_traits, n_sets = models.EncodedValueSet.objects.link_traits(models.SourceTrait.objects.all())
+        self.assertEqual((n_traits, n_sets), (2, 1))
+        self.assertEqual(models.EncodedValueSet.objects.count(), 3)
+        self.assertEqual(models.EncodedValueSet.objects.unused().count(), 1)
+
+    def test_traits_without_encoded_values(self):
+        """Traits without encoded values share the empty set."""
+        other_traits = factories.SourceTraitFactory.create_batch(2)
+        models.EncodedValueSet.objects.link_traits(models.SourceTrait.objects.all())
+        empty_set = models.EncodedValueSet.objects.get(encoded_values='[]')
+        self.assertEqual(set(empty_set.sourcetrait_set.all()), set(other_traits))
+
+    def test_get_differences(self):
+        """Unlinked traits and traits whose encoded values changed are different."""
+        self.assertEqual(
+            set(models.EncodedValueSet.objects.get_differences(models.SourceTrait.objects.all())),
+            set(trait.pk for trait in self.source_traits))
+        models.EncodedValueSet.objects.link_traits(models.SourceTrait.objects.all())
+        self.assertEqual(models.EncodedValueSet.objects.get_differences(models.SourceTrait.objects.all()), {})
+        models.SourceTraitEncodedValue.objects.filter(source_trait=self.source_traits[0], i_category='1').update(
+            i_value='YES')
+        differences = models.EncodedValueSet.objects.get_differences(models.SourceTrait.objects.all())
+        self.assertEqual(list(differences), [self.source_traits[0].pk])
+
+    def test_harmonized_traits(self):
+        """Harmonized traits are linked to sets from their own encoded values."""
+        harmonized_trait = factories.HarmonizedTraitFactory.create()
+        factories.HarmonizedTraitEncodedValueFactory.create(
+            harmonized_trait=harmonized_trait, i_category='1', i_value='Male')
+        models.EncodedValueSet.objects.link_traits(models.SourceTrait.objects.all())
+        models.EncodedValueSet.objects.link_traits(models.HarmonizedTrait.objects.all())
+        harmonized_trait.refresh_from_db()
+        self.source_traits[2].refresh_from_db()
+        self.assertEqual(harmonized_trait.encoded_value_set, self.source_traits[2].encoded_value_set)
+
+    def test_get_encoded_values(self):
+        """A linked trait's encoded values come from its set, in the order of the encoded value rows."""
+        models.EncodedValueSet.objects.link_traits(models.SourceTrait.objects.all())
+        source_trait = models.SourceTrait.objects.select_related('encoded_value_set').get(pk=self.source_traits[0].pk)
+        with self.assertNumQueries(0):
+            encoded_values = source_trait.get_encoded_values()
+        self.assertEqual(encoded_values, [('0', 'No'), ('1', 'Yes')])
+        self.assertEqual(encoded_values[0].i_category, '0')
+
+    def test_get_encoded_values_unlinked(self):
+        """An unlinked trait's encoded values come from its encoded value rows."""
+        encoded_values = self.source_traits[0].get_encoded_values()
+        self.assertEqual([(ev.i_category, ev.i_value) for ev in encoded_values], [('0', 'No'), ('1', 'Yes')])
+
+    def test_printing(self):
+        """The custom __str__ method returns a string."""
+        models.EncodedValueSet.objects.link_traits(models.SourceTrait.objects.all())
+        self.assertIsInstance(models.EncodedValueSet.objects.first().__str__(), str)
+
+
 class SourceTraitEncodedValueTest(TestCase):
 
     def test_model_saving(self):
@@ -0,0 +1,129 @@
+"""Test the source db classes used by import_db."""
+
+import datetime
+import os
+import sqlite3
+from tempfile import TemporaryDirectory
+
+from django.test import TestCase
+from mysql.connector import FieldType
+
+from .factories import GlobalStudyFactory
+from .management.commands.import_db import (Command, GLOBAL_STUDY_ARGS_MAPPING, RowConversionPlan,
+                                            STUDY_ARGS_MAPPING)
+from . import source_db
+from .source_db_generator import SourceDBGenerator
+
+
+class SQLiteSourceDBTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'source_db.sqlite3')
+        self.source_db = source_db.SQLiteSourceDB(self.path)
+        self.source_db.create_tables()
+        self.date = datetime.datetime(2018, 3, 4, 5, 6, 7)
+        self.source_db.insert_rows('global_study', [(1, 'Study one', None, 'S1', self.date, self.date)])
+
+    def tearDown(self):
+        self.source_db.close()
+        self.tmpdir.cleanup()
+
+    def test_creates_all_tables(self):
+        """All of the source db tables are created, and creating them again does nothing."""
+        self.source_db.create_tables()
+        self.assertEqual(list(self.source_db.count_rows().keys()), list(source_db.SOURCE_DB_TABLES.keys()))
+        self.assertEqual(self.source_db.count_rows()['global_study'], 1)
+
+    def test_all_columns_have_types(self):
+        """Every column of the source db tables has a MySQL field type."""
+        for table, columns in source_db.SOURCE_DB_TABLES.items():
+            for column in columns:
+                self.assertIn(column, source_db.COLUMN_TYPES, msg='{}.{}'.format(table, column))
+
+    def test_rows_match_mysql_connector(self):
+        """Rows have bytearray strings, naive datetimes, and MySQL field types like mysql.connector rows."""
+        cursor = self.source_db.cursor(buffered=True, dictionary=True)
+        cursor.execute('SELECT * FROM global_study')
+        row = cursor.fetchone()
+        cursor.close()
+        self.assertEqual(row, {'id': 1, 'name': bytearray(b'Study one'), 'topmed_accession': None,
+                               'topmed_abbreviation': bytearray(b'S1'), 'date_added': self.date,
+                               'date_changed': self.date})
+        field_types = {el[0]: el[1] for el in cursor.description}
+        self.assertEqual(field_types['name'], FieldType.VAR_STRING)
+        self.assertEqual(field_types['date_added'], FieldType.DATETIME)
+
+    def test_tuple_rows(self):
+        """Rows are tuples without dictionary=True."""
+        cursor = self.source_db.cursor()
+        cursor.execute('SELECT id, name FROM global_study')
+        self.assertEqual(cursor.fetchall(), [(1, bytearray(b'Study one'))])
+
+    def test_fixed_rows(self):
+        """The import_db row fixers make strings and timezone aware datetimes from the rows."""
+        cursor = self.source_db.cursor(dictionary=True)
+        cursor.execute('SELECT * FROM global_study')
+        field_types = {el[0]: el[1] for el in cursor.description}
+        row = Command()._fix_row(next(iter(cursor)), field_types)
+        self.assertEqual(row['name'], 'Study one')
+        self.assertEqual(row['date_added'], datetime.datetime(2018, 3, 4, 5, 6, 7, tzinfo=datetime.timezone.utc))
+        self.assertIsNone(row['topmed_accession'])
+
+    def test_row_conversion_plan_values(self):
+        """A RowConversionPlan converts the values of every column of every table as _fix_row does."""
+        SourceDBGenerator(self.source_db).add_release(n_new_studies=2, n_datasets_range=(1, 2),
+                                                      n_traits_range=(2, 4), n_new_harmonized_trait_sets=2)
+        command = Command()
+        for table, columns in source_db.SOURCE_DB_TABLES.items():
+            query = 'SELECT * FROM {}'.format(table)
+            cursor = self.source_db.cursor(dictionary=True)
+            cursor.execute(query)
+            field_types = {el[0]: el[1] for el in cursor.description}
+            fixed_rows = [command._fix_row(row, field_types) for row in cursor]
+            cursor = self.source_db.cursor()
+            cursor.execute(query)
+            plan = RowConversionPlan(cursor.description)
+            for fixed_row, row in zip(fixed_rows, cursor.fetchall()):
+                self.assertEqual({column: plan.get_value(row, column) for column in columns}, fixed_row,
+                                 msg=table)
+
+    def test_row_conversion_plan_args(self):
+        """A RowConversionPlan makes the same args from a row tuple as _make_*_args makes from the fixed row."""
+        global_study = GlobalStudyFactory.create(i_id=1)
+        self.source_db.insert_rows('study', [(2, 1, 'Study two', self.date, self.date)])
+        command = Command()
+        for table, make_args, mapping in (('global_study', command._make_global_study_args, GLOBAL_STUDY_ARGS_MAPPING),
+                                          ('study', command._make_study_args, STUDY_ARGS_MAPPING)):
+            cursor = self.source_db.cursor(dictionary=True)
+            cursor.execute('SELECT * FROM {}'.format(table))
+            field_types = {el[0]: el[1] for el in cursor.description}
+            expected = make_args(command._fix_row(cursor.fetchone(), field_types))
+            cursor = self.source_db.cursor()
+            cursor.execute('SELECT * FROM {}'.format(table))
+            plan = RowConversionPlan(cursor.description, mapping)
+            self.assertEqual(plan.make_args(cursor.fetchone()), expected)
+        self.assertEqual(expected['global_study'], global_study)
+        self.assertEqual(expected['i_study_name'], 'Study two')
+
+    def test_lock(self):
+        """Others can't write to the source db while it is locked."""
+        other_connection = sqlite3.connect(self.path, timeout=0)
+        self.source_db.lock()
+        with self.assertRaises(sqlite3.OperationalError):
+            other_connection.execute('DELETE FROM global_study')
+        self.source_db.unlock()
+        other_connection.execute('DELETE FROM global_study')
+        other_connection.commit()
+        other_connection.close()
+        self.assertEqual(self.source_db.count_rows()['global_study'], 0)
+
+
+class MySQLSourceDBTest(TestCase):
+
+    def test_wraps_connection(self):
+        """Attributes other than lock and unlock are those of the wrapped connection."""
+        class Connection(object):
+            database = bytearray(b'topmed_pheno')
+        wrapped = source_db.MySQLSourceDB(Connection())
+        self.assertEqual(wrapped.database, bytearray(b'topmed_pheno'))
@@ -0,0 +1,73 @@
+"""Test the generator of synthetic releases for a SQLite stand-in source db."""
+
+from django.test import TestCase
+
+from .management.commands.import_db import DATA_DICT_RE
+from .source_db import SQLiteSourceDB
+from .source_db_generator import RELEASE_INTERVAL, SourceDBGenerator
+
+
+RELEASE_ARGS = {'n_datasets_range': (1, 3), 'n_traits_range': (5, 10), 'n_new_harmonized_trait_sets': 2}
+
+
+class SourceDBGeneratorTest(TestCase):
+
+    def setUp(self):
+        self.source_db = SQLiteSourceDB()
+        self.generator = SourceDBGenerator(self.source_db, seed=1)
+
+    def tearDown(self):
+        self.source_db.close()
+
+    def query(self, query):
+        return self.source_db.connection.execute(query).fetchall()
+
+    def test_first_release(self):
+        """The first release has the requested number of studies, each with one current version."""
+        self.generator.add_release(n_new_studies=3, **RELEASE_ARGS)
+        counts = self.source_db.count_rows()
+        self.assertEqual(counts['study'], 3)
+        self.assertEqual(counts['source_study_version'], 3)
+        self.assertEqual(counts['harmonized_trait_set_version'], 2)
+        self.assertTrue(3 <= counts['source_dataset'] <= 9)
+        self.assertEqual(counts['source_dataset_dictionary_files'], counts['source_dataset'])
+        self.assertTrue(counts['source_trait'] >= 5 * counts['source_dataset'])
+        self.assertTrue(counts['component_source_trait'] > 0)
+        self.assertEqual(self.query('SELECT SUM(is_deprecated) FROM source_study_version'), [(0, )])
+
+    def test_second_release(self):
+        """The second release makes new versions of the current studies and deprecates the previous versions."""
+        first_date = self.generator.add_release(n_new_studies=3, **RELEASE_ARGS)
+        second_date = self.generator.add_release(n_new_studies=1, **RELEASE_ARGS)
+        self.assertEqual(second_date, first_date + RELEASE_INTERVAL)
+        self.assertEqual(self.source_db.count_rows()['study'], 4)
+        self.assertEqual(self.query('SELECT version, is_deprecated, COUNT(*) FROM source_study_version '
+                                    'GROUP BY version, is_deprecated'), [(1, 0, 1), (1, 1, 3), (2, 0, 3)])
+        self.assertEqual(
+            self.query('SELECT COUNT(*) FROM source_study_version '
+                       'WHERE is_deprecated = 1 AND date_changed > date_added'),
+            [(3, )])
+        # Most variables of the new versions have the same accessions as in the previous versions.
+        shared_accessions = self.query(
+            'SELECT COUNT(DISTINCT dbgap_variable_accession) FROM source_trait GROUP BY dbgap_variable_accession '
+            'HAVING COUNT(*) > 1')
+        self.assertTrue(len(shared_accessions) > 0)
+        self.assertEqual(self.query('SELECT COUNT(*) FROM harmonized_trait_set_version WHERE is_deprecated = 1'),
+                         [(2, )])
+        self.assertEqual(self.source_db.count_rows()['harmonized_trait_set_version_update_reason'], 2)
+
+    def test_dictionary_file_names(self):
+        """The data dictionary file names can be parsed by import_db."""
+        self.generator.add_release(n_new_studies=2, **RELEASE_ARGS)
+        self.generator.add_release(n_new_studies=0, **RELEASE_ARGS)
+        for filename, in self.query('SELECT filename FROM source_dataset_dictionary_files'):
+            self.assertIsNotNone(DATA_DICT_RE.match(filename), msg=filename)
+
+    def test_same_seed_same_data(self):
+        """The same seed makes the same source db."""
+        self.generator.add_release(n_new_studies=2, **RELEASE_ARGS)
+        other_source_db = SQLiteSourceDB()
+        SourceDBGenerator(other_source_db, seed=1).add_release(n_new_studies=2, **RELEASE_ARGS)
+        query = 'SELECT * FROM source_trait ORDER BY source_trait_id'
+        self.assertEqual(self.query(query), other_source_db.connection.execute(query).fetchall())
+        other_source_db.close()
@@ -62,6 +62,23 @@ class StudyTableTest(TestCase):
         row = table.rows[0]
         self.assertEqual(row.get_cell('trait_count'), '{:,}'.format(n_traits))
 
+    def test_trait_count_annotated(self):
+        """Trait counts annotated by with_trait_count are correct and don't need a query per row."""
+        study = self.model_factory.create()
+        self.model_factory.create_batch(5)
+        n_traits = 12
+        factories.SourceTraitFactory.create_batch(
+            n_traits, source_dataset__source_study_version__study=study,
+            source_dataset__source_study_version__i_is_deprecated=False)
+        factories.SourceTraitFactory.create_batch(
+            5, source_dataset__source_study_version__study=study,
+            source_dataset__source_study_version__i_is_deprecated=True)
+        table = self.table_class(self.model.objects.with_trait_count())
+        with self.assertNumQueries(1):
+            cells = {row.record.pk: row.get_cell('trait_count') for row in table.rows}
+        self.assertEqual(cells[study.pk], '{:,}'.format(n_traits))
+        self.assertEqual(len([cell for cell in cells.values() if cell == '0']), 5)
+
 
 class SourceDatasetTableTest(TestCase):
 
@@ -99,6 +116,19 @@ class SourceDatasetTableTest(TestCase):
         row = table.rows[0]
         self.assertEqual(row.get_cell('trait_count'), '{:,}'.format(n_traits))
 
+    def test_trait_count_annotated(self):
+        """Trait counts annotated by with_trait_count are correct and don't need a query per row."""
+        dataset = self.model_factory.create()
+        self.model_factory.create_batch(5)
+        n_traits = 12
+        factories.SourceTraitFactory.create_batch(n_traits, source_dataset=dataset)
+        table = self.table_class(self.model.objects.select_related(
+            'source_study_version__study').with_trait_count())
+        with self.assertNumQueries(1):
+            cells = {row.record.pk: row.get_cell('trait_count') for row in table.rows}
+        self.assertEqual(cells[dataset.pk], '{:,}'.format(n_traits))
+        self.assertEqual(len([cell for cell in cells.values() if cell == '0']), 5)
+
 
 class SourceDatasetTableFullTest(TestCase):
 
@@ -136,6 +166,19 @@ class SourceDatasetTableFullTest(TestCase):
         row = table.rows[0]
         self.assertEqual(row.get_cell('trait_count'), '{:,}'.format(n_traits))
 
+    def test_trait_count_annotated(self):
+        """Trait counts annotated by with_trait_count are correct and don't need a query per row."""
+        dataset = self.model_factory.create()
+        self.model_factory.create_batch(5)
+        n_traits = 12
+        factories.SourceTraitFactory.create_batch(n_traits, source_dataset=dataset)
+        table = self.table_class(self.model.objects.select_related(
+            'source_study_version__study').with_trait_count())
+        with self.assertNumQueries(1):
+            cells = {row.record.pk: row.get_cell('trait_count') for row in table.rows}
+        self.assertEqual(cells[dataset.pk], '{:,}'.format(n_traits))
+        self.assertEqual(len([cell for cell in cells.values() if cell == '0']), 5)
+
 
 class SourceTraitTableTest(TestCase):
 
@@ -229,6 +272,27 @@ class SourceTraitDatasetTableTest(TestCase):
         )
 
 
+class SourceTraitVersionTableTest(TestCase):
+
+    model = models.SourceTrait
+    model_factory = factories.SourceTraitFactory
+    table_class = tables.SourceTraitVersionTable
+
+    def test_row_count(self):
+        """Table has expected number of rows."""
+        things = self.model_factory.create_batch(20)
+        table = self.table_class(things)
+        self.assertEqual(self.model.objects.count(), len(table.rows))
+
+    def test_status(self):
+        """Status column shows whether the trait is from a deprecated study version."""
+        current_trait = self.model_factory.create(source_dataset__source_study_version__i_is_deprecated=False)
+        deprecated_trait = self.model_factory.create(source_dataset__source_study_version__i_is_deprecated=True)
+        table = self.table_class([current_trait, deprecated_trait])
+        self.assertEqual(table.rows[0].get_cell('status'), 'current')
+        self.assertEqual(table.rows[1].get_cell('status'), 'deprecated')
+
+
 class HarmonizedTraitTableTest(TestCase):
 
     model = models.HarmonizedTrait
@@ -3,15 +3,22 @@
 from copy import copy
 from datetime import timedelta
 
+from django.contrib import messages
 from django.contrib.auth.models import Group
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
 from django.urls import reverse
 from django.utils import timezone
 
+from core.factories import UserFactory
 from core.utils import (DCCAnalystLoginTestCase, get_autocomplete_view_ids, LoginRequiredTestCase,
-                        PhenotypeTaggerLoginTestCase, UserLoginTestCase)
+                        PhenotypeTaggerLoginTestCase, QueryBudgetTestMixin, UserLoginTestCase)
 from tags.models import TaggedTrait, DCCReview
 from tags.factories import DCCReviewFactory, TagFactory, TaggedTraitFactory
 
+from . import accessions
 from . import factories
 from . import forms
 from . import models
@@ -142,6 +149,23 @@ class StudyDetailTest(UserLoginTestCase):
         self.assertTrue(context['show_new_dataset_button'])
         self.assertContains(response, reverse('trait_browser:source:studies:pk:datasets:new', args=[self.study.pk]))
 
+    def test_modified_by_tagging(self):
+        """Tagging or archiving a tagged trait in the study changes the ETag, and reviewing it doesn't."""
+        cache.clear()
+        url = self.get_url(self.study.pk)
+        etag = self.client.get(url)['ETag']
+        tagged_trait = TaggedTraitFactory.create(trait=self.source_traits[0])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '1 variables and 1 tags')
+        etag = response['ETag']
+        DCCReviewFactory.create(tagged_trait=tagged_trait)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        tagged_trait.archive()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '0 variables and 0 tags')
+
 
 class StudyListTest(UserLoginTestCase):
     """Unit tests for the StudyList view."""
@@ -2255,6 +2279,22 @@ class SourceTraitDetailTest(UserLoginTestCase):
         self.assertIn('is_deprecated', context)
         self.assertIn('show_removed_text', context)
         self.assertIn('new_version_link', context)
+        self.assertIn('harmonized_traits', context)
+
+    def test_harmonized_traits(self):
+        """View shows the current harmonized traits that use the trait, directly or transitively."""
+        harmonized_trait = factories.HarmonizedTraitFactory.create(
+            component_source_traits=[self.trait], harmonized_trait_set_version__i_is_deprecated=False)
+        downstream_trait = factories.HarmonizedTraitFactory.create(
+            component_harmonized_trait_set_versions=[harmonized_trait.harmonized_trait_set_version],
+            harmonized_trait_set_version__i_is_deprecated=False)
+        deprecated_trait = factories.HarmonizedTraitFactory.create(
+            component_source_traits=[self.trait], harmonized_trait_set_version__i_is_deprecated=True)
+        models.SourceTraitLineage.objects.refresh()
+        response = self.client.get(self.get_url(self.trait.pk))
+        self.assertEqual(set(response.context['harmonized_traits']), {harmonized_trait, downstream_trait})
+        self.assertContains(response, downstream_trait.trait_flavor_name)
+        self.assertNotContains(response, deprecated_trait.get_absolute_url())
 
     def test_context_deprecated_trait_with_no_newer_version(self):
         """View has appropriate deprecation message with no newer version."""
@@ -2642,6 +2682,214 @@ class SourceTraitDetailDCCAnalystTest(DCCAnalystLoginTestCase):
         self.assertFalse(context['user_is_study_tagger'])
 
 
+class SourceTraitDetailQueryBudgetTestsMixin(QueryBudgetTestMixin):
+    """Mixin to check the number of queries run by the SourceTraitDetail view."""
+
+    query_budget = None
+
+    def get_url(self, *args):
+        return reverse('trait_browser:source:traits:detail', args=args)
+
+    def setUp(self):
+        super().setUp()
+        if self.user.profile.taggable_studies.count() > 0:
+            user_study = self.study
+        else:
+            user_study = factories.StudyFactory.create()
+        self.trait = factories.SourceTraitFactory.create(source_dataset__source_study_version__study=user_study)
+        factories.SourceTraitEncodedValueFactory.create_batch(3, source_trait=self.trait)
+
+    def test_no_tagged_traits_query_budget(self):
+        """The view runs no more than the query budget for a trait with no tags."""
+        with self.assertMaxNumQueries(self.query_budget):
+            response = self.client.get(self.get_url(self.trait.pk))
+        self.assertEqual(response.status_code, 200)
+
+    def test_many_tagged_traits_query_budget(self):
+        """The view runs no more than the query budget for a trait with many reviewed and unreviewed tags."""
+        TaggedTraitFactory.create_batch(10, trait=self.trait)
+        for tagged_trait in TaggedTraitFactory.create_batch(10, trait=self.trait):
+            DCCReviewFactory.create(tagged_trait=tagged_trait)
+        with self.assertMaxNumQueries(self.query_budget):
+            response = self.client.get(self.get_url(self.trait.pk))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['tagged_traits_with_xs']), 20)
+
+    def test_linked_encoded_value_set_query_budget(self):
+        """The view shows the encoded values of a trait linked to an encoded value set within the query budget."""
+        models.EncodedValueSet.objects.link_traits(models.SourceTrait.objects.filter(pk=self.trait.pk))
+        with self.assertMaxNumQueries(self.query_budget):
+            response = self.client.get(self.get_url(self.trait.pk))
+        for encoded_value in self.trait.sourcetraitencodedvalue_set.all():
+            self.assertContains(response, encoded_value.i_category)
+
+
+class SourceTraitDetailQueryBudgetUserTest(SourceTraitDetailQueryBudgetTestsMixin, UserLoginTestCase):
+
+    query_budget = 10
+
+
+class SourceTraitDetailQueryBudgetPhenotypeTaggerTest(SourceTraitDetailQueryBudgetTestsMixin,
+                                                      PhenotypeTaggerLoginTestCase):
+
+    query_budget = 10
+
+
+class SourceTraitDetailQueryBudgetDCCAnalystTest(SourceTraitDetailQueryBudgetTestsMixin, DCCAnalystLoginTestCase):
+
+    query_budget = 10
+
+
+class SourceTraitDetailConditionalGetTest(UserLoginTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.trait = factories.SourceTraitFactory.create(i_description='original description')
+        self.url = reverse('trait_browser:source:traits:detail', args=[self.trait.pk])
+
+    def get_other_client(self, **user_kwargs):
+        client = Client()
+        client.force_login(UserFactory.create(**user_kwargs))
+        return client
+
+    def test_validator_headers(self):
+        """The page has an ETag and Last-Modified header, and must be revalidated before reuse."""
+        response = self.client.get(self.url)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_not_modified(self):
+        """A request with the ETag of the current page gets a 304 without running the view."""
+        etag = self.client.get(self.url)['ETag']
+        # The session, the user, and the page state.
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        """A request with the Last-Modified date of the current page gets a 304."""
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_modified_by_tagging(self):
+        """Tagging the trait changes the ETag."""
+        etag = self.client.get(self.url)['ETag']
+        tagged_trait = TaggedTraitFactory.create(trait=self.trait)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, tagged_trait.tag.title)
+        etag = response['ETag']
+        DCCReviewFactory.create(tagged_trait=tagged_trait)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_modified_by_import(self):
+        """A new import generation changes the ETag, and the cached details of the page."""
+        etag = self.client.get(self.url)['ETag']
+        models.SourceTrait.objects.filter(pk=self.trait.pk).update(i_description='imported description')
+        # The details are cached until the next import.
+        response = self.client.get(self.url)
+        self.assertContains(response, 'original description')
+        models.ImportGeneration.objects.create()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'imported description')
+
+    def test_etag_differs_by_user(self):
+        """Users with the same role get different ETags, because the navbar shows their name."""
+        etag = self.client.get(self.url)['ETag']
+        other_client = self.get_other_client()
+        response = other_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cached_details_shared_by_role(self):
+        """Users with the same role share the cached details, and users with other roles don't."""
+        self.client.get(self.url)
+        models.SourceTrait.objects.filter(pk=self.trait.pk).update(i_description='imported description')
+        self.assertContains(self.get_other_client().get(self.url), 'original description')
+        staff_response = self.get_other_client(is_staff=True).get(self.url)
+        self.assertContains(staff_response, 'imported description')
+        self.assertContains(staff_response, 'Tag this variable')
+
+    def test_study_tagger_role(self):
+        """Taggers of the trait's study don't get the cached details of other users."""
+        self.client.get(self.url)
+        tagger = UserFactory.create()
+        tagger.profile.taggable_studies.add(self.trait.source_dataset.source_study_version.study)
+        tagger.groups.add(Group.objects.get(name='phenotype_taggers'))
+        tagger_client = Client()
+        tagger_client.force_login(tagger)
+        self.assertContains(tagger_client.get(self.url), 'Tag this variable')
+
+    def test_pending_messages(self):
+        """Pages are rendered in full when the user has messages to show."""
+        etag = self.client.get(self.url)['ETag']
+        # Queue a message in the cookie of the test client, as a view that redirects to the page would.
+        message_storage = CookieStorage(RequestFactory().get('/'))
+        message_storage.add(messages.SUCCESS, 'A message for the user.')
+        response = HttpResponse()
+        message_storage.update(response)
+        self.client.cookies.update(response.cookies)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'A message for the user.')
+
+
+class SourceTraitVersionListTest(UserLoginTestCase):
+    """Unit tests for the SourceTraitVersionList view."""
+
+    def setUp(self):
+        super(SourceTraitVersionListTest, self).setUp()
+        study = factories.StudyFactory.create()
+        now = timezone.now()
+        self.traits = [factories.SourceTraitFactory.create(
+            source_dataset__source_study_version__study=study,
+            source_dataset__source_study_version__i_version=version,
+            source_dataset__source_study_version__i_date_added=now - timedelta(hours=3 - version),
+            source_dataset__source_study_version__i_is_deprecated=version < 2,
+            i_dbgap_variable_accession=100) for version in (1, 2)]
+
+    def get_url(self, *args):
+        return reverse('trait_browser:source:traits:versions', args=args)
+
+    def test_view_success_code(self):
+        """View returns successful response code."""
+        response = self.client.get(self.get_url(self.traits[0].pk))
+        self.assertEqual(response.status_code, 200)
+
+    def test_view_with_invalid_pk(self):
+        """View returns 404 response code when the pk doesn't exist."""
+        response = self.client.get(self.get_url(self.traits[-1].pk + 1))
+        self.assertEqual(response.status_code, 404)
+
+    def test_context_data(self):
+        """View has appropriate data in the context."""
+        response = self.client.get(self.get_url(self.traits[0].pk))
+        context = response.context
+        self.assertEqual(context['source_trait'], self.traits[0])
+        self.assertIn('version_table', context)
+        self.assertIsInstance(context['version_table'], tables.SourceTraitVersionTable)
+
+    def test_table_has_all_versions_in_order(self):
+        """The table has every version of the trait, from oldest to newest, and no other traits."""
+        other_trait = factories.SourceTraitFactory.create(
+            source_dataset=self.traits[1].source_dataset, i_dbgap_variable_accession=101)
+        response = self.client.get(self.get_url(self.traits[1].pk))
+        table = response.context['version_table']
+        self.assertEqual(list(table.data), self.traits)
+        self.assertNotIn(other_trait, table.data)
+
+    def test_detail_page_links_to_versions(self):
+        """The detail page of a trait links to its version history."""
+        response = self.client.get(reverse('trait_browser:source:traits:detail', args=[self.traits[0].pk]))
+        self.assertContains(response, self.get_url(self.traits[0].pk))
+
+
 class SourceTraitListTest(UserLoginTestCase):
     """Unit tests for the SourceTraitList view."""
 
@@ -5180,6 +5428,51 @@ class SourceTraitLookupTest(UserLoginTestCase):
                              'Select a valid choice. That choice is not one of the available choices.')
 
 
+class BulkAccessionLookupTest(UserLoginTestCase):
+    """Unit tests for the BulkAccessionLookup view."""
+
+    def setUp(self):
+        super(BulkAccessionLookupTest, self).setUp()
+        self.trait = factories.SourceTraitFactory.create(i_dbgap_variable_accession=507)
+
+    def get_url(self):
+        return reverse('trait_browser:source:bulk-lookup')
+
+    def get_rows(self, response):
+        return [line.split('\t') for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_view_success_code(self):
+        """View returns successful response code."""
+        response = self.client.get(self.get_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.context['form'], forms.BulkAccessionLookupForm)
+
+    def test_streams_results(self):
+        """The results are streamed back as a tab-separated file, in the order of the accessions."""
+        response = self.client.post(self.get_url(), {'accessions': 'phv999\nphv507, 507', 'default_prefix': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/tab-separated-values')
+        self.assertIn('attachment', response['Content-Disposition'])
+        rows = self.get_rows(response)
+        self.assertEqual(tuple(rows[0]), accessions.RESULT_FIELDS)
+        results = [dict(zip(rows[0], row)) for row in rows[1:]]
+        self.assertEqual([result['query'] for result in results], ['phv999', 'phv507', '507'])
+        self.assertEqual([result['status'] for result in results],
+                         [accessions.STATUS_NOT_FOUND, accessions.STATUS_CURRENT, accessions.STATUS_INVALID])
+        self.assertEqual(results[1]['url'], 'http://testserver' + self.trait.get_absolute_url())
+
+    def test_default_prefix(self):
+        """Accessions without a prefix have the selected type."""
+        response = self.client.post(self.get_url(), {'accessions': '507', 'default_prefix': 'phv'})
+        self.assertEqual(self.get_rows(response)[1][1], accessions.STATUS_CURRENT)
+
+    def test_error_with_no_accessions(self):
+        """The form is shown again with an error if there are no accessions."""
+        response = self.client.post(self.get_url(), {'accessions': ' , '})
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response, 'form', 'accessions', forms.BulkAccessionLookupForm.ERROR_NO_ACCESSIONS)
+
+
 class HarmonizedTraitListTest(UserLoginTestCase):
     """Unit tests for the HarmonizedTraitList view."""
 
@@ -5513,6 +5806,13 @@ class HarmonizedTraitSetVersionDetailTest(UserLoginTestCase):
         self.assertIn('harmonized_trait_set_version', context)
         self.assertEqual(context['harmonized_trait_set_version'], self.htsv)
 
+    def test_component_html(self):
+        """The saved component html is included in the page as it is."""
+        self.htsv.component_html_detail = '<p class="component-html-test">{{ not a template }}</p>'
+        self.htsv.save()
+        response = self.client.get(self.get_url(self.htsv.pk))
+        self.assertContains(response, self.htsv.component_html_detail, html=False)
+
 
 # Test of the login-required for each URL in the app.
 class TraitBrowserLoginRequiredTest(LoginRequiredTestCase):
@@ -32,6 +32,7 @@ source_trait_patterns = ([
     url(r'^autocomplete/', include(source_trait_autocomplete_patterns)),
     url(r'^list/$', views.SourceTraitList.as_view(), name='list'),
     url(r'^(?P<pk>\d+)/$', views.SourceTraitDetail.as_view(), name='detail'),
+    url(r'^(?P<pk>\d+)/versions/$', views.SourceTraitVersionList.as_view(), name='versions'),
     url(r'^(?P<pk>\d+)/add-tag/$', views.SourceTraitTagging.as_view(), name='tagging'),
     url(r'^search/$', views.SourceTraitSearch.as_view(), name='search'),
     url(r'^lookup/$', views.SourceTraitLookup.as_view(), name='lookup'),
@@ -94,6 +95,7 @@ source_patterns = ([
     url(r'^variables/', include(source_trait_patterns)),
     url(r'^datasets/', include(source_dataset_patterns)),
     url(r'^studies/', include(source_study_patterns)),
+    url(r'^bulk-lookup/$', views.BulkAccessionLookup.as_view(), name='bulk-lookup'),
     url(r'lookup/$', views.SourceObjectLookup.as_view(), name='lookup'),
 ], 'source', )
 
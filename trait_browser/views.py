@@ -1,11 +1,17 @@
 """View functions and classes for the trait_browser app."""
 
-from django.core.exceptions import ObjectDoesNotExist
+from calendar import timegm
+import csv
+import datetime
+
+from django.contrib.messages import get_messages
 from django.db.models import Count, F, Q
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.template.defaultfilters import pluralize    # Use pluralize in the views.
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.utils.safestring import mark_safe
 from django.views.generic import DetailView, FormView, ListView
 from django.views.generic.base import TemplateView
@@ -17,10 +23,13 @@ from braces.views import (FormMessagesMixin, LoginRequiredMixin, MessageMixin, P
 from dal import autocomplete
 from django_tables2 import SingleTableMixin, SingleTableView
 
+from tags.caches import get_unreviewed_study_pks
 from tags.forms import TagSpecificTraitForm
 from tags.models import TaggedTrait
 from tags.views import TAGGING_ERROR_MESSAGE, TaggableStudiesRequiredMixin
 
+from . import accessions
+from . import caches
 from . import forms
 from . import models
 from . import searches
@@ -87,11 +96,69 @@ class SearchFormMixin(FormMixin):
         return self.render_to_response(context)
 
 
-class StudyDetail(LoginRequiredMixin, DetailView):
+class ConditionalPageMixin(object):
+    """Answer conditional GETs of a catalog page with 304s, and cache its sections for all users with the same role.
+
+    The page version depends on the latest import, the modified time of the object,
+    and the role of the user, and on the tagging of the object if the view sets
+    page_tagged_traits_path to the lookup path from its model to its TaggedTraits, or
+    page_tag_counts_path to the lookup path from its model to its TagStudyCounts.
+    Views of pages with tagging buttons set page_study_path to the lookup path from
+    their model to its Study, so that study taggers get their own version. The page
+    version is passed to the template as page_cache_key, for use with the
+    cache_section template tag, and the page state and the user's role are kept in
+    page_state and page_role.
+    """
+
+    page_tagged_traits_path = None
+    page_tag_counts_path = None
+    page_study_path = None
+
+    def get_page_state(self):
+        """Return a dict of the values the page version depends on."""
+        queryset = caches.get_page_state_queryset(
+            self.model.objects.all(), self.request.user, tagged_traits_path=self.page_tagged_traits_path,
+            tag_counts_path=self.page_tag_counts_path, study_path=self.page_study_path)
+        return get_object_or_404(queryset, pk=self.kwargs['pk'])
+
+    def get(self, request, *args, **kwargs):
+        self.page_state = self.get_page_state()
+        self.page_role = caches.get_user_role(request.user, self.page_state)
+        self.page_cache_key = caches.get_page_version(
+            type(self).__name__, request.get_full_path(), self.page_role, self.page_state)
+        # The navbar shows the user's name, so the ETag of the full page is different for each user.
+        etag = quote_etag('{}-{}'.format(self.page_cache_key, request.user.pk))
+        timestamps = [value for value in self.page_state.values() if isinstance(value, datetime.datetime)]
+        last_modified = timegm(max(timestamps).utctimetuple()) if timestamps else None
+        # Always render pages with pending messages, so that the messages are shown.
+        if len(get_messages(request)) == 0:
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                response['ETag'] = etag
+                return response
+        response = super().get(request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Browsers have to check whether the page has changed before they reuse it.
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['page_cache_key'] = self.page_cache_key
+        return context
+
+
+class StudyDetail(LoginRequiredMixin, ConditionalPageMixin, DetailView):
 
     model = models.Study
     context_object_name = 'study'
 
+    # The page only shows the counts of tagged variables and tags, which TagStudyCount keeps up to date.
+    page_tag_counts_path = 'tag_counts'
+    page_study_path = 'pk'
+
     def get_context_data(self, **kwargs):
         context = super(StudyDetail, self).get_context_data(**kwargs)
         traits = models.SourceTrait.objects.current().filter(source_dataset__source_study_version__study=self.object)
@@ -113,6 +180,9 @@ class StudyList(LoginRequiredMixin, SingleTableMixin, ListView):
     context_table_name = 'study_table'
     table_pagination = {'per_page': TABLE_PER_PAGE}
 
+    def get_table_data(self):
+        return models.Study.objects.with_trait_count()
+
 
 class StudyNameAutocomplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
     """Auto-complete studies in a form field by i_study_name."""
@@ -181,17 +251,18 @@ class StudyNameOrPHSAutocomplete(LoginRequiredMixin, autocomplete.Select2QuerySe
         unreviewed_non_archived = self.forwarded.get('unreviewed_non_archived_tagged_traits_only', False)
         # tag_pk is a string, so "is not None" is not needed.
         if tag_pk:
-            tagged_traits = TaggedTrait.objects.current()
             if unreviewed_non_archived:
-                tagged_traits = tagged_traits.unreviewed().non_archived()
-            studies_with_tag = tagged_traits.filter(
-                tag__pk=tag_pk
-            ).values_list('trait__source_dataset__source_study_version__study', flat=True).distinct()
+                # Use the cached index instead of querying TaggedTrait.
+                studies_with_tag = get_unreviewed_study_pks(tag_pk)
+            else:
+                studies_with_tag = TaggedTrait.objects.current().filter(
+                    tag__pk=tag_pk
+                ).values_list('trait__source_dataset__source_study_version__study', flat=True).distinct()
             retrieved = retrieved.filter(pk__in=studies_with_tag)
         return retrieved
 
 
-class SourceDatasetDetail(LoginRequiredMixin, SingleTableMixin, DetailView):
+class SourceDatasetDetail(LoginRequiredMixin, ConditionalPageMixin, SingleTableMixin, DetailView):
     """Detail view class for SourceDatasets. Displays the dataset's source traits in a table."""
 
     model = models.SourceDataset
@@ -231,7 +302,7 @@ class SourceDatasetList(LoginRequiredMixin, SingleTableView):
     def get_table_data(self):
         return models.SourceDataset.objects.current().select_related(
             'source_study_version__study'
-        )
+        ).with_trait_count()
 
 
 class StudySourceDatasetList(SingleTableMixin, StudyDetail):
@@ -244,7 +315,7 @@ class StudySourceDatasetList(SingleTableMixin, StudyDetail):
 
     def get_table_data(self):
         return models.SourceDataset.objects.current().filter(
-            source_study_version__study=self.object)
+            source_study_version__study=self.object).with_trait_count()
 
 
 class StudySourceDatasetNewList(SingleTableMixin, StudyDetail):
@@ -256,7 +327,7 @@ class StudySourceDatasetNewList(SingleTableMixin, StudyDetail):
     table_pagination = {'per_page': TABLE_PER_PAGE}
 
     def get_table_data(self):
-        return self.object.get_latest_version().get_new_sourcedatasets()
+        return self.object.get_latest_version().get_new_sourcedatasets().with_trait_count()
 
 
 class SourceDatasetSearch(LoginRequiredMixin, SearchFormMixin, SingleTableMixin, MessageMixin, TemplateView):
@@ -276,7 +347,7 @@ class SourceDatasetSearch(LoginRequiredMixin, SearchFormMixin, SingleTableMixin,
             studies=studies
         ).select_related(
             'source_study_version__study'
-        )
+        ).with_trait_count()
 
 
 class StudySourceDatasetSearch(LoginRequiredMixin, SearchFormMixin, SingleObjectMixin, SingleTableMixin, MessageMixin,
@@ -304,7 +375,7 @@ class StudySourceDatasetSearch(LoginRequiredMixin, SearchFormMixin, SingleObject
         ).select_related(
             'source_study_version',
             'source_study_version__study'
-        )
+        ).with_trait_count()
 
 
 class SourceDatasetNameAutocomplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
@@ -400,34 +471,41 @@ class StudySourceDatasetNameOrPHTAutocomplete(SourceDatasetNameOrPHTAutocomplete
         return retrieved
 
 
-class SourceTraitDetail(LoginRequiredMixin, DetailView):
+class SourceTraitDetail(LoginRequiredMixin, ConditionalPageMixin, DetailView):
     """Detail view class for SourceTraits. Inherits from django.views.generic.DetailView."""
 
     model = models.SourceTrait
     context_object_name = 'source_trait'
 
+    page_tagged_traits_path = 'all_taggedtraits'
+    page_study_path = 'source_dataset__source_study_version__study'
+
+    def get_queryset(self):
+        # Traits that have not been linked to an encoded value set yet load their encoded values separately.
+        return super(SourceTraitDetail, self).get_queryset().select_related(
+            'source_dataset__source_study_version__study', 'encoded_value_set'
+        )
+
     def get_context_data(self, **kwargs):
         is_deprecated = self.object.source_dataset.source_study_version.i_is_deprecated
         context = super(SourceTraitDetail, self).get_context_data(**kwargs)
-        user_studies = list(self.request.user.profile.taggable_studies.all())
-        context['user_is_study_tagger'] = self.object.source_dataset.source_study_version.study in user_studies
+        context['user_is_study_tagger'] = self.page_state['is_study_tagger']
         context['show_tag_button'] = (context['user_is_study_tagger'] or self.request.user.is_staff) and \
             not is_deprecated
         # Get the taggedtraits, not the tags, so you can offer the option of deleting the taggedtraits.
-        tagged_traits = self.object.all_taggedtraits.non_archived().order_by('tag__lower_title')
+        tagged_traits = self.object.all_taggedtraits.non_archived().select_related(
+            'tag', 'dcc_review').order_by('tag__lower_title')
         # If tagging is allowed, check on whether to show the delete button for each tag.
         if context['show_tag_button']:
-            show_delete_buttons = []
-            for tt in tagged_traits:
-                try:
-                    tt.dcc_review
-                    show_delete_buttons.append(False)
-                except ObjectDoesNotExist:
-                    show_delete_buttons.append(True)
+            # The dcc_review is already retrieved by select_related, so hasattr does not run a query.
+            show_delete_buttons = [not hasattr(tt, 'dcc_review') for tt in tagged_traits]
         # Don't show the delete button to anyone if tagging is not allowed.
         else:
             show_delete_buttons = [False] * len(tagged_traits)
         context['tagged_traits_with_xs'] = list(zip(tagged_traits, show_delete_buttons))
+        # Harmonized traits that use this trait, from the precomputed lineage table.
+        context['harmonized_traits'] = self.object.get_harmonized_traits().current().non_unique_keys().order_by(
+            'trait_flavor_name')
         context['show_removed_text'] = False
         context['new_version_link'] = None
         context['is_deprecated'] = is_deprecated
@@ -440,6 +518,22 @@ class SourceTraitDetail(LoginRequiredMixin, DetailView):
         return context
 
 
+class SourceTraitVersionList(LoginRequiredMixin, SingleTableMixin, DetailView):
+    """List all of the versions of a SourceTrait, across the versions of its study."""
+
+    model = models.SourceTrait
+    context_object_name = 'source_trait'
+    template_name = 'trait_browser/sourcetrait_versions.html'
+    context_table_name = 'version_table'
+    table_class = tables.SourceTraitVersionTable
+    table_pagination = {'per_page': TABLE_PER_PAGE}
+
+    def get_table_data(self):
+        return self.object.get_version_history().select_related(
+            'source_dataset__source_study_version'
+        )
+
+
 class SourceTraitList(LoginRequiredMixin, SingleTableMixin, ListView):
 
     model = models.SourceTrait
@@ -892,6 +986,38 @@ class SourceTraitLookup(LoginRequiredMixin, FormView):
         return url
 
 
+class _Echo(object):
+    """File-like object that returns what is written to it, so that csv rows can be streamed."""
+
+    def write(self, value):
+        return value
+
+
+class BulkAccessionLookup(LoginRequiredMixin, FormView):
+    """View to resolve many dbGaP accessions at once, and stream the results back as a tab-separated file."""
+
+    template_name = 'trait_browser/bulk_accession_lookup.html'
+    form_class = forms.BulkAccessionLookupForm
+
+    def get_rows(self, results):
+        """Generate the header and rows of the results file, with full urls."""
+        yield accessions.RESULT_FIELDS
+        for result in results:
+            for field in ('url', 'latest_url'):
+                if result[field] is not None:
+                    result[field] = self.request.build_absolute_uri(result[field])
+            yield list(result.values())
+
+    def form_valid(self, form):
+        results = accessions.resolve_accessions(form.cleaned_data['accessions'],
+                                                default_prefix=form.cleaned_data['default_prefix'])
+        writer = csv.writer(_Echo(), delimiter='\t', lineterminator='\n')
+        response = StreamingHttpResponse((writer.writerow(row) for row in self.get_rows(results)),
+                                         content_type='text/tab-separated-values')
+        response['Content-Disposition'] = 'attachment; filename="accessions.tsv"'
+        return response
+
+
 class HarmonizedTraitList(LoginRequiredMixin, SingleTableMixin, ListView):
 
     model = models.HarmonizedTrait
@@ -934,7 +1060,7 @@ class HarmonizedTraitSearch(LoginRequiredMixin, SearchFormMixin, SingleTableMixi
         )
 
 
-class HarmonizedTraitSetVersionDetail(LoginRequiredMixin, FormMessagesMixin, DetailView):
+class HarmonizedTraitSetVersionDetail(LoginRequiredMixin, ConditionalPageMixin, FormMessagesMixin, DetailView):
     """Detail view class for HarmonizedTraitSetVersions. Inherits from django.views.generic.DetailView."""
 
     model = models.HarmonizedTraitSetVersion
@@ -942,7 +1068,7 @@ class HarmonizedTraitSetVersionDetail(LoginRequiredMixin, FormMessagesMixin, Det
 
     def get_context_data(self, **kwargs):
         context = super(HarmonizedTraitSetVersionDetail, self).get_context_data(**kwargs)
-        harmonized_traits = self.object.harmonizedtrait_set.all()
+        harmonized_traits = self.object.harmonizedtrait_set.select_related('encoded_value_set')
         context['harmonized_trait'] = harmonized_traits.get(i_is_unique_key=False)
         context['unique_keys'] = harmonized_traits.filter(i_is_unique_key=True)
         context['unique_key_names'] = ', '.join(context['unique_keys'].values_list('trait_flavor_name', flat=True))